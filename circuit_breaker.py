@@ -0,0 +1,246 @@
+"""
+外部呼び出しのサーキットブレーカーと、観測レイテンシからのタイムアウト決定
+
+Dify が遅く・不安定になったとき、固定の 60 秒タイムアウトでは学習者が毎回1分待たされる。
+
+- LatencyTracker: ワークフローごとに成功した呼び出しの所要時間を記録し、p99 × factor
+  （min_sec〜max_sec の範囲）をタイムアウトに、p95 をヘッジ（2本目の送信）の目安にする
+- CircuitBreaker: 直近の失敗が続いたら open にして、cooldown_sec の間は呼ばずに即座に失敗させる。
+  cooldown 後は half_open で1件だけ試し、成功すれば closed に戻す（状態を変えるのはその試し呼び出しの結果だけ）
+
+実際の呼び出し・タイムアウト・ヘッジは DifyClient（dify.py）が行う。このモジュールは判断だけを持つ。
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from metrics import Histogram, get_metrics
+
+logger = logging.getLogger('winglish.circuit_breaker')
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LatencyTracker:
+    """
+    成功した呼び出しの所要時間からタイムアウトを決める
+
+    Usage:
+        tracker = LatencyTracker(default_sec=60, min_sec=5, max_sec=60)
+        timeout = tracker.timeout()
+        ...
+        tracker.observe(elapsed_sec)
+    """
+
+    def __init__(
+        self,
+        default_sec: float,
+        min_sec: float,
+        max_sec: float,
+        factor: float = 2.0,
+        min_samples: int = 20,
+    ) -> None:
+        """
+        Args:
+            default_sec: サンプルが min_samples 件たまるまでのタイムアウト
+            min_sec: タイムアウトの下限
+            max_sec: タイムアウトの上限
+            factor: p99 に掛ける倍率
+            min_samples: 観測値からタイムアウトを決めるのに必要なサンプル数
+        """
+        self.default_sec = default_sec
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self.factor = factor
+        self.min_samples = min_samples
+        self._histogram = Histogram(max_samples=256)
+
+    @property
+    def ready(self) -> bool:
+        return self._histogram.count >= self.min_samples
+
+    def observe(self, elapsed_sec: float) -> None:
+        """
+        所要時間を記録する
+
+        タイムアウトした呼び出しはタイムアウト値を記録する（打ち切られた分だけ p99 が上がり、
+        Dify が全体に遅くなったときにタイムアウトが上限に向かって伸びる）。
+        """
+        self._histogram.observe(elapsed_sec)
+
+    def timeout(self) -> float:
+        """次の呼び出しのタイムアウト（秒）"""
+        if not self.ready:
+            return self.default_sec
+        return min(self.max_sec, max(self.min_sec, self._histogram.percentile(0.99) * self.factor))
+
+    def hedge_after(self) -> Optional[float]:
+        """2本目を送るまでの時間（秒）。サンプルが足りなければ None（ヘッジしない）"""
+        if not self.ready:
+            return None
+        return self._histogram.percentile(0.95)
+
+    def stats(self) -> Dict[str, float]:
+        """メトリクス用の統計値を返す"""
+        return {
+            "p95_sec": round(self._histogram.percentile(0.95), 3),
+            "p99_sec": round(self._histogram.percentile(0.99), 3),
+            "timeout_sec": round(self.timeout(), 3),
+        }
+
+
+class Permit:
+    """allow() が返す呼び出しの許可（probe: half_open の試し呼び出しを持っているか）"""
+
+    __slots__ = ("probe",)
+
+    def __init__(self, probe: bool) -> None:
+        self.probe = probe
+
+
+class CircuitBreaker:
+    """
+    失敗が続いたら一定時間呼び出しを止めるサーキットブレーカー
+
+    次のどちらかで open になる:
+    - 連続 failure_threshold 回の失敗
+    - 直近 window 件（min_calls 件以上）のうち failure_ratio 以上が失敗
+
+    half_open で状態を変えるのは試し呼び出し（permit.probe）の結果だけ。open になる前に始まった呼び出しが
+    遅れて終わっても、その結果では closed / open に戻さない。
+
+    Usage:
+        permit = breaker.allow()
+        if permit is None:
+            raise Unavailable(...)
+        try:
+            ...
+        except UpstreamError:
+            breaker.record_failure(permit)
+            raise
+        else:
+            breaker.record_success(permit)
+        finally:
+            breaker.release_probe(permit)   # 成否を記録せずに終わった試し呼び出しを解放する
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        failure_ratio: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        cooldown_sec: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            name: ログ・メトリクスに出す名前（"dify" など）
+            failure_threshold: open にする連続失敗数
+            failure_ratio: open にする直近の失敗率
+            window: 失敗率を計算する直近の件数
+            min_calls: 失敗率で判断するのに必要な件数
+            cooldown_sec: open から half_open に移るまでの秒数
+            clock: 時刻関数（テスト用）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.cooldown_sec = cooldown_sec
+        self._clock = clock
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        # half_open の試し呼び出しの許可（実行中でなければ None）
+        self._probe: Optional[Permit] = None
+
+    def allow(self) -> Optional[Permit]:
+        """
+        呼び出してよいか
+
+        Returns:
+            許可（half_open の試し呼び出しなら probe=True）。open 中・試し呼び出しの実行中は None
+        """
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.cooldown_sec:
+                get_metrics().inc(f"{self.name}.breaker.rejected")
+                return None
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe is not None:
+                get_metrics().inc(f"{self.name}.breaker.rejected")
+                return None
+            self._probe = Permit(probe=True)
+            return self._probe
+        return Permit(probe=False)
+
+    def record_success(self, permit: Optional[Permit] = None) -> None:
+        """成功を記録する（half_open の試し呼び出しなら closed に戻す）"""
+        self._outcomes.append(True)
+        self._consecutive_failures = 0
+        if self.state == HALF_OPEN and self._owns_probe(permit):
+            self._probe = None
+            self._outcomes.clear()
+            self._transition(CLOSED)
+
+    def record_failure(self, permit: Optional[Permit] = None) -> None:
+        """失敗を記録する（条件を満たせば open にする。half_open では試し呼び出しの失敗だけで open に戻す）"""
+        self._outcomes.append(False)
+        self._consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            if self._owns_probe(permit):
+                self._probe = None
+                self._open()
+            return
+        if self.state == CLOSED and self._should_open():
+            self._open()
+
+    def release_probe(self, permit: Optional[Permit]) -> None:
+        """試し呼び出しが成否を記録せずに終わった（キャンセルなど）ときに解放する（permit が試し呼び出しのときだけ）"""
+        if self._owns_probe(permit):
+            self._probe = None
+
+    def stats(self) -> Dict[str, object]:
+        """メトリクス用の統計値を返す"""
+        failures = self._outcomes.count(False)
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "recent_failure_ratio": round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+        }
+
+    def _owns_probe(self, permit: Optional[Permit]) -> bool:
+        return permit is not None and permit is self._probe
+
+    def _should_open(self) -> bool:
+        if self._consecutive_failures >= self.failure_threshold:
+            return True
+        if len(self._outcomes) < self.min_calls:
+            return False
+        return self._outcomes.count(False) / len(self._outcomes) >= self.failure_ratio
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        previous, self.state = self.state, state
+        get_metrics().inc(f"{self.name}.breaker.{state}")
+        message = f"サーキットブレーカー {self.name}: {previous} → {state}"
+        if state == OPEN:
+            logger.warning(f"{message}（{self.cooldown_sec:g}秒間は呼び出しを止めます）")
+        else:
+            logger.info(message)
+
+
+__all__ = ['CLOSED', 'OPEN', 'HALF_OPEN', 'LatencyTracker', 'CircuitBreaker', 'Permit']
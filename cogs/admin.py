@@ -27,6 +27,23 @@ def _slugify_channel(name: str) -> str:
         s = "user"
     return f"winglish-{s}"
 
+def _format_ms_summary(summary: dict) -> str:
+    """ヒストグラムの summary() を1行にまとめる（ミリ秒）"""
+    return (
+        f"n={summary['count']} p50 {summary['p50']} / p95 {summary['p95']} / "
+        f"p99 {summary['p99']} / max {summary['max']} ms"
+    )
+
+def _top_histograms(histograms: dict, prefix: str, limit: int = 10) -> list[str]:
+    """p95 の大きい順に上位 limit 件を整形する（名前の prefix と末尾の .ms は省く）"""
+    if not histograms:
+        return ["(記録なし)"]
+    ranked = sorted(histograms.items(), key=lambda kv: kv[1].percentile(0.95), reverse=True)[:limit]
+    return [
+        f"`{name[len(prefix):].removesuffix('.ms')}` {_format_ms_summary(hist.summary())}"
+        for name, hist in ranked
+    ]
+
 GUILD_CATEGORY_NAME = "Winglish｜個人学習"
 
 class WinglishAdmin(commands.Cog):
@@ -202,18 +219,75 @@ class WinglishAdmin(commands.Cog):
     @group.command(name="diag_vocab", description="語彙テーブルの件数とサンプルを表示")
     async def diag_vocab(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        from db import get_db_manager
-        db_manager = get_db_manager()
-        async with db_manager.acquire() as conn:
-            n = await conn.fetchval("SELECT COUNT(*) FROM words")
-            sample = await conn.fetch("""
-                SELECT word_id, word, jp, pos
-                FROM words ORDER BY word_id ASC LIMIT 5
-            """)
-        lines = [f"{r['word_id']}: {r['word']} / {r['jp']} / {r.get('pos') or '-'}" for r in sample]
-        msg = f"words 件数: **{n}**\n" + ("\n".join(lines) if lines else "(サンプルなし)")
+        from word_catalog import get_word_catalog
+        catalog = get_word_catalog()
+        if catalog.loaded:
+            n = len(catalog)
+            sample = [catalog.get(i) for i in catalog.ids[:5]]
+            source = f"カタログ（約{catalog.memory_bytes() // 1024} KiB）"
+        else:
+            from db import get_db_manager
+            db_manager = get_db_manager()
+            async with db_manager.acquire(site="admin.diag_vocab", readonly=True) as conn:
+                n = await conn.fetchval("SELECT COUNT(*) FROM words")
+                sample = await catalog.get_many(
+                    conn,
+                    [r['word_id'] for r in await conn.fetch("SELECT word_id FROM words ORDER BY word_id ASC LIMIT 5")]
+                )
+            source = "DB（カタログ未読み込み）"
+        lines = [f"{r.word_id}: {r.word} / {r.jp} / {r.pos or '-'}" for r in sample]
+        msg = f"words 件数: **{n}**（{source}）\n" + ("\n".join(lines) if lines else "(サンプルなし)")
         await interaction.followup.send(msg, ephemeral=True)
 
+    @group.command(name="diag_metrics", description="Bot内部のメトリクス（セッション数など）を表示")
+    @is_manager()
+    async def diag_metrics(self, interaction: discord.Interaction):
+        from metrics import get_metrics
+        snapshot = get_metrics().snapshot()
+        lines = [f"{k}: **{v}**" for k, v in snapshot.items()]
+        msg = "\n".join(lines) if lines else "(メトリクスなし)"
+        await interaction.response.send_message(msg[:1900], ephemeral=True)
+
+    @group.command(name="diag_db", description="DB接続プールとクエリ時間の概要を表示")
+    @is_manager()
+    async def diag_db(self, interaction: discord.Interaction):
+        from config import DB_SLOW_QUERY_MS
+        from metrics import get_metrics
+        metrics = get_metrics()
+        pool = metrics.source("db_pool")
+        replica = metrics.source("db_replica_pool")
+        wait = metrics.histogram("db.acquire_wait_ms").summary()
+
+        lines = [
+            "**接続プール**: " + (" / ".join(f"{k} {v}" for k, v in pool.items()) if pool else "(未初期化)"),
+            f"**接続待ち**: {_format_ms_summary(wait)}",
+            f"**遅いクエリ**: {metrics.counter('db.slow_queries')}件 / "
+            f"遅い接続待ち: {metrics.counter('db.slow_acquires')}件（閾値 {DB_SLOW_QUERY_MS:g} ms）",
+            f"**接続の整理**: 目標超過 {metrics.counter('db.pool_trimmed')}件 / 寿命 {metrics.counter('db.pool_retired')}件",
+            "**振り分け**: " + " / ".join(
+                f"{k} {metrics.counter(f'db.route.{k}')}" for k in ("primary", "replica", "sticky", "fallback")
+            ) + (f"（レプリカ: {' / '.join(f'{k} {v}' for k, v in replica.items())}）" if replica else ""),
+            "",
+            "**呼び出し元別（p95 上位10）**",
+        ]
+        lines += _top_histograms(metrics.histograms("db.site."), "db.site.")
+        lines += ["", "**名前付きクエリ（p95 上位10）**"]
+        lines += _top_histograms(
+            {k: v for k, v in metrics.histograms("db.").items() if not k.startswith(("db.site.", "db.acquire"))},
+            "db."
+        )
+        await interaction.response.send_message("\n".join(lines)[:1900], ephemeral=True)
+
+    @group.command(name="purge_grading_cache", description="長文読解の採点結果キャッシュを削除（デフォルトは期限切れのみ）")
+    @app_commands.describe(all_entries="True で期限内のものも含めて全件削除")
+    @is_manager()
+    async def purge_grading_cache(self, interaction: discord.Interaction, all_entries: bool = False):
+        await interaction.response.defer(ephemeral=True)
+        from grading_cache import get_grading_cache
+        deleted = await get_grading_cache().purge(expired_only=not all_entries)
+        scope = "全件" if all_entries else "期限切れ"
+        await interaction.followup.send(f"🧹 採点キャッシュ（{scope}）を {deleted} 件削除しました", ephemeral=True)
+
     @group.command(name="create_channel", description="指定ユーザーの学習鍵チャンネルを作成（ニックネーム名）")
     @app_commands.describe(user="対象ユーザー（@メンション または 検索）")
     async def create_channel(self, interaction: discord.Interaction, user: discord.Member):
@@ -247,7 +321,7 @@ class WinglishAdmin(commands.Cog):
         # DB users にも反映（upsert）
         from db import get_db_manager
         db_manager = get_db_manager()
-        async with db_manager.acquire() as conn:
+        async with db_manager.acquire(site="admin.create_channel") as conn:
             await conn.execute(
                 "INSERT INTO users(user_id, channel_id) VALUES($1,$2) "
                 "ON CONFLICT (user_id) DO UPDATE SET channel_id=$2",
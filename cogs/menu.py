@@ -1,91 +1,55 @@
 from __future__ import annotations
 
 import logging
+from typing import Optional
+
 import discord
 from discord.ext import commands
 
+from db import get_db_manager
 from error_handler import ErrorHandler
+from interaction_router import get_interaction_router
+from review_queue import count_due
+from srs_buffer import sync_srs_user
 from utils import info_embed
 
 logger = logging.getLogger('winglish.menu')
 
 
 class MenuView(discord.ui.View):
+    """メインメニュー（ボタンは Menu のルートで処理する。custom_id が固定なので再起動後も効く）"""
+
     def __init__(self) -> None:
         super().__init__(timeout=None)
-
-    @discord.ui.button(label="英単語", style=discord.ButtonStyle.primary, custom_id="menu:vocab")
-    async def vocab_btn(
-        self, interaction: discord.Interaction, button: discord.ui.Button
-    ) -> None:
-        await self._replace_with_new_bam(
-            interaction,
-            info_embed("英単語", "10問 / 前々回テスト / 苦手テスト / 戻る"),
-            VocabMenuView()
-        )
-
-    @discord.ui.button(label="英文解釈", style=discord.ButtonStyle.primary, custom_id="menu:svocm")
-    async def svocm_btn(
-        self, interaction: discord.Interaction, button: discord.ui.Button
-    ) -> None:
-        await self._replace_with_new_bam(
-            interaction,
-            info_embed("英文解釈（SVOCM）", "文型別 or ランダム / モーダル解答"),
-            SvocmMenuView()
-        )
-
-    @discord.ui.button(label="長文読解", style=discord.ButtonStyle.primary, custom_id="menu:reading")
-    async def reading_btn(
-        self, interaction: discord.Interaction, button: discord.ui.Button
-    ) -> None:
-        try:
-            # 1) まずは見た目を「生成中…」に更新
-            await ErrorHandler.safe_edit_message(
-                interaction,
-                embed=info_embed("長文読解", "問題を生成中です…（数秒かかることがあります）"),
-                view=None
-            )
-
-            # 2) ReadingCog を取得して、既存のコマンド実装を直接呼ぶ
-            rcog = interaction.client.get_cog("ReadingCog")
-            if rcog is None:
-                await ErrorHandler.safe_send_followup(
-                    interaction,
-                    "❌ ReadingCog が見つかりませんでした。管理者に連絡してください。",
-                    ephemeral=True
-                )
-                return
-
-            # command ctx を作って既存実装を再利用
-            ctx = await interaction.client.get_context(interaction.message)
-            # 既存の !reading コマンドと同じ入口を使う（デフォルトは toeic）
-            await rcog.start_reading(ctx, kind="toeic")
-        except Exception as e:
-            await ErrorHandler.handle_interaction_error(
-                interaction,
-                e,
-                user_message="❌ 長文読解の問題生成に失敗しました。しばらく待ってから再試行してください。",
-                log_context="menu.reading_btn"
-            )
+        self.add_item(discord.ui.Button(label="英単語", style=discord.ButtonStyle.primary, custom_id="menu:vocab"))
+        self.add_item(discord.ui.Button(label="英文解釈", style=discord.ButtonStyle.primary, custom_id="menu:svocm"))
+        self.add_item(discord.ui.Button(label="長文読解", style=discord.ButtonStyle.primary, custom_id="menu:reading"))
+        # ViewStore に残さない（interaction_router.routed_view を参照）
+        self.stop()
 
 
-    async def _replace_with_new_bam(
-        self,
-        interaction: discord.Interaction,
-        embed: discord.Embed,
-        view: discord.ui.View
-    ) -> None:
-        await ErrorHandler.safe_edit_message(interaction, embed=embed, view=view)
+async def _due_count(user_id: str) -> Optional[int]:
+    """今日の復習の枚数（取得できなければ None。メニュー表示は止めない）"""
+    try:
+        await sync_srs_user(user_id)
+        async with get_db_manager().acquire(site="menu.vocab_btn") as conn:
+            return await count_due(conn, user_id)
+    except Exception as e:
+        logger.warning(f"復習枚数の取得に失敗: {e}")
+        return None
 
 
-# サブメニューViews（最低限）
+# サブメニューViews（最低限。ボタンは各 Cog のルートで処理するため、どれも送る前に stop() する）
 class VocabMenuView(discord.ui.View):
-    def __init__(self) -> None:
+    def __init__(self, due_count: Optional[int] = None) -> None:
         super().__init__(timeout=None)
+        review_label = "今日の復習" if due_count is None else f"今日の復習（{due_count}）"
         self.add_item(discord.ui.Button(label="10問", style=discord.ButtonStyle.success, custom_id="vocab:ten"))
         self.add_item(discord.ui.Button(label="前々回テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:prevprev"))
         self.add_item(discord.ui.Button(label="苦手テスト", style=discord.ButtonStyle.danger, custom_id="vocab:weak"))
+        self.add_item(discord.ui.Button(label=review_label, style=discord.ButtonStyle.primary, custom_id="vocab:review"))
         self.add_item(discord.ui.Button(label="戻る", style=discord.ButtonStyle.secondary, custom_id="back:main"))
+        self.stop()
 
 
 class SvocmMenuView(discord.ui.View):
@@ -95,6 +59,7 @@ class SvocmMenuView(discord.ui.View):
             self.add_item(discord.ui.Button(label=f"第{i}文型", custom_id=f"svocm:pattern:{i}"))
         self.add_item(discord.ui.Button(label="ランダム", style=discord.ButtonStyle.success, custom_id="svocm:random"))
         self.add_item(discord.ui.Button(label="戻る", style=discord.ButtonStyle.secondary, custom_id="back:main"))
+        self.stop()
 
 
 class ReadingMenuView(discord.ui.View):
@@ -107,34 +72,73 @@ class ReadingMenuView(discord.ui.View):
         ]:
             self.add_item(discord.ui.Button(label=label, custom_id=cid))
         self.add_item(discord.ui.Button(label="戻る", style=discord.ButtonStyle.secondary, custom_id="back:main"))
+        self.stop()
 
 
 class Menu(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot: commands.Bot = bot
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction) -> None:
-        if interaction.type != discord.InteractionType.component:
-            return
-        cid = interaction.data.get("custom_id", "")
-        if cid == "back:main":
-            try:
-                await ErrorHandler.safe_edit_message(
-                    interaction,
-                    embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
-                    view=MenuView()
-                )
-            except Exception as e:
-                await ErrorHandler.handle_interaction_error(
+    async def cog_load(self) -> None:
+        router = get_interaction_router()
+        router.add("menu:vocab", self.vocab_btn)
+        router.add("menu:svocm", self.svocm_btn)
+        router.add("menu:reading", self.reading_btn)
+        router.add("back:main", self.back_main)
+
+    async def cog_unload(self) -> None:
+        get_interaction_router().remove_owner(self)
+
+    async def vocab_btn(self, interaction: discord.Interaction) -> None:
+        # 先にメニューを出して応答し（Discord の3秒の期限）、復習の枚数は取れたらボタンに書き足す
+        embed = info_embed("英単語", "10問 / 前々回テスト / 苦手テスト / 今日の復習 / 戻る")
+        await ErrorHandler.safe_edit_message(interaction, embed=embed, view=VocabMenuView())
+        due = await _due_count(str(interaction.user.id))
+        if due is not None:
+            await ErrorHandler.safe_edit_message(interaction, embed=embed, view=VocabMenuView(due))
+
+    async def svocm_btn(self, interaction: discord.Interaction) -> None:
+        await ErrorHandler.safe_edit_message(
+            interaction,
+            embed=info_embed("英文解釈（SVOCM）", "文型別 or ランダム / モーダル解答"),
+            view=SvocmMenuView()
+        )
+
+    async def reading_btn(self, interaction: discord.Interaction) -> None:
+        try:
+            # 1) まずは見た目を「生成中…」に更新
+            await ErrorHandler.safe_edit_message(
+                interaction,
+                embed=info_embed("長文読解", "問題を生成中です…（数秒かかることがあります）"),
+                view=None
+            )
+
+            # 2) ReadingCog を取得して、既存のコマンド実装を直接呼ぶ
+            rcog = self.bot.get_cog("ReadingCog")
+            if rcog is None:
+                await ErrorHandler.safe_send_followup(
                     interaction,
-                    e,
-                    log_context="menu.on_interaction: back:main"
+                    "❌ ReadingCog が見つかりませんでした。管理者に連絡してください。",
+                    ephemeral=True
                 )
-        # vocab/svocm/reading のサブメニューイベントを中継
-        elif cid.startswith("vocab:") or cid.startswith("svocm:") or cid.startswith("reading:"):
-            # 他の Cog に処理を任せる（何もしない）
-            pass  # discord.py が自動ルーティングする
+                return
+
+            # 既存の !reading コマンドと同じ入口を、押した人の問題として使う（デフォルトは toeic。作り置きがあればすぐ出る）
+            await rcog.start_session(interaction.channel, interaction.user.id)
+        except Exception as e:
+            await ErrorHandler.handle_interaction_error(
+                interaction,
+                e,
+                user_message="❌ 長文読解の問題生成に失敗しました。しばらく待ってから再試行してください。",
+                log_context="menu.reading_btn"
+            )
+
+    async def back_main(self, interaction: discord.Interaction) -> None:
+        await ErrorHandler.safe_edit_message(
+            interaction,
+            embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
+            view=MenuView()
+        )
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Menu(bot))
@@ -7,9 +7,12 @@ from typing import Any, Optional
 import discord
 from discord.ext import commands
 
-from db import get_db_manager
+from db import get_db_manager, run_query
 from error_handler import ErrorHandler
-from cogs.vocab import VocabSessionView, ensure_defer, safe_edit
+from cogs.vocab import SESSION_SIZE, VocabSessionView, ensure_defer, safe_edit
+from sampler import sample_distinct
+from sessions import get_session_registry
+from word_catalog import get_word_catalog
 
 logger = logging.getLogger('winglish.notebook')
 
@@ -35,7 +38,7 @@ class Notebook(commands.Cog):
         
         try:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            async with db_manager.acquire(site="notebook.notebook_create", user_id=user_id) as conn:
                 # 同名の単語帳があるかチェック
                 existing = await conn.fetchrow("""
                     SELECT notebook_id FROM vocabulary_notebooks 
@@ -79,7 +82,7 @@ class Notebook(commands.Cog):
         
         try:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            async with db_manager.acquire(site="notebook.notebook_list", readonly=True, user_id=user_id) as conn:
                 notebooks = await conn.fetch("""
                     SELECT 
                         n.notebook_id,
@@ -135,7 +138,7 @@ class Notebook(commands.Cog):
         """システム推奨単語帳一覧を表示"""
         try:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            async with db_manager.acquire(site="notebook.sys_notebooks", readonly=True) as conn:
                 notebooks = await conn.fetch("""
                     SELECT 
                         n.notebook_id,
@@ -196,7 +199,7 @@ class Notebook(commands.Cog):
         
         try:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            async with db_manager.acquire(site="notebook.notebook_delete", user_id=user_id) as conn:
                 # 単語帳を取得
                 notebook = await conn.fetchrow("""
                     SELECT notebook_id FROM vocabulary_notebooks 
@@ -243,7 +246,7 @@ class Notebook(commands.Cog):
         
         try:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            async with db_manager.acquire(site="notebook.notebook_add", user_id=user_id) as conn:
                 # 単語帳を取得
                 notebook = await conn.fetchrow("""
                     SELECT notebook_id FROM vocabulary_notebooks 
@@ -257,20 +260,8 @@ class Notebook(commands.Cog):
                     )
                     return
                 
-                # 単語を検索（部分一致でも検索できるように）
-                word_row = await conn.fetchrow("""
-                    SELECT word_id, word, jp FROM words 
-                    WHERE word ILIKE $1 
-                    LIMIT 1
-                """, word)
-                
-                if not word_row:
-                    # 前方一致で再試行
-                    word_row = await conn.fetchrow("""
-                        SELECT word_id, word, jp FROM words 
-                        WHERE word ILIKE $1 || '%'
-                        LIMIT 1
-                    """, word)
+                # 単語を検索（完全一致 → 前方一致）
+                word_row = await get_word_catalog().lookup(conn, word)
                 
                 if not word_row:
                     await interaction.response.send_message(
@@ -284,11 +275,11 @@ class Notebook(commands.Cog):
                 existing = await conn.fetchrow("""
                     SELECT * FROM notebook_words 
                     WHERE notebook_id = $1 AND word_id = $2
-                """, notebook['notebook_id'], word_row['word_id'])
+                """, notebook['notebook_id'], word_row.word_id)
                 
                 if existing:
                     await interaction.response.send_message(
-                        f"✅ 単語「{word_row['word']}」は既に単語帳に追加されています。",
+                        f"✅ 単語「{word_row.word}」は既に単語帳に追加されています。",
                         ephemeral=True
                     )
                     return
@@ -297,13 +288,13 @@ class Notebook(commands.Cog):
                 await conn.execute("""
                     INSERT INTO notebook_words (notebook_id, word_id)
                     VALUES ($1, $2)
-                """, notebook['notebook_id'], word_row['word_id'])
+                """, notebook['notebook_id'], word_row.word_id)
             
             await interaction.response.send_message(
-                f"✅ 単語「{word_row['word']} ({word_row['jp']})」を「{notebook_name}」に追加しました！",
+                f"✅ 単語「{word_row.word} ({word_row.jp})」を「{notebook_name}」に追加しました！",
                 ephemeral=True
             )
-            logger.info(f"ユーザー {user_id} が単語帳「{notebook_name}」に「{word_row['word']}」を追加しました")
+            logger.info(f"ユーザー {user_id} が単語帳「{notebook_name}」に「{word_row.word}」を追加しました")
         except Exception as e:
             await ErrorHandler.handle_interaction_error(
                 interaction,
@@ -326,7 +317,7 @@ class Notebook(commands.Cog):
         
         try:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            async with db_manager.acquire(site="notebook.notebook_remove", user_id=user_id) as conn:
                 # 単語帳を取得
                 notebook = await conn.fetchrow("""
                     SELECT notebook_id FROM vocabulary_notebooks 
@@ -341,11 +332,7 @@ class Notebook(commands.Cog):
                     return
                 
                 # 単語を検索
-                word_row = await conn.fetchrow("""
-                    SELECT word_id, word, jp FROM words 
-                    WHERE word ILIKE $1 
-                    LIMIT 1
-                """, word)
+                word_row = await get_word_catalog().lookup(conn, word, prefix_fallback=False)
                 
                 if not word_row:
                     await interaction.response.send_message(
@@ -358,20 +345,20 @@ class Notebook(commands.Cog):
                 result = await conn.execute("""
                     DELETE FROM notebook_words 
                     WHERE notebook_id = $1 AND word_id = $2
-                """, notebook['notebook_id'], word_row['word_id'])
+                """, notebook['notebook_id'], word_row.word_id)
                 
                 if result == "DELETE 0":
                     await interaction.response.send_message(
-                        f"❌ 単語「{word_row['word']}」は単語帳に存在しません。",
+                        f"❌ 単語「{word_row.word}」は単語帳に存在しません。",
                         ephemeral=True
                     )
                     return
             
             await interaction.response.send_message(
-                f"✅ 単語「{word_row['word']} ({word_row['jp']})」を「{notebook_name}」から削除しました。",
+                f"✅ 単語「{word_row.word} ({word_row.jp})」を「{notebook_name}」から削除しました。",
                 ephemeral=True
             )
-            logger.info(f"ユーザー {user_id} が単語帳「{notebook_name}」から「{word_row['word']}」を削除しました")
+            logger.info(f"ユーザー {user_id} が単語帳「{notebook_name}」から「{word_row.word}」を削除しました")
         except Exception as e:
             await ErrorHandler.handle_interaction_error(
                 interaction,
@@ -395,7 +382,8 @@ class Notebook(commands.Cog):
             await ensure_defer(interaction)
             
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
+            # 読み取りだけのブロック（レプリカに振り分けられうるので、ここでは書き込まない）
+            async with db_manager.acquire(site="notebook.notebook_study", readonly=True, user_id=user_id) as conn:
                 # 単語帳を取得（システム推奨もユーザー個人のも含む）
                 notebook = await conn.fetchrow("""
                     SELECT notebook_id, name, is_system 
@@ -407,61 +395,53 @@ class Notebook(commands.Cog):
                       )
                 """, notebook_name, user_id)
                 
-                if not notebook:
-                    await interaction.followup.send(
-                        f"❌ 単語帳「{notebook_name}」が見つかりません。",
-                        ephemeral=True
-                    )
-                    return
-                
-                # システム推奨単語帳の場合
-                if notebook['is_system']:
-                    words = await conn.fetch("""
-                        SELECT w.word_id, w.word, w.jp, w.pos, w.example_en, w.example_ja, w.synonyms, w.derived
-                        FROM system_notebook_words snw
-                        JOIN words w ON snw.word_id = w.word_id
-                        WHERE snw.notebook_id = $1
-                        ORDER BY snw.order_index, random()
-                        LIMIT 20
-                    """, notebook['notebook_id'])
-                else:
-                    # ユーザー個人の単語帳の場合
-                    words = await conn.fetch("""
-                        SELECT w.word_id, w.word, w.jp, w.pos, w.example_en, w.example_ja, w.synonyms, w.derived
-                        FROM notebook_words nw
-                        JOIN words w ON nw.word_id = w.word_id
-                        WHERE nw.notebook_id = $1
-                        ORDER BY random()
-                        LIMIT 20
-                    """, notebook['notebook_id'])
-                
-                if not words or len(words) < 1:
-                    await interaction.followup.send(
-                        f"❌ 単語帳「{notebook_name}」に単語がありません。\n"
-                        "`/notebook_add` で単語を追加してください。",
-                        ephemeral=True
-                    )
-                    return
-                
-                # 10問に制限
-                items = [dict(r) for r in words][:10]
-                batch_id = str(uuid.uuid4())
-                
-                view = VocabSessionView(batch_id, items)
-                # vocab.pyのstart_tenと同じパターン：最初にembedだけ送信してから、send_currentで最初の問題を表示
-                initial_embed = discord.Embed(title=f"英単語 10問 - {notebook_name}")
-                await safe_edit(interaction, embed=initial_embed, view=None, content=None)
-                await view.send_current(interaction)
-                
-                # セッションバッチを記録
-                await conn.execute("""
-                    INSERT INTO session_batches(user_id, module, batch_id) 
-                    VALUES($1, $2, $3) 
-                    ON CONFLICT DO NOTHING
-                """, user_id, "vocab", batch_id)
-                
-                self.bot._vocab_session = view
-                logger.info(f"ユーザー {user_id} が単語帳「{notebook_name}」から学習を開始しました")
+                words = []
+                if notebook:
+                    # システム推奨単語帳の場合（学習順序 order_index の先頭から）
+                    if notebook['is_system']:
+                        word_ids = await conn.fetch("""
+                            SELECT word_id
+                            FROM system_notebook_words
+                            WHERE notebook_id = $1
+                            ORDER BY order_index
+                            LIMIT $2
+                        """, notebook['notebook_id'], SESSION_SIZE)
+                        ids = [r['word_id'] for r in word_ids]
+                    else:
+                        # ユーザー個人の単語帳の場合（IDだけ取得してメモリ上でランダム抽出）
+                        word_ids = await conn.fetch("""
+                            SELECT word_id FROM notebook_words WHERE notebook_id = $1
+                        """, notebook['notebook_id'])
+                        ids = sample_distinct([r['word_id'] for r in word_ids], SESSION_SIZE)
+                    words = await get_word_catalog().get_many(conn, ids)
+            
+            if not notebook:
+                await interaction.followup.send(
+                    f"❌ 単語帳「{notebook_name}」が見つかりません。",
+                    ephemeral=True
+                )
+                return
+            
+            if not words:
+                await interaction.followup.send(
+                    f"❌ 単語帳「{notebook_name}」に単語がありません。\n"
+                    "`/notebook_add` で単語を追加してください。",
+                    ephemeral=True
+                )
+                return
+            
+            items = [w.to_dict() for w in words]
+            batch_id = str(uuid.uuid4())
+            view = VocabSessionView(batch_id, items)
+            
+            # セッションバッチを primary に記録してからセッションを登録する
+            async with db_manager.acquire(site="notebook.notebook_study", user_id=user_id) as conn:
+                await run_query(conn, "execute", "vocab.record_batch", user_id, "vocab", batch_id)
+            get_session_registry().put(user_id, VocabSessionView.MODULE, view)
+            
+            # 1問目のカードを1回の編集で表示する（見出しだけの編集はすぐ上書きされるので省く）
+            await safe_edit(interaction, **view.current_fields())
+            logger.info(f"ユーザー {user_id} が単語帳「{notebook_name}」から学習を開始しました")
         except Exception as e:
             await ErrorHandler.handle_interaction_error(
                 interaction,
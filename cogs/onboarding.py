@@ -36,7 +36,7 @@ class Onboarding(commands.Cog):
 
         # DBユーザー登録
         db_manager = get_db_manager()
-        async with db_manager.acquire() as conn:
+        async with db_manager.acquire(site="onboarding.ensure_private_channel") as conn:
             await conn.execute("INSERT INTO users(user_id) VALUES($1) ON CONFLICT (user_id) DO NOTHING", str(member.id))
 
         # メインBAM送付（常に最新1つ方針の起点）
@@ -1,242 +1,382 @@
-from dify import run_reading_question_async, run_reading_answer_async
+import re
+import time
+from typing import Optional
+
+from dify import DifyBusyError, DifyError, DifyPayloadError, DifyUnavailableError, get_dify_client
+from grading_cache import get_grading_cache
+from interaction_router import get_interaction_router, routed_view
+from metrics import get_metrics
+from reading_feedback import (
+    BRIEF_ALL_CORRECT, FEEDBACK_BRIEF, FEEDBACK_FULL, get_feedback_mode, needs_explanation, set_feedback_mode,
+)
+from reading_pool import DEFAULT_LEVEL, LEVEL_SCORES, get_reading_pool
+from reading_prefetch import get_reading_prefetcher
 import discord
 from discord.ext import commands
+from reading_sessions import (
+    ANSWER_PREFIX, DEFAULT_KIND, QUESTION_NUMBERS, answer_custom_id, get_reading_sessions,
+)
+from utils import ThrottledEditor
+
+# 生成中の本文を表示するメッセージの編集間隔（秒）。Discord の編集レート制限（5秒に5回）より控えめにする
+STREAM_EDIT_INTERVAL_SEC = 1.2
+# 解説の詳しさの切り替えボタン（"reading:feedback:full:toeic" など。末尾は問題の種類。種類のない古いボタンは DEFAULT_KIND）
+FEEDBACK_PREFIX = "reading:feedback:"
+# 「もう一問」ボタン（"reading:again:toeic" など。同じ種類で再出題する。種類のない古いボタンは "reading:again"）
+AGAIN_PREFIX = "reading:again:"
+# custom_id の上限（Discord の仕様）
+CUSTOM_ID_MAX_LEN = 100
+UNAVAILABLE_MESSAGE = "⚠️ 問題の生成・採点サービスが一時的に応答していません。しばらくしてからもう一度お試しください。"
+GRADE_FAILED_MESSAGE = "解説の作成に失敗しました。しばらくしてから「もう一問」で続けてください。"
 
 class ReadingCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._live_views = set()   # ★ 参照保持
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
-            return
-        cid = interaction.data.get("custom_id", "")
+    async def cog_load(self):
+        router = get_interaction_router()
+        router.add("reading:again", self.again)
+        router.add(AGAIN_PREFIX, self.again)
+        router.add("reading:back_main", self.back_main)
+        router.add(ANSWER_PREFIX, self.handle_answer, template=ReadingAnswerButton)
+        router.add(FEEDBACK_PREFIX, self.set_feedback)
 
-        # 共有: 直前メッセージのボタンを無効化するユーティリティ
-        async def _disable_buttons_only(msg: discord.Message):
-            try:
-                disabled = discord.ui.View(timeout=0)
-                for row in msg.components:
-                    for comp in getattr(row, "children", []):
-                        if isinstance(comp, discord.ui.Button):
-                            b = discord.ui.Button(
-                                label=comp.label, style=comp.style,
-                                custom_id=comp.custom_id, url=getattr(comp, "url", None),
-                                disabled=True
-                            )
-                            disabled.add_item(b)
-                await msg.edit(view=disabled)  # ★ Embedは触らない
-            except Exception:
-                pass
+    async def cog_unload(self):
+        get_interaction_router().remove_owner(self)
 
-        if cid == "reading:again":
-            # 解説メッセージはそのまま残す → ボタンだけ無効化
-            await _disable_buttons_only(interaction.message)
+    async def again(self, interaction: discord.Interaction, kind: str = DEFAULT_KIND):
+        # 解説メッセージはそのまま残す → ボタンだけ無効化
+        await _disable_buttons_only(interaction.message)
 
-            # 新規メッセージとして「生成中…」を出し、そこから再出題
-            try:
-                await interaction.response.send_message(
-                    embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
-                    view=None
-                )
-            except discord.InteractionResponded:
-                await interaction.followup.send(
-                    embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
-                    wait=True
-                )
+        # 新規メッセージとして「生成中…」を出し、そこから再出題
+        try:
+            await interaction.response.send_message(
+                embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
+                view=None
+            )
+        except discord.InteractionResponded:
+            await interaction.followup.send(
+                embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
+                wait=True
+            )
 
-            # 新しく出したメッセージから ctx を作って再出題
-            # （直前sendのメッセージは followup の戻り値を拾えないため、チャンネルからctxでOK）
-            ctx = await interaction.client.get_context(interaction.message)
-            await self.start_reading(ctx, kind="toeic")
+        # 同じチャンネルに、押した人の問題として同じ種類で再出題（先読みがあればすぐ出る）
+        await self.start_session(interaction.channel, interaction.user.id, kind or DEFAULT_KIND, use_prefetch=True)
 
-        elif cid == "reading:back_main":
-            # 解説メッセージはそのまま残す → ボタンだけ無効化
-            await _disable_buttons_only(interaction.message)
+    async def back_main(self, interaction: discord.Interaction):
+        # 解説メッセージはそのまま残す → ボタンだけ無効化
+        await _disable_buttons_only(interaction.message)
 
-            # 新規メッセージとしてメニューを送る
-            from utils import info_embed
-            from cogs.menu import MenuView
-            try:
-                await interaction.response.send_message(
-                    embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
-                    view=MenuView()
-                )
-            except discord.InteractionResponded:
-                await interaction.followup.send(
-                    embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
-                    view=MenuView(),
-                    wait=True
-                )
+        # 新規メッセージとしてメニューを送る
+        from utils import info_embed
+        from cogs.menu import MenuView
+        try:
+            await interaction.response.send_message(
+                embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
+                view=MenuView()
+            )
+        except discord.InteractionResponded:
+            await interaction.followup.send(
+                embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
+                view=MenuView(),
+                wait=True
+            )
 
     @commands.command(name="reading")
-    async def start_reading(self, ctx, kind: str = "toeic"):
+    async def start_reading(self, ctx, kind: str = DEFAULT_KIND):
         """例: !reading toeic"""
-        async with ctx.channel.typing():  # ← 入力中…を維持
-            q = await run_reading_question_async(
-                user_id=ctx.author.id,
-                training_type="reading",
-                current_score=50,
-                recent_svocm_mistakes="[]",
-                word=""
-            )
-
-            passage = q.get("passage", q.get("raw_text", ""))
-            q1_text = q.get("question_1_text", "")
-            q2_text = q.get("question_2_text", "")
-            q1_choices = {
-                "A": q.get("question_1_choice_A"),
-                "B": q.get("question_1_choice_B"),
-                "C": q.get("question_1_choice_C"),
-                "D": q.get("question_1_choice_D"),
-            }
-            q2_choices = {
-                "A": q.get("question_2_choice_A"),
-                "B": q.get("question_2_choice_B"),
-                "C": q.get("question_2_choice_C"),
-                "D": q.get("question_2_choice_D"),
-            }
-            q1_answer = q.get("question_1_answer")
-            q2_answer = q.get("question_2_answer")
+        await self.start_session(ctx.channel, ctx.author.id, kind)
+
+    async def start_session(self, channel, user_id: int, kind: str = DEFAULT_KIND, use_prefetch: bool = False):
+        """
+        channel に user_id の問題を出す（コマンド・メニュー・「もう一問」の共通の入口）
+
+        Args:
+            use_prefetch: 先読みを使う（「もう一問」のときだけ。先読みの hit_rate は「もう一問」の中での割合にする）
+        """
+        editor = None
+        async with channel.typing():  # ← 入力中…を維持
+            # 先読み（「もう一問」のみ。前の問題の解答中に生成を始めたもの。生成中なら完了を待つ）→ 作り置き の順に
+            # 即出題し、どちらもないときだけ Dify でその場で生成する
+            q = await get_reading_prefetcher().take(user_id, kind) if use_prefetch else None
+            if q is None:
+                q = await get_reading_pool().claim(kind, user_id=user_id)
+            if q is None:
+                # 生成しながら本文を少しずつ表示する（編集は STREAM_EDIT_INTERVAL_SEC ごとに間引く）
+                msg = await channel.send(embed=discord.Embed(title="📖 Reading Passage", description="本文を生成中です…"))
+                editor = ThrottledEditor(msg, STREAM_EDIT_INTERVAL_SEC)
+
+                def on_queued(position: int) -> None:
+                    editor.update(embed=discord.Embed(
+                        title="📖 Reading Passage", description=f"本文を生成中です…（順番待ち: {position}番目）"
+                    ))
+
+                def on_passage(text: str) -> None:
+                    editor.update(embed=discord.Embed(title="📖 Reading Passage", description=text[:4000] + " ▌"))
+
+                try:
+                    q = await get_dify_client().reading_question(
+                        user_id=user_id,
+                        training_type="reading",
+                        current_score=LEVEL_SCORES[DEFAULT_LEVEL],
+                        recent_svocm_mistakes="[]",
+                        word="",
+                        on_passage=on_passage,
+                        on_queued=on_queued,
+                    )
+                except DifyBusyError:
+                    # 連打など: 生成中の前の問題をそのまま使ってもらう
+                    await editor.finish(embed=discord.Embed(
+                        title="📖 Reading Passage", description="⏳ 前の問題を生成中です。表示されるまでお待ちください。"
+                    ))
+                    return
+                except DifyUnavailableError:
+                    # Dify の不調が続いている: 待たせずにすぐ知らせる
+                    await editor.finish(embed=discord.Embed(
+                        title="📖 Reading Passage", description=UNAVAILABLE_MESSAGE
+                    ))
+                    return
+                except DifyPayloadError:
+                    # 出題として読めない出力（dify.py でログ済み）: 壊れた問題は出さない
+                    await editor.finish(embed=discord.Embed(
+                        title="📖 Reading Passage", description="問題の生成に失敗しました。もう一度お試しください。"
+                    ))
+                    return
+                except Exception:
+                    await editor.finish(embed=discord.Embed(
+                        title="📖 Reading Passage", description="問題の生成に失敗しました。もう一度お試しください。"
+                    ))
+                    raise
 
             # 本文
-            emb_p = discord.Embed(title="📖 Reading Passage", description=passage)
-            await ctx.send(embed=emb_p)
+            emb_p = discord.Embed(title="📖 Reading Passage", description=q.passage)
+            if editor is None:
+                await channel.send(embed=emb_p)
+            else:
+                await editor.finish(embed=emb_p)
 
-            # セッション
-            session = {
-                "passage": passage,
-                "q1_text": q1_text, "q1_choices": q1_choices, "q1_answer": q1_answer, "q1_user": None,
-                "q2_text": q2_text, "q2_choices": q2_choices, "q2_answer": q2_answer, "q2_user": None,
-                "author_id": ctx.author.id,
-            }
+            # セッション（メモリと DB に保存し、ボタンの custom_id から引く）
+            session = await get_reading_sessions().create(str(user_id), q, kind=kind)
 
         # Q1表示（typingの外でOK）
-        await self._send_question(ctx, session, number=1)
+        await self._send_question(channel, session, number=1)
+
+    async def set_feedback(self, interaction: discord.Interaction, rest: str):
+        # 解説の詳しさを保存し、ボタンの表示を切り替える（「もう一問」の種類はそのまま引き継ぐ）
+        mode, _, kind = rest.partition(":")
+        try:
+            await set_feedback_mode(interaction.user.id, mode)
+        except ValueError:
+            return
+        await interaction.response.edit_message(view=ReadingEndView(mode, kind or DEFAULT_KIND))
+        note = ("次から、全問正解のときは解説を省いてすぐ結果だけを表示します。" if mode == FEEDBACK_BRIEF
+                else "次から、全問正解のときも詳しい解説を表示します。")
+        await interaction.followup.send(note, ephemeral=True)
 
-    async def _send_question(self, ctx, session, number: int):
-        q_text = session[f"q{number}_text"]
-        choices = session[f"q{number}_choices"]
-        emb_q = discord.Embed(title=f"Q{number}", description=q_text)
+    async def _send_question(self, channel, session, number: int):
+        q = session.question
+        emb_q = discord.Embed(title=f"Q{number}", description=q.text(number))
 
         # 選択肢本文をEmbedに表示
-        lines = []
-        for k in ("A", "B", "C", "D"):
-            v = choices.get(k)
-            if v:
-                lines.append(f"**{k}.** {v}")
+        choices = q.choices(number)
+        lines = [f"**{k}.** {v}" for k, v in choices.items()]
         if lines:
             emb_q.add_field(name="Choices", value="\n".join(lines), inline=False)
 
-        # View作成（A/B/C/Dボタン）＋ 参照保持（GC防止）
-        view = ChoiceView(
-            session=session,
-            number=number,
-            on_done=lambda s, n=number: self._on_answer(ctx, s, n),
-            timeout=180
-        )
-        for key in ("A", "B", "C", "D"):
-            if choices.get(key):
-                view.add_item(ChoiceButton(label=key, custom_id=f"{number}:{key}", key=key))
-        self._live_views.add(view)  # ★ 参照保持
+        # A/B/C/Dボタン（custom_id にセッションIDを入れ、ルーターから handle_answer で処理する）
+        view = routed_view(*[ReadingAnswerButton(session.session_id, number, key) for key in choices])
+        await channel.send(embed=emb_q, view=view)
 
-        await ctx.send(embed=emb_q, view=view)
+    async def handle_answer(self, interaction: discord.Interaction, match: re.Match):
+        session_id, number, key = match["session_id"], int(match["number"]), match["key"]
 
-    async def _on_answer(self, ctx, session, answered_number: int):
-        # Q1の直後→Q2へ、Q2の直後→採点
-        if answered_number == 1:
-            await self._send_question(ctx, session, number=2)
+        # ユーザー単位のロックで多重実行ガード（処理中のクリックは捨てる）
+        user_id = str(interaction.user.id)
+        store = get_reading_sessions()
+        lock = store.lock(user_id)
+        if lock.locked():
+            await interaction.response.defer()
             return
 
-        # 採点
+        async with lock:
+            session = await store.get(user_id, session_id)
+            if session is None or not session.record(number, key):
+                # 失効・置き換え済み・ほかの人の問題・解答済み
+                await interaction.response.send_message(
+                    "この問題にはもう解答できません（時間切れか、ほかの人の問題です）。「!reading」で新しい問題を始めてください。",
+                    ephemeral=True,
+                )
+                return
+
+            # 既存のQカードに「あなたの選択」を追記して示す
+            try:
+                emb = interaction.message.embeds[0] if interaction.message.embeds else None
+                if emb is not None:
+                    emb = emb.copy()
+                    emb.add_field(name="Your choice", value=f"**{key}**", inline=True)
+                    await interaction.response.edit_message(embed=emb, view=None)
+                else:
+                    await interaction.response.edit_message(view=None)
+            except discord.InteractionResponded:
+                try:
+                    await interaction.message.edit(view=None)
+                except Exception:
+                    pass
+
+            # Q1の直後→Q2へ、Q2の直後→採点（採点に進んだらセッションは終わり）
+            if session.next_number() is not None:
+                await store.save(session)
+            else:
+                await store.finish(session)
+
+        # 解説のあとの「もう一問」に備えて、次の問題の生成を始めておく（Q1 で始められなければ採点のあとで。
+        # 採点の Dify 呼び出しは同じユーザーの先読みより優先され、生成中の先読みはキャンセルされるため）
+        if session.next_number() is not None:
+            get_reading_prefetcher().start(user_id, session.kind)
+            await self._send_question(interaction.channel, session, number=session.next_number())
+        else:
+            await self._grade(interaction.channel, session)
+            get_reading_prefetcher().start(user_id, session.kind)
+
+    async def _grade(self, channel, session):
+        q = session.question
+
         def join_choices(d):
             return " ".join([f"{k}. {v}" for k, v in d.items() if v])
 
-        # 入力中…インジケータをONにしてからDifyを叩く
-        async with ctx.channel.typing():
-            result = await run_reading_answer_async(
-                user_id=session["author_id"],
-                passage=session["passage"],
-                q1_text=session["q1_text"],
-                q1_choices_str=join_choices(session["q1_choices"]),
-                q1_answer=session["q1_answer"],
-                q1_user=session["q1_user"],
-                q2_text=session["q2_text"],
-                q2_choices_str=join_choices(session["q2_choices"]),
-                q2_answer=session["q2_answer"],
-                q2_user=session["q2_user"],
-            )
+        # 正誤はセッションの正解からすぐ出す（解説は届いたら同じメッセージを編集して追記する）
+        mode = await get_feedback_mode(session.user_id)
+        metrics = get_metrics()
+        if not needs_explanation(session, mode):
+            # 簡潔な解説 + 全問正解: Dify を呼ばずに定型文で終える
+            metrics.inc("reading.explanation.skipped")
+            await channel.send(embed=result_embed(session, overall=BRIEF_ALL_CORRECT), view=ReadingEndView(mode, session.kind))
+            return
+        msg = await channel.send(embed=result_embed(session, overall="⏳ 解説を作成中です…"))
 
-        # 解説Embed作成（ユーザーの選択肢も明示）
-        emb_r = discord.Embed(title="🌸 解説 / フィードバック")
-        qs = result.get("questions", [])
-        if len(qs) >= 1:
-            emb_r.add_field(name="Q1 Reason", value=qs[0].get("q1_reason", "-"), inline=False)
-            emb_r.add_field(name="Q1 Feedback", value=qs[0].get("feedback", "-"), inline=False)
-            if session.get("q1_user"):
-                emb_r.add_field(name="Q1 Your choice", value=f"**{session['q1_user']}**", inline=True)
-                emb_r.add_field(name="Q1 Correct", value=f"**{session['q1_answer']}**", inline=True)
-        if len(qs) >= 2:
-            emb_r.add_field(name="Q2 Reason", value=qs[1].get("q2_reason", "-"), inline=False)
-            emb_r.add_field(name="Q2 Feedback", value=qs[1].get("feedback", "-"), inline=False)
-            if session.get("q2_user"):
-                emb_r.add_field(name="Q2 Your choice", value=f"**{session['q2_user']}**", inline=True)
-                emb_r.add_field(name="Q2 Correct", value=f"**{session['q2_answer']}**", inline=True)
-        emb_r.add_field(name="Overall", value=result.get("overall_feedback", "-"), inline=False)
-        await ctx.send(embed=emb_r, view=ReadingEndView())
-
-
-class ChoiceButton(discord.ui.Button):
-    def __init__(self, label, custom_id, key):
-        super().__init__(label=label, style=discord.ButtonStyle.primary, custom_id=custom_id)
-        self.key = key
-
-    async def callback(self, interaction: discord.Interaction):
-        view: ChoiceView = self.view  # type: ignore
-        await view.record_answer(interaction, self.key)
-
-
-class ChoiceView(discord.ui.View):
-    def __init__(self, session, number, on_done, timeout=180):
-        super().__init__(timeout=timeout)
-        self.session = session
-        self.number = number
-        self.on_done = on_done
-
-    async def record_answer(self, interaction: discord.Interaction, key: str):
-        # ユーザーの選択を保存
-        self.session[f"q{self.number}_user"] = key
-
-        # 既存のQカードに「あなたの選択」を追記して示す
-        try:
-            emb = interaction.message.embeds[0] if interaction.message.embeds else None
-            if emb is not None:
-                emb = emb.copy()
-                # すでにフィールドがあるなら追加、なければ新規
-                emb.add_field(name="Your choice", value=f"**{key}**", inline=True)
-                await interaction.response.edit_message(embed=emb, view=None)
-            else:
-                await interaction.response.edit_message(view=None)
-        except discord.InteractionResponded:
+        # 入力中…インジケータをONにしてからDifyを叩く（同じ問題・同じ解答の採点はキャッシュから返す）
+        started = time.perf_counter()
+        async with channel.typing():
             try:
-                await interaction.message.edit(view=None)
+                result = await get_grading_cache().reading_answer(
+                    user_id=session.user_id,
+                    passage=q.passage,
+                    q1_text=q.text(1),
+                    q1_choices_str=join_choices(q.choices(1)),
+                    q1_answer=q.answer(1),
+                    q1_user=session.user_answer(1),
+                    q2_text=q.text(2),
+                    q2_choices_str=join_choices(q.choices(2)),
+                    q2_answer=q.answer(2),
+                    q2_user=session.user_answer(2),
+                )
+            except DifyBusyError:
+                await msg.edit(embed=result_embed(
+                    session, overall="⏳ 別の問題を生成中のため解説を作れませんでした。生成が終わってから「もう一問」で続けてください。",
+                ), view=ReadingEndView(mode, session.kind))
+                return
+            except DifyUnavailableError:
+                await msg.edit(embed=result_embed(session, overall=UNAVAILABLE_MESSAGE), view=ReadingEndView(mode, session.kind))
+                return
+            except DifyPayloadError:
+                await msg.edit(embed=result_embed(
+                    session, overall="解説を読み取れませんでした。しばらくしてから「もう一問」で続けてください。",
+                ), view=ReadingEndView(mode, session.kind))
+                return
+            except DifyError:
+                # 上流のエラーなど: 「解説を作成中」のまま残さず、結果と続きのボタンは出す
+                await msg.edit(embed=result_embed(session, overall=GRADE_FAILED_MESSAGE), view=ReadingEndView(mode, session.kind))
+                return
             except Exception:
-                pass
-
-        # 次の処理へ（Q1→Q2 or 採点へ）
-        await self.on_done(self.session, self.number)
+                await msg.edit(embed=result_embed(session, overall=GRADE_FAILED_MESSAGE), view=ReadingEndView(mode, session.kind))
+                raise
+        metrics.observe("reading.explanation_ms", (time.perf_counter() - started) * 1000)
+
+        await msg.edit(embed=result_embed(session, result), view=ReadingEndView(mode, session.kind))
+
+
+def result_embed(session, result=None, overall: Optional[str] = None) -> discord.Embed:
+    """
+    採点結果のEmbed（正誤はセッションから。result があれば Dify の解説も載せる）
+
+    Args:
+        session: 解答済みの ReadingSession
+        result: Dify の採点結果（ReadingAnswer）。解説がまだ・省いたときは None
+        overall: Overall 欄の文（省略時は result.overall_feedback）
+    """
+    q = session.question
+    correct = session.correct_count()
+    emb = discord.Embed(title=f"🌸 結果: {correct} / {len(QUESTION_NUMBERS)} 問正解")
+    for number in QUESTION_NUMBERS:
+        mark = "✅ 正解" if session.is_correct(number) else "❌ 不正解"
+        emb.add_field(
+            name=f"Q{number} {mark}",
+            value=f"あなたの選択: **{session.user_answer(number)}** ／ 正解: **{q.answer(number)}**",
+            inline=False,
+        )
+        graded = result.question(number) if result is not None else None
+        if graded is not None:
+            emb.add_field(name=f"Q{number} Reason", value=graded.reason, inline=False)
+            emb.add_field(name=f"Q{number} Feedback", value=graded.feedback, inline=False)
+    emb.add_field(name="Overall", value=overall if overall is not None else result.overall_feedback, inline=False)
+    return emb
+
+
+async def _disable_buttons_only(msg: discord.Message):
+    """直前メッセージのボタンだけを無効化する（Embedは触らない）"""
+    try:
+        disabled = discord.ui.View(timeout=0)
+        for row in msg.components:
+            for comp in getattr(row, "children", []):
+                if isinstance(comp, discord.ui.Button):
+                    b = discord.ui.Button(
+                        label=comp.label, style=comp.style,
+                        custom_id=comp.custom_id, url=getattr(comp, "url", None),
+                        disabled=True
+                    )
+                    disabled.add_item(b)
+        await msg.edit(view=disabled)  # ★ Embedは触らない
+    except Exception:
+        pass
+
+
+class ReadingAnswerButton(discord.ui.DynamicItem[discord.ui.Button],
+                          template=re.escape(ANSWER_PREFIX) + r"(?P<session_id>[\w-]+):(?P<number>\d+):(?P<key>\w+)"):
+    """解答ボタン（custom_id は answer_custom_id と同じ形。ルーターがこのテンプレートで解析する）"""
+
+    def __init__(self, session_id: str, number: int, key: str):
+        super().__init__(discord.ui.Button(label=key, style=discord.ButtonStyle.primary,
+                                           custom_id=answer_custom_id(session_id, number, key)))
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["session_id"], int(match["number"]), match["key"])
+
+
+def _with_kind(custom_id: str, kind: str, fallback: str) -> str:
+    """custom_id の末尾に問題の種類を付ける（上限を超える長い種類は fallback = 種類なしの ID にする）"""
+    custom_id = f"{custom_id}{kind}"
+    return custom_id if len(custom_id) <= CUSTOM_ID_MAX_LEN else fallback
 
-    async def on_timeout(self):
-        # 将来的にメッセージに「タイムアウト」を出すならここで
-        return
 
 class ReadingEndView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, feedback_mode: str = FEEDBACK_FULL, kind: str = DEFAULT_KIND):
         super().__init__(timeout=None)
-        self.add_item(discord.ui.Button(label="もう一問", style=discord.ButtonStyle.success, custom_id="reading:again"))
+        self.add_item(discord.ui.Button(label="もう一問", style=discord.ButtonStyle.success,
+                                        custom_id=_with_kind(AGAIN_PREFIX, kind, "reading:again")))
         # ★ 衝突回避のため back は独自IDに
         self.add_item(discord.ui.Button(label="メニューへ戻る", style=discord.ButtonStyle.secondary, custom_id="reading:back_main"))
+        # 解説の詳しさの切り替え（今と逆のほうを出す）
+        if feedback_mode == FEEDBACK_BRIEF:
+            feedback_id = f"{FEEDBACK_PREFIX}{FEEDBACK_FULL}"
+            self.add_item(discord.ui.Button(label="解説: 簡潔 → 詳しく", style=discord.ButtonStyle.secondary,
+                                            custom_id=_with_kind(f"{feedback_id}:", kind, feedback_id)))
+        else:
+            feedback_id = f"{FEEDBACK_PREFIX}{FEEDBACK_BRIEF}"
+            self.add_item(discord.ui.Button(label="解説: 詳しく → 簡潔", style=discord.ButtonStyle.secondary,
+                                            custom_id=_with_kind(f"{feedback_id}:", kind, feedback_id)))
+        # どれもルーターで処理する（ViewStore に残さない。routed_view を参照）
+        self.stop()
 
 async def setup(bot):
     await bot.add_cog(ReadingCog(bot))
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import re
 from typing import Optional
 
 import discord
@@ -8,10 +9,15 @@ from discord.ext import commands
 
 from db import get_db_manager
 from error_handler import ErrorHandler
+from interaction_router import get_interaction_router, routed_view
+from sampler import get_svocm_sampler
 from utils import info_embed
 
 logger = logging.getLogger('winglish.svocm')
 
+# 「解答する」ボタンの custom_id（"svocm:answer:{item_id}"）
+ANSWER_PREFIX = "svocm:answer:"
+
 
 class SvocmModal(discord.ui.Modal, title="SVOCM 解答"):
     s = discord.ui.TextInput(label="S", required=True)
@@ -79,7 +85,7 @@ class SvocmModal(discord.ui.Modal, title="SVOCM 解答"):
             # ログ保存
             try:
                 db_manager = get_db_manager()
-                async with db_manager.acquire() as conn:
+                async with db_manager.acquire(site="svocm.on_submit") as conn:
                     await conn.execute("""
                       INSERT INTO study_logs(user_id, module, item_id, result)
                       VALUES($1,'svocm',$2,$3::jsonb)
@@ -99,30 +105,71 @@ class SvocmModal(discord.ui.Modal, title="SVOCM 解答"):
                 log_context="svocm.on_submit"
             )
 
+class SvocmAnswerButton(discord.ui.DynamicItem[discord.ui.Button], template=re.escape(ANSWER_PREFIX) + r"(?P<item_id>\d+)"):
+    """「解答する」ボタン（custom_id に問題の item_id を入れる）"""
+
+    def __init__(self, item_id: int) -> None:
+        super().__init__(discord.ui.Button(label="解答する", style=discord.ButtonStyle.primary,
+                                           custom_id=f"{ANSWER_PREFIX}{item_id}"))
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match) -> "SvocmAnswerButton":
+        return cls(int(match["item_id"]))
+
+
 class Svocm(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot: commands.Bot = bot
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction) -> None:
-        if interaction.type != discord.InteractionType.component:
+    async def cog_load(self) -> None:
+        router = get_interaction_router()
+        router.add("svocm:pattern:", self.show_pattern)
+        router.add("svocm:random", self.show_random)
+        router.add(ANSWER_PREFIX, self.open_modal, template=SvocmAnswerButton)
+
+    async def cog_unload(self) -> None:
+        get_interaction_router().remove_owner(self)
+
+    async def show_pattern(self, interaction: discord.Interaction, pattern: str) -> None:
+        await self.show_item(interaction, pattern=int(pattern))
+
+    async def show_random(self, interaction: discord.Interaction) -> None:
+        await self.show_item(interaction, pattern=None)
+
+    async def open_modal(self, interaction: discord.Interaction, match: re.Match) -> None:
+        """「解答する」: 問題文を読み直してモーダルを開く（View を残さないので再起動後も効く）"""
+        item_id = int(match["item_id"])
+        try:
+            db_manager = get_db_manager()
+            async with db_manager.acquire(site="svocm.open_modal", readonly=True) as conn:
+                rows = await db_manager.fetch("svocm.items_by_ids", [item_id], conn=conn)
+        except Exception as db_error:
+            error_msg = await ErrorHandler.handle_database_error(db_error, "svocm.open_modal")
+            await interaction.response.send_message(error_msg, ephemeral=True)
+            return
+        if not rows:
+            await interaction.response.send_message("この問題は見つかりませんでした。", ephemeral=True)
             return
-        cid = interaction.data.get("custom_id", "")
-        if cid.startswith("svocm:pattern:"):
-            pattern = int(cid.split(":")[-1])
-            await self.show_item(interaction, pattern=pattern)
-        elif cid == "svocm:random":
-            await self.show_item(interaction, pattern=None)
+        try:
+            await interaction.response.send_modal(SvocmModal(rows[0]["sentence_en"], item_id))
+        except Exception as modal_error:
+            await ErrorHandler.handle_interaction_error(
+                interaction,
+                modal_error,
+                log_context="svocm.open_modal: モーダル起動"
+            )
 
     async def show_item(self, interaction: discord.Interaction, pattern: Optional[int]) -> None:
         try:
             try:
                 db_manager = get_db_manager()
-                async with db_manager.acquire() as conn:
-                    if pattern:
-                        row = await conn.fetchrow("SELECT * FROM svocm_items WHERE pattern=$1 ORDER BY random() LIMIT 1", pattern)
-                    else:
-                        row = await conn.fetchrow("SELECT * FROM svocm_items ORDER BY random() LIMIT 1")
+                async with db_manager.acquire(site="svocm.show_item", readonly=True) as conn:
+                    rows = await get_svocm_sampler().sample_rows(
+                        conn, 1,
+                        lambda ids: db_manager.fetch("svocm.items_by_ids", ids, conn=conn),
+                        group=pattern or None
+                    )
+                row = rows[0] if rows else None
             except Exception as db_error:
                 error_msg = await ErrorHandler.handle_database_error(
                     db_error,
@@ -148,21 +195,8 @@ class Svocm(commands.Cog):
                 title="SVOCM 問題",
                 description=f"{sentence}\n\n（ヒントは ||スポイラー|| で運用可）"  
             )
-            view = discord.ui.View()
-            modal = SvocmModal(sentence, row["item_id"])
-            # モーダル起動ボタン
-            async def on_answer(i: discord.Interaction) -> None:
-                try:
-                    await i.response.send_modal(modal)
-                except Exception as modal_error:
-                    await ErrorHandler.handle_interaction_error(
-                        i,
-                        modal_error,
-                        log_context="svocm.show_item: モーダル起動"
-                    )
-            btn = discord.ui.Button(label="解答する", style=discord.ButtonStyle.primary)
-            btn.callback = on_answer
-            view.add_item(btn)
+            # モーダル起動ボタン（ルーターから open_modal で処理する）
+            view = routed_view(SvocmAnswerButton(row["item_id"]))
             await ErrorHandler.safe_edit_message(interaction, embed=e, view=view)
         except Exception as e:
             await ErrorHandler.handle_interaction_error(
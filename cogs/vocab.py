@@ -1,18 +1,31 @@
 from __future__ import annotations
 
 import logging
+import re
 import uuid
 from typing import Any, Optional
 
 import discord
 from discord.ext import commands
 
+from config import SRS_WRITE_MODE
 from db import get_db_manager
 from error_handler import ErrorHandler
-from srs import update_srs
+from interaction_router import get_interaction_router
+from metrics import get_metrics
+from review_queue import DueCursor, fetch_due_page
+from sampler import get_word_sampler, sample_distinct
+from sessions import DEFAULT_SESSION_TTL_SEC, get_session_registry
+from render_pipeline import RenderPipeline
+from srs import update_srs_in_db
+from srs_buffer import get_srs_buffer, sync_srs_user
+from word_catalog import get_word_catalog
 
 logger = logging.getLogger('winglish.vocab')
 
+# 1セッションの出題数
+SESSION_SIZE = 10
+
 # ------------------------
 # 共通ユーティリティ
 # ------------------------
@@ -43,73 +56,140 @@ async def safe_edit(
         content=content
     )
 
+def card_embed(w: dict[str, Any], number: int, total: int = SESSION_SIZE) -> discord.Embed:
+    """
+    単語カードのEmbedを作成する
+
+    Args:
+        w: 単語データ（word, jp, pos, example_en, example_ja, synonyms, derived）
+        number: 問題番号（1始まり）
+        total: 出題数（タイトルの分母）
+    """
+    jp = w.get('jp','-')
+    pos = w.get('pos','-')
+    ex_en = w.get('example_en') or '-'
+    ex_ja = w.get('example_ja') or '-'
+    syns = ", ".join(w.get('synonyms',[]) or []) or '—'
+    drv  = ", ".join(w.get('derived',[])  or []) or '—'
+
+    desc = (
+        f"**📘 {w['word']}**\n"
+        f"意味：||{jp}||\n"
+        f"品詞：{pos}\n"
+        f"例文：{ex_en}\n"
+        f"日本語訳：||{ex_ja}||\n"
+        f"類義語：{syns} / 派生語：{drv}"
+    )
+    return discord.Embed(title=f"Q{number}/{total}", description=desc)
+
 # ------------------------
 # 完了後や中断時に表示するメニュー View
 # ------------------------
 class VocabMenuView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
+        # どのボタンも Vocab のルートで処理する（ViewStore に残さない）
+        self.add_item(discord.ui.Button(label="英単語 10問", style=discord.ButtonStyle.primary, custom_id="vocab:ten"))
+        self.add_item(discord.ui.Button(label="前々回テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:prevprev"))
+        self.add_item(discord.ui.Button(label="苦手テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:weak"))
+        self.add_item(discord.ui.Button(label="今日の復習", style=discord.ButtonStyle.success, custom_id="vocab:review"))
+        self.add_item(discord.ui.Button(label="戻る", style=discord.ButtonStyle.danger, custom_id="vocab:menu"))
+        self.stop()
+
+
+class VocabAnswerButton(discord.ui.DynamicItem[discord.ui.Button],
+                        template=r"vocab:(?P<kind>known|unsure):(?P<word_id>\d+)"):
+    """覚えた(◎) / 忘れそう(△) ボタン（custom_id に単語IDを入れ、ルーターから handle_answer で処理する）"""
+
+    LABELS = {"known": ("覚えた(◎)", discord.ButtonStyle.success), "unsure": ("忘れそう(△)", discord.ButtonStyle.secondary)}
 
-    @discord.ui.button(label="英単語 10問", style=discord.ButtonStyle.primary, custom_id="vocab:ten")
-    async def ten_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # on_interaction側が拾うのでここでは何もしない
-        pass
+    def __init__(self, kind: str, word_id: int) -> None:
+        label, style = self.LABELS[kind]
+        self.kind: str = kind
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"vocab:{kind}:{word_id}"))
 
-    @discord.ui.button(label="前々回テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:prevprev")
-    async def prevprev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        pass
+    def set_word(self, word_id: int) -> None:
+        """表示するカードの単語IDに差し替える（ボタンを作り直さない）"""
+        self.custom_id = f"vocab:{self.kind}:{word_id}"
 
-    @discord.ui.button(label="苦手テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:weak")
-    async def weak_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        pass
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match) -> "VocabAnswerButton":
+        return cls(match["kind"], int(match["word_id"]))
 
-    @discord.ui.button(label="戻る", style=discord.ButtonStyle.danger)
-    async def back_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        e = discord.Embed(title="Winglish — 英単語", description="学習メニューを選んでください。")
-        await safe_edit(interaction, embed=e, view=VocabMenuView())
+
+# 完了・一覧の画面で使い回すメニュー（中身が固定なので1つだけ作る）
+_vocab_menu_view: Optional[VocabMenuView] = None
+
+
+def vocab_menu_view() -> VocabMenuView:
+    """英単語メニューの View（初回だけ作る。View の生成にはイベントループが要るため遅延させる）"""
+    global _vocab_menu_view
+    if _vocab_menu_view is None:
+        _vocab_menu_view = VocabMenuView()
+    return _vocab_menu_view
 
 # ------------------------
 # 10問提示ビュー（1問ごとにEmbed更新）
 # ------------------------
 class VocabSessionView(discord.ui.View):
-    def __init__(self, batch_id: str, items: list[dict[str, Any]]) -> None:
-        super().__init__(timeout=180)
+    """
+    英単語セッションの状態と、カードのボタン
+
+    ボタン（覚えた / 忘れそう / 次へ）はセッションの開始時に1度だけ作り、カードごとに custom_id の単語IDだけを
+    差し替えてこの View 自体を送る。ボタンはルーターで処理するため、送る前に stop() して ViewStore には残さない。
+    """
+    # セッションレジストリに (user_id, "vocab") で登録する
+    MODULE = "vocab"
+
+    def __init__(
+        self,
+        batch_id: str,
+        items: list[dict[str, Any]],
+        review: bool = False,
+        cursor: Optional[DueCursor] = None
+    ) -> None:
+        super().__init__(timeout=DEFAULT_SESSION_TTL_SEC)
         self.batch_id: str = batch_id
         self.items: list[dict[str, Any]] = items
         self.index: int = 0
-        self.busy: bool = False  # 多重クリック防止
-
-    async def send_current(self, interaction: discord.Interaction) -> None:
-        if self.index >= len(self.items):
-            await safe_edit(
-                interaction,
-                embed=discord.Embed(title="完了", description="10問が終了しました。メインメニューへ戻れます。"),
-                view=VocabMenuView()
-            )
-            return
+        # 今日の復習モード: cursor があれば、ページを解き終えたら次のページを読み込む
+        self.review: bool = review
+        self.cursor: Optional[DueCursor] = cursor
+        # このセッションで Discord に送った回数（メトリクス vocab.api_calls_per_session）
+        self.api_calls: int = 0
+
+        self.known_btn = VocabAnswerButton("known", 0)
+        self.unsure_btn = VocabAnswerButton("unsure", 0)
+        self.add_item(self.known_btn)
+        self.add_item(self.unsure_btn)
+        self.add_item(discord.ui.Button(label="▶ 次へ", style=discord.ButtonStyle.primary, custom_id="vocab:next"))
+        self.stop()
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self.items)
+
+    def current_word_id(self) -> Optional[int]:
+        """表示中のカードの単語ID（終わっていれば None）"""
+        return None if self.finished else int(self.items[self.index]['word_id'])
+
+    def current_fields(self) -> dict[str, Any]:
+        """表示中のカード（終わっていれば完了画面）の embed と view"""
+        if self.finished:
+            done = "今日の復習が終了しました。" if self.review else "10問が終了しました。"
+            return {
+                "embed": discord.Embed(title="完了", description=f"{done}メインメニューへ戻れます。"),
+                "view": vocab_menu_view(),
+            }
 
         w = self.items[self.index]
-        jp = w.get('jp','-')
-        pos = w.get('pos','-')
-        ex_en = w.get('example_en') or '-'
-        ex_ja = w.get('example_ja') or '-'
-        syns = ", ".join(w.get('synonyms',[]) or []) or '—'
-        drv  = ", ".join(w.get('derived',[])  or []) or '—'
-
-        desc = (
-            f"**📘 {w['word']}**\n"
-            f"意味：||{jp}||\n"
-            f"品詞：{pos}\n"
-            f"例文：{ex_en}\n"
-            f"日本語訳：||{ex_ja}||\n"
-            f"類義語：{syns} / 派生語：{drv}"
-        )
-        e = discord.Embed(title=f"Q{self.index+1}/10", description=desc)
-        v = discord.ui.View(timeout=180)
-        v.add_item(discord.ui.Button(label="覚えた(◎)", style=discord.ButtonStyle.success, custom_id=f"vocab:known:{w['word_id']}"))
-        v.add_item(discord.ui.Button(label="忘れそう(△)", style=discord.ButtonStyle.secondary, custom_id=f"vocab:unsure:{w['word_id']}"))
-        v.add_item(discord.ui.Button(label="▶ 次へ", style=discord.ButtonStyle.primary, custom_id="vocab:next"))
-        await safe_edit(interaction, embed=e, view=v)
+        self.known_btn.set_word(w['word_id'])
+        self.unsure_btn.set_word(w['word_id'])
+        return {"embed": card_embed(w, self.index + 1, len(self.items)), "view": self}
+
+    def render_current(self, render: RenderPipeline) -> None:
+        """表示中のカードを render に積む"""
+        render.update(**self.current_fields())
 
 # ------------------------
 # Cog本体
@@ -118,276 +198,273 @@ class Vocab(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None: 
         self.bot: commands.Bot = bot
 
-    # 直近メッセージのボタンを無効化（見た目で連打抑止）
-    async def _disable_current_buttons(self, interaction: discord.Interaction) -> None:
-        try:
-            new_view = discord.ui.View(timeout=0)
-            for row in interaction.message.components:
-                # Rowの再構築
-                for comp in getattr(row, "children", []):
-                    if isinstance(comp, discord.ui.Button):
-                        b = discord.ui.Button(
-                            label=comp.label, 
-                            style=comp.style, 
-                            custom_id=comp.custom_id, 
-                            url=comp.url if hasattr(comp, "url") else None,
-                            disabled=True
-                        )
-                        new_view.add_item(b)
-            await safe_edit(interaction, view=new_view)
-        except Exception as e:
-            logger.warning(f"ボタン無効化に失敗: {e}")
-
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
-            return
-        cid = interaction.data.get("custom_id","")
-
-        if cid == "vocab:ten":
-            await self.start_ten(interaction)
-
-        elif cid.startswith("vocab:known:") or cid.startswith("vocab:unsure:"):
-            await self.handle_answer(interaction, cid)
-
-        elif cid == "vocab:next":
-            await self.next_item(interaction)
-
-        elif cid == "vocab:prevprev":
-            await self.prevprev_test(interaction)
-
-        elif cid == "vocab:weak":
-            await self.weak_test(interaction)
+    async def cog_load(self) -> None:
+        router = get_interaction_router()
+        router.add("vocab:ten", self.start_ten)
+        router.add("vocab:known:", self.handle_answer, template=VocabAnswerButton)
+        router.add("vocab:unsure:", self.handle_answer, template=VocabAnswerButton)
+        router.add("vocab:next", self.next_item)
+        router.add("vocab:prevprev", self.prevprev_test)
+        router.add("vocab:weak", self.weak_test)
+        router.add("vocab:review", self.start_review)
+        router.add("vocab:menu", self.show_menu)
+
+    async def cog_unload(self) -> None:
+        get_interaction_router().remove_owner(self)
+
+    async def show_menu(self, interaction: discord.Interaction) -> None:
+        async with RenderPipeline(interaction) as render:
+            render.update(
+                embed=discord.Embed(title="Winglish — 英単語", description="学習メニューを選んでください。"),
+                view=vocab_menu_view(),
+            )
 
     # 10問スタート
     async def start_ten(self, interaction: discord.Interaction) -> None:
-        try:
-            user_id = str(interaction.user.id)
-            await ensure_defer(interaction)
-
-            db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
-                words = await conn.fetch("""
-                    SELECT word_id, word, jp, pos, example_en, example_ja, synonyms, derived
-                    FROM words
-                    ORDER BY random()
-                    LIMIT 20
-                """)
-            
-            if not words or len(words) < 10:
-                error_msg = await ErrorHandler.handle_database_error(
-                    Exception("単語データが不足しています"),
-                    "start_ten: 単語データ取得"
-                )
-                await ErrorHandler.safe_send_followup(
+        view = None
+        async with RenderPipeline(interaction) as render:
+            try:
+                view = await self._start_ten(render, str(interaction.user.id))
+            except Exception as e:
+                await ErrorHandler.handle_interaction_error(
                     interaction,
-                    error_msg,
-                    ephemeral=True
+                    e,
+                    log_context="vocab.start_ten"
                 )
-                return
-            
-            items = [dict(r) for r in words][:10]
-            batch_id = str(uuid.uuid4())
-
-            view = VocabSessionView(batch_id, items)
-            await safe_edit(interaction, embed=discord.Embed(title="英単語 10問"), view=None)
-            await view.send_current(interaction)
-
+        _count_calls(view, render)
+
+    async def _start_ten(self, render: RenderPipeline, user_id: str) -> Optional[VocabSessionView]:
+        """10問を選んで1問目を表示する（表示は render.flush() まで送る）"""
+        catalog = get_word_catalog()
+        if catalog.loaded:
+            # カタログから抽出（DBアクセスなし）
+            items = [
+                catalog.get(i).to_dict()
+                for i in sample_distinct(catalog.ids, SESSION_SIZE)
+            ]
+        else:
             db_manager = get_db_manager()
-            async with db_manager.acquire() as conn:
-                await conn.execute(
-                    "INSERT INTO session_batches(user_id, module, batch_id) VALUES($1,$2,$3) ON CONFLICT DO NOTHING",
-                    user_id, "vocab", batch_id
+            async with db_manager.acquire(site="vocab.start_ten", readonly=True) as conn:
+                words = await get_word_sampler().sample_rows(
+                    conn, SESSION_SIZE,
+                    lambda ids: db_manager.fetch("vocab.random_words", ids, conn=conn)
                 )
+            items = [dict(r) for r in words]
 
-            self.bot._vocab_session = view
-        except Exception as e:
-            await ErrorHandler.handle_interaction_error(
-                interaction,
-                e,
-                log_context="vocab.start_ten"
+        if len(items) < SESSION_SIZE:
+            error_msg = await ErrorHandler.handle_database_error(
+                Exception("単語データが不足しています"),
+                "start_ten: 単語データ取得"
             )
+            await render.notify(error_msg)
+            return None
+
+        batch_id = str(uuid.uuid4())
+        view = VocabSessionView(batch_id, items)
+        view.render_current(render)
+        get_session_registry().put(user_id, VocabSessionView.MODULE, view)
+        # 1問目を先に出してから、バッチを記録する
+        await render.flush()
+        await get_db_manager().execute("vocab.record_batch", user_id, "vocab", batch_id)
+        return view
 
     # 解答処理（覚えた/忘れそう）
-    async def handle_answer(self, interaction: discord.Interaction, cid: str) -> None:
-        await ensure_defer(interaction)
-
-        # セッション取得＆多重実行ガード
-        view = getattr(self.bot, "_vocab_session", None)
-        if isinstance(view, VocabSessionView):
-            if view.busy:
-                return
-            view.busy = True
-        try:
-            await self._disable_current_buttons(interaction)
-
-            user_id = str(interaction.user.id)
-            quality = 5 if "known" in cid else 2
-            try:
-                word_id = int(cid.split(":")[-1])
-            except (ValueError, IndexError) as e:
-                logger.error(f"word_idの解析に失敗: {cid}")
-                await ErrorHandler.handle_interaction_error(
-                    interaction,
-                    e,
-                    user_message="❌ 内部エラーが発生しました。最初からやり直してください。",
-                    log_context="vocab.handle_answer: word_id解析"
-                )
+    async def handle_answer(self, interaction: discord.Interaction, match: re.Match) -> None:
+        # ユーザー単位のロックで多重実行ガード（処理中のクリックは defer だけ返して捨てる）
+        user_id = str(interaction.user.id)
+        registry = get_session_registry()
+        lock = registry.lock(user_id, VocabSessionView.MODULE)
+        view = None
+        async with RenderPipeline(interaction) as render:
+            if lock.locked():
                 return
+            async with lock:
+                view = registry.get(user_id, VocabSessionView.MODULE)
+                try:
+                    quality = 5 if match["kind"] == "known" else 2
+                    word_id = int(match["word_id"])
+                    if isinstance(view, VocabSessionView) and view.current_word_id() != word_id:
+                        # 前のカードのボタン（連打で処理済みのクリック）。同じカードを二重に進めない
+                        return
+
+                    try:
+                        if SRS_WRITE_MODE == "sql":
+                            # DB内でSM-2を計算して1往復で更新
+                            async with get_db_manager().acquire(site="vocab.handle_answer", user_id=user_id) as conn:
+                                await update_srs_in_db(conn, user_id, word_id, quality)
+                        else:
+                            # 書き込みはバッファ経由でまとめて行う（ここでは待たない）
+                            await get_srs_buffer().answer(user_id, word_id, quality)
+                    except Exception as db_error:
+                        error_msg = await ErrorHandler.handle_database_error(
+                            db_error,
+                            "vocab.handle_answer: SRS更新"
+                        )
+                        await render.notify(error_msg)
+                        return
 
-            try:
-                db_manager = get_db_manager()
-                async with db_manager.acquire() as conn:
-                    row = await conn.fetchrow(
-                        "SELECT easiness, interval_days, consecutive_correct FROM srs_state WHERE user_id=$1 AND word_id=$2",
-                        user_id, word_id
-                    )
-                    if row:
-                        e, i, c = row["easiness"], row["interval_days"], row["consecutive_correct"]
+                    # 次へ（次のカードの表示1回で応答する）
+                    if isinstance(view, VocabSessionView):
+                        await self._advance(render, user_id, view)
+                        await render.flush()
                     else:
-                        e, i, c = 2.5, 0, 0
-
-                    e, i, c, next_review = update_srs(e, i, c, quality)
-                    await conn.execute("""
-                        INSERT INTO srs_state(user_id, word_id, easiness, interval_days, consecutive_correct, next_review)
-                        VALUES($1,$2,$3,$4,$5,$6)
-                        ON CONFLICT (user_id, word_id) DO UPDATE
-                        SET easiness=$3, interval_days=$4, consecutive_correct=$5, next_review=$6
-                    """, user_id, word_id, e, i, c, next_review)
-            except Exception as db_error:
-                error_msg = await ErrorHandler.handle_database_error(
-                    db_error,
-                    "vocab.handle_answer: SRS更新"
-                )
-                await ErrorHandler.safe_send_followup(
-                    interaction,
-                    error_msg,
-                    ephemeral=True
-                )
-                return
-
-            # 次へ
-            if isinstance(view, VocabSessionView):
-                view.index += 1
-                await view.send_current(interaction)
-            else:
-                await self.start_ten(interaction)
-        except Exception as e:
-            await ErrorHandler.handle_interaction_error(
-                interaction,
-                e,
-                log_context="vocab.handle_answer"
-            )
-        finally:
-            if isinstance(view, VocabSessionView):
-                view.busy = False
+                        view = await self._start_ten(render, user_id)
+                except Exception as e:
+                    await ErrorHandler.handle_interaction_error(
+                        interaction,
+                        e,
+                        log_context="vocab.handle_answer"
+                    )
+        _count_calls(view, render)
 
     # 明示的な「次へ」
     async def next_item(self, interaction: discord.Interaction) -> None:
-        await ensure_defer(interaction)
-        view = getattr(self.bot, "_vocab_session", None)
-        if isinstance(view, VocabSessionView):
-            if view.busy:
+        user_id = str(interaction.user.id)
+        registry = get_session_registry()
+        lock = registry.lock(user_id, VocabSessionView.MODULE)
+        view = None
+        async with RenderPipeline(interaction) as render:
+            if lock.locked():
                 return
-            view.busy = True
+            async with lock:
+                view = registry.get(user_id, VocabSessionView.MODULE)
+                if isinstance(view, VocabSessionView):
+                    await self._advance(render, user_id, view)
+                    await render.flush()
+                else:
+                    view = await self._start_ten(render, user_id)
+        _count_calls(view, render)
+
+    async def _advance(self, render: RenderPipeline, user_id: str, view: VocabSessionView) -> None:
+        """次のカードへ進める（復習モードはページ末尾で次ページを読み込む）"""
+        view.index += 1
+        if view.finished and view.review and view.cursor is not None:
+            await self._load_review_page(user_id, view)
+        view.render_current(render)
+        if view.finished:
+            get_session_registry().pop(user_id, VocabSessionView.MODULE)
+
+    async def _load_review_page(self, user_id: str, view: VocabSessionView) -> None:
+        """view.cursor の続きから due カードを1ページ分読み込む"""
+        # 直前の解答がバッファに残っていれば先に書き込む（古い next_review で読まない）
+        await sync_srs_user(user_id)
+        db_manager = get_db_manager()
+        async with db_manager.acquire(site="vocab.start_review") as conn:
+            word_ids, view.cursor = await fetch_due_page(conn, user_id, SESSION_SIZE, after=view.cursor)
+            rows = await get_word_catalog().get_many(conn, word_ids)
+        view.items = [r.to_dict() for r in rows]
+        view.index = 0
+
+    # 今日の復習（next_review が今日以前のカードを古い順に）
+    async def start_review(self, interaction: discord.Interaction) -> None:
+        view = None
+        async with RenderPipeline(interaction) as render:
             try:
-                await self._disable_current_buttons(interaction)
-                view.index += 1
-                await view.send_current(interaction)
-            finally:
-                view.busy = False
-        else:
-            await self.start_ten(interaction)
+                user_id = str(interaction.user.id)
+                review = VocabSessionView(str(uuid.uuid4()), [], review=True)
+                try:
+                    await self._load_review_page(user_id, review)
+                except Exception as db_error:
+                    error_msg = await ErrorHandler.handle_database_error(
+                        db_error,
+                        "vocab.start_review"
+                    )
+                    await render.notify(error_msg)
+                    return
+
+                if not review.items:
+                    render.update(embed=discord.Embed(title="今日の復習", description="復習期限のカードはありません。"),
+                                  view=vocab_menu_view())
+                    return
+
+                view = review
+                view.render_current(render)
+                get_session_registry().put(user_id, VocabSessionView.MODULE, view)
+            except Exception as e:
+                await ErrorHandler.handle_interaction_error(
+                    interaction,
+                    e,
+                    log_context="vocab.start_review"
+                )
+        _count_calls(view, render)
 
     # 前々回テスト（プレースホルダ）
     async def prevprev_test(self, interaction: discord.Interaction) -> None:
-        try:
-            await ensure_defer(interaction)
-            user_id = str(interaction.user.id)
-            
+        async with RenderPipeline(interaction) as render:
             try:
-                db_manager = get_db_manager()
-                async with db_manager.acquire() as conn:
-                    rows = await conn.fetch("""
-                        SELECT batch_id FROM session_batches
-                        WHERE user_id=$1 AND module='vocab'
-                        ORDER BY created_at DESC LIMIT 3
-                    """, user_id)
-            except Exception as db_error:
-                error_msg = await ErrorHandler.handle_database_error(
-                    db_error,
-                    "vocab.prevprev_test"
+                user_id = str(interaction.user.id)
+
+                try:
+                    rows = await get_db_manager().fetch("vocab.recent_batches", user_id)
+                except Exception as db_error:
+                    error_msg = await ErrorHandler.handle_database_error(
+                        db_error,
+                        "vocab.prevprev_test"
+                    )
+                    await render.notify(error_msg)
+                    return
+
+                if len(rows) < 3:
+                    e = discord.Embed(title="前々回テスト", description="履歴が足りません。")
+                    render.update(embed=e, view=vocab_menu_view())
+                    return
+
+                target = rows[2]["batch_id"]
+                e = discord.Embed(
+                    title="前々回テスト",
+                    description=f"batch: {target}\n※4択テストは今後実装（MVP後半）"
                 )
-                await ErrorHandler.safe_send_followup(
+                render.update(embed=e, view=vocab_menu_view())
+            except Exception as e:
+                await ErrorHandler.handle_interaction_error(
                     interaction,
-                    error_msg,
-                    ephemeral=True
+                    e,
+                    log_context="vocab.prevprev_test"
                 )
-                return
-
-            if len(rows) < 3:
-                e = discord.Embed(title="前々回テスト", description="履歴が足りません。")
-                await safe_edit(interaction, embed=e, view=VocabMenuView())
-                return
-
-            target = rows[2]["batch_id"]
-            e = discord.Embed(
-                title="前々回テスト",
-                description=f"batch: {target}\n※4択テストは今後実装（MVP後半）"
-            )
-            await safe_edit(interaction, embed=e, view=VocabMenuView())
-        except Exception as e:
-            await ErrorHandler.handle_interaction_error(
-                interaction,
-                e,
-                log_context="vocab.prevprev_test"
-            )
 
     # 苦手テスト（候補表示）
     async def weak_test(self, interaction: discord.Interaction) -> None:
-        try:
-            await ensure_defer(interaction)
-            user_id = str(interaction.user.id)
-            
+        async with RenderPipeline(interaction) as render:
             try:
-                db_manager = get_db_manager()
-                async with db_manager.acquire() as conn:
-                    rows = await conn.fetch("""
-                        SELECT s.word_id, w.word, w.jp, w.pos
-                        FROM srs_state s
-                        JOIN words w ON w.word_id=s.word_id
-                        WHERE s.user_id=$1 AND (s.next_review <= CURRENT_DATE OR s.consecutive_correct < 2)
-                        ORDER BY s.consecutive_correct ASC NULLS FIRST, s.next_review ASC NULLS LAST
-                        LIMIT 10
-                    """, user_id)
-            except Exception as db_error:
-                error_msg = await ErrorHandler.handle_database_error(
-                    db_error,
-                    "vocab.weak_test"
-                )
-                await ErrorHandler.safe_send_followup(
+                user_id = str(interaction.user.id)
+
+                try:
+                    await sync_srs_user(user_id)
+                    db_manager = get_db_manager()
+                    async with db_manager.acquire(site="vocab.weak_test") as conn:
+                        srs_rows = await db_manager.fetch("vocab.weak_candidates", user_id, conn=conn)
+                        rows = await get_word_catalog().get_many(conn, [r['word_id'] for r in srs_rows])
+                except Exception as db_error:
+                    error_msg = await ErrorHandler.handle_database_error(
+                        db_error,
+                        "vocab.weak_test"
+                    )
+                    await render.notify(error_msg)
+                    return
+
+                if not rows:
+                    render.update(embed=discord.Embed(title="苦手テスト", description="対象がありません。"),
+                                  view=vocab_menu_view())
+                    return
+
+                words = "\n".join([f"- **{r.word}**（意味：||{r.jp}||）" for r in rows])
+                render.update(embed=discord.Embed(title="苦手テスト（候補）", description=words),
+                              view=vocab_menu_view())
+            except Exception as e:
+                await ErrorHandler.handle_interaction_error(
                     interaction,
-                    error_msg,
-                    ephemeral=True
+                    e,
+                    log_context="vocab.weak_test"
                 )
-                return
 
-            if not rows:
-                await safe_edit(interaction,
-                                embed=discord.Embed(title="苦手テスト", description="対象がありません。"),
-                                view=VocabMenuView())
-                return
 
-            words = "\n".join([f"- **{r['word']}**（意味：||{r['jp']}||）" for r in rows])
-            await safe_edit(interaction,
-                            embed=discord.Embed(title="苦手テスト（候補）", description=words),
-                            view=VocabMenuView())
-        except Exception as e:
-            await ErrorHandler.handle_interaction_error(
-                interaction,
-                e,
-                log_context="vocab.weak_test"
-            )
+def _count_calls(view: Optional[VocabSessionView], render: RenderPipeline) -> None:
+    """このクリックで Discord に送った回数をセッションに足し、終わったセッションは回数を記録する"""
+    if view is None:
+        return
+    view.api_calls += render.calls
+    if view.finished:
+        get_metrics().observe("vocab.api_calls_per_session", view.api_calls)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Vocab(bot))
\ No newline at end of file
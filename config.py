@@ -16,6 +16,14 @@ DIFY_API_KEY_QUESTION = os.getenv("DIFY_API_KEY_QUESTION")
 DIFY_API_KEY_ANSWER = os.getenv("DIFY_API_KEY_ANSWER")
 TEST_GUILD_ID = os.getenv("TEST_GUILD_ID")
 
+# SRS更新の書き込み方式
+#   buffer: メモリに溜めてまとめて書き込む（srs_buffer.py）
+#   sql   : DB内のSM-2関数で1往復のUPSERT（srs.update_srs_in_db）
+SRS_WRITE_MODE = os.getenv("SRS_WRITE_MODE", "buffer").strip().lower()
+
+# この時間（ミリ秒）以上かかったクエリ・接続待ちを警告ログに出す
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
 # ロギング設定
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = os.getenv("LOG_FILE")  # 例: "logs/winglish.log"
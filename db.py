@@ -1,17 +1,273 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from typing import Optional
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 import asyncpg
 
-from config import DATABASE_URL
+from config import DATABASE_URL, DB_SLOW_QUERY_MS
+from metrics import get_metrics
+from pool_controller import DEFAULT_INTERVAL_SEC, PoolController
+from settings import get_settings
 
 logger = logging.getLogger('winglish.db')
 
 _pool: Optional[asyncpg.Pool] = None
 
+# acquire(site=...) のブロック内で実行されたクエリの呼び出し元タグ
+# （ErrorHandler に渡す log_context と同じ文字列を使う。例: "vocab.start_ten"）
+_db_site: ContextVar[Optional[str]] = ContextVar("winglish_db_site", default=None)
+
+# site を指定せずに acquire した場合のタグ
+UNTAGGED_SITE = "other"
+
+# acquire の振り分け先（メトリクス "db.route.<役割>" の名前にも使う）
+PRIMARY = "primary"
+REPLICA = "replica"
+
+# レプリカが使えないとみなすエラー（接続できない・接続が切れた）
+# InterfaceError は含めない（同じ接続での操作の重なりなど呼び出し側の誤りで、レプリカの不調ではない。
+# 接続が切れたときの ConnectionDoesNotExistError は PostgresConnectionError に含まれる）
+REPLICA_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+)
+
+# レプリカへの接続タイムアウト（秒）。落ちているときに読み取りを長く待たせない
+REPLICA_CONNECT_TIMEOUT_SEC = 3.0
+
+# 名前付きクエリカタログ
+# プールの接続ごとに（文キャッシュへ）prepare され、DatabaseManager.fetch("vocab.random_words", ...) のように名前で実行する。
+# 実行時間は "db.<名前>.ms" のヒストグラムに記録される。
+QUERIES: Dict[str, str] = {
+    # 英単語
+    "vocab.random_words": """
+        SELECT word_id, word, jp, pos, example_en, example_ja, synonyms, derived
+        FROM words
+        WHERE word_id = ANY($1::int[])
+    """,
+    "vocab.record_batch": """
+        INSERT INTO session_batches(user_id, module, batch_id) VALUES($1,$2,$3) ON CONFLICT DO NOTHING
+    """,
+    "vocab.recent_batches": """
+        SELECT batch_id FROM session_batches
+        WHERE user_id=$1 AND module='vocab'
+        ORDER BY created_at DESC LIMIT 3
+    """,
+    # 苦手テストの候補（idx_srs_state_weak の並び順どおりに読む）
+    "vocab.weak_candidates": """
+        SELECT s.word_id
+        FROM srs_state s
+        WHERE s.user_id=$1 AND (s.next_review <= CURRENT_DATE OR s.consecutive_correct < 2)
+        ORDER BY s.consecutive_correct ASC NULLS FIRST, s.next_review ASC NULLS LAST
+        LIMIT 10
+    """,
+    # SRS
+    "srs.get_state": """
+        SELECT easiness, interval_days, consecutive_correct, next_review
+        FROM srs_state
+        WHERE user_id=$1 AND word_id=$2
+    """,
+    "srs.flush": """
+        INSERT INTO srs_state(user_id, word_id, easiness, interval_days, consecutive_correct, next_review)
+        SELECT * FROM unnest($1::text[], $2::int[], $3::numeric[], $4::int[], $5::int[], $6::date[])
+        ON CONFLICT (user_id, word_id) DO UPDATE
+        SET easiness=EXCLUDED.easiness,
+            interval_days=EXCLUDED.interval_days,
+            consecutive_correct=EXCLUDED.consecutive_correct,
+            next_review=EXCLUDED.next_review
+    """,
+    # 今日の復習（review_queue.py）
+    "review.due_count": """
+        SELECT count(*)
+        FROM srs_state
+        WHERE user_id = $1 AND next_review <= $2
+    """,
+    "review.due_first_page": """
+        SELECT word_id, next_review
+        FROM srs_state
+        WHERE user_id = $1 AND next_review <= $2
+        ORDER BY next_review, word_id
+        LIMIT $3
+    """,
+    "review.due_next_page": """
+        SELECT word_id, next_review
+        FROM srs_state
+        WHERE user_id = $1 AND next_review <= $2
+          AND (next_review, word_id) > ($4::date, $5::int)
+        ORDER BY next_review, word_id
+        LIMIT $3
+    """,
+    # 英文解釈
+    "svocm.items_by_ids": """
+        SELECT item_id, sentence_en FROM svocm_items WHERE item_id = ANY($1::int[])
+    """,
+    # 長文読解の作り置き（reading_pool.py）: 取り出しは SKIP LOCKED で同じ問題を二人に出さない
+    "reading.claim": """
+        UPDATE reading_items SET served_at = now(), served_to = $3
+        WHERE item_id = (
+            SELECT item_id FROM reading_items
+            WHERE kind = $1 AND level = $2 AND served_at IS NULL
+            ORDER BY item_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING item_id, questions
+    """,
+    "reading.stock": """
+        SELECT count(*) FROM reading_items
+        WHERE kind = $1 AND level = $2 AND served_at IS NULL
+    """,
+    "reading.insert": """
+        INSERT INTO reading_items(kind, level, passage_en, questions, answer_key, source)
+        VALUES($1, $2, $3, $4::jsonb, $5::jsonb, 'dify')
+    """,
+    # 採点結果キャッシュ（grading_cache.py）
+    "grading.get": """
+        SELECT result, extract(epoch FROM expires_at - now())::float8 AS ttl_sec
+        FROM grading_cache
+        WHERE cache_key = $1 AND expires_at > now()
+    """,
+    "grading.put": """
+        INSERT INTO grading_cache(cache_key, result, expires_at)
+        VALUES($1, $2::jsonb, now() + make_interval(secs => $3))
+        ON CONFLICT (cache_key) DO UPDATE
+        SET result = EXCLUDED.result, expires_at = EXCLUDED.expires_at
+    """,
+    "grading.purge_expired": """
+        DELETE FROM grading_cache WHERE expires_at <= now()
+    """,
+    "grading.purge_all": """
+        DELETE FROM grading_cache
+    """,
+    # 長文読解の解説の詳しさ（reading_feedback.py）
+    "reading_feedback.get": """
+        SELECT reading_feedback FROM users WHERE user_id = $1
+    """,
+    "reading_feedback.set": """
+        INSERT INTO users(user_id, reading_feedback) VALUES($1, $2)
+        ON CONFLICT (user_id) DO UPDATE SET reading_feedback = EXCLUDED.reading_feedback
+    """,
+    # 長文読解の進行中セッション（reading_sessions.py）: ユーザーごとに1行（新しいセッションで置き換える）
+    "reading_session.get": """
+        SELECT state FROM reading_sessions
+        WHERE session_id = $1 AND user_id = $2 AND expires_at > now()
+    """,
+    "reading_session.put": """
+        INSERT INTO reading_sessions(session_id, user_id, state, expires_at)
+        VALUES($1, $2, $3::jsonb, now() + make_interval(secs => $4))
+        ON CONFLICT (user_id) DO UPDATE
+        SET session_id = EXCLUDED.session_id, state = EXCLUDED.state,
+            updated_at = now(), expires_at = EXCLUDED.expires_at
+    """,
+    "reading_session.delete": """
+        DELETE FROM reading_sessions WHERE session_id = $1
+    """,
+}
+
+
+class CatalogConnection(asyncpg.Connection):
+    """
+    クエリカタログを文キャッシュに載せておく接続
+
+    asyncpg は接続ごとの文キャッシュ（statement_cache_size）で prepare 済みの文を再利用する。
+    PreparedStatement オブジェクトはプールへ返却すると使えなくなるため保持せず、
+    接続作成時にカタログのクエリをこのキャッシュへ prepare しておく。
+    以降の conn.fetch(sql) 等は Parse / 型解決の往復なしで実行される。
+
+    作成時刻（created_at）を持ち、PoolController が寿命での作り直しに使う。
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.created_at: float = time.monotonic()
+
+    async def prepare_catalog(self) -> int:
+        """
+        カタログのクエリをすべて文キャッシュへ prepare する
+
+        スキーマ適用前などで prepare できないクエリは飛ばす（初回実行時に prepare される）。
+
+        Returns:
+            prepare できた件数
+        """
+        # 公開 API の conn.prepare() は use_cache=False で文キャッシュに載らない（conn.fetch(sql) からは使われない）。
+        # そのため conn.fetch と同じ内部経路の _get_statement(use_cache=True) を使う。asyncpg は requirements.txt で
+        # 固定しており、上げるときは tests/test_db.py のシグネチャのテストで検知する。なければ prepare せずに進める
+        get_statement = getattr(self, "_get_statement", None)
+        if get_statement is None:
+            logger.warning("この asyncpg では文キャッシュへの prepare ができません（初回実行時に prepare されます）")
+            return 0
+        failed = []
+        for name, sql in QUERIES.items():
+            try:
+                await get_statement(sql, None, use_cache=True)
+            except asyncpg.PostgresError:
+                failed.append(name)
+        if failed:
+            logger.warning(f"クエリカタログの prepare を後回しにします: {', '.join(failed)}")
+        return len(QUERIES) - len(failed)
+
+
+def _log_query(record: Any) -> None:
+    """
+    クエリロガー（asyncpg の add_query_logger）
+
+    acquire() のブロック内のクエリは "db.site.<site>.ms" に記録し、
+    DB_SLOW_QUERY_MS 以上かかったクエリは警告ログに出す。
+    プールへの返却時のリセットクエリなど、ブロック外のクエリは記録しない。
+    """
+    site = _db_site.get()
+    if site is None:
+        return
+    elapsed_ms = record.elapsed * 1000
+    metrics = get_metrics()
+    metrics.observe(f"db.site.{site}.ms", elapsed_ms)
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        metrics.inc("db.slow_queries")
+        query = " ".join(record.query.split())
+        logger.warning(f"🐢 遅いクエリ {elapsed_ms:.0f} ms (site={site}): {query[:200]}")
+
+
+async def prepare_catalog(conn: CatalogConnection) -> None:
+    """プールの init フック: 新しい接続ごとにクエリロガーを登録し、クエリカタログを prepare する"""
+    conn.add_query_logger(_log_query)
+    await conn.prepare_catalog()
+
+
+async def run_query(conn: Any, method: str, name: str, *args: Any) -> Any:
+    """
+    カタログの名前付きクエリを、取得済みの接続で実行する
+
+    Args:
+        conn: asyncpg の接続（プールから取得したもの）
+        method: "fetch" / "fetchrow" / "fetchval" / "execute"
+        name: QUERIES のキー
+        *args: クエリのパラメータ
+
+    Returns:
+        各メソッドの戻り値
+
+    Raises:
+        KeyError: 未登録のクエリ名の場合
+    """
+    sql = QUERIES[name]
+    metrics = get_metrics()
+    started = time.perf_counter()
+    try:
+        return await getattr(conn, method)(sql, *args)
+    except Exception:
+        metrics.inc(f"db.{name}.errors")
+        raise
+    finally:
+        metrics.observe(f"db.{name}.ms", (time.perf_counter() - started) * 1000)
+
 
 class DatabaseManager:
     """
@@ -22,44 +278,83 @@ class DatabaseManager:
     - 接続のヘルスチェック
     - エラー時の自動リトライ（今後の拡張用）
     - 安全な接続取得（コンテキストマネージャー）
+    - 読み取り専用レプリカへの振り分け（acquire(readonly=True)）
     """
     
-    def __init__(self, database_url: str) -> None:
+    def __init__(self, database_url: str, replica_url: Optional[str] = None) -> None:
         """
         DatabaseManagerを初期化
         
         Args:
             database_url: PostgreSQL接続URL
+            replica_url: 読み取り専用レプリカの接続URL（省略時はすべて primary）
         """
         self.database_url: str = database_url
+        self.replica_url: Optional[str] = replica_url
         self._pool: Optional[asyncpg.Pool] = None
+        self._replica: Optional[asyncpg.Pool] = None
+        self._replica_healthy: bool = False
+        self._replica_retry_at: float = 0.0
+        self._replica_retry_sec: float = 30.0
+        self._sticky_sec: float = 10.0
+        # user_id -> 最後に primary へ書き込んだ時刻（time.monotonic()）
+        self._recent_writes: Dict[str, float] = {}
+        self._waiting: int = 0
+        self._controller: Optional[PoolController] = None
+        self._control_task: Optional[asyncio.Task] = None
     
-    async def initialize(self, min_size: int = 1, max_size: int = 10, command_timeout: int = 60) -> None:
+    async def initialize(
+        self,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        command_timeout: int = 60,
+    ) -> None:
         """
         プールを初期化する
         
+        接続数は min_size〜max_size の範囲で PoolController が接続待ち時間を見て調整する。
+        上下限・待ち時間の目標・アイドル時間・寿命は settings.DatabaseConfig（DB_POOL_*）から読む。
+        
         Args:
-            min_size: 最小接続数（デフォルト: 1）
-            max_size: 最大接続数（デフォルト: 10）
+            min_size: 最小接続数（デフォルト: DB_POOL_MIN_SIZE）
+            max_size: 最大接続数（デフォルト: DB_POOL_MAX_SIZE）
             command_timeout: コマンドタイムアウト（秒、デフォルト: 60）
         
         Raises:
             asyncpg.PostgresConnectionError: データベース接続に失敗した場合
         """
         if self._pool is None:
+            config = get_settings().database
+            min_size = config.pool_min_size if min_size is None else min_size
+            max_size = config.pool_max_size if max_size is None else max_size
             try:
                 logger.info(f"データベース接続プールを初期化中... (min={min_size}, max={max_size})")
+                # 接続ごとに init でクエリカタログを prepare する（min_size 分はここで作られるため、
+                # 最初のクリックで parse / 型解決のコストを払わずに済む）
                 self._pool = await asyncpg.create_pool(
                     self.database_url,
                     min_size=min_size,
                     max_size=max_size,
+                    max_inactive_connection_lifetime=config.pool_max_idle_sec,
                     command_timeout=command_timeout,
+                    connection_class=CatalogConnection,
+                    init=prepare_catalog,
                     server_settings={
                         'application_name': 'winglish-bot',
                         'timezone': 'UTC',
                     }
                 )
-                logger.info("✅ データベース接続プールの初期化が完了しました")
+                self._controller = PoolController(
+                    min_size=min_size,
+                    max_size=max_size,
+                    target_wait_ms=config.pool_target_wait_ms,
+                    max_age_sec=config.pool_max_age_sec,
+                )
+                if self.replica_url:
+                    await self._init_replica(config, max_size, command_timeout)
+                self._control_task = asyncio.create_task(self._control_loop())
+                get_metrics().register_source("db_pool", self.pool_stats)
+                logger.info(f"✅ データベース接続プールの初期化が完了しました（クエリカタログ {len(QUERIES)}件）")
             except asyncpg.PostgresConnectionError as e:
                 logger.error(f"❌ データベース接続エラー: {e}")
                 raise
@@ -67,6 +362,97 @@ class DatabaseManager:
                 logger.error(f"❌ 予期しないデータベースエラー: {e}", exc_info=True)
                 raise
     
+    async def _init_replica(self, config: Any, max_size: int, command_timeout: int) -> None:
+        """
+        レプリカのプールを作る
+
+        min_size=0 で作るため、レプリカが落ちていても起動は止めない（到達確認は _probe_replica）。
+        """
+        self._sticky_sec = config.replica_sticky_sec
+        self._replica_retry_sec = config.replica_retry_sec
+        self._replica = await asyncpg.create_pool(
+            self.replica_url,
+            min_size=0,
+            max_size=max_size,
+            max_inactive_connection_lifetime=config.pool_max_idle_sec,
+            timeout=REPLICA_CONNECT_TIMEOUT_SEC,
+            command_timeout=command_timeout,
+            connection_class=CatalogConnection,
+            init=prepare_catalog,
+            server_settings={
+                'application_name': 'winglish-bot-replica',
+                'timezone': 'UTC',
+            }
+        )
+        get_metrics().register_source("db_replica_pool", self.replica_stats)
+        await self._probe_replica()
+
+    async def _probe_replica(self) -> bool:
+        """レプリカに接続できるか確かめ、読み取りの振り分けを再開・停止する"""
+        if self._replica is None:
+            return False
+        try:
+            async with self._replica.acquire() as conn:
+                in_recovery = await conn.fetchval("SELECT pg_is_in_recovery()")
+        except REPLICA_ERRORS as e:
+            self._mark_replica_down(e)
+            return False
+        if not in_recovery:
+            logger.warning("DATABASE_REPLICA_URL がスタンバイではありません（読み取りはそのまま振り分けます）")
+        if not self._replica_healthy:
+            logger.info("✅ レプリカへの読み取りの振り分けを開始しました")
+        self._replica_healthy = True
+        return True
+
+    def _mark_replica_down(self, error: BaseException) -> None:
+        """レプリカを使えないものとして、replica_retry_sec の間は読み取りを primary に向ける"""
+        get_metrics().inc("db.replica_failures")
+        if self._replica_healthy or self._replica_retry_at == 0.0:
+            logger.warning(f"⚠️ レプリカに接続できません。{self._replica_retry_sec:g}秒間は primary で読み取ります: {error}")
+        self._replica_healthy = False
+        self._replica_retry_at = time.monotonic() + self._replica_retry_sec
+
+    def _route(self, readonly: bool, user_id: Optional[str]) -> Tuple[asyncpg.Pool, str]:
+        """acquire の振り分け先（プールと役割）を決める"""
+        if not readonly or self._replica is None:
+            return self._pool, PRIMARY
+        if not self._replica_healthy:
+            get_metrics().inc("db.route.fallback")
+            return self._pool, PRIMARY
+        if user_id is not None and self._wrote_recently(user_id):
+            # 自分の直前の書き込みがレプリカに届いていない可能性がある
+            get_metrics().inc("db.route.sticky")
+            return self._pool, PRIMARY
+        return self._replica, REPLICA
+
+    def record_writes(self, user_ids: Iterable[str]) -> None:
+        """
+        user_ids が primary に書き込んだことを記録する（sticky 期間の読み取りを primary に向ける）
+
+        acquire(user_id=...) は1人分しか記録できないため、複数のユーザーの行をまとめて書き込んだ
+        （srs_buffer の flush など）ときはこちらを呼ぶ。レプリカがなければ何もしない。
+        """
+        if self._replica is None:
+            return
+        now = time.monotonic()
+        for user_id in user_ids:
+            self._recent_writes[user_id] = now
+
+    def _wrote_recently(self, user_id: str) -> bool:
+        wrote_at = self._recent_writes.get(user_id)
+        if wrote_at is None:
+            return False
+        if time.monotonic() - wrote_at < self._sticky_sec:
+            return True
+        del self._recent_writes[user_id]
+        return False
+
+    def _prune_recent_writes(self) -> None:
+        """sticky 期間を過ぎた書き込み記録を捨てる"""
+        expired_before = time.monotonic() - self._sticky_sec
+        for user_id in [u for u, t in self._recent_writes.items() if t < expired_before]:
+            del self._recent_writes[user_id]
+
     async def close(self) -> None:
         """
         プールを閉じる
@@ -75,8 +461,22 @@ class DatabaseManager:
         """
         if self._pool:
             logger.info("データベース接続プールを閉じています...")
+            if self._control_task is not None:
+                self._control_task.cancel()
+                try:
+                    await self._control_task
+                except asyncio.CancelledError:
+                    pass
+                self._control_task = None
+            self._controller = None
+            if self._replica is not None:
+                await self._replica.close()
+                self._replica = None
+                self._replica_healthy = False
+                get_metrics().unregister_source("db_replica_pool")
             await self._pool.close()
             self._pool = None
+            get_metrics().unregister_source("db_pool")
             logger.info("✅ データベース接続プールを閉じました")
     
     async def health_check(self) -> bool:
@@ -98,13 +498,31 @@ class DatabaseManager:
             return False
     
     @asynccontextmanager
-    async def acquire(self):
+    async def acquire(
+        self,
+        site: Optional[str] = None,
+        readonly: bool = False,
+        user_id: Optional[str] = None,
+    ):
         """
         接続を取得（コンテキストマネージャー）
         
+        接続待ち時間を "db.acquire_wait_ms" に、ブロック内の各クエリの実行時間を
+        "db.site.<site>.ms" に、振り分け先を "db.route.<primary|replica>" に記録する。
+        
+        readonly=True の場合、レプリカが設定されていればレプリカの接続を返す。ただし
+        - user_id が直近（DB_REPLICA_STICKY_SEC 以内）に書き込んでいれば primary（自分の書き込みを読むため）
+        - レプリカに接続できなければ primary（DB_REPLICA_RETRY_SEC 後に再確認する）
+        
         Usage:
-            async with db_manager.acquire() as conn:
-                result = await conn.fetch("SELECT * FROM users")
+            async with db_manager.acquire(site="notebook.notebook_list", readonly=True, user_id=user_id) as conn:
+                rows = await conn.fetch("SELECT ...")
+        
+        Args:
+            site: 呼び出し元タグ（省略時は外側のタグ、なければ "other"）
+            readonly: 読み取りだけのブロックなら True（レプリカに振り分けてよい）
+            user_id: 操作しているユーザー。readonly=False なら書き込みとして記録し、
+                以降の同じユーザーの読み取りを sticky 期間だけ primary に向ける
         
         Yields:
             asyncpg.Connection: データベース接続
@@ -115,9 +533,185 @@ class DatabaseManager:
         if self._pool is None:
             raise RuntimeError("Database pool not initialized. Call initialize() first.")
         
-        async with self._pool.acquire() as conn:
+        pool, role = self._route(readonly, user_id)
+        tag = site or _db_site.get() or UNTAGGED_SITE
+        started = time.perf_counter()
+        conn = None
+        if role == REPLICA:
+            try:
+                conn = await pool.acquire()
+            except REPLICA_ERRORS as e:
+                self._mark_replica_down(e)
+                get_metrics().inc("db.route.fallback")
+                pool, role = self._pool, PRIMARY
+        if conn is None:
+            self._waiting += 1
+            try:
+                conn = await pool.acquire()
+            finally:
+                self._waiting -= 1
+        wait_ms = (time.perf_counter() - started) * 1000
+        metrics = get_metrics()
+        metrics.observe("db.acquire_wait_ms", wait_ms)
+        metrics.inc(f"db.route.{role}")
+        if self._controller is not None and role == PRIMARY:
+            self._controller.observe_wait(wait_ms, pool.get_size() - pool.get_idle_size())
+        if wait_ms >= DB_SLOW_QUERY_MS:
+            metrics.inc("db.slow_acquires")
+            logger.warning(f"🐢 接続待ち {wait_ms:.0f} ms (site={tag}, {role}, waiting={self._waiting}, size={pool.get_size()})")
+
+        token = _db_site.set(tag)
+        try:
             yield conn
+        except REPLICA_ERRORS as e:
+            if role == REPLICA:
+                self._mark_replica_down(e)
+            raise
+        finally:
+            _db_site.reset(token)
+            if user_id is not None and not readonly:
+                self.record_writes((user_id,))
+            await self._release(pool, conn)
+
+    async def _release(self, pool: asyncpg.Pool, conn: Any) -> None:
+        """
+        接続を返却する
+
+        primary の寿命切れの接続と、目標サイズを超えている分の接続（待っている呼び出しがなければ）は
+        閉じてから返却する。閉じた接続の枠は空きとしてプールに戻り、必要になれば次の acquire で接続し直される。
+        """
+        controller = self._controller
+        if controller is not None and pool is self._pool and not conn.is_closed():
+            age = time.monotonic() - conn.created_at if hasattr(conn, "created_at") else None
+            if controller.should_retire(age):
+                metric = "db.pool_retired"
+            elif not self._waiting and controller.surplus(pool.get_size(), pool.get_idle_size() + 1):
+                metric = "db.pool_trimmed"
+            else:
+                metric = None
+            if metric is not None:
+                try:
+                    await conn.close(timeout=5)
+                    get_metrics().inc(metric)
+                except Exception as e:
+                    logger.warning(f"接続のクローズに失敗しました（そのまま返却します）: {e}")
+        await pool.release(conn)
+
+    async def _control_loop(self, interval: float = DEFAULT_INTERVAL_SEC) -> None:
+        """一定間隔で目標サイズを更新し、足りない分の接続を先に作っておく"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.adjust_pool()
+            except Exception as e:
+                logger.warning(f"接続プールの調整に失敗しました: {e}")
+            if self._replica is not None:
+                self._prune_recent_writes()
+                if not self._replica_healthy and time.monotonic() >= self._replica_retry_at:
+                    await self._probe_replica()
+
+    async def adjust_pool(self) -> int:
+        """
+        PoolController の目標サイズを更新し、足りなければ接続を1本先に作っておく
+
+        多い分は返却時に閉じる（_release）。返却されないまま使われない接続は
+        max_inactive_connection_lifetime（DB_POOL_MAX_IDLE_SEC）で asyncpg が閉じる。
+
+        Returns:
+            更新後の目標サイズ
+        """
+        if self._pool is None or self._controller is None:
+            return 0
+        pool = self._pool
+        before = self._controller.target
+        target = self._controller.tick(self._waiting)
+        if target != before:
+            logger.info(f"接続プールの目標サイズ: {before} → {target} (size={pool.get_size()}, waiting={self._waiting})")
+
+        if self._waiting:
+            # 待っている呼び出しがいれば、接続はそちらで作られる
+            return target
+        if pool.get_size() < target and pool.get_idle_size() == 0:
+            # アイドル接続がなければ、借りると未接続の枠で新しく接続される（すぐ返すので利用者の接続は奪わない）。
+            # アイドル接続があるうちは借りても新しい接続にならないため、次の周期に回す
+            conn = await pool.acquire(timeout=5)
+            await pool.release(conn)
+            get_metrics().inc("db.pool_prewarmed")
+        return target
+
+    def pool_stats(self) -> Dict[str, int]:
+        """
+        プールの状態（ゲージ）を返す
+
+        Returns:
+            size / idle / in_use / waiting / min_size / max_size
+            （初期化後は PoolController の target / grows / shrinks も含む）
+        """
+        if self._pool is None:
+            return {"size": 0, "idle": 0, "in_use": 0, "waiting": self._waiting}
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "waiting": self._waiting,
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            **(self._controller.stats() if self._controller is not None else {}),
+        }
     
+    def replica_stats(self) -> Dict[str, Any]:
+        """
+        レプリカのプールの状態（ゲージ）を返す
+
+        Returns:
+            size / idle / in_use / healthy / sticky_users
+        """
+        if self._replica is None:
+            return {}
+        size = self._replica.get_size()
+        idle = self._replica.get_idle_size()
+        return {
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "healthy": self._replica_healthy,
+            "sticky_users": len(self._recent_writes),
+        }
+
+    async def fetch(self, name: str, *args: Any, conn: Any = None) -> list:
+        """
+        カタログの名前付きクエリを実行して全行を取得する
+
+        Usage:
+            rows = await db_manager.fetch("vocab.recent_batches", user_id)
+
+        Args:
+            name: QUERIES のキー
+            *args: クエリのパラメータ
+            conn: 取得済みの接続（省略時はプールから取得）
+        """
+        return await self._run("fetch", name, args, conn)
+
+    async def fetchrow(self, name: str, *args: Any, conn: Any = None) -> Optional[asyncpg.Record]:
+        """カタログの名前付きクエリを実行して1行を取得する"""
+        return await self._run("fetchrow", name, args, conn)
+
+    async def fetchval(self, name: str, *args: Any, conn: Any = None) -> Any:
+        """カタログの名前付きクエリを実行して1つの値を取得する"""
+        return await self._run("fetchval", name, args, conn)
+
+    async def execute(self, name: str, *args: Any, conn: Any = None) -> str:
+        """カタログの名前付きクエリを実行する（ステータス文字列を返す）"""
+        return await self._run("execute", name, args, conn)
+
+    async def _run(self, method: str, name: str, args: tuple, conn: Any) -> Any:
+        if conn is not None:
+            return await run_query(conn, method, name, *args)
+        async with self.acquire(site=_db_site.get() or name) as acquired:
+            return await run_query(acquired, method, name, *args)
+
     @property
     def pool(self) -> asyncpg.Pool:
         """
@@ -154,7 +748,7 @@ def get_db_manager() -> DatabaseManager:
         raise ValueError("DATABASE_URL is not set. Please configure it in environment variables.")
     
     if _db_manager is None:
-        _db_manager = DatabaseManager(DATABASE_URL)
+        _db_manager = DatabaseManager(DATABASE_URL, replica_url=get_settings().database.replica_url)
     
     return _db_manager
 
@@ -184,7 +778,7 @@ async def get_pool() -> asyncpg.Pool:
     
     # DatabaseManagerで初期化
     if db_manager._pool is None:
-        await db_manager.initialize(min_size=1, max_size=10)
+        await db_manager.initialize()
     
     _pool = db_manager.pool
     return _pool
@@ -202,13 +796,16 @@ async def init_db() -> None:
     
     # DatabaseManagerで初期化（まだの場合）
     if db_manager._pool is None:
-        await db_manager.initialize(min_size=1, max_size=10)
+        await db_manager.initialize()
     
     try:
         with open("sql/schema.sql", "r", encoding="utf-8") as f:
             schema = f.read()
         async with db_manager.acquire() as con:
             await con.execute(schema)
+            # スキーマ適用前に作られた接続では prepare できなかったクエリがあるため、やり直す
+            if hasattr(con, "prepare_catalog"):
+                await con.prepare_catalog()
         logger.info("✅ データベーススキーマの適用が完了しました")
     except FileNotFoundError:
         logger.error("❌ sql/schema.sql が見つかりません")
@@ -225,10 +822,17 @@ async def close_db() -> None:
     """
     データベース接続プールを閉じる
     
-    アプリケーション終了時に呼び出す
+    アプリケーション終了時に呼び出す。
+    書き込み待ちのSRS更新（srs_buffer）はプールを閉じる前にすべて書き込む。
     """
     global _pool, _db_manager
     
+    from srs_buffer import close_srs_buffer
+    try:
+        await close_srs_buffer()
+    except Exception as e:
+        logger.error(f"❌ SRSバッファの書き込みに失敗しました: {e}", exc_info=True)
+    
     if _db_manager:
         await _db_manager.close()
         _db_manager = None
@@ -243,4 +847,7 @@ async def close_db() -> None:
 #   from db import get_db_manager
 #   db_manager = get_db_manager()
 #   async with db_manager.acquire() as conn: ...
-__all__ = ['DatabaseManager', 'get_db_manager', 'get_pool', 'init_db', 'close_db']
+__all__ = [
+    'QUERIES', 'CatalogConnection', 'DatabaseManager', 'prepare_catalog', 'run_query',
+    'get_db_manager', 'get_pool', 'init_db', 'close_db',
+]
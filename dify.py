@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import os
+import re
 import json
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import time
+import importlib.util
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
 
-import httpx  # ★ 非同期HTTP
-import requests
+import httpx  # ★ 非同期HTTP（同期の呼び出し元も SyncDifyClient 経由でこれを使う）
+
+from circuit_breaker import CircuitBreaker, LatencyTracker
+from dify_payloads import PayloadError, ReadingAnswer, ReadingQuestion, parse_reading_answer, parse_reading_question
+from metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +27,33 @@ DIFY_API_KEY_QUESTION = os.getenv("DIFY_API_KEY_QUESTION")  # app-xxxxxxxx (Wing
 DIFY_API_KEY_ANSWER = os.getenv("DIFY_API_KEY_ANSWER")      # app-yyyyyyyy (Winglish_reading_Answer)
 
 DEFAULT_TIMEOUT_SEC = 60
+CONNECT_TIMEOUT_SEC = 10
+
+# 共有HTTPクライアント（keep-alive で DNS / TCP / TLS の確立を呼び出しごとに払わない）
+DIFY_MAX_CONNECTIONS = int(os.getenv("DIFY_MAX_CONNECTIONS", "20"))
+DIFY_MAX_KEEPALIVE = int(os.getenv("DIFY_MAX_KEEPALIVE", "10"))
+DIFY_KEEPALIVE_EXPIRY_SEC = float(os.getenv("DIFY_KEEPALIVE_EXPIRY_SEC", "60"))
+DIFY_HTTP2 = os.getenv("DIFY_HTTP2", "").strip().lower() in ("1", "true", "yes")
+
+# 同時に Dify へ投げる呼び出し数の上限（全体・出題/採点ごと）と、順番待ちの上限時間
+DIFY_MAX_CONCURRENCY = int(os.getenv("DIFY_MAX_CONCURRENCY", "8"))
+DIFY_MAX_CONCURRENCY_QUESTION = int(os.getenv("DIFY_MAX_CONCURRENCY_QUESTION", "4"))
+DIFY_MAX_CONCURRENCY_ANSWER = int(os.getenv("DIFY_MAX_CONCURRENCY_ANSWER", "4"))
+DIFY_QUEUE_TIMEOUT_SEC = float(os.getenv("DIFY_QUEUE_TIMEOUT_SEC", "120"))
+
+# タイムアウトは観測した p99 × DIFY_TIMEOUT_FACTOR（DIFY_TIMEOUT_MIN_SEC〜DEFAULT_TIMEOUT_SEC）
+DIFY_TIMEOUT_MIN_SEC = float(os.getenv("DIFY_TIMEOUT_MIN_SEC", "5"))
+DIFY_TIMEOUT_FACTOR = float(os.getenv("DIFY_TIMEOUT_FACTOR", "2.0"))
+# サーキットブレーカー（連続失敗数 / open にしておく秒数）
+DIFY_BREAKER_FAILURES = int(os.getenv("DIFY_BREAKER_FAILURES", "5"))
+DIFY_BREAKER_COOLDOWN_SEC = float(os.getenv("DIFY_BREAKER_COOLDOWN_SEC", "30"))
+# blocking 呼び出しが p95 を超えたら同じリクエストをもう1本送る（Dify の実行コストが倍になりうるため既定は無効）
+DIFY_HEDGE = os.getenv("DIFY_HEDGE", "").strip().lower() in ("1", "true", "yes")
+
+LANE_QUESTION = "question"
+LANE_ANSWER = "answer"
+
+T = TypeVar("T")
 
 
 # ===== Exceptions =====
@@ -25,25 +61,27 @@ class DifyError(RuntimeError):
     pass
 
 
-# ===== Utilities =====
-def _clean_fenced_json(text: str) -> str:
-    """
-    ```json\n{ ... }\n``` のようなフェンス付きテキストを純JSON文字列にする。
-    """
-    s = text.strip()
-    if s.startswith("```"):
-        # 先頭の ```json or ``` を除去
-        s = s.lstrip("`")
-        # 1行目(例えば "json") を落として本文へ
-        if "\n" in s:
-            s = s.split("\n", 1)[1]
-        # 末尾の ``` を除去（残っていれば）
-        s = s.rstrip("`").rstrip()
-        if s.endswith("```"):
-            s = s[:-3].rstrip()
-    return s
+class DifyBusyError(DifyError):
+    """同じユーザーの呼び出しがすでに順番待ち・実行中のとき"""
+    pass
+
+
+class DifyUpstreamError(DifyError):
+    """Dify 側の不調（通信エラー・タイムアウト・5xx / 429・ワークフローの失敗）。サーキットブレーカーが数える"""
+    pass
+
+
+class DifyUnavailableError(DifyError):
+    """サーキットブレーカーが open のため呼び出さなかったとき"""
+    pass
 
 
+class DifyPayloadError(DifyError):
+    """outputs.text を JSON として読めない、または出題・採点の形になっていないとき"""
+    pass
+
+
+# ===== Utilities =====
 def _extract_outputs_text(resp_json: Dict[str, Any]) -> Optional[str]:
     """
     Difyのレスポンスから text を抽出する。
@@ -76,81 +114,339 @@ def _extract_outputs_text(resp_json: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def _post_workflow(
-    inputs: Dict[str, Any],
-    user_id: str | int,
-    api_key: str,
-    endpoint: str = DIFY_ENDPOINT_RUN,
-    timeout_sec: int = DEFAULT_TIMEOUT_SEC,
-) -> str:
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Dify 用の httpx.AsyncClient を作る（接続数の上限・keep-alive・HTTP/2 は環境変数で設定）
+
+    APIキーはリクエストごとのヘッダーで渡すため、出題用・採点用で同じクライアントを使える。
+    HTTP/2 は DIFY_HTTP2=1 かつ h2 パッケージ（httpx[http2]）が入っている場合のみ有効。
     """
-    Dify /workflows/run を叩く共通関数。
-    - inputs: Workflowに渡す "inputs" の中身（dict）
-    - user_id: 任意のユーザー識別（stringでもintでもOK）
-    - api_key: "app-..." で始まる Dify アプリキー
-    戻り値: outputs.text（文字列）を返す。存在しなければ DifyError。
+    http2 = DIFY_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("DIFY_HTTP2 が指定されていますが h2 がインストールされていません（HTTP/1.1 で接続します）")
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(DEFAULT_TIMEOUT_SEC, connect=CONNECT_TIMEOUT_SEC),
+        limits=httpx.Limits(
+            max_connections=DIFY_MAX_CONNECTIONS,
+            max_keepalive_connections=DIFY_MAX_KEEPALIVE,
+            keepalive_expiry=DIFY_KEEPALIVE_EXPIRY_SEC,
+        ),
+        http2=http2,
+        transport=transport,
+    )
+
+
+def partial_json_string(text: str, key: str) -> Optional[str]:
     """
-    if not api_key:
-        raise DifyError("Missing Dify API key for this workflow. Check .env (DIFY_API_KEY_QUESTION / DIFY_API_KEY_ANSWER).")
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    body = {
-        "inputs": inputs,
-        "response_mode": "blocking",
-        "user": str(user_id),
-    }
+    生成途中の JSON テキストから、文字列フィールド key のここまでの値を取り出す。
 
-    try:
-        resp = requests.post(endpoint, headers=headers, json=body, timeout=timeout_sec)
-    except requests.RequestException as e:
-        raise DifyError(f"Failed to call Dify endpoint: {e}") from e
+    ストリーミング中の outputs.text（```json フェンス付きでもよい）は閉じていない JSON のため
+    json.loads できない。"key": " の後ろを、途中で切れたエスケープを除いて読めた所までデコードする。
 
-    if not (200 <= resp.status_code < 300):
-        # 可能ならエラーボディを載せる
-        detail = None
+    Returns:
+        ここまでの値（key がまだ現れていなければ None）
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), text)
+    if match is None:
+        return None
+    start = i = match.end()
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            break
+        if c == "\\":
+            step = 6 if text[i + 1:i + 2] == "u" else 2
+            if i + step > len(text):
+                break
+            i += step
+        else:
+            i += 1
+    try:
+        value = json.loads('"' + text[start:i] + '"')
+    except json.JSONDecodeError:
+        return None
+    # サロゲートペアの途中で切れた場合の片割れは落とす
+    return value.encode("utf-8", "ignore").decode("utf-8")
+
+
+async def _iter_sse_events(resp: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """text/event-stream の data 行を JSON として1イベントずつ返す（ping などの data のないイベントは飛ばす）"""
+    data_lines: list[str] = []
+    async for line in resp.aiter_lines():
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+        elif not line and data_lines:
+            payload, data_lines = "\n".join(data_lines), []
+            try:
+                yield json.loads(payload)
+            except json.JSONDecodeError:
+                logger.warning(f"Dify SSE event is not JSON: {payload[:200]!r}")
+    if data_lines:
         try:
-            detail = resp.json()
-        except Exception:
-            detail = resp.text[:500]
-        raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+            yield json.loads("\n".join(data_lines))
+        except json.JSONDecodeError:
+            logger.warning("Dify SSE stream ended with a broken event")
 
+
+def _decode(parse: Callable[[str], T], raw_text: str, label: str) -> T:
+    """outputs.text を型付きのオブジェクトにする。読めなければ DifyPayloadError"""
     try:
-        resp_json = resp.json()
-    except ValueError as e:
-        raise DifyError(f"Dify response is not JSON: {resp.text[:500]!r}") from e
+        return parse(raw_text)
+    except PayloadError as e:
+        get_metrics().inc(f"dify.payload_errors.{label.lower()}")
+        logger.warning(f"{label} payload rejected: {e}")
+        raise DifyPayloadError(f"{label}: {e}") from e
 
-    text = _extract_outputs_text(resp_json)
-    if text is None:
-        raise DifyError(f"Dify response missing outputs.text. Raw: {json.dumps(resp_json)[:800]}")
 
-    return text
+class _Waiter:
+    __slots__ = ("lane", "future", "on_queued", "position")
 
+    def __init__(self, lane: Optional[str], on_queued: Optional[Callable[[int], None]]) -> None:
+        self.lane = lane
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.on_queued = on_queued
+        self.position = 0
 
-# ---------- ★ 非同期ポスト ----------
-async def _apost_workflow(
-    inputs: Dict[str, Any],
-    user_id: str | int,
-    api_key: str,
-    endpoint: str = DIFY_ENDPOINT_RUN,
-    timeout_sec: int = DEFAULT_TIMEOUT_SEC,
-) -> str:
-    if not api_key:
-        raise DifyError("Missing Dify API key. Set DIFY_API_KEY_QUESTION / DIFY_API_KEY_ANSWER")
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    body = {"inputs": inputs, "response_mode": "blocking", "user": str(user_id)}
-
-    async with httpx.AsyncClient(timeout=timeout_sec) as client:
-        resp = await client.post(endpoint, headers=headers, json=body)
+
+class _Background:
+    __slots__ = ("task", "lane", "preempted", "handed_over")
+
+    def __init__(self, task: "asyncio.Task[Any]", lane: Optional[str]) -> None:
+        self.task = task
+        self.lane = lane
+        # キャンセル済み（タスクが終わるまでは実行枠を持っている）
+        self.preempted = False
+        # 同じユーザーの本番の呼び出しに「1ユーザー1件」の枠を引き継いだ
+        self.handed_over = False
+
+
+class DifyLimiter:
+    """
+    Dify 呼び出しの同時実行数を制限する FIFO キュー
+
+    - 全体で max_concurrency 件、レーン（出題 / 採点）ごとに lane_limits 件まで同時に実行する
+    - 空きがなければ到着順に待つ。レーンが埋まっている待ちは飛ばし、別レーンの待ちを先に通す
+      （同じレーンの中では到着順を守る）
+    - 1ユーザーにつき順番待ち・実行中は1件まで。2件目は待たせずに DifyBusyError にする
+      （連打しても列を占有できないので、ユーザー間で公平になる）
+    - 待っている間は on_queued(何番目か) で順番を知らせる（順番が変わるたびに呼ぶ）
+    - background=True（先読みなどの低優先の呼び出し）は、順番待ちがなく空き枠があるときだけ通し、待たせない。
+      同じユーザーの1件に数え、本番の呼び出しに譲る: 同じユーザーの本番の呼び出しが来たら、
+      または本番の呼び出しが順番待ちになったら、呼び出し元のタスクをキャンセルして枠を空ける
+
+    Usage:
+        async with limiter.slot(user_id, lane=LANE_QUESTION, on_queued=show_position):
+            ...  # Dify を呼ぶ
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DIFY_MAX_CONCURRENCY,
+        lane_limits: Optional[Dict[str, int]] = None,
+        queue_timeout_sec: float = DIFY_QUEUE_TIMEOUT_SEC,
+    ) -> None:
+        """
+        Args:
+            max_concurrency: 全体の同時実行数の上限
+            lane_limits: レーンごとの同時実行数の上限（デフォルト: 出題・採点それぞれ環境変数の値）
+            queue_timeout_sec: 順番待ちの上限時間（秒）。過ぎたら DifyError
+        """
+        if lane_limits is None:
+            lane_limits = {LANE_QUESTION: DIFY_MAX_CONCURRENCY_QUESTION, LANE_ANSWER: DIFY_MAX_CONCURRENCY_ANSWER}
+        self.max_concurrency = max(1, max_concurrency)
+        self.lane_limits = {lane: max(1, limit) for lane, limit in lane_limits.items()}
+        self.queue_timeout_sec = queue_timeout_sec
+        self.active = 0
+        self._lane_active: Dict[str, int] = {}
+        self._users: set = set()
+        self._waiters: Deque[_Waiter] = deque()
+        self._background: Dict[str, _Background] = {}
+        self.rejected = 0
+        self.timeouts = 0
+        self.preempted = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: str | int,
+        lane: Optional[str] = None,
+        on_queued: Optional[Callable[[int], None]] = None,
+        background: bool = False,
+    ) -> AsyncIterator[None]:
+        """
+        実行枠を1つ確保する（空くまで到着順に待つ）
+
+        background=True なら待たずに空き枠だけを使い、本番の呼び出しのために呼び出し元のタスクごと
+        キャンセルされることがある（先読み用）。
+
+        Raises:
+            DifyBusyError: 同じユーザーの呼び出しがすでにある場合（background=True なら空き枠がない場合も）
+            DifyError: queue_timeout_sec 待っても順番が来なかった場合
+        """
+        user = str(user_id)
+        if background:
+            async with self._background_slot(user, lane):
+                yield
+            return
+        if user in self._users:
+            running = self._background.pop(user, None)
+            if running is None:
+                self.rejected += 1
+                get_metrics().inc("dify.limiter.rejected")
+                raise DifyBusyError(f"Dify call already in progress for user {user}")
+            # 同じユーザーの低優先の呼び出しは譲らせる（枠は解放されしだい順番待ちから渡る）
+            running.handed_over = True
+            if not running.preempted:
+                self._preempt(running)
+        self._users.add(user)
+        try:
+            await self._acquire(lane, on_queued)
+            try:
+                yield
+            finally:
+                self._release(lane)
+        finally:
+            self._users.discard(user)
+
+    def try_acquire(self, lane: Optional[str] = None) -> bool:
+        """
+        待たずに実行枠を1つ確保する（ヘッジの2本目用。返すときは release(lane)）
+
+        Returns:
+            確保できたら True。全体・レーンに空きがない、または順番待ちがあれば False（割り込まない）
+        """
+        if self._waiters or self.active >= self.max_concurrency or self._lane_full(lane):
+            return False
+        self.active += 1
+        if lane is not None:
+            self._lane_active[lane] = self._lane_active.get(lane, 0) + 1
+        return True
+
+    def release(self, lane: Optional[str] = None) -> None:
+        """try_acquire で確保した実行枠を返す"""
+        self._release(lane)
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "background": len(self._background),
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "preempted": self.preempted,
+        }
+
+    @asynccontextmanager
+    async def _background_slot(self, user: str, lane: Optional[str]) -> AsyncIterator[None]:
+        if user in self._users or not self.try_acquire(lane):
+            raise DifyBusyError(f"No free Dify slot for a background call of user {user}")
+        running = _Background(asyncio.current_task(), lane)
+        self._users.add(user)
+        self._background[user] = running
+        try:
+            yield
+        finally:
+            self._release(lane)
+            if self._background.get(user) is running:
+                del self._background[user]
+            if not running.handed_over:
+                self._users.discard(user)
+
+    def _preempt(self, running: _Background) -> None:
+        running.preempted = True
+        self.preempted += 1
+        get_metrics().inc("dify.limiter.preempted")
+        running.task.cancel()
+
+    def _preempt_for(self, lane: Optional[str]) -> None:
+        """順番待ちになった本番の呼び出しのために、低優先の呼び出しを1件キャンセルする（枠が空けば通るものだけ）"""
+        for running in self._background.values():
+            if not running.preempted and (running.lane == lane or not self._lane_full(lane)):
+                self._preempt(running)
+                return
+
+    async def _acquire(self, lane: Optional[str], on_queued: Optional[Callable[[int], None]]) -> None:
+        waiter = _Waiter(lane, on_queued)
+        self._waiters.append(waiter)
+        self._dispatch()
+        if waiter.future.done():
+            return
+        self._preempt_for(lane)
+
+        metrics = get_metrics()
+        metrics.inc("dify.limiter.queued")
+        started = time.perf_counter()
+        self._notify_positions()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout_sec)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done():
+                # 順番が来たのと同時に諦めた: 確保済みの枠を返す
+                self._release(lane)
+            else:
+                waiter.future.cancel()
+                self._waiters.remove(waiter)
+                self._notify_positions()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                metrics.inc("dify.limiter.timeouts")
+                raise DifyError(f"Dify queue wait exceeded {self.queue_timeout_sec:g}s") from e
+            raise
+        finally:
+            metrics.observe("dify.limiter.wait_ms", (time.perf_counter() - started) * 1000)
+
+    def _release(self, lane: Optional[str]) -> None:
+        self.active -= 1
+        if lane is not None:
+            self._lane_active[lane] -= 1
+        self._dispatch()
+        self._notify_positions()
+
+    def _lane_full(self, lane: Optional[str]) -> bool:
+        limit = self.lane_limits.get(lane) if lane is not None else None
+        return limit is not None and self._lane_active.get(lane, 0) >= limit
+
+    def _dispatch(self) -> None:
+        for waiter in list(self._waiters):
+            if self.active >= self.max_concurrency:
+                break
+            if self._lane_full(waiter.lane):
+                continue
+            self._waiters.remove(waiter)
+            self.active += 1
+            if waiter.lane is not None:
+                self._lane_active[waiter.lane] = self._lane_active.get(waiter.lane, 0) + 1
+            waiter.future.set_result(None)
+
+    def _notify_positions(self) -> None:
+        for position, waiter in enumerate(self._waiters, start=1):
+            if waiter.position != position:
+                waiter.position = position
+                if waiter.on_queued is not None:
+                    try:
+                        waiter.on_queued(position)
+                    except Exception as e:
+                        logger.warning(f"on_queued failed: {e}")
+
+
+def _raise_for_status(resp: httpx.Response) -> None:
     if not (200 <= resp.status_code < 300):
+        # 可能ならエラーボディを載せる
         try:
             detail = resp.json()
         except Exception:
             detail = resp.text[:500]
-        raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+        error = DifyUpstreamError if resp.status_code >= 500 or resp.status_code == 429 else DifyError
+        raise error(f"Dify returned HTTP {resp.status_code}: {detail}")
 
+
+def _blocking_text(resp: httpx.Response) -> str:
     try:
         resp_json = resp.json()
     except ValueError as e:
@@ -162,133 +458,409 @@ async def _apost_workflow(
     return text
 
 
-# ===== Public APIs (Reading) =====
-def run_reading_question(
-    *,
-    user_id: int | str,
-    training_type: str = "reading",
-    current_score: int | float = 50,
-    recent_svocm_mistakes: str = "",
-    word: str = "",
-) -> Dict[str, Any]:
+async def _streaming_text(resp: httpx.Response, on_text: Callable[[str], None]) -> str:
     """
-    Winglish_reading_Question を実行し、JSONをdictで返す。
-    - Dify側のSYSTEMは、passage/choices/answers を JSON文字列として outputs.text に返す想定。
+    streaming モードのイベント列を読み、最終的な outputs.text を返す
+
+    text_chunk ごとに on_text(ここまでのテキスト) を呼ぶ。workflow_finished の outputs.text を正とし、
+    text_chunk を出さないワークフローでも最後にまとめて on_text を1回呼ぶ。
     """
-    inputs = {
-        "user_id": str(user_id),
-        "training_type": training_type,
-        "current_score": current_score,
-        "recent_svocm_mistakes": recent_svocm_mistakes,  # JSON文字列でOK（空でも可）
-        "word": word,
-    }
-
-    raw_text = _post_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION)
-    cleaned = _clean_fenced_json(raw_text)
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        logger.warning("Question JSON parse failed. Returning raw text for debugging.")
-        # 解析エラー時は最低限の形に包んで返す（上位で扱えるように）
-        return {"raw_text": raw_text}
-
-
-def run_reading_answer(
-    *,
-    user_id: int | str,
-    passage: str,
-    q1_text: str,
-    q1_choices_str: str,  # "A. ... B. ... C. ... D. ..." の1本化文字列（Bubble互換）
-    q1_answer: str,       # "A" ~ "D"
-    q1_user: str,         # "A" ~ "D"
-    q2_text: str,
-    q2_choices_str: str,  # 同上
-    q2_answer: str,       # "A" ~ "D"
-    q2_user: str,         # "A" ~ "D"
-) -> Dict[str, Any]:
+    chunks: list[str] = []
+    async for event in _iter_sse_events(resp):
+        kind = event.get("event")
+        if kind == "text_chunk":
+            chunks.append((event.get("data") or {}).get("text", ""))
+            on_text("".join(chunks))
+        elif kind == "workflow_finished":
+            data = event.get("data") or {}
+            if data.get("status", "succeeded") != "succeeded":
+                raise DifyUpstreamError(f"Dify workflow {data.get('status')}: {data.get('error')}")
+            text = _extract_outputs_text(event)
+            if text is None:
+                if not chunks:
+                    raise DifyError(f"Dify response missing outputs.text. Raw: {json.dumps(event)[:800]}")
+                text = "".join(chunks)
+            if text != "".join(chunks):
+                on_text(text)
+            return text
+        elif kind == "error":
+            raise DifyUpstreamError(f"Dify stream error {event.get('status')}: {event.get('message')}")
+    raise DifyUpstreamError("Dify stream ended before workflow_finished")
+
+
+async def _hedged(call: Callable[[], Awaitable[T]], hedge_after: float, limiter: DifyLimiter, lane: Optional[str]) -> T:
     """
-    Winglish_reading_Answer を実行し、```json フェンス有無に関わらず dict を返す。
-    DifyのSYSTEMに合わせて Bubble時代のキー名で inputs を渡す。
+    call() が hedge_after 秒で終わらなければもう1本 call() を送り、先に成功した方を返す
+
+    2本目は limiter の実行枠（lane）を別に確保して送り、空きがなければ送らずに1本目を待つ。
+    両方失敗したら後に終わった方の例外を送出する。残った方はキャンセルする。
     """
-    inputs = {
-        "user_id": str(user_id),
-        "Question": passage,                 # Bubble準拠の大文字Q
-        "question_1_text": q1_text,
-        "question_1_choice": q1_choices_str,
-        "question_1_Answer": q1_answer,
-        "question_1_User_Answer": q1_user,
-        "question_2_text": q2_text,
-        "question_2_choice": q2_choices_str,
-        "question_2_Answer": q2_answer,
-        "question_2_User_Answer": q2_user,
-    }
-
-    raw_text = _post_workflow(inputs, user_id, api_key=DIFY_API_KEY_ANSWER)
-    cleaned = _clean_fenced_json(raw_text)
+    first = asyncio.ensure_future(call())
+    tasks = [first]
+    hedge_slot = False
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        logger.warning("Answer JSON parse failed. Returning raw text for debugging.")
-        return {"raw_text": raw_text}
-
-
-# ---------- ★ 読解: 非同期API ----------
-async def run_reading_question_async(
-    *,
-    user_id: int | str,
-    training_type: str = "reading",
-    current_score: int | float = 50,
-    recent_svocm_mistakes: str = "",
-    word: str = "",
-) -> Dict[str, Any]:
-    inputs = {
-        "user_id": str(user_id),  # ← string必須
-        "training_type": training_type,
-        "current_score": current_score,
-        "recent_svocm_mistakes": recent_svocm_mistakes or "",
-        "word": word or "",
-    }
-    raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION)
-    cleaned = _clean_fenced_json(raw_text)
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        logger.warning("Question JSON parse failed. Returning raw text")
-        return {"raw_text": raw_text}
-
-
-async def run_reading_answer_async(
-    *,
-    user_id: int | str,
-    passage: str,
-    q1_text: str,
-    q1_choices_str: str,
-    q1_answer: str,
-    q1_user: str,
-    q2_text: str,
-    q2_choices_str: str,
-    q2_answer: str,
-    q2_user: str,
-) -> Dict[str, Any]:
-    inputs = {
-        "user_id": str(user_id),  # ← string必須
-        "Question": passage,
-        "question_1_text": q1_text,
-        "question_1_choice": q1_choices_str,
-        "question_1_Answer": q1_answer,
-        "question_1_User_Answer": q1_user,
-        "question_2_text": q2_text,
-        "question_2_choice": q2_choices_str,
-        "question_2_Answer": q2_answer,
-        "question_2_User_Answer": q2_user,
-    }
-    raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_ANSWER)
-    cleaned = _clean_fenced_json(raw_text)
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        logger.warning("Answer JSON parse failed. Returning raw text")
-        return {"raw_text": raw_text}
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            hedge_slot = limiter.try_acquire(lane)
+            if hedge_slot:
+                get_metrics().inc("dify.hedge.sent")
+                tasks.append(asyncio.ensure_future(call()))
+            else:
+                get_metrics().inc("dify.hedge.skipped")
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        get_metrics().inc("dify.hedge.won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if hedge_slot:
+            limiter.release(lane)
+
+
+class DifyClient:
+    """
+    Dify ワークフローの非同期クライアント
+
+    出題（Winglish_reading_Question）と採点（Winglish_reading_Answer）はどちらも
+    run_workflow の1本の経路で /workflows/run を呼ぶ。
+
+    Usage:
+        client = get_dify_client()
+        await client.open()            # ボットの setup_hook で（keep-alive 接続を共有）
+        q = await client.reading_question(user_id=uid)
+        ...
+        await client.aclose()          # 終了時
+    """
+
+    def __init__(
+        self,
+        *,
+        question_key: Optional[str] = None,
+        answer_key: Optional[str] = None,
+        endpoint: str = DIFY_ENDPOINT_RUN,
+        timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        limiter: Optional[DifyLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = DIFY_HEDGE,
+    ) -> None:
+        """
+        DifyClientを初期化
+
+        Args:
+            question_key: 出題用アプリのキー（デフォルト: DIFY_API_KEY_QUESTION）
+            answer_key: 採点用アプリのキー（デフォルト: DIFY_API_KEY_ANSWER）
+            endpoint: /workflows/run のURL
+            timeout_sec: 1リクエストのタイムアウトの上限（秒）。観測したレイテンシからこれ以下に縮める
+            transport: httpx のトランスポート（テスト用）
+            limiter: 同時実行数の制限（デフォルト: 環境変数の上限で新しく作る）
+            breaker: サーキットブレーカー（デフォルト: 環境変数の設定で新しく作る）
+            hedge: blocking 呼び出しのヘッジを行うか
+        """
+        self.question_key: Optional[str] = question_key if question_key is not None else DIFY_API_KEY_QUESTION
+        self.answer_key: Optional[str] = answer_key if answer_key is not None else DIFY_API_KEY_ANSWER
+        self.endpoint: str = endpoint
+        self.timeout_sec: float = timeout_sec
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self.limiter: DifyLimiter = limiter if limiter is not None else DifyLimiter()
+        self.breaker: CircuitBreaker = breaker if breaker is not None else CircuitBreaker(
+            "dify", failure_threshold=DIFY_BREAKER_FAILURES, cooldown_sec=DIFY_BREAKER_COOLDOWN_SEC,
+        )
+        self.hedge: bool = hedge
+        self.latency: Dict[str, LatencyTracker] = {}
+
+    @property
+    def is_open(self) -> bool:
+        """共有の HTTP クライアントを持っているか"""
+        return self._http is not None and not self._http.is_closed
+
+    async def open(self) -> "DifyClient":
+        """keep-alive 接続を共有する HTTP クライアントを作る（作成済みなら何もしない）"""
+        if not self.is_open:
+            self._http = create_http_client(self._transport)
+            logger.info(
+                f"Dify HTTPクライアントを作成しました（max_connections={DIFY_MAX_CONNECTIONS}, "
+                f"keepalive={DIFY_MAX_KEEPALIVE}, http2={DIFY_HTTP2}）"
+            )
+        return self
+
+    async def aclose(self) -> None:
+        """HTTP クライアントを閉じる"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self) -> "DifyClient":
+        return await self.open()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def run_workflow(
+        self,
+        inputs: Dict[str, Any],
+        user_id: str | int,
+        api_key: Optional[str],
+        on_text: Optional[Callable[[str], None]] = None,
+        lane: Optional[str] = None,
+        on_queued: Optional[Callable[[int], None]] = None,
+        background: bool = False,
+    ) -> str:
+        """
+        Dify /workflows/run を呼び、outputs.text を返す
+
+        on_text を渡すと streaming モード（server-sent events）で呼び、text_chunk が届くたびに
+        ここまでのテキスト全体を on_text に渡す。戻り値はどちらのモードでも最終的な outputs.text。
+        送信は self.limiter の枠を確保してから行う（空きがなければ到着順に待つ）。
+        タイムアウトはレーンごとに観測した所要時間から決め（LatencyTracker）、Dify の不調が続いている間は
+        サーキットブレーカーで呼ばずに DifyUnavailableError にする。hedge が有効な blocking 呼び出しは、
+        p95 を過ぎても終わらなければ同じリクエストをもう1本送って先に返った方を使う。
+        open() 前（スクリプトなど）は1回限りの HTTP クライアントで送信する。
+
+        Args:
+            inputs: Workflowに渡す "inputs" の中身（dict）
+            user_id: 任意のユーザー識別（stringでもintでもOK）
+            api_key: "app-..." で始まる Dify アプリキー
+            on_text: 生成途中のテキストを受け取る関数（同期関数。重い処理はしないこと）
+            lane: 同時実行数を数えるレーン（LANE_QUESTION / LANE_ANSWER）
+            on_queued: 順番待ちの間、何番目かを受け取る関数（同期関数）
+            background: 低優先の呼び出し（先読み）にする。空き枠があるときだけ送り、ヘッジしない。
+                本番の呼び出しに枠を譲るため、呼び出し元のタスクごとキャンセルされることがある（DifyLimiter.slot）
+
+        Raises:
+            DifyBusyError: 同じユーザーの呼び出しがすでにある場合（background=True なら空き枠がない場合も）
+            DifyUnavailableError: サーキットブレーカーが open の場合
+            DifyUpstreamError: 通信エラー・タイムアウト・5xx / 429・ワークフローの失敗
+            DifyError: キー未設定・順番待ちのタイムアウト・通信エラー・2xx 以外・ワークフローの失敗・outputs.text がない場合
+        """
+        if not api_key:
+            raise DifyError("Missing Dify API key for this workflow. Check .env (DIFY_API_KEY_QUESTION / DIFY_API_KEY_ANSWER).")
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        body = {
+            "inputs": inputs,
+            "response_mode": "blocking" if on_text is None else "streaming",
+            "user": str(user_id),
+        }
+        timeout = httpx.Timeout(self.timeout_sec, connect=CONNECT_TIMEOUT_SEC)
+
+        async def send(http: httpx.AsyncClient) -> str:
+            if on_text is None:
+                resp = await http.post(self.endpoint, headers=headers, json=body, timeout=timeout)
+                _raise_for_status(resp)
+                return _blocking_text(resp)
+            async with http.stream("POST", self.endpoint, headers=headers, json=body, timeout=timeout) as resp:
+                if not (200 <= resp.status_code < 300):
+                    await resp.aread()
+                    _raise_for_status(resp)
+                return await _streaming_text(resp, on_text)
+
+        async def call() -> str:
+            try:
+                if self.is_open:
+                    return await send(self._http)
+                async with create_http_client(self._transport) as http:
+                    return await send(http)
+            except httpx.HTTPError as e:
+                raise DifyUpstreamError(f"Failed to call Dify endpoint: {e}") from e
+
+        permit = self.breaker.allow()
+        if permit is None:
+            raise DifyUnavailableError("Dify is temporarily unavailable (circuit breaker is open)")
+        tracker = self._latency_tracker(lane)
+        try:
+            async with self.limiter.slot(user_id, lane=lane, on_queued=on_queued, background=background):
+                deadline = tracker.timeout()
+                hedge = self.hedge and on_text is None and not background and not self.limiter.queued
+                hedge_after = tracker.hedge_after() if hedge else None
+                started = time.perf_counter()
+                try:
+                    if hedge_after is None:
+                        text = await asyncio.wait_for(call(), timeout=deadline)
+                    else:
+                        text = await asyncio.wait_for(_hedged(call, hedge_after, self.limiter, lane), timeout=deadline)
+                except asyncio.TimeoutError as e:
+                    tracker.observe(deadline)
+                    self.breaker.record_failure(permit)
+                    get_metrics().inc("dify.timeouts")
+                    raise DifyUpstreamError(f"Dify call timed out after {deadline:.1f}s") from e
+                except DifyUpstreamError:
+                    self.breaker.record_failure(permit)
+                    raise
+                except DifyError:
+                    # 4xx・応答の形の不備: Dify 自体は応答している
+                    self.breaker.record_success(permit)
+                    raise
+                tracker.observe(time.perf_counter() - started)
+                self.breaker.record_success(permit)
+                return text
+        finally:
+            # 順番待ちで失敗・キャンセルされた half_open の試し呼び出しを解放する（この呼び出しが試し呼び出しのときだけ）
+            self.breaker.release_probe(permit)
+
+    def _latency_tracker(self, lane: Optional[str]) -> LatencyTracker:
+        key = lane or "default"
+        if key not in self.latency:
+            self.latency[key] = LatencyTracker(
+                default_sec=self.timeout_sec,
+                min_sec=min(DIFY_TIMEOUT_MIN_SEC, self.timeout_sec),
+                max_sec=self.timeout_sec,
+                factor=DIFY_TIMEOUT_FACTOR,
+            )
+        return self.latency[key]
+
+    def latency_stats(self) -> Dict[str, float]:
+        """メトリクス用: レーンごとの p95 / p99 と現在のタイムアウト"""
+        return {f"{lane}.{k}": v for lane, tracker in self.latency.items() for k, v in tracker.stats().items()}
+
+    async def reading_question(
+        self,
+        *,
+        user_id: int | str,
+        training_type: str = "reading",
+        current_score: int | float = 50,
+        recent_svocm_mistakes: str = "",
+        word: str = "",
+        on_passage: Optional[Callable[[str], None]] = None,
+        on_queued: Optional[Callable[[int], None]] = None,
+        background: bool = False,
+    ) -> ReadingQuestion:
+        """
+        Winglish_reading_Question を実行し、検証済みの ReadingQuestion を返す。
+        Dify側のSYSTEMは、passage/choices/answers を JSON文字列として outputs.text に返す想定。
+        JSON として読めない・必須項目が欠けている場合は DifyPayloadError。
+
+        on_passage を渡すと streaming モードで呼び、本文（passage）が伸びるたびにここまでの本文を渡す。
+        on_queued には順番待ちの間の順番が渡る。background=True は先読み用の低優先の呼び出し（run_workflow を参照）。
+        """
+        inputs = {
+            "user_id": str(user_id),  # ← string必須
+            "training_type": training_type,
+            "current_score": current_score,
+            "recent_svocm_mistakes": recent_svocm_mistakes or "",  # JSON文字列でOK（空でも可）
+            "word": word or "",
+        }
+        on_text = None
+        if on_passage is not None:
+            shown = ""
+
+            def on_text(text: str) -> None:
+                nonlocal shown
+                passage = partial_json_string(text, "passage")
+                if passage and passage != shown:
+                    shown = passage
+                    on_passage(passage)
+
+        raw_text = await self.run_workflow(
+            inputs, user_id, self.question_key, on_text=on_text, lane=LANE_QUESTION, on_queued=on_queued,
+            background=background,
+        )
+        return _decode(parse_reading_question, raw_text, "Question")
+
+    async def reading_answer(
+        self,
+        *,
+        user_id: int | str,
+        passage: str,
+        q1_text: str,
+        q1_choices_str: str,  # "A. ... B. ... C. ... D. ..." の1本化文字列（Bubble互換）
+        q1_answer: str,       # "A" ~ "D"
+        q1_user: str,         # "A" ~ "D"
+        q2_text: str,
+        q2_choices_str: str,  # 同上
+        q2_answer: str,       # "A" ~ "D"
+        q2_user: str,         # "A" ~ "D"
+    ) -> ReadingAnswer:
+        """
+        Winglish_reading_Answer を実行し、```json フェンス有無に関わらず ReadingAnswer を返す。
+        DifyのSYSTEMに合わせて Bubble時代のキー名で inputs を渡す。
+        """
+        inputs = {
+            "user_id": str(user_id),  # ← string必須
+            "Question": passage,                 # Bubble準拠の大文字Q
+            "question_1_text": q1_text,
+            "question_1_choice": q1_choices_str,
+            "question_1_Answer": q1_answer,
+            "question_1_User_Answer": q1_user,
+            "question_2_text": q2_text,
+            "question_2_choice": q2_choices_str,
+            "question_2_Answer": q2_answer,
+            "question_2_User_Answer": q2_user,
+        }
+        raw_text = await self.run_workflow(inputs, user_id, self.answer_key, lane=LANE_ANSWER)
+        return _decode(parse_reading_answer, raw_text, "Answer")
+
+
+class SyncDifyClient:
+    """
+    スクリプトなど同期コードから DifyClient を使うための薄いファサード
+
+    呼び出しごとに asyncio.run でイベントループを回す。イベントループの中（ボットの Cog など）から
+    呼ぶとループを止めてしまうため、その場合は RuntimeError にする（DifyClient を await すること）。
+
+    Usage:
+        q = SyncDifyClient().reading_question(user_id="script")
+    """
+
+    def __init__(self, **client_kwargs: Any) -> None:
+        """
+        Args:
+            **client_kwargs: DifyClient に渡す引数（キー・エンドポイントなど）
+        """
+        self._client_kwargs = client_kwargs
+
+    def _run(self, call: Callable[[DifyClient], Awaitable[T]]) -> T:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("SyncDifyClient はイベントループの中では使えません。await DifyClient のメソッドを使ってください。")
+
+        async def main() -> T:
+            # ループごとに HTTP クライアントを作り、終わったら閉じる（別ループの接続を持ち越さない）
+            async with DifyClient(**self._client_kwargs) as client:
+                return await call(client)
+
+        return asyncio.run(main())
+
+    def reading_question(self, **kwargs: Any) -> ReadingQuestion:
+        """DifyClient.reading_question の同期版"""
+        return self._run(lambda client: client.reading_question(**kwargs))
+
+    def reading_answer(self, **kwargs: Any) -> ReadingAnswer:
+        """DifyClient.reading_answer の同期版"""
+        return self._run(lambda client: client.reading_answer(**kwargs))
+
+
+# グローバルなDifyClientインスタンス（ボットで共有）
+_dify_client: Optional[DifyClient] = None
+
+
+def get_dify_client() -> DifyClient:
+    """
+    グローバルなDifyClientインスタンスを取得する
+
+    Returns:
+        DifyClientインスタンス（open() は setup_hook で呼ばれる）
+    """
+    global _dify_client
+    if _dify_client is None:
+        _dify_client = DifyClient()
+        metrics = get_metrics()
+        metrics.register_source("dify_limiter", _dify_client.limiter.stats)
+        metrics.register_source("dify_breaker", _dify_client.breaker.stats)
+        metrics.register_source("dify_latency", _dify_client.latency_stats)
+    return _dify_client
 
 
 # ===== Optional: Health check (起動時ログ用) =====
@@ -0,0 +1,313 @@
+"""
+Dify ワークフローの出力（outputs.text）のデコードと検証
+
+LLM が返す outputs.text は「JSON のはず」のテキストで、次のような崩れ方をする。
+
+- ```json フェンスや前後の説明文（"Here is the question: {...} Good luck!"）
+- 末尾のカンマ（{"a": 1,}）
+- 区切りのスマートクォート（{“passage”: “...”}）
+- 文字列の中の生の改行
+
+decode_json はまず本文の JSON オブジェクトを切り出して高速パーサー（orjson。なければ標準の json）
+で読み、失敗したときだけ上の崩れを直して読み直す。parse_reading_question / parse_reading_answer は
+さらに pydantic のモデルで検証し、型付きのオブジェクトを返す。
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+try:
+    import orjson
+except ImportError:  # orjson は任意（なければ標準の json で読む）
+    orjson = None
+
+CHOICE_KEYS = ("A", "B", "C", "D")
+
+_FENCE_LANG = re.compile(r"[A-Za-z0-9_-]*")
+_JSON_TOKEN = re.compile(r'[{}"\\]')
+# repair_json が見る文字（これ以外はそのまま写す）
+_REPAIR_TOKEN = re.compile('[\\\\",\n\r\t“”„‟″]')
+_STRING_ESCAPES = {'"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_NON_SPACE = re.compile(r"\S")
+_SMART_DOUBLE = "“”„‟″"
+# スマートクォートを文字列の始まりとみなす直前の文字（文字列の外）
+_STRUCTURAL_BEFORE = ("", "{", "[", ",", ":")
+# 「,」のあとにこれが続けば、直前の引用符で文字列が終わっている
+_VALUE_START = frozenset('"{[]}-0123456789tfn' + _SMART_DOUBLE)
+
+
+class PayloadError(ValueError):
+    """outputs.text を JSON として読めない、または期待する形でないとき"""
+    pass
+
+
+def loads(text: str | bytes) -> Any:
+    """orjson があれば orjson で、なければ標準の json で読む"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _strip_fence(text: str) -> str:
+    """```json ... ``` があればその中身を返す（閉じていなければ末尾まで）"""
+    start = text.find("```")
+    if start < 0:
+        return text.strip()
+    body_start = _FENCE_LANG.match(text, start + 3).end()
+    end = text.find("```", body_start)
+    body = text[body_start:end if end >= 0 else len(text)]
+    return body.strip() if "{" in body else text.strip()
+
+
+def extract_json_object(text: str) -> str:
+    """
+    テキストから JSON オブジェクトの部分を切り出す
+
+    最初の { から対応する } まで（文字列の中の括弧は数えない）を返すため、前後の説明文や
+    ```json フェンスは落ちる。閉じていなければ末尾まで返す。
+    """
+    start = text.find("{")
+    if start < 0:
+        return text.strip()
+    depth = 0
+    in_string = False
+    skip_to = -1
+    for match in _JSON_TOKEN.finditer(text, start):
+        i = match.start()
+        if i < skip_to:
+            continue
+        c = match.group()
+        if in_string:
+            if c == "\\":
+                skip_to = i + 2
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _next_significant(text: str, i: int) -> Tuple[str, int]:
+    match = _NON_SPACE.search(text, i)
+    return (match.group(), match.start()) if match else ("", len(text))
+
+
+def _closes_string(text: str, i: int) -> bool:
+    """i の引用符のあとが「:」「}」「]」か、「,」のあとに次のキー・値が続くなら文字列の終わりとみなす"""
+    c, j = _next_significant(text, i + 1)
+    if c in (":", "}", "]", ""):
+        return True
+    if c == ",":
+        after, _ = _next_significant(text, j + 1)
+        return after in _VALUE_START
+    return False
+
+
+def repair_json(text: str) -> str:
+    """
+    LLM 出力によくある JSON の崩れを直す
+
+    - 区切りの位置にあるスマートクォート（“ ”）を " にする（本文中の “引用” はそのまま）
+    - 文字列の中のエスケープされていない " と、生の改行・タブをエスケープする
+    - } や ] の直前のカンマを取り除く
+    """
+    out: List[str] = []
+    in_string = False
+    prev = ""  # 文字列の外で直前の空白以外の文字
+    pos = 0
+    for match in _REPAIR_TOKEN.finditer(text):
+        i = match.start()
+        if i < pos:
+            continue  # エスケープで読み飛ばした文字
+        c = match.group()
+        if not in_string and i > pos:
+            prev = _last_significant(text, pos, i, prev)
+        out.append(text[pos:i])
+        pos = i + 1
+        if in_string:
+            if c == "\\":
+                out.append(text[i:i + 2])
+                pos = i + 2
+            elif (c == '"' or c in _SMART_DOUBLE) and _closes_string(text, i):
+                out.append('"')
+                in_string = False
+                prev = '"'
+            else:
+                out.append(_STRING_ESCAPES.get(c, c))
+        elif c == '"' or (c in _SMART_DOUBLE and prev in _STRUCTURAL_BEFORE):
+            out.append('"')
+            in_string = True
+        elif c == "," and _next_significant(text, i + 1)[0] in "}]":
+            pass
+        else:
+            out.append(c)
+            if c == ",":
+                prev = c
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def _last_significant(text: str, start: int, end: int, default: str) -> str:
+    stripped = text[start:end].rstrip()
+    return stripped[-1] if stripped else default
+
+
+def decode_json(raw_text: str) -> Dict[str, Any]:
+    """
+    outputs.text から JSON オブジェクトを読む
+
+    崩れのない出力（フェンスの有無は問わない）はそのまま1回のパースで読む。失敗したときだけ
+    JSON 部分を切り出し、それでも読めなければ repair_json で直して読み直す。
+
+    Raises:
+        PayloadError: 崩れを直しても読めない、またはオブジェクトでない場合
+    """
+    try:
+        value = loads(_strip_fence(raw_text))
+    except ValueError:
+        body = extract_json_object(raw_text)
+        try:
+            value = loads(body)
+        except ValueError:
+            try:
+                value = loads(repair_json(body))
+            except ValueError as e:
+                raise PayloadError(f"outputs.text is not JSON: {raw_text[:200]!r}") from e
+    if not isinstance(value, dict):
+        raise PayloadError(f"outputs.text is not a JSON object: {raw_text[:200]!r}")
+    return value
+
+
+def _answer_letter(value: Any) -> Any:
+    """"b" / "(B)" / "B. ..." / "Answer: B" などを "B" にそろえる"""
+    if not isinstance(value, str):
+        return value
+    match = re.search(r"(?<![A-Za-z])([A-Da-d])(?![A-Za-z])", value)
+    return match.group(1).upper() if match else value
+
+
+class ReadingQuestion(BaseModel):
+    """長文読解の出題（Winglish_reading_Question の出力）"""
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    passage: str = Field(min_length=1)
+    question_1_text: str = Field(min_length=1)
+    question_1_choice_A: Optional[str] = None
+    question_1_choice_B: Optional[str] = None
+    question_1_choice_C: Optional[str] = None
+    question_1_choice_D: Optional[str] = None
+    question_1_answer: str
+    question_2_text: str = Field(min_length=1)
+    question_2_choice_A: Optional[str] = None
+    question_2_choice_B: Optional[str] = None
+    question_2_choice_C: Optional[str] = None
+    question_2_choice_D: Optional[str] = None
+    question_2_answer: str
+    # 作り置き（reading_items）から出した場合の item_id。Dify の出力には含まれない
+    item_id: Optional[int] = Field(default=None, exclude=True)
+
+    @field_validator("question_1_answer", "question_2_answer", mode="before")
+    @classmethod
+    def _normalize_answer(cls, value: Any) -> Any:
+        return _answer_letter(value)
+
+    @model_validator(mode="after")
+    def _answers_are_choices(self) -> "ReadingQuestion":
+        for number in (1, 2):
+            choices = self.choices(number)
+            if len(choices) < 2:
+                raise ValueError(f"question {number} has fewer than 2 choices")
+            if self.answer(number) not in choices:
+                raise ValueError(f"question {number} answer {self.answer(number)!r} is not one of {sorted(choices)}")
+        return self
+
+    def text(self, number: int) -> str:
+        """問題文"""
+        return getattr(self, f"question_{number}_text")
+
+    def choices(self, number: int) -> Dict[str, str]:
+        """空でない選択肢（"A"〜"D" → 本文）"""
+        return {
+            key: value
+            for key in CHOICE_KEYS
+            if (value := getattr(self, f"question_{number}_choice_{key}"))
+        }
+
+    def answer(self, number: int) -> str:
+        """正解（"A"〜"D"）"""
+        return getattr(self, f"question_{number}_answer")
+
+
+class GradedQuestion(BaseModel):
+    """採点結果の1問分（q1_reason / q2_reason は reason にそろえる）"""
+
+    model_config = ConfigDict(extra="allow", str_strip_whitespace=True)
+
+    reason: str = "-"
+    feedback: str = "-"
+
+    @model_validator(mode="before")
+    @classmethod
+    def _numbered_reason(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "reason" not in data:
+            for key, value in data.items():
+                if re.fullmatch(r"q\d+_reason", key):
+                    return {**data, "reason": value}
+        return data
+
+
+class ReadingAnswer(BaseModel):
+    """長文読解の採点（Winglish_reading_Answer の出力）"""
+
+    model_config = ConfigDict(extra="allow", str_strip_whitespace=True)
+
+    questions: List[GradedQuestion] = Field(default_factory=list)
+    overall_feedback: str = "-"
+
+    def question(self, number: int) -> Optional[GradedQuestion]:
+        """number 問目（1始まり）の採点。なければ None"""
+        return self.questions[number - 1] if len(self.questions) >= number else None
+
+
+def parse_reading_question(raw_text: str) -> ReadingQuestion:
+    """
+    出題の outputs.text を ReadingQuestion にする
+
+    Raises:
+        PayloadError: JSON として読めない、または必須項目・正解が不正な場合
+    """
+    try:
+        return ReadingQuestion.model_validate(decode_json(raw_text))
+    except ValidationError as e:
+        raise PayloadError(f"invalid reading question: {e.errors()[0]['msg']}") from e
+
+
+def parse_reading_answer(raw_text: str) -> ReadingAnswer:
+    """
+    採点の outputs.text を ReadingAnswer にする
+
+    Raises:
+        PayloadError: JSON として読めない、または形が不正な場合
+    """
+    try:
+        return ReadingAnswer.model_validate(decode_json(raw_text))
+    except ValidationError as e:
+        raise PayloadError(f"invalid reading answer: {e.errors()[0]['msg']}") from e
+
+
+__all__ = [
+    'PayloadError', 'ReadingQuestion', 'GradedQuestion', 'ReadingAnswer',
+    'loads', 'extract_json_object', 'repair_json', 'decode_json',
+    'parse_reading_question', 'parse_reading_answer',
+]
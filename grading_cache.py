@@ -0,0 +1,178 @@
+"""
+長文読解の採点結果キャッシュ（2段: メモリの LRU + Postgres）
+
+作り置きプール（reading_pool.py）から同じ問題が何人にも出るため、同じ本文・問題・選択肢・正解に
+同じ解答をした採点は何度も同じ Dify 呼び出しになります。採点の入力から作ったハッシュをキーに
+結果を保存し、2回目以降は Dify を呼ばずに返します。
+
+- 1段目: プロセス内の LRU（GRADING_CACHE_MAX_ENTRIES 件）
+- 2段目: grading_cache テーブル（プロセス間・再起動後も共有）
+- どちらも GRADING_CACHE_TTL_SEC で期限切れ。DB のエラーはキャッシュなしとして扱い、採点は止めない
+- /winglish purge_grading_cache で期限切れ（または全件）を削除する
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from db import get_db_manager, run_query
+from dify_payloads import ReadingAnswer
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.grading_cache')
+
+GRADING_CACHE_TTL_SEC = float(os.getenv("GRADING_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+GRADING_CACHE_MAX_ENTRIES = int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "1024"))
+
+# キーに含める採点の入力（user_id は含めない: 誰が解いても同じ採点になる）
+KEY_FIELDS = (
+    "passage",
+    "q1_text", "q1_choices_str", "q1_answer", "q1_user",
+    "q2_text", "q2_choices_str", "q2_answer", "q2_user",
+)
+
+
+def grading_key(**inputs: Any) -> str:
+    """
+    採点の入力（KEY_FIELDS）からキャッシュキーを作る
+
+    Returns:
+        正規化した JSON の SHA-256（16進）
+    """
+    canonical = json.dumps([inputs.get(name) for name in KEY_FIELDS], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class GradingCache:
+    """
+    採点結果の2段キャッシュ
+
+    Usage:
+        result = await get_grading_cache().reading_answer(user_id=uid, passage=..., ...)
+    """
+
+    def __init__(self, max_entries: int = GRADING_CACHE_MAX_ENTRIES, ttl_sec: float = GRADING_CACHE_TTL_SEC) -> None:
+        """
+        Args:
+            max_entries: メモリに保持する件数
+            ttl_sec: 有効期限（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[str, Tuple[float, ReadingAnswer]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[ReadingAnswer]:
+        """メモリ → DB の順に探す（DB で見つかればメモリにも載せる）"""
+        metrics = get_metrics()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                metrics.inc("grading_cache.hits.memory")
+                return result
+            del self._entries[key]
+
+        try:
+            async with get_db_manager().acquire(site="grading_cache.get", readonly=True) as conn:
+                row = await run_query(conn, "fetchrow", "grading.get", key)
+        except Exception as e:
+            metrics.inc("grading_cache.errors")
+            logger.warning(f"採点キャッシュの読み取りに失敗しました: {e}")
+            row = None
+        if row is None:
+            metrics.inc("grading_cache.misses")
+            return None
+
+        try:
+            result = ReadingAnswer.model_validate_json(row["result"])
+        except ValueError as e:
+            metrics.inc("grading_cache.errors")
+            logger.warning(f"採点キャッシュの内容を読めません（採点し直します）: {e}")
+            return None
+        metrics.inc("grading_cache.hits.db")
+        self._remember(key, result, min(self.ttl_sec, row["ttl_sec"]))
+        return result
+
+    async def put(self, key: str, result: ReadingAnswer) -> None:
+        """メモリと DB に保存する"""
+        self._remember(key, result, self.ttl_sec)
+        try:
+            async with get_db_manager().acquire(site="grading_cache.put") as conn:
+                await run_query(
+                    conn, "execute", "grading.put",
+                    key, result.model_dump_json(), self.ttl_sec,
+                )
+        except Exception as e:
+            get_metrics().inc("grading_cache.errors")
+            logger.warning(f"採点キャッシュの書き込みに失敗しました: {e}")
+
+    async def purge(self, expired_only: bool = True) -> int:
+        """
+        キャッシュを削除する
+
+        Args:
+            expired_only: True なら期限切れだけ、False なら全件
+
+        Returns:
+            DB から削除した件数
+        """
+        if expired_only:
+            now = time.monotonic()
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+        else:
+            self._entries.clear()
+        async with get_db_manager().acquire(site="grading_cache.purge") as conn:
+            status = await run_query(conn, "execute", "grading.purge_expired" if expired_only else "grading.purge_all")
+        return int(status.split()[-1])
+
+    async def reading_answer(self, **kwargs: Any) -> ReadingAnswer:
+        """
+        DifyClient.reading_answer のキャッシュ付き版（引数も同じ）
+
+        解析できなかった結果は DifyPayloadError になるため、キャッシュには検証済みの結果だけが入る。
+        """
+        from dify import get_dify_client
+
+        key = grading_key(**kwargs)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+        result = await get_dify_client().reading_answer(**kwargs)
+        await self.put(key, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {"memory_entries": len(self._entries)}
+
+    def _remember(self, key: str, result: ReadingAnswer, ttl_sec: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl_sec, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# グローバルインスタンス
+_grading_cache: Optional[GradingCache] = None
+
+
+def get_grading_cache() -> GradingCache:
+    """グローバルなGradingCacheインスタンスを取得する"""
+    global _grading_cache
+    if _grading_cache is None:
+        _grading_cache = GradingCache()
+        get_metrics().register_source("grading_cache", _grading_cache.stats)
+    return _grading_cache
+
+
+__all__ = ['GradingCache', 'grading_key', 'get_grading_cache']
@@ -0,0 +1,209 @@
+"""
+コンポーネント（ボタン）のインタラクションの振り分け
+
+各 Cog が on_interaction を持つと、すべてのインタラクションで全リスナーが起き、それぞれが custom_id を
+startswith の連鎖で調べ直すことになります。ここでは custom_id の表から1つのハンドラーだけを呼びます。
+
+- 完全一致のルート（"vocab:ten"）: handler(interaction) を呼ぶ
+- 接頭辞のルート（":" で終わるキー。"reading:feedback:"）: handler(interaction, 残りの文字列) を呼ぶ
+- テンプレートのルート（discord.ui.DynamicItem のサブクラスを渡す）: テンプレートの正規表現で custom_id を
+  解析し、handler(interaction, re.Match) を呼ぶ。ボタンの生成と解析を同じクラスにまとめるために使い、
+  振り分けはこの表で行う（bot.add_dynamic_items には登録しない。ViewStore と二重に呼ばれるため）
+
+探索は完全一致 → ":" の区切りで長いほうの接頭辞から、の順で、ルートの数によらず custom_id の区切りの数だけで済みます。
+ルートごとに件数（interactions.<ルート>）・処理時間（interactions.<ルート>_ms）・例外（interactions.<ルート>.errors）を
+記録し、どのルートにも当たらないものは interactions.unrouted に数えます。
+"""
+from __future__ import annotations
+
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+
+import discord
+
+from error_handler import ErrorHandler
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.interaction_router')
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class Route:
+    """1つのルート（キー・ハンドラー・メトリクス名・テンプレート）"""
+
+    __slots__ = ("key", "handler", "name", "template")
+
+    def __init__(self, key: str, handler: Handler, name: str, template: Optional[re.Pattern[str]] = None) -> None:
+        self.key = key
+        self.handler = handler
+        self.name = name
+        self.template = template
+
+    @property
+    def is_prefix(self) -> bool:
+        return self.key.endswith(":")
+
+
+def route_name(key: str) -> str:
+    """メトリクス名（"reading:ans:" → "reading.ans"）"""
+    return key.rstrip(":").replace(":", ".")
+
+
+class InteractionRouter:
+    """
+    custom_id からハンドラーへの振り分け表
+
+    Usage:
+        router = get_interaction_router()
+        router.add("vocab:ten", self.start_ten)
+        router.add("reading:feedback:", self.set_feedback)
+        router.add(ANSWER_PREFIX, self.handle_answer, template=ReadingAnswerButton)
+        await router.dispatch(interaction)   # bot の on_interaction から
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, Route] = {}
+        self._prefixes: Dict[str, Route] = {}
+
+    def __len__(self) -> int:
+        return len(self._exact) + len(self._prefixes)
+
+    def add(
+        self,
+        key: str,
+        handler: Handler,
+        *,
+        template: Optional[Type[discord.ui.DynamicItem]] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        ルートを登録する
+
+        Args:
+            key: custom_id（":" で終われば接頭辞として扱う）
+            handler: 呼び出すコルーチン関数
+            template: custom_id を解析する DynamicItem のサブクラス（接頭辞のルートのみ）
+            name: メトリクス名（省略時は key から作る）
+
+        Raises:
+            ValueError: 同じキーが別のハンドラーで登録済みのとき、接頭辞でないキーに template を渡したとき
+        """
+        table = self._prefixes if key.endswith(":") else self._exact
+        current = table.get(key)
+        if current is not None and current.handler != handler:
+            raise ValueError(f"route already registered: {key!r}")
+        if template is not None and table is not self._prefixes:
+            raise ValueError(f"template needs a prefix route: {key!r}")
+        pattern = template.__discord_ui_compiled_template__ if template is not None else None
+        table[key] = Route(key, handler, name or route_name(key), pattern)
+
+    def remove(self, key: str) -> None:
+        """ルートを削除する（なければ何もしない）"""
+        (self._prefixes if key.endswith(":") else self._exact).pop(key, None)
+
+    def remove_owner(self, owner: Any) -> int:
+        """
+        owner のメソッドをハンドラーにしたルートをすべて削除する（Cog の cog_unload 用）
+
+        Returns:
+            削除した数
+        """
+        removed = 0
+        for table in (self._exact, self._prefixes):
+            for key in [k for k, r in table.items() if getattr(r.handler, "__self__", None) is owner]:
+                del table[key]
+                removed += 1
+        return removed
+
+    def resolve(self, custom_id: str) -> Optional[Route]:
+        """custom_id のルートを探す（完全一致 → 長い接頭辞の順）"""
+        route = self._exact.get(custom_id)
+        if route is not None:
+            return route
+        end = custom_id.rfind(":")
+        while end > 0:
+            route = self._prefixes.get(custom_id[:end + 1])
+            if route is not None:
+                return route
+            end = custom_id.rfind(":", 0, end)
+        return None
+
+    async def dispatch(self, interaction: discord.Interaction) -> bool:
+        """
+        コンポーネントのインタラクションを1つのハンドラーに渡す
+
+        Returns:
+            ハンドラーを呼んだら True。コンポーネント以外・どのルートにも当たらない・テンプレートに合わない場合は False
+        """
+        if interaction.type != discord.InteractionType.component:
+            return False
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        metrics = get_metrics()
+        route = self.resolve(custom_id)
+        if route is None:
+            metrics.inc("interactions.unrouted")
+            return False
+
+        if route.template is not None:
+            arg = route.template.fullmatch(custom_id)
+            if arg is None:
+                metrics.inc("interactions.malformed")
+                logger.warning(f"custom_id がテンプレートに合いません（{route.name}）: {custom_id}")
+                return False
+            args: tuple = (arg,)
+        elif route.is_prefix:
+            args = (custom_id[len(route.key):],)
+        else:
+            args = ()
+
+        metrics.inc(f"interactions.{route.name}")
+        started = time.perf_counter()
+        try:
+            await route.handler(interaction, *args)
+        except Exception as e:
+            metrics.inc(f"interactions.{route.name}.errors")
+            await ErrorHandler.handle_interaction_error(interaction, e, log_context=f"interaction_router: {route.name}")
+        finally:
+            metrics.observe(f"interactions.{route.name}_ms", (time.perf_counter() - started) * 1000)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {"routes": len(self)}
+
+
+def routed_view(*items: discord.ui.Item) -> discord.ui.View:
+    """
+    ルーター経由で処理するボタンだけの View を作る
+
+    送る前に stop() しておくと discord.py の ViewStore に登録されないため、
+    送ったメッセージの数だけ View がメモリに残ることがない（コールバックは使わない）。
+    """
+    view = discord.ui.View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    view.stop()
+    return view
+
+
+# グローバルインスタンス
+_interaction_router: Optional[InteractionRouter] = None
+
+
+def get_interaction_router() -> InteractionRouter:
+    """
+    グローバルなInteractionRouterインスタンスを取得する
+
+    初回作成時にメトリクス（"interactions.*"）へ統計を登録する。
+    """
+    global _interaction_router
+    if _interaction_router is None:
+        _interaction_router = InteractionRouter()
+        get_metrics().register_source("interactions", _interaction_router.stats)
+    return _interaction_router
+
+
+__all__ = ['InteractionRouter', 'Route', 'get_interaction_router', 'routed_view', 'route_name']
@@ -11,7 +11,12 @@ except ImportError:
 
 from config import DISCORD_TOKEN, TEST_GUILD_ID, LOG_LEVEL, LOG_FILE, validate_required_env
 from db import init_db, close_db, get_db_manager
-from cogs.menu import MenuView
+from dify import get_dify_client
+from reading_pool import close_reading_pool, get_reading_pool
+from reading_prefetch import close_reading_prefetcher
+from sampler import get_word_sampler
+from word_catalog import get_word_catalog
+from interaction_router import get_interaction_router
 from logger_config import setup_logging, get_logger
 
 # --- ログ設定 ---
@@ -37,6 +42,18 @@ class WinglishBot(commands.Bot):
             logger.critical(f"❌ データベース初期化に失敗しました: {e}", exc_info=True)
             raise
 
+        # 語彙カタログ（失敗してもDB参照にフォールバックするので起動は継続）
+        try:
+            await self.reload_words()
+            await get_word_catalog().start_listening(db_manager.database_url, self.reload_words)
+        except Exception as e:
+            logger.error(f"❌ 語彙カタログの読み込みに失敗しました（DB参照で継続）: {e}", exc_info=True)
+
+        # Dify 用の共有HTTPクライアント（読解の出題・採点で keep-alive 接続を使い回す）
+        await get_dify_client().open()
+        # 長文読解の作り置き（在庫を目標数まで補充し続ける）
+        get_reading_pool().start()
+
         cogs = ["cogs.onboarding", "cogs.menu", "cogs.vocab", "cogs.notebook", "cogs.svocm", "cogs.reading", "cogs.admin"]
         for cog in cogs:
             try:
@@ -45,12 +62,32 @@ class WinglishBot(commands.Bot):
             except Exception as e:
                 logger.error(f"❌ Cog 読み込み失敗: {cog} - {e}")
 
-        self.add_view(MenuView())
-        logger.info("✅ 永続 View 登録完了")
+        # ボタンは View のコールバックではなく、各 Cog が cog_load で登録したルートで処理する
+        # （custom_id が固定のメニューは再起動後もそのまま効くため、永続 View の登録は不要）
+        logger.info(f"✅ インタラクションのルート登録完了（{len(get_interaction_router())}件）")
         
         # 注意: スラッシュコマンド同期は on_ready() で実行します
         # Cogのコマンドが完全に登録された後に同期するためです
 
+    async def reload_words(self) -> None:
+        """語彙カタログを再読み込みし、単語IDサンプラーも無効化する"""
+        async with get_db_manager().acquire(site="main.reload_words") as conn:
+            await get_word_catalog().load(conn)
+        get_word_sampler().invalidate()
+
+    async def close(self) -> None:
+        await get_word_catalog().stop_listening()
+        await close_reading_pool()
+        await close_reading_prefetcher()
+        await super().close()
+        await get_dify_client().aclose()
+        # イベントループが動いているうちにSRSバッファを書き出してプールを閉じる
+        await close_db()
+
+    async def on_interaction(self, interaction: discord.Interaction) -> None:
+        # コンポーネントのインタラクションはここだけで受け、custom_id の表から1つのハンドラーに渡す
+        await get_interaction_router().dispatch(interaction)
+
     async def on_ready(self) -> None:
         logger.info(f"✅ Logged in as {self.user} ({self.user.id})")
         
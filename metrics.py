@@ -0,0 +1,182 @@
+"""
+メトリクス管理モジュール
+
+プロセス内のカウンターと、各コンポーネントが公開する統計情報（ソース）を
+一箇所に集約します。外部の監視基盤には依存せず、管理コマンドやログから
+スナップショットを参照する用途を想定しています。
+"""
+from __future__ import annotations
+
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger('winglish.metrics')
+
+# ヒストグラムが保持する直近サンプル数
+DEFAULT_HISTOGRAM_SAMPLES = 1024
+
+
+class Histogram:
+    """
+    直近N件のサンプルからパーセンタイルを計算する簡易ヒストグラム
+
+    件数・合計・最大値は全期間、パーセンタイルは直近N件で計算する。
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_HISTOGRAM_SAMPLES) -> None:
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """サンプルを追加する"""
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float) -> float:
+        """
+        パーセンタイルを返す（サンプルがなければ0）
+
+        Args:
+            p: 0.0〜1.0（例: 0.99）
+        """
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def summary(self) -> Dict[str, float]:
+        """count / mean / p50 / p95 / p99 / max をまとめて返す"""
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": round(self.percentile(0.50), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "max": round(self.max, 3),
+        }
+
+
+class MetricsRegistry:
+    """
+    カウンターと統計ソースを保持するクラス
+
+    主な機能:
+    - 名前付きカウンターの加算
+    - 名前付きヒストグラム（レイテンシ・件数など）の記録
+    - コンポーネントの stats() 等をソースとして登録し、まとめて取得
+    """
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, int] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """
+        カウンターを加算する
+
+        Args:
+            name: カウンター名（例: "vocab.answers"）
+            value: 加算値（デフォルト: 1）
+        """
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> int:
+        """カウンターの現在値を取得する（未登録なら0）"""
+        return self._counters.get(name, 0)
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        ヒストグラムにサンプルを追加する
+
+        Args:
+            name: ヒストグラム名（例: "srs_buffer.flush_ms"）
+            value: 値（レイテンシはミリ秒で記録する）
+        """
+        self.histogram(name).observe(value)
+
+    def histogram(self, name: str) -> Histogram:
+        """ヒストグラムを取得する（なければ作成）"""
+        hist = self._histograms.get(name)
+        if hist is None:
+            hist = Histogram()
+            self._histograms[name] = hist
+        return hist
+
+    def histograms(self, prefix: str = "") -> Dict[str, Histogram]:
+        """
+        名前が prefix で始まるヒストグラムを取得する
+
+        Returns:
+            {名前: Histogram}（名前順）
+        """
+        return {name: hist for name, hist in sorted(self._histograms.items()) if name.startswith(prefix)}
+
+    def source(self, name: str) -> Dict[str, Any]:
+        """登録済みソースの現在値を取得する（未登録なら空の dict）"""
+        fn = self._sources.get(name)
+        return fn() if fn else {}
+
+    def register_source(self, name: str, source: Callable[[], Dict[str, Any]]) -> None:
+        """
+        統計ソースを登録する（同名があれば置き換える）
+
+        Args:
+            name: ソース名（スナップショットのキー接頭辞になる）
+            source: 呼び出すと統計値の dict を返す関数
+        """
+        self._sources[name] = source
+
+    def unregister_source(self, name: str) -> None:
+        """統計ソースの登録を解除する"""
+        self._sources.pop(name, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        すべてのカウンターとソースの値を平坦な dict で取得する
+
+        Returns:
+            {"<source>.<key>": 値, "<counter>": 値, ...}
+        """
+        result: Dict[str, Any] = dict(self._counters)
+        for name, hist in self._histograms.items():
+            for key, value in hist.summary().items():
+                result[f"{name}.{key}"] = value
+        for name, source in self._sources.items():
+            try:
+                for key, value in source().items():
+                    result[f"{name}.{key}"] = value
+            except Exception as e:
+                logger.warning(f"メトリクスソースの取得に失敗 ({name}): {e}")
+        return dict(sorted(result.items()))
+
+    def reset(self) -> None:
+        """カウンターとヒストグラムを消去する（ソースは残す）"""
+        self._counters.clear()
+        self._histograms.clear()
+
+
+# グローバルインスタンス
+_metrics: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    グローバルなMetricsRegistryインスタンスを取得する
+
+    Returns:
+        MetricsRegistryインスタンス
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
+
+
+__all__ = ['Histogram', 'MetricsRegistry', 'get_metrics']
@@ -0,0 +1,140 @@
+"""
+接続プールのサイズ調整（接続待ち時間ベース）
+
+asyncpg のプールは max_size まで必要に応じて接続を作るが、新しい接続の作成
+（TCP/TLS/認証 + init でのクエリカタログ prepare）は acquire の待ち時間にそのまま乗る。
+PoolController は観測した接続待ち時間から「温めておく接続数（target）」を決める。
+
+- 一定間隔ごとに直近の接続待ち p99 を見て、目標（target_wait_ms）を超えていれば target を増やす
+- 待ちがなく、使用中の接続数のピークが target を下回っていれば target を1つずつ減らす
+- target より多いアイドル接続は一定間隔ごとに閉じる（surplus）
+- max_age_sec を超えた接続は返却時に閉じる（should_retire）
+
+実際の接続の作成・破棄は DatabaseManager（db.py）が行う。このクラスは判断だけを持つ。
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from metrics import Histogram
+
+DEFAULT_INTERVAL_SEC = 10.0
+
+
+class PoolController:
+    """
+    接続待ち時間から接続プールの目標サイズを決める
+
+    Usage:
+        controller = PoolController(min_size=1, max_size=10, target_wait_ms=5)
+        controller.observe_wait(wait_ms, in_use)   # acquire のたびに
+        target = controller.tick(waiting)          # 一定間隔ごとに
+        for _ in range(controller.surplus(size, idle)):
+            ...                                    # アイドル接続を閉じる
+        if controller.should_retire(age_sec):
+            ...                                    # 返却時に閉じる
+    """
+
+    def __init__(
+        self,
+        min_size: int,
+        max_size: int,
+        target_wait_ms: float,
+        max_age_sec: Optional[float] = None,
+    ) -> None:
+        """
+        PoolControllerを初期化
+
+        Args:
+            min_size: 目標サイズの下限
+            max_size: 目標サイズの上限（プールの max_size と同じ値にする）
+            target_wait_ms: 接続待ち p99 の目標（ミリ秒）
+            max_age_sec: 接続の最大寿命（秒、None なら寿命で閉じない）
+        """
+        if min_size < 0 or max_size < max(min_size, 1):
+            raise ValueError(f"invalid pool bounds: min={min_size}, max={max_size}")
+        self.min_size: int = min_size
+        self.max_size: int = max_size
+        self.target_wait_ms: float = target_wait_ms
+        self.max_age_sec: Optional[float] = max_age_sec
+        self.target: int = max(min_size, 1)
+        self._waits = Histogram()
+        self._peak_in_use: int = 0
+        self.grows: int = 0
+        self.shrinks: int = 0
+
+    def observe_wait(self, wait_ms: float, in_use: int) -> None:
+        """
+        acquire 1回分の待ち時間と、取得後の使用中接続数を記録する
+
+        Args:
+            wait_ms: 接続待ち時間（ミリ秒）
+            in_use: 取得後に使用中の接続数
+        """
+        self._waits.observe(wait_ms)
+        if in_use > self._peak_in_use:
+            self._peak_in_use = in_use
+
+    def tick(self, waiting: int = 0) -> int:
+        """
+        直近の観測から目標サイズを更新し、観測をリセットする
+
+        Args:
+            waiting: いま接続を待っている呼び出しの数
+
+        Returns:
+            更新後の目標サイズ
+        """
+        p99 = self._waits.percentile(0.99)
+        peak = self._peak_in_use
+
+        if p99 > self.target_wait_ms or waiting > 0:
+            # 足りなかった分（待っている数、またはピーク時の不足）だけ一度に増やす
+            needed = max(self.target + max(waiting, 1), peak + waiting)
+            new_target = min(self.max_size, needed)
+            if new_target > self.target:
+                self.grows += 1
+        elif peak < self.target - 1:
+            # 余っていても急に減らさず、1回につき1つずつ
+            new_target = max(self.min_size, 1, self.target - 1)
+            if new_target < self.target:
+                self.shrinks += 1
+        else:
+            new_target = self.target
+
+        self.target = new_target
+        self._waits = Histogram()
+        self._peak_in_use = 0
+        return self.target
+
+    def surplus(self, size: int, idle: int) -> int:
+        """
+        目標サイズを超えていて閉じてよいアイドル接続の数
+
+        Args:
+            size: 現在のプールの接続数
+            idle: そのうちアイドルの接続数
+        """
+        return max(0, min(idle, size - max(self.target, self.min_size)))
+
+    def should_retire(self, age_sec: Optional[float]) -> bool:
+        """
+        返却しようとしている接続を寿命切れとして閉じるべきか判定する
+
+        Args:
+            age_sec: 接続の経過秒数（不明なら None）
+        """
+        if self.max_age_sec is None or age_sec is None:
+            return False
+        return age_sec >= self.max_age_sec
+
+    def stats(self) -> Dict[str, float]:
+        """目標サイズと調整回数（メトリクス表示用）"""
+        return {
+            "target": self.target,
+            "grows": self.grows,
+            "shrinks": self.shrinks,
+        }
+
+
+__all__ = ['PoolController', 'DEFAULT_INTERVAL_SEC']
@@ -0,0 +1,68 @@
+"""
+長文読解の採点結果の表示（正誤はその場で、解説はあとから）
+
+正解（question_1_answer / question_2_answer）はセッションにあるため、Q2 に解答したらすぐ正誤を表示し、
+Dify の解説は届いてから同じメッセージを編集して追記します。
+
+ユーザーは解説の詳しさ（users.reading_feedback）を選べます。
+
+- "full"（デフォルト）: いつも Dify の解説を付ける
+- "brief": 全問正解のときは Dify を呼ばず、BRIEF_ALL_CORRECT の定型文にする（不正解があれば解説を付ける）
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from db import get_db_manager, run_query
+from metrics import get_metrics
+from reading_sessions import QUESTION_NUMBERS, ReadingSession
+
+logger = logging.getLogger('winglish.reading_feedback')
+
+FEEDBACK_FULL = "full"
+FEEDBACK_BRIEF = "brief"
+FEEDBACK_MODES = (FEEDBACK_FULL, FEEDBACK_BRIEF)
+
+BRIEF_ALL_CORRECT = "全問正解です！この調子で次の問題にも挑戦しましょう。"
+
+
+async def get_feedback_mode(user_id: Any) -> str:
+    """
+    ユーザーの解説の詳しさを返す
+
+    Returns:
+        "full" / "brief"。未登録・DB エラーのときは "full"（解説を省かない）
+    """
+    try:
+        async with get_db_manager().acquire(site="reading_feedback.get", readonly=True, user_id=str(user_id)) as conn:
+            mode = await run_query(conn, "fetchval", "reading_feedback.get", str(user_id))
+    except Exception as e:
+        get_metrics().inc("reading_feedback.errors")
+        logger.warning(f"解説の詳しさの読み取りに失敗しました（詳しい解説にします）: {e}")
+        return FEEDBACK_FULL
+    return mode if mode in FEEDBACK_MODES else FEEDBACK_FULL
+
+
+async def set_feedback_mode(user_id: Any, mode: str) -> None:
+    """
+    ユーザーの解説の詳しさを保存する
+
+    Raises:
+        ValueError: mode が "full" / "brief" でないとき
+    """
+    if mode not in FEEDBACK_MODES:
+        raise ValueError(f"unknown feedback mode: {mode!r}")
+    async with get_db_manager().acquire(site="reading_feedback.set", user_id=str(user_id)) as conn:
+        await run_query(conn, "execute", "reading_feedback.set", str(user_id), mode)
+
+
+def needs_explanation(session: ReadingSession, mode: str) -> bool:
+    """Dify の解説が必要か（"brief" で全問正解なら不要）"""
+    return not (mode == FEEDBACK_BRIEF and session.correct_count() == len(QUESTION_NUMBERS))
+
+
+__all__ = [
+    'FEEDBACK_FULL', 'FEEDBACK_BRIEF', 'get_feedback_mode', 'set_feedback_mode',
+    'needs_explanation', 'BRIEF_ALL_CORRECT',
+]
@@ -0,0 +1,261 @@
+"""
+長文読解の出題プール（事前生成）
+
+!reading のたびに Dify で問題を生成する（数十秒かかる）のではなく、バックグラウンドで
+(kind, level) ごとに目標数（READING_POOL_TARGET）の問題を reading_items に作り置きしておき、
+出題時は1本の UPDATE（db.QUERIES の "reading.claim"）で1問を取り出します。
+
+- 取り出しは FOR UPDATE SKIP LOCKED で行い、同時に出題しても同じ問題を二人に出さない
+- 取り出した問題は served_at を付けて残す（再出題しない）
+- 在庫が READING_POOL_LOW_WATER 以下になったら補充を前倒しする
+- 在庫が空のとき（または DB エラーのとき）だけ、呼び出し元がその場で生成する
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from db import get_db_manager, run_query
+from dify_payloads import ReadingQuestion
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.reading_pool')
+
+# 難易度ラベルと Dify に渡す current_score の対応（現状の出題は 50 固定）
+LEVEL_SCORES: Dict[str, int] = {"standard": 50}
+DEFAULT_LEVEL = "standard"
+
+# 作り置きする種類（カンマ区切り）と、(kind, level) ごとの目標数・補充の閾値
+READING_POOL_KINDS = [k.strip() for k in os.getenv("READING_POOL_KINDS", "toeic").split(",") if k.strip()]
+READING_POOL_TARGET = int(os.getenv("READING_POOL_TARGET", "5"))
+READING_POOL_LOW_WATER = int(os.getenv("READING_POOL_LOW_WATER", "2"))
+READING_POOL_REFILL_INTERVAL_SEC = float(os.getenv("READING_POOL_REFILL_INTERVAL_SEC", "300"))
+
+# 事前生成の呼び出しで Dify に渡す user（実ユーザーと区別する）
+POOL_USER_ID = "reading_pool"
+
+PoolKey = Tuple[str, str]
+Generator = Callable[[str, str], Awaitable[ReadingQuestion]]
+
+
+async def _generate_with_dify(kind: str, level: str) -> ReadingQuestion:
+    from dify import get_dify_client
+
+    return await get_dify_client().reading_question(
+        user_id=POOL_USER_ID,
+        training_type="reading",
+        current_score=LEVEL_SCORES.get(level, LEVEL_SCORES[DEFAULT_LEVEL]),
+        recent_svocm_mistakes="[]",
+        word="",
+    )
+
+
+class ReadingPool:
+    """
+    長文読解の作り置きプール
+
+    Usage:
+        pool = get_reading_pool()
+        pool.start()                      # setup_hook で補充を開始
+        q = await pool.claim("toeic", user_id=ctx.author.id)
+        if q is None:
+            q = await get_dify_client().reading_question(...)  # 在庫切れのときだけその場で生成
+        ...
+        await pool.close()
+    """
+
+    def __init__(
+        self,
+        kinds: Iterable[str] = READING_POOL_KINDS,
+        target: int = READING_POOL_TARGET,
+        low_water: int = READING_POOL_LOW_WATER,
+        refill_interval_sec: float = READING_POOL_REFILL_INTERVAL_SEC,
+        generate: Optional[Generator] = None,
+    ) -> None:
+        """
+        Args:
+            kinds: 作り置きする種類（"toeic" など）。level は DEFAULT_LEVEL のみ
+            target: (kind, level) ごとに保つ在庫数（0 で作り置きしない）
+            low_water: 取り出し後の在庫がこの数以下なら補充を前倒しする
+            refill_interval_sec: 定期的に在庫を確認して補充する間隔
+            generate: 1問を生成する関数（テスト用。デフォルトは Dify）
+        """
+        self.targets: Dict[PoolKey, int] = {(kind, DEFAULT_LEVEL): max(0, target) for kind in kinds}
+        self.low_water = low_water
+        self.refill_interval_sec = refill_interval_sec
+        self._generate = generate or _generate_with_dify
+        self._stock: Dict[PoolKey, int] = {}
+        self._wakeup = asyncio.Event()
+        self._refill_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.targets.values())
+
+    async def claim(self, kind: str, level: str = DEFAULT_LEVEL, user_id: Any = None) -> Optional[ReadingQuestion]:
+        """
+        在庫から1問を取り出す
+
+        Args:
+            kind: 問題の種類
+            level: 難易度ラベル
+            user_id: 出題先のユーザー（served_to に記録する）
+
+        Returns:
+            item_id 付きの ReadingQuestion。在庫がなければ（または保存内容が壊れていれば）None
+        """
+        key = (kind, level)
+        if not self.targets.get(key):
+            return None
+        metrics = get_metrics()
+        try:
+            async with get_db_manager().acquire(site="reading_pool.claim") as conn:
+                row = await run_query(
+                    conn, "fetchrow", "reading.claim",
+                    kind, level, None if user_id is None else str(user_id),
+                )
+        except Exception as e:
+            # 作り置きが使えなくても、その場で生成すれば出題はできる
+            metrics.inc("reading_pool.claim_errors")
+            logger.warning(f"読解プールからの取り出しに失敗しました（その場で生成します）: {e}")
+            return None
+
+        if row is None:
+            metrics.inc("reading_pool.misses")
+            self._stock[key] = 0
+            self.request_refill()
+            return None
+
+        metrics.inc("reading_pool.hits")
+        stock = max(0, self._stock.get(key, 1) - 1)
+        self._stock[key] = stock
+        if stock <= self.low_water:
+            self.request_refill()
+        try:
+            q = ReadingQuestion.model_validate_json(row["questions"])
+        except ValueError as e:
+            metrics.inc("reading_pool.invalid_items")
+            logger.error(f"作り置きの問題 {row['item_id']} を読めません（その場で生成します）: {e}")
+            return None
+        q.item_id = row["item_id"]
+        return q
+
+    def available(self, kind: str, level: str = DEFAULT_LEVEL) -> int:
+        """最後に確認した在庫数（作り置きしない種類・まだ確認していなければ 0）"""
+        if not self.targets.get((kind, level)):
+            return 0
+        return self._stock.get((kind, level), 0)
+
+    def request_refill(self) -> None:
+        """補充ループを起こす（start() していなければ何もしない）"""
+        self._wakeup.set()
+
+    async def refill(self) -> int:
+        """
+        各 (kind, level) の在庫を目標数まで補充する
+
+        1問生成するごとに INSERT するため、補充の途中でも作れた分から出題に使われる。
+        生成に失敗した (kind, level) はそこで打ち切り、次の補充で再試行する。
+
+        Returns:
+            追加した問題数
+        """
+        async with self._refill_lock:
+            added = 0
+            for (kind, level), target in self.targets.items():
+                if target <= 0:
+                    continue
+                async with get_db_manager().acquire(site="reading_pool.stock") as conn:
+                    stock = await run_query(conn, "fetchval", "reading.stock", kind, level)
+                self._stock[(kind, level)] = stock
+                for _ in range(target - stock):
+                    if not await self._produce_one(kind, level):
+                        break
+                    added += 1
+                    self._stock[(kind, level)] += 1
+            return added
+
+    async def _produce_one(self, kind: str, level: str) -> bool:
+        metrics = get_metrics()
+        started = time.perf_counter()
+        try:
+            q = await self._generate(kind, level)
+            async with get_db_manager().acquire(site="reading_pool.insert") as conn:
+                await run_query(
+                    conn, "execute", "reading.insert",
+                    kind, level, q.passage, q.model_dump_json(),
+                    json.dumps({"1": q.answer(1), "2": q.answer(2)}),
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.inc("reading_pool.generate_errors")
+            logger.error(f"読解問題の事前生成に失敗しました（{kind}/{level}）: {e}")
+            return False
+        metrics.inc("reading_pool.generated")
+        metrics.observe("reading_pool.generate_ms", (time.perf_counter() - started) * 1000)
+        return True
+
+    def start(self) -> None:
+        """補充ループを開始する（目標数がすべて 0 なら開始しない）"""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """補充ループを止める（生成中の呼び出しは破棄する）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す（最後に確認した在庫数）"""
+        return {f"stock.{kind}.{level}": count for (kind, level), count in self._stock.items()}
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                added = await self.refill()
+                if added:
+                    logger.info(f"✅ 読解問題を {added} 問作り置きしました")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"読解プールの補充に失敗しました: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+
+
+# グローバルインスタンス
+_reading_pool: Optional[ReadingPool] = None
+
+
+def get_reading_pool() -> ReadingPool:
+    """グローバルなReadingPoolインスタンスを取得する"""
+    global _reading_pool
+    if _reading_pool is None:
+        _reading_pool = ReadingPool()
+        get_metrics().register_source("reading_pool", _reading_pool.stats)
+    return _reading_pool
+
+
+async def close_reading_pool() -> None:
+    """グローバルなReadingPoolの補充ループを止めて破棄する"""
+    global _reading_pool
+    if _reading_pool is not None:
+        await _reading_pool.close()
+        _reading_pool = None
+
+
+__all__ = ['ReadingPool', 'get_reading_pool', 'close_reading_pool']
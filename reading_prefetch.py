@@ -0,0 +1,242 @@
+"""
+長文読解の次の問題の先読み（投機的な事前生成）
+
+解説のあとはほとんどのユーザーが「もう一問」を押すため、Q1 に解答した時点で（間に合わなければ Q2 の
+解答時に）そのユーザーの次の問題をバックグラウンドで生成し始めます。「もう一問」では先読みした問題を
+すぐに渡し、使われなかったものは READING_PREFETCH_TTL_SEC で捨てます。
+
+- ユーザーごとに READING_PREFETCH_PER_USER 件、全体で READING_PREFETCH_MAX_TOTAL 件まで
+- 作り置き（reading_pool.py）に在庫があれば先読みしない（出題はそちらで即時にできる）
+- Dify には本人の user のまま低優先（background）で頼む。DifyLimiter の「1ユーザー1件」に数え、空き枠が
+  あるときだけ送る。本人の採点など本番の呼び出しが来たら先読みはキャンセルされて枠を譲る（採点のあとで始め直す）
+- 生成中に「もう一問」が押されたら、最初から生成し直さずにその完了を待つ
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from dify import DifyBusyError
+from dify_payloads import ReadingQuestion
+from metrics import get_metrics
+from reading_pool import DEFAULT_LEVEL, LEVEL_SCORES, get_reading_pool
+
+logger = logging.getLogger('winglish.reading_prefetch')
+
+READING_PREFETCH_TTL_SEC = float(os.getenv("READING_PREFETCH_TTL_SEC", "900"))
+READING_PREFETCH_PER_USER = int(os.getenv("READING_PREFETCH_PER_USER", "1"))
+READING_PREFETCH_MAX_TOTAL = int(os.getenv("READING_PREFETCH_MAX_TOTAL", "20"))
+
+PrefetchKey = Tuple[str, str]
+Generator = Callable[[str, str], Awaitable[ReadingQuestion]]
+
+
+async def _generate_with_dify(user_id: str, kind: str) -> ReadingQuestion:
+    from dify import get_dify_client
+
+    return await get_dify_client().reading_question(
+        user_id=user_id,
+        training_type="reading",
+        current_score=LEVEL_SCORES[DEFAULT_LEVEL],
+        recent_svocm_mistakes="[]",
+        word="",
+        background=True,
+    )
+
+
+class _Prefetch:
+    __slots__ = ("task", "expires_at")
+
+    def __init__(self, task: "asyncio.Task[Optional[ReadingQuestion]]", expires_at: float) -> None:
+        self.task = task
+        self.expires_at = expires_at
+
+
+class ReadingPrefetcher:
+    """
+    ユーザーごとの次の問題の先読み
+
+    Usage:
+        prefetcher = get_reading_prefetcher()
+        prefetcher.start(user_id, "toeic")        # Q1 / Q2 に解答したとき
+        q = await prefetcher.take(user_id, "toeic")   # 「もう一問」。なければ None
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float = READING_PREFETCH_TTL_SEC,
+        per_user: int = READING_PREFETCH_PER_USER,
+        max_total: int = READING_PREFETCH_MAX_TOTAL,
+        generate: Optional[Generator] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            ttl_sec: 先読みを始めてから使われずに捨てるまでの秒数
+            per_user: ユーザーごとに同時に持てる先読みの数（0 で先読みしない）
+            max_total: 全体で同時に持てる先読みの数
+            generate: (user_id, kind) から1問を生成する関数（テスト用。デフォルトは Dify）
+            clock: 現在時刻（秒）を返す関数（テスト用に差し替え可能）
+        """
+        self.ttl_sec = ttl_sec
+        self.per_user = per_user
+        self.max_total = max_total
+        self._generate = generate or _generate_with_dify
+        self._clock = clock
+        self._entries: Dict[PrefetchKey, _Prefetch] = {}
+        # hit_rate 用（カウンタ reading_prefetch.hits / misses と同じ値）
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_user > 0 and self.max_total > 0
+
+    def start(self, user_id: Any, kind: str) -> bool:
+        """
+        次の問題の先読みを始める
+
+        Returns:
+            始めたら True。すでにある・上限に達した・作り置きに在庫がある場合は False
+        """
+        user, key = str(user_id), (str(user_id), kind)
+        self.purge_expired()
+        if not self.enabled or key in self._entries:
+            return False
+        metrics = get_metrics()
+        if get_reading_pool().available(kind) > 0:
+            metrics.inc("reading_prefetch.skipped.pool")
+            return False
+        if sum(1 for u, _ in self._entries if u == user) >= self.per_user or len(self._entries) >= self.max_total:
+            metrics.inc("reading_prefetch.skipped.limit")
+            return False
+
+        task = asyncio.get_running_loop().create_task(self._run(user, kind))
+        self._entries[key] = _Prefetch(task, self._clock() + self.ttl_sec)
+        metrics.inc("reading_prefetch.started")
+        return True
+
+    async def take(self, user_id: Any, kind: str) -> Optional[ReadingQuestion]:
+        """
+        先読みした問題を取り出す（生成中なら完了を待つ。「もう一問」からだけ呼ぶ: 呼ぶたびに hits / misses を数える）
+
+        Returns:
+            ReadingQuestion。先読みがない・期限切れ・生成に失敗した場合は None
+        """
+        if not self.enabled:
+            return None
+        self.purge_expired()
+        entry = self._entries.pop((str(user_id), kind), None)
+        q = None
+        if entry is not None:
+            try:
+                q = await asyncio.shield(entry.task)
+            except asyncio.CancelledError:
+                # 先読み側のキャンセル（close）なら先読みなしとして続ける
+                if not entry.task.cancelled():
+                    raise
+        metrics = get_metrics()
+        if q is None:
+            self.misses += 1
+            metrics.inc("reading_prefetch.misses")
+            return None
+        self.hits += 1
+        metrics.inc("reading_prefetch.hits")
+        return q
+
+    def purge_expired(self) -> int:
+        """
+        期限切れの先読みを捨てる（生成中ならキャンセルする）
+
+        Returns:
+            捨てた数
+        """
+        now = self._clock()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._entries.pop(key).task.cancel()
+        if expired:
+            get_metrics().inc("reading_prefetch.expired", len(expired))
+        return len(expired)
+
+    async def close(self) -> None:
+        """生成中の先読みをすべてキャンセルして捨てる"""
+        entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            entry.task.cancel()
+        await asyncio.gather(*(entry.task for entry in entries), return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        """メトリクス用の統計値を返す（hit_rate は「もう一問」のうち先読みを渡せた割合）"""
+        taken = self.hits + self.misses
+        return {
+            "active": len(self._entries),
+            "pending": sum(1 for entry in self._entries.values() if not entry.task.done()),
+            "hit_rate": self.hits / taken if taken else 0.0,
+        }
+
+    async def _run(self, user: str, kind: str) -> Optional[ReadingQuestion]:
+        started = time.perf_counter()
+        try:
+            q = await self._generate(user, kind)
+        except asyncio.CancelledError:
+            # 本番の呼び出しに枠を譲った（DifyLimiter がキャンセルした）なら捨てて、次の解答で始め直せるようにする。
+            # 期限切れ・close では先に取り除いてある
+            if self._drop(user, kind):
+                get_metrics().inc("reading_prefetch.preempted")
+            raise
+        except DifyBusyError:
+            # 本人の呼び出しがある・空き枠がない: 本番の呼び出しを待たせないため、先読みはしない
+            self._drop(user, kind)
+            get_metrics().inc("reading_prefetch.skipped.busy")
+            return None
+        except Exception as e:
+            # 失敗した先読みは捨てる（「もう一問」ではいつも通りその場で生成する）
+            self._drop(user, kind)
+            get_metrics().inc("reading_prefetch.errors")
+            logger.warning(f"読解問題の先読みに失敗しました（{user}/{kind}）: {e}")
+            return None
+        get_metrics().observe("reading_prefetch.generate_ms", (time.perf_counter() - started) * 1000)
+        return q
+
+    def _drop(self, user: str, kind: str) -> bool:
+        """この（実行中の）タスクの先読みを取り除く。取り除いたら True"""
+        entry = self._entries.get((user, kind))
+        if entry is not None and entry.task is asyncio.current_task():
+            del self._entries[(user, kind)]
+            return True
+        return False
+
+
+# グローバルインスタンス
+_reading_prefetcher: Optional[ReadingPrefetcher] = None
+
+
+def get_reading_prefetcher() -> ReadingPrefetcher:
+    """
+    グローバルなReadingPrefetcherインスタンスを取得する
+
+    初回作成時にメトリクス（"reading_prefetch.*"）へ統計を登録する。
+    """
+    global _reading_prefetcher
+    if _reading_prefetcher is None:
+        _reading_prefetcher = ReadingPrefetcher()
+        get_metrics().register_source("reading_prefetch", _reading_prefetcher.stats)
+    return _reading_prefetcher
+
+
+async def close_reading_prefetcher() -> None:
+    """グローバルなReadingPrefetcherの先読みを止めて破棄する"""
+    global _reading_prefetcher
+    if _reading_prefetcher is not None:
+        await _reading_prefetcher.close()
+        _reading_prefetcher = None
+
+
+__all__ = ['ReadingPrefetcher', 'get_reading_prefetcher', 'close_reading_prefetcher']
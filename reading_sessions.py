@@ -0,0 +1,289 @@
+"""
+長文読解の進行中セッション（2段: メモリの SessionRegistry + Postgres）
+
+出題から採点までの状態（問題・ユーザーの解答）をセッション ID で管理します。
+解答ボタンの custom_id にセッション ID を入れ（"reading:ans:{session_id}:{number}:{key}"）、
+ReadingCog.handle_answer（interaction_router 経由）が custom_id からセッションを引くため、View をメモリに残す必要がありません。
+
+- 1段目: SessionRegistry（ユーザーごとに1件。READING_SESSION_TTL_SEC で失効、
+  READING_SESSION_MAX_ENTRIES 件を超えたら LRU で削除）
+- 2段目: reading_sessions テーブル（ユーザーごとに1行）。メモリにないセッションは DB から読み戻すため、
+  再起動後や別プロセスでもボタンが効く
+- 採点に進んだら両方から削除する。DB のエラーはメモリだけで続ける
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db import get_db_manager, run_query
+from dify_payloads import ReadingQuestion
+from metrics import get_metrics
+from sessions import SessionRegistry
+
+logger = logging.getLogger('winglish.reading_sessions')
+
+READING_SESSION_TTL_SEC = float(os.getenv("READING_SESSION_TTL_SEC", "1800"))
+READING_SESSION_MAX_ENTRIES = int(os.getenv("READING_SESSION_MAX_ENTRIES", "1000"))
+
+MODULE = "reading"
+ANSWER_PREFIX = "reading:ans:"
+QUESTION_NUMBERS = (1, 2)
+# 問題の種類（!reading の引数。「もう一問」・先読みも同じ種類で出す）
+DEFAULT_KIND = "toeic"
+
+
+def answer_custom_id(session_id: str, number: int, key: str) -> str:
+    """解答ボタンの custom_id"""
+    return f"{ANSWER_PREFIX}{session_id}:{number}:{key}"
+
+
+def parse_answer_custom_id(custom_id: str) -> Tuple[str, int, str]:
+    """
+    解答ボタンの custom_id を (session_id, number, key) に分ける
+
+    Raises:
+        ValueError: 解答ボタンの custom_id でないとき
+    """
+    if not custom_id.startswith(ANSWER_PREFIX):
+        raise ValueError(f"not a reading answer: {custom_id!r}")
+    session_id, number, key = custom_id[len(ANSWER_PREFIX):].split(":")
+    return session_id, int(number), key
+
+
+def _deep_size(value: Any) -> int:
+    """文字列・数値・dict・list/tuple を sys.getsizeof で再帰的に合算する"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(_deep_size(v) for v in value)
+    return size
+
+
+class ReadingSession:
+    """1人分の出題と解答の状態"""
+
+    __slots__ = ("session_id", "user_id", "question", "user_answers", "kind")
+
+    def __init__(
+        self,
+        session_id: str,
+        user_id: str,
+        question: ReadingQuestion,
+        user_answers: Optional[List[Optional[str]]] = None,
+        kind: str = DEFAULT_KIND,
+    ) -> None:
+        self.session_id = session_id
+        self.user_id = str(user_id)
+        self.question = question
+        self.user_answers: List[Optional[str]] = list(user_answers or [None] * len(QUESTION_NUMBERS))
+        self.kind = kind
+
+    @classmethod
+    def new(cls, user_id: str, question: ReadingQuestion, kind: str = DEFAULT_KIND) -> "ReadingSession":
+        """新しいセッション ID で作る（64ビットの乱数。custom_id に入る長さに抑える）"""
+        return cls(secrets.token_urlsafe(8), user_id, question, kind=kind)
+
+    def user_answer(self, number: int) -> Optional[str]:
+        """ユーザーの解答（未解答なら None）"""
+        return self.user_answers[number - 1]
+
+    def is_correct(self, number: int) -> bool:
+        """ユーザーの解答が正解か（未解答なら False）"""
+        return self.user_answers[number - 1] == self.question.answer(number)
+
+    def correct_count(self) -> int:
+        """正解した問題の数"""
+        return sum(1 for number in QUESTION_NUMBERS if self.is_correct(number))
+
+    def next_number(self) -> Optional[int]:
+        """次に解答する問題の番号（すべて解答済みなら None）"""
+        for number in QUESTION_NUMBERS:
+            if self.user_answers[number - 1] is None:
+                return number
+        return None
+
+    def record(self, number: int, key: str) -> bool:
+        """
+        解答を記録する
+
+        Returns:
+            記録したら True。解答済み・順番違い・選択肢にないキーなら False（多重クリックなど）
+        """
+        if number != self.next_number() or key not in self.question.choices(number):
+            return False
+        self.user_answers[number - 1] = key
+        return True
+
+    def to_json(self) -> str:
+        """DB に保存する状態（item_id も含める）"""
+        return json.dumps({
+            "question": self.question.model_dump(),
+            "item_id": self.question.item_id,
+            "user_answers": self.user_answers,
+            "kind": self.kind,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, session_id: str, user_id: str, state: str) -> "ReadingSession":
+        """
+        to_json で保存した状態から作る
+
+        Raises:
+            ValueError: 状態が読めないとき（pydantic の ValidationError を含む）
+        """
+        data = json.loads(state)
+        question = ReadingQuestion.model_validate(data["question"])
+        question.item_id = data.get("item_id")
+        return cls(session_id, user_id, question, data["user_answers"], kind=data.get("kind", DEFAULT_KIND))
+
+    def memory_bytes(self) -> int:
+        """
+        このセッションのおおよそのメモリ使用量（バイト）を返す
+
+        セッション本体・ID・解答のリストと、問題（pydantic モデルの属性 dict と文字列）を合算する。
+        ほかと共有している文字列も数えるため、上限寄りの値になる。
+        """
+        total = sys.getsizeof(self) + _deep_size(self.session_id) + _deep_size(self.user_id)
+        total += _deep_size(self.user_answers)
+        total += sys.getsizeof(self.question) + _deep_size(self.question.__dict__)
+        return total
+
+
+class ReadingSessionStore:
+    """
+    長文読解セッションの2段ストア
+
+    Usage:
+        store = get_reading_sessions()
+        session = await store.create(user_id, question)
+        session = await store.get(user_id, session_id)   # ボタンの custom_id から
+        await store.save(session)
+        await store.finish(session)
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float = READING_SESSION_TTL_SEC,
+        max_entries: int = READING_SESSION_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            ttl_sec: 最終アクセスからセッションが失効するまでの秒数（DB の行も同じ期限）
+            max_entries: メモリに保持するセッションの上限件数
+            clock: 現在時刻（秒）を返す関数（テスト用に差し替え可能）
+        """
+        self.ttl_sec = ttl_sec
+        self._registry = SessionRegistry(ttl_sec=ttl_sec, max_entries=max_entries, clock=clock)
+
+    def __len__(self) -> int:
+        return len(self._registry)
+
+    def lock(self, user_id: str):
+        """ユーザー単位のロック（多重クリック防止）"""
+        return self._registry.lock(user_id, MODULE)
+
+    async def create(self, user_id: str, question: ReadingQuestion, kind: str = DEFAULT_KIND) -> ReadingSession:
+        """新しいセッションを作って保存する（同じユーザーの前のセッションは置き換える）"""
+        session = ReadingSession.new(user_id, question, kind=kind)
+        await self.save(session)
+        get_metrics().inc("reading_sessions.created")
+        return session
+
+    async def get(self, user_id: str, session_id: str) -> Optional[ReadingSession]:
+        """
+        セッションを探す（メモリ → DB。DB で見つかればメモリにも載せる）
+
+        Returns:
+            セッション。失効済み・置き換え済み・別のユーザーのものなら None
+        """
+        session = self._registry.get(user_id, MODULE)
+        if session is not None and session.session_id == session_id:
+            return session
+
+        # 直前に書いた行を読むため、レプリカではなくプライマリから読む（遅延で「期限切れ」にしない）
+        metrics = get_metrics()
+        try:
+            async with get_db_manager().acquire(site="reading_sessions.get") as conn:
+                row = await run_query(conn, "fetchrow", "reading_session.get", session_id, str(user_id))
+        except Exception as e:
+            metrics.inc("reading_sessions.errors")
+            logger.warning(f"長文読解セッションの読み取りに失敗しました: {e}")
+            return None
+        if row is None:
+            metrics.inc("reading_sessions.misses")
+            return None
+
+        try:
+            session = ReadingSession.from_json(session_id, user_id, row["state"])
+        except (ValueError, KeyError, TypeError) as e:
+            metrics.inc("reading_sessions.errors")
+            logger.warning(f"長文読解セッションの内容を読めません: {e}")
+            return None
+        metrics.inc("reading_sessions.restored")
+        self._registry.put(user_id, MODULE, session)
+        return session
+
+    async def save(self, session: ReadingSession) -> None:
+        """メモリと DB に保存する（DB の期限も延長する）"""
+        self._registry.put(session.user_id, MODULE, session)
+        try:
+            async with get_db_manager().acquire(site="reading_sessions.save") as conn:
+                await run_query(
+                    conn, "execute", "reading_session.put",
+                    session.session_id, session.user_id, session.to_json(), self.ttl_sec,
+                )
+        except Exception as e:
+            get_metrics().inc("reading_sessions.errors")
+            logger.warning(f"長文読解セッションの書き込みに失敗しました（メモリだけで続けます）: {e}")
+
+    async def finish(self, session: ReadingSession) -> None:
+        """セッションを終える（メモリと DB から削除する）"""
+        current = self._registry.get(session.user_id, MODULE)
+        if current is not None and current.session_id == session.session_id:
+            self._registry.pop(session.user_id, MODULE)
+        try:
+            async with get_db_manager().acquire(site="reading_sessions.finish") as conn:
+                await run_query(conn, "execute", "reading_session.delete", session.session_id)
+        except Exception as e:
+            get_metrics().inc("reading_sessions.errors")
+            logger.warning(f"長文読解セッションの削除に失敗しました（期限で消えます）: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す（セッションあたりのメモリ使用量を含む）"""
+        sessions = self._registry.values()
+        memory = sum(s.memory_bytes() for s in sessions)
+        stats = self._registry.stats()
+        stats["memory_bytes"] = memory
+        stats["bytes_per_session"] = memory // len(sessions) if sessions else 0
+        return stats
+
+
+# グローバルインスタンス
+_reading_sessions: Optional[ReadingSessionStore] = None
+
+
+def get_reading_sessions() -> ReadingSessionStore:
+    """
+    グローバルなReadingSessionStoreインスタンスを取得する
+
+    初回作成時にメトリクス（"reading_sessions.*"）へ統計を登録する。
+    """
+    global _reading_sessions
+    if _reading_sessions is None:
+        _reading_sessions = ReadingSessionStore()
+        get_metrics().register_source("reading_sessions", _reading_sessions.stats)
+    return _reading_sessions
+
+
+__all__ = [
+    'ReadingSession', 'ReadingSessionStore', 'get_reading_sessions',
+    'answer_custom_id', 'parse_answer_custom_id', 'ANSWER_PREFIX',
+]
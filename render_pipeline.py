@@ -0,0 +1,123 @@
+"""
+1回のクリックで出すメッセージの変更をまとめて送る（インタラクションごとの描画パイプライン）
+
+ハンドラーは Discord を直接呼ばずに update(embed=..., view=...) で変更を積み、最後に1回だけ送ります。
+
+- 結果が RENDER_DEFER_AFTER_SEC 以内にそろえば、インタラクションの応答（response.edit_message）1回で済む
+- 間に合わなければその時点で defer（3秒の応答期限を守る）し、最後に edit_original_response を1回送る
+- 変更がなければ defer だけ返す（多重クリックを捨てるときなど）
+
+以前の英単語の「覚えた」は defer → ボタンの無効化 → 次のカード、の3回でした。
+送った回数は calls（メトリクス render.api_calls）で数えます。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Dict, Optional
+
+import discord
+
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.render_pipeline')
+
+# この秒数までに結果がそろわなければ先に defer する（Discord の応答期限は3秒）
+RENDER_DEFER_AFTER_SEC = float(os.getenv("RENDER_DEFER_AFTER_SEC", "2.0"))
+
+
+class RenderPipeline:
+    """
+    1つのインタラクションへの表示の変更を集め、まとめて1回で送る
+
+    Usage:
+        async with RenderPipeline(interaction) as render:
+            render.update(view=disabled_view)            # 途中の変更は送らずに上書きされる
+            render.update(embed=next_card, view=card_view)
+        # ここで edit_message（間に合わなければ defer + edit_original_response）を1回だけ送る
+    """
+
+    def __init__(self, interaction: discord.Interaction, defer_after_sec: float = RENDER_DEFER_AFTER_SEC) -> None:
+        """
+        Args:
+            interaction: 応答するインタラクション（クリックされたメッセージを編集する）
+            defer_after_sec: 結果を待たずに defer するまでの秒数
+        """
+        self.interaction = interaction
+        self.defer_after_sec = defer_after_sec
+        # Discord へ送った回数（defer / 編集 / メッセージ）
+        self.calls: int = 0
+        self.deferred: bool = False
+        self._fields: Dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "RenderPipeline":
+        self._timer = asyncio.get_running_loop().create_task(self._defer_later())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # 例外のときは積んだ変更を捨てる（エラーの応答は呼び出し側・ルーターが返す）
+        async with self._lock:
+            self._timer.cancel()
+            if exc_type is None:
+                await self._flush()
+
+    def update(self, **fields: Any) -> None:
+        """次に送る変更を積む（message.edit の引数。同じ項目はあとから積んだものが勝つ）"""
+        self._fields.update(fields)
+
+    async def flush(self) -> None:
+        """積んだ変更をすぐに送る（per-user ロックの中で送りたいときなど）"""
+        async with self._lock:
+            await self._flush()
+
+    async def notify(self, content: str) -> None:
+        """
+        本人だけに見えるメッセージを送る
+
+        まだ応答しておらず積んだ変更もなければ、応答そのもの（send_message）で送るので1回で済む。
+        """
+        async with self._lock:
+            if not self._fields and not self.interaction.response.is_done():
+                await self._call(self.interaction.response.send_message(content, ephemeral=True))
+                return
+            await self._flush()
+            await self._call(self.interaction.followup.send(content, ephemeral=True))
+
+    async def _defer_later(self) -> None:
+        await asyncio.sleep(self.defer_after_sec)
+        async with self._lock:
+            if not self.interaction.response.is_done():
+                await self._call(self.interaction.response.defer())
+                self.deferred = True
+                get_metrics().inc("render.deferred")
+
+    async def _flush(self) -> None:
+        fields, self._fields = self._fields, {}
+        response = self.interaction.response
+        if not response.is_done():
+            if fields:
+                await self._call(response.edit_message(**fields))
+            else:
+                await self._call(response.defer())
+        elif fields:
+            # defer 済みなら元のメッセージを webhook で、ほかの応答（エラーの通知など）が先なら直接編集する
+            if self.deferred:
+                await self._call(self.interaction.edit_original_response(**fields))
+            elif self.interaction.message is not None:
+                await self._call(self.interaction.message.edit(**fields))
+
+    async def _call(self, request: Awaitable[Any]) -> None:
+        self.calls += 1
+        metrics = get_metrics()
+        metrics.inc("render.api_calls")
+        try:
+            await request
+        except discord.HTTPException as e:
+            metrics.inc("render.errors")
+            logger.warning(f"表示の更新に失敗しました (HTTP {e.status}): {e.text}")
+
+
+__all__ = ['RenderPipeline', 'RENDER_DEFER_AFTER_SEC']
@@ -0,0 +1,75 @@
+"""
+「今日の復習」キュー（英単語）
+
+srs_state から next_review が基準日以前のカードを next_review 順に取り出します。
+
+- 部分インデックス idx_srs_state_due (user_id, next_review, word_id) を前提にしている
+- ページングは OFFSET ではなく (next_review, word_id) のキーセットで行う
+  （解答で next_review が更新されても、同じカードの重複や取りこぼしが起きない）
+- 件数は同じインデックスの index-only scan で数える
+
+SQL は db.QUERIES の "review.*"（接続ごとに prepare 済み）。
+基準日は update_srs と揃えるため Python 側の date.today() を渡す。
+解答は srs_buffer で遅れて書き込まれるため、呼び出し側は接続を取る前に srs_buffer.sync_srs_user() を待つこと
+（待たないと、直前に解答したカードが古い next_review のまま数えられる）。
+"""
+from __future__ import annotations
+
+import datetime
+from typing import Any, List, Optional, Tuple
+
+from db import run_query
+
+# (next_review, word_id)
+DueCursor = Tuple[datetime.date, int]
+
+DEFAULT_PAGE_SIZE = 10
+
+
+async def count_due(conn: Any, user_id: str, today: Optional[datetime.date] = None) -> int:
+    """
+    復習期限が来ているカードの枚数を返す
+
+    Args:
+        conn: asyncpg の接続
+        user_id: ユーザーID
+        today: 基準日（デフォルト: date.today()）
+    """
+    return int(await run_query(conn, "fetchval", "review.due_count", str(user_id), today or datetime.date.today()))
+
+
+async def fetch_due_page(
+    conn: Any,
+    user_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[DueCursor] = None,
+    today: Optional[datetime.date] = None,
+) -> Tuple[List[int], Optional[DueCursor]]:
+    """
+    復習期限が来ているカードを next_review 順に1ページ分取得する
+
+    Args:
+        conn: asyncpg の接続
+        user_id: ユーザーID
+        limit: 1ページの件数
+        after: 前のページが返したカーソル（None なら先頭から）
+        today: 基準日（デフォルト: date.today()）
+
+    Returns:
+        (word_id のリスト, 次ページのカーソル)。次ページがなければカーソルは None
+    """
+    today = today or datetime.date.today()
+    if after is None:
+        rows = await run_query(conn, "fetch", "review.due_first_page", str(user_id), today, limit)
+    else:
+        rows = await run_query(conn, "fetch", "review.due_next_page", str(user_id), today, limit, after[0], after[1])
+
+    word_ids = [r["word_id"] for r in rows]
+    cursor: Optional[DueCursor] = None
+    if len(rows) == limit:
+        last = rows[-1]
+        cursor = (last["next_review"], last["word_id"])
+    return word_ids, cursor
+
+
+__all__ = ['DueCursor', 'count_due', 'fetch_due_page']
@@ -0,0 +1,230 @@
+"""
+ランダム出題用のIDサンプラー
+
+`ORDER BY random()` はテーブル全体をソートするため、行数に比例して遅くなります。
+ここでは ID だけをコンパクトな配列（array('i')）でメモリに保持し、
+k件の重複なしIDを O(k) で抽出してから `= ANY($1)` で必要な行だけを取得します。
+
+テーブルの変更は件数と最大IDのシグネチャで検知し、一定間隔で再読み込みします。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from array import array
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Union
+
+import asyncpg
+
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.sampler')
+
+DEFAULT_REFRESH_INTERVAL_SEC = 300
+
+
+def sample_distinct(ids: Sequence[int], k: int, rng: Optional[random.Random] = None) -> List[int]:
+    """
+    ID列から重複なしでk件をランダムに抽出する
+
+    k が全体に比べて小さい場合は棄却法で O(k)、大きい場合は random.sample を使う。
+
+    Args:
+        ids: 抽出元のID列
+        k: 抽出件数（全体より多い場合は全件をシャッフルして返す）
+        rng: 乱数生成器（テスト用。省略時はモジュールの random）
+
+    Returns:
+        抽出したIDのリスト（ランダム順）
+    """
+    r = rng or random
+    n = len(ids)
+    if k <= 0 or n == 0:
+        return []
+    if k >= n:
+        result = list(ids)
+        r.shuffle(result)
+        return result
+    if k * 4 > n:
+        return r.sample(list(ids), k)
+
+    picked: set[int] = set()
+    result = []
+    while len(result) < k:
+        pos = r.randrange(n)
+        if pos not in picked:
+            picked.add(pos)
+            result.append(ids[pos])
+    return result
+
+
+class IdSampler:
+    """
+    テーブルのIDを保持し、ランダム抽出を提供するクラス
+
+    Usage:
+        sampler = get_word_sampler()
+        async with db_manager.acquire() as conn:
+            rows = await sampler.sample_rows(conn, 10, "SELECT ... FROM words WHERE word_id = ANY($1::int[])")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        table: str,
+        id_column: str,
+        group_column: Optional[str] = None,
+        refresh_interval_sec: float = DEFAULT_REFRESH_INTERVAL_SEC,
+    ) -> None:
+        """
+        IdSamplerを初期化
+
+        Args:
+            name: メトリクス等に使う名前
+            table: 対象テーブル名（固定値のみ。ユーザー入力を渡さないこと）
+            id_column: IDカラム名
+            group_column: グループ分けするカラム名（例: svocm_items.pattern）
+            refresh_interval_sec: テーブル変更を確認する間隔（秒）
+        """
+        self.name: str = name
+        self.refresh_interval_sec: float = refresh_interval_sec
+        self._load_sql = (
+            f"SELECT {id_column}, {group_column} FROM {table}" if group_column
+            else f"SELECT {id_column} FROM {table}"
+        )
+        self._signature_sql = f"SELECT COUNT(*), COALESCE(MAX({id_column}), 0) FROM {table}"
+        self._has_group = group_column is not None
+        self._all: array = array('i')
+        self._groups: Dict[Hashable, array] = {}
+        self._signature: Optional[tuple[int, int]] = None
+        self._checked_at: float = float("-inf")
+        self._lock = asyncio.Lock()
+        self.reloads: int = 0
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def invalidate(self) -> None:
+        """次回の抽出時にシグネチャ確認を強制する"""
+        self._checked_at = float("-inf")
+
+    async def refresh(self, conn: asyncpg.Connection, force: bool = False) -> None:
+        """
+        必要に応じてIDを再読み込みする
+
+        Args:
+            conn: データベース接続
+            force: シグネチャが変わっていなくても読み込む場合はTrue
+        """
+        if not force and time.monotonic() - self._checked_at < self.refresh_interval_sec:
+            return
+        async with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.refresh_interval_sec:
+                return
+            row = await conn.fetchrow(self._signature_sql)
+            signature = (int(row[0]), int(row[1]))
+            if force or signature != self._signature:
+                rows = await conn.fetch(self._load_sql)
+                all_ids = array('i')
+                groups: Dict[Hashable, array] = {}
+                for r in rows:
+                    all_ids.append(r[0])
+                    if self._has_group:
+                        groups.setdefault(r[1], array('i')).append(r[0])
+                # 参照の差し替えのみで切り替える（抽出中の呼び出しに影響しない）
+                self._all, self._groups = all_ids, groups
+                self._signature = signature
+                self.reloads += 1
+                logger.info(f"IDサンプラーを再読み込み: {self.name} ({len(all_ids)}件)")
+            self._checked_at = time.monotonic()
+
+    async def sample(self, conn: asyncpg.Connection, k: int, group: Optional[Hashable] = None) -> List[int]:
+        """
+        重複なしのIDをk件抽出する
+
+        Args:
+            conn: データベース接続（再読み込みが必要な場合に使用）
+            k: 抽出件数
+            group: グループ（Noneなら全体から抽出）
+
+        Returns:
+            抽出したIDのリスト
+        """
+        await self.refresh(conn)
+        ids = self._all if group is None else self._groups.get(group, array('i'))
+        return sample_distinct(ids, k)
+
+    async def sample_rows(
+        self,
+        conn: asyncpg.Connection,
+        k: int,
+        fetch_sql: Union[str, Callable[[List[int]], Awaitable[Sequence[Any]]]],
+        group: Optional[Hashable] = None,
+    ) -> List[asyncpg.Record]:
+        """
+        IDを抽出して対応する行を取得する（抽出順を維持）
+
+        IDが削除済みで行が不足した場合は、再読み込みして1度だけやり直す。
+
+        Args:
+            conn: データベース接続
+            k: 抽出件数
+            fetch_sql: `$1` にID配列を受け取り、1列目にIDを返すSQL
+                （または ID配列を受け取って行を返す関数。例: カタログの名前付きクエリ）
+            group: グループ（Noneなら全体から抽出）
+
+        Returns:
+            取得した行のリスト
+        """
+        rows: List[Any] = []
+        for _ in range(2):
+            ids = await self.sample(conn, k, group)
+            if not ids:
+                return []
+            if callable(fetch_sql):
+                fetched = await fetch_sql(ids)
+            else:
+                fetched = await conn.fetch(fetch_sql, ids)
+            by_id = {r[0]: r for r in fetched}
+            rows = [by_id[i] for i in ids if i in by_id]
+            if len(rows) == len(ids):
+                break
+            logger.info(f"IDサンプラーの内容が古いため再読み込みします: {self.name}")
+            await self.refresh(conn, force=True)
+        return rows
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {
+            "ids": len(self._all),
+            "groups": len(self._groups),
+            "reloads": self.reloads,
+        }
+
+
+# グローバルインスタンス
+_word_sampler: Optional[IdSampler] = None
+_svocm_sampler: Optional[IdSampler] = None
+
+
+def get_word_sampler() -> IdSampler:
+    """words.word_id のサンプラーを取得する"""
+    global _word_sampler
+    if _word_sampler is None:
+        _word_sampler = IdSampler("words", "words", "word_id")
+        get_metrics().register_source("sampler.words", _word_sampler.stats)
+    return _word_sampler
+
+
+def get_svocm_sampler() -> IdSampler:
+    """svocm_items.item_id のサンプラー（pattern別）を取得する"""
+    global _svocm_sampler
+    if _svocm_sampler is None:
+        _svocm_sampler = IdSampler("svocm_items", "svocm_items", "item_id", group_column="pattern")
+        get_metrics().register_source("sampler.svocm", _svocm_sampler.stats)
+    return _svocm_sampler
+
+
+__all__ = ['IdSampler', 'sample_distinct', 'get_word_sampler', 'get_svocm_sampler']
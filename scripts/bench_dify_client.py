@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Dify 呼び出し1回あたりのHTTPオーバーヘッドを測るスクリプト
+
+ローカルに Dify の /workflows/run を真似たスタブサーバーを立て、
+- open() していない DifyClient（呼び出しごとに httpx.AsyncClient を作る）
+- open() した DifyClient（共有の HTTP クライアントで keep-alive 接続を使い回す）
+の2通りで DifyClient.run_workflow を繰り返し呼び、1回あたりの時間を比べます。
+--tls を付けると自己署名証明書で HTTPS のスタブを立て、TLS ハンドシェイクの分も含めて測ります。
+
+Usage:
+    python scripts/bench_dify_client.py [--calls 300] [--concurrency 1] [--tls] [--delay-ms 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from dify import DifyClient
+
+RESPONSE_BODY = json.dumps({"data": {"outputs": {"text": "{\"ok\": true}"}}}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/workflows/run の blocking 応答を返すスタブ（HTTP/1.1 keep-alive）"""
+
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書くため、Nagle と遅延ACKで 40 ms 待たされないようにする
+    disable_nagle_algorithm = True
+    delay_sec = 0.0
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.delay_sec:
+            time.sleep(self.delay_sec)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def _self_signed_cert(workdir: str) -> tuple:
+    cert = os.path.join(workdir, "cert.pem")
+    key = os.path.join(workdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def start_stub(tls: bool, delay_ms: float, workdir: str) -> str:
+    """スタブサーバーを別スレッドで起動し、エンドポイントURLを返す"""
+    StubHandler.delay_sec = delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    scheme = "http"
+    if tls:
+        cert, key = _self_signed_cert(workdir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        # httpx は SSL_CERT_FILE の証明書を信頼する
+        os.environ["SSL_CERT_FILE"] = cert
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"{scheme}://127.0.0.1:{server.server_address[1]}/v1/workflows/run"
+
+
+async def _run(client: DifyClient, calls: int, concurrency: int) -> list:
+    timings = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(calls):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        while not queue.empty():
+            i = queue.get_nowait()
+            started = time.perf_counter()
+            await client.run_workflow({"n": i}, "bench", api_key="app-bench")
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings
+
+
+def _report(label: str, timings: list) -> float:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    mean = statistics.fmean(timings)
+    print(f"  {label:<24} mean {mean:7.3f} ms / p50 {statistics.median(timings):7.3f} ms / p99 {p99:7.3f} ms")
+    return mean
+
+
+async def main(calls: int, concurrency: int, tls: bool, delay_ms: float) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        endpoint = start_stub(tls, delay_ms, workdir)
+        print(f"スタブ: {endpoint}（{calls}回、並列{concurrency}、応答遅延 {delay_ms:g} ms）")
+
+        client = DifyClient(endpoint=endpoint)
+
+        # ウォームアップ（import や SSL コンテキスト作成などの初回コストを除く）
+        await _run(client, 5, 1)
+        per_call = await _run(client, calls, concurrency)
+
+        async with client:
+            await _run(client, 5, 1)
+            shared = await _run(client, calls, concurrency)
+
+        before = _report("呼び出しごとに作成", per_call)
+        after = _report("共有クライアント", shared)
+        print(f"  1回あたりの短縮: {before - after:.3f} ms（{before / after:.1f}倍）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dify 呼び出しのHTTPオーバーヘッドを測る")
+    parser.add_argument("--calls", type=int, default=300, help="呼び出し回数")
+    parser.add_argument("--concurrency", type=int, default=1, help="並列数")
+    parser.add_argument("--tls", action="store_true", help="自己署名証明書の HTTPS スタブで測る")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="スタブの応答遅延（ミリ秒）")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency, args.tls, args.delay_ms))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Dify の outputs.text のデコード速度を比べるスクリプト
+
+- 旧実装: 先頭の ```json フェンスを外して json.loads（読めなければ raw_text のまま）
+- dify_payloads: JSON 部分の切り出し → orjson（または標準の json）→ 崩れていれば修復 → pydantic で検証
+
+出題・採点の出力（スタブと同じ問題）を、そのままの形と LLM によくある崩れ方（前後の説明文・
+末尾カンマ・スマートクォート）で用意し、1件あたりの時間と読めた割合を表示します。
+--file に実際に記録した outputs.text（1行1件の JSON 文字列）を渡すとそれも測ります。
+
+Usage:
+    python scripts/bench_dify_decode.py [--iterations 20000] [--file recorded.jsonl]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import dify_payloads
+from dify_payloads import PayloadError, decode_json, parse_reading_answer, parse_reading_question
+from scripts.dify_sse_stub import OUTPUT_TEXT, READING_ITEM
+
+ANSWER_ITEM = {
+    "questions": [
+        {"q1_reason": "The passage says many residents could not visit after work.", "feedback": "Correct!"},
+        {"q2_reason": "Applicants should have customer service experience.", "feedback": "Check the last paragraph."},
+    ],
+    "overall_feedback": "Good job. Pay attention to requirements listed near the end of notices.",
+}
+
+
+def _legacy_decode(text: str) -> dict:
+    """旧実装: コードフェンス（```json）を文字列操作で外してから json.loads で dict にする（型の検証はしない）"""
+    s = text.strip()
+    if s.startswith("```"):
+        s = s.lstrip("`")
+        if "\n" in s:
+            s = s.split("\n", 1)[1]
+        s = s.rstrip("`").rstrip()
+        if s.endswith("```"):
+            s = s[:-3].rstrip()
+    try:
+        return json.loads(s)
+    except json.JSONDecodeError:
+        return {"raw_text": text}
+
+
+def _payloads() -> dict:
+    answer_text = "```json\n" + json.dumps(ANSWER_ITEM, indent=2) + "\n```"
+    body = json.dumps(READING_ITEM, ensure_ascii=False, indent=2)
+    return {
+        "question/fenced": ("question", OUTPUT_TEXT),
+        "answer/fenced": ("answer", answer_text),
+        "question/prose": ("question", "Sure! Here is today's TOEIC passage:\n\n" + body + "\n\nGood luck!"),
+        "question/trailing_comma": ("question", body[:-2] + ",\n}"),
+        "question/smart_quotes": ("question", re.sub(r'"([^"]*)"', "“\\1”", body)),
+    }
+
+
+def _time_per_call(fn, text: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def _decodes(fn, text: str) -> bool:
+    try:
+        return "raw_text" not in fn(text)
+    except PayloadError:
+        return False
+
+
+def main(iterations: int, recorded: Path | None) -> None:
+    payloads = _payloads()
+    if recorded is not None:
+        for i, line in enumerate(recorded.read_text(encoding="utf-8").splitlines()):
+            if line.strip():
+                text = json.loads(line)
+                payloads[f"recorded/{i}"] = ("answer" if '"overall_feedback"' in text else "question", text)
+
+    parser = "orjson" if dify_payloads.orjson is not None else "json（orjson なし）"
+    print(f"📊 outputs.text のデコード（{iterations} 回の平均、パーサー: {parser}）")
+    print(f"  {'payload':<24} {'旧実装':>10} {'decode_json':>12} {'+検証':>10}  読めたか（旧 / 新）")
+    for label, (kind, text) in payloads.items():
+        parse = parse_reading_question if kind == "question" else parse_reading_answer
+        legacy_us = _time_per_call(_legacy_decode, text, iterations)
+        decode_us = _time_per_call(decode_json, text, iterations) if _decodes(decode_json, text) else float("nan")
+        try:
+            parse(text)
+            typed_us = _time_per_call(parse, text, iterations)
+            ok = "✅"
+        except PayloadError:
+            typed_us, ok = float("nan"), "❌"
+        legacy_ok = "✅" if _decodes(_legacy_decode, text) else "❌"
+        print(f"  {label:<24} {legacy_us:8.1f}µs {decode_us:10.1f}µs {typed_us:8.1f}µs  {legacy_ok} / {ok}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--file", type=Path, default=None, help="記録した outputs.text（1行1件の JSON 文字列）")
+    args = parser.parse_args()
+    main(args.iterations, args.file)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+長文読解セッション1件あたりのメモリを比べるスクリプト
+
+- 旧実装: セッションの dict + 問題ごとの ChoiceView（A〜D の Button）。ReadingCog._live_views が
+  View を持ち続け、discord.py の ViewStore にも送ったメッセージごとに登録される
+- reading_sessions: ReadingSession だけを ReadingSessionStore（上限・TTL 付き）に置き、
+  ボタンはルーター（interaction_router.py）で処理する（View は送る前に stop() して ViewStore に残さない）
+
+tracemalloc で N 件分を作ったときの増分を測り、ReadingSession.memory_bytes() の見積もりと並べます。
+出題は scripts/dify_standin.py の問題（本文 約600文字）を使います。
+
+Usage:
+    python scripts/bench_reading_sessions.py [--sessions 1000]
+"""
+
+import argparse
+import asyncio
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import discord
+
+from dify_payloads import ReadingQuestion
+from reading_sessions import ReadingSession, ReadingSessionStore
+from scripts.dify_standin import READING_ITEMS
+
+
+def _legacy_session(q: ReadingQuestion, user_id: int) -> tuple:
+    """旧実装: セッションを dict で持ち、Q1・Q2 ごとに A〜D の Button を載せた View（timeout 180秒）を作っていたもの"""
+    session = {
+        "passage": q.passage,
+        "q1_text": q.text(1), "q1_choices": q.choices(1), "q1_answer": q.answer(1), "q1_user": None,
+        "q2_text": q.text(2), "q2_choices": q.choices(2), "q2_answer": q.answer(2), "q2_user": None,
+        "author_id": user_id,
+    }
+    views = []
+    for number in (1, 2):
+        view = discord.ui.View(timeout=180)
+        view.session = session
+        view.number = number
+        view.on_done = lambda s, n=number: None
+        for key in session[f"q{number}_choices"]:
+            view.add_item(discord.ui.Button(label=key, style=discord.ButtonStyle.primary, custom_id=f"{number}:{key}"))
+        views.append(view)
+    return session, views
+
+
+def _measure(build, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(count)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+async def main(count: int) -> None:
+    q = ReadingQuestion.model_validate(READING_ITEMS[0])
+    store = ReadingSessionStore(max_entries=count)
+
+    def new_session(i: int) -> ReadingSession:
+        # 出題ごとに Dify / 作り置きから別々に読み込む想定で、問題もコピーする
+        session = ReadingSession.new(str(i), q.model_copy(deep=True))
+        store._registry.put(session.user_id, "reading", session)
+        return session
+
+    legacy = _measure(lambda i: _legacy_session(q.model_copy(deep=True), i), count)
+    current = _measure(new_session, count)
+    estimate = store.stats()["bytes_per_session"]
+
+    print(f"📊 長文読解セッション1件あたりのメモリ（{count} 件の平均、本文 {len(q.passage)} 文字）")
+    print(f"  旧実装（dict + ChoiceView x2）: {legacy / 1024:6.1f} KiB")
+    print(f"  ReadingSession（実測）        : {current / 1024:6.1f} KiB")
+    print(f"  ReadingSession.memory_bytes() : {estimate / 1024:6.1f} KiB（メトリクス reading_sessions.bytes_per_session）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+読み取りのレプリカ振り分けで primary の負荷がどれだけ減るかを測るスクリプト
+
+ボットの操作に近い読み書きの混合（単語カード・単語帳一覧・システム単語帳・単語帳への追加・
+復習枚数）を並列に流し、pg_stat_database の xact_commit の増分で primary / レプリカの
+トランザクション数を比べます。単語帳は検証用ユーザー（user_id が "__bench__" で始まる）に作り、
+終了時に削除します。
+
+DATABASE_URL（primary）と DATABASE_REPLICA_URL（スタンバイ）を設定して実行してください。
+
+Usage:
+    python scripts/bench_replica_routing.py [--requests 5000] [--concurrency 20] [--users 50]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# .envファイルを読み込む
+from dotenv import load_dotenv
+load_dotenv(project_root / ".env")
+
+import asyncpg
+
+from db import get_db_manager
+from metrics import get_metrics
+from review_queue import count_due
+from settings import get_settings
+
+USER_PREFIX = "__bench__"
+
+XACT_SQL = "SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()"
+
+NOTEBOOK_LIST_SQL = """
+    SELECT n.notebook_id, n.name, COUNT(nw.word_id) AS word_count
+    FROM vocabulary_notebooks n
+    LEFT JOIN notebook_words nw ON n.notebook_id = nw.notebook_id
+    WHERE n.user_id = $1 AND n.is_system = FALSE
+    GROUP BY n.notebook_id, n.name
+"""
+
+SYS_NOTEBOOKS_SQL = """
+    SELECT n.notebook_id, n.name, COUNT(snw.word_id) AS word_count
+    FROM vocabulary_notebooks n
+    LEFT JOIN system_notebook_words snw ON n.notebook_id = snw.notebook_id
+    WHERE n.is_system = TRUE
+    GROUP BY n.notebook_id, n.name
+"""
+
+ADD_WORD_SQL = """
+    INSERT INTO notebook_words (notebook_id, word_id)
+    SELECT notebook_id, $2 FROM vocabulary_notebooks WHERE user_id = $1
+    ON CONFLICT DO NOTHING
+"""
+
+
+async def _xact_commit(url: str) -> int:
+    # pg_stat_database は統計の取得ごとにスナップショットが変わるため、専用の接続で読む
+    conn = await asyncpg.connect(url)
+    try:
+        await conn.execute("SELECT pg_stat_clear_snapshot()")
+        return await conn.fetchval(XACT_SQL)
+    finally:
+        await conn.close()
+
+
+async def _one_request(db_manager, user_id: str, word_ids: list) -> None:
+    kind = random.random()
+    if kind < 0.30:
+        # 単語カード（10問スタート）
+        async with db_manager.acquire(site="bench.word_cards", readonly=True) as conn:
+            await db_manager.fetch("vocab.random_words", random.sample(word_ids, 10), conn=conn)
+    elif kind < 0.50:
+        # 単語帳一覧
+        async with db_manager.acquire(site="bench.notebook_list", readonly=True, user_id=user_id) as conn:
+            await conn.fetch(NOTEBOOK_LIST_SQL, user_id)
+    elif kind < 0.60:
+        # システム推奨単語帳
+        async with db_manager.acquire(site="bench.sys_notebooks", readonly=True) as conn:
+            await conn.fetch(SYS_NOTEBOOKS_SQL)
+    elif kind < 0.75:
+        # 単語帳への追加（書き込み → このユーザーの読み取りは sticky 期間 primary へ）
+        async with db_manager.acquire(site="bench.notebook_add", user_id=user_id) as conn:
+            await conn.execute(ADD_WORD_SQL, user_id, random.choice(word_ids))
+    else:
+        # 復習枚数（SRS は書き込みバッファと整合させるため primary で読む）
+        async with db_manager.acquire(site="bench.due_count") as conn:
+            await count_due(conn, user_id)
+
+
+async def main(requests: int, concurrency: int, users: int) -> None:
+    config = get_settings().database
+    if not config.replica_url:
+        print("❌ DATABASE_REPLICA_URL が設定されていません")
+        sys.exit(1)
+
+    db_manager = get_db_manager()
+    await db_manager.initialize()
+    user_ids = [f"{USER_PREFIX}{i}" for i in range(users)]
+    try:
+        async with db_manager.acquire() as conn:
+            word_ids = [r["word_id"] for r in await conn.fetch("SELECT word_id FROM words")]
+            await conn.executemany(
+                "INSERT INTO vocabulary_notebooks (user_id, name) VALUES ($1, 'bench')",
+                [(u,) for u in user_ids],
+            )
+        if not db_manager.replica_stats().get("healthy"):
+            print("⚠️ レプリカに接続できません（すべて primary で読み取ります）")
+
+        primary_before = await _xact_commit(config.url)
+        replica_before = await _xact_commit(config.replica_url)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(random.choice(user_ids))
+
+        async def worker() -> None:
+            while not queue.empty():
+                await _one_request(db_manager, queue.get_nowait(), word_ids)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        primary = await _xact_commit(config.url) - primary_before
+        replica = await _xact_commit(config.replica_url) - replica_before
+        metrics = get_metrics()
+        routed = {k: metrics.counter(f"db.route.{k}") for k in ("primary", "replica", "sticky", "fallback")}
+
+        print(f"\n{requests}リクエスト / 並列{concurrency} / {users}ユーザー: {elapsed:.2f}秒（{requests / elapsed:,.0f} req/s）")
+        print(f"  振り分け: primary {routed['primary']} / replica {routed['replica']}"
+              f"（うち自分の書き込みで primary: {routed['sticky']}、レプリカ停止で primary: {routed['fallback']}）")
+        print(f"  xact_commit 増分: primary {primary:,} / replica {replica:,}")
+        if primary + replica:
+            print(f"  primary から外れたトランザクション: {replica / (primary + replica):.0%}")
+        wait = metrics.histogram("db.acquire_wait_ms").summary()
+        print(f"  接続待ち: p50 {wait['p50']:.2f} ms / p99 {wait['p99']:.2f} ms")
+    finally:
+        async with db_manager.acquire() as conn:
+            await conn.execute("DELETE FROM vocabulary_notebooks WHERE user_id LIKE $1 || '%'", USER_PREFIX)
+        print("\n🧹 検証用データを削除しました")
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="読み取りのレプリカ振り分けの効果を測る")
+    parser.add_argument("--requests", type=int, default=5000, help="リクエスト数")
+    parser.add_argument("--concurrency", type=int, default=20, help="並列数")
+    parser.add_argument("--users", type=int, default=50, help="検証用ユーザー数")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.users))
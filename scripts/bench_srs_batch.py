@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+SRS更新のスカラー版（update_srs）とベクトル版（update_srs_batch）を比較するスクリプト
+
+ランダムなSRS状態を 10^3〜10^7 件生成し、それぞれの処理時間と1件あたりの時間を表示します。
+両者の結果が一致することも確認します。DB接続は不要です（NumPy が必要）。
+
+スカラー版は 10^7 件で数十秒かかるため、--scalar-limit を超える件数では省略できます。
+
+Usage:
+    python scripts/bench_srs_batch.py [--max-exp 7] [--scalar-limit 10000000]
+"""
+
+import argparse
+import datetime
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from srs import update_srs, update_srs_batch
+
+
+def _random_states(n: int, rng: np.random.Generator):
+    easiness = np.round(rng.uniform(1.3, 3.0, n), 2)
+    interval_days = rng.integers(0, 365, n).astype(np.float64)
+    consecutive_correct = rng.integers(0, 10, n)
+    q = rng.choice(np.array([2, 5]), n)
+    return easiness, interval_days, consecutive_correct, q
+
+
+def _run_scalar(easiness, interval_days, consecutive_correct, q):
+    # 実際のバックフィルと同じく、Pythonの値に変換してから1件ずつ処理する
+    rows = zip(easiness.tolist(), interval_days.tolist(), consecutive_correct.tolist(), q.tolist())
+    return [update_srs(e, i, c, qq) for e, i, c, qq in rows]
+
+
+def _check(scalar, batch, sample: int = 10_000) -> None:
+    be, bi, bc, bnext = batch
+    for k in range(0, len(scalar), max(1, len(scalar) // sample)):
+        e, i, c, next_review = scalar[k]
+        if (be[k], bi[k], bc[k], bnext[k].astype(datetime.date)) != (e, i, c, next_review):
+            raise AssertionError(f"結果が一致しません (index={k}): {scalar[k]}")
+
+
+def main(max_exp: int, scalar_limit: int) -> None:
+    rng = np.random.default_rng(0)
+    print(f"{'件数':>10}  {'スカラー':>12}  {'ベクトル':>12}  {'ns/件(S)':>9}  {'ns/件(V)':>9}  {'倍率':>7}")
+
+    for exp in range(3, max_exp + 1):
+        n = 10 ** exp
+        states = _random_states(n, rng)
+
+        t0 = time.perf_counter()
+        batch = update_srs_batch(*states)
+        vector_sec = time.perf_counter() - t0
+
+        if n <= scalar_limit:
+            t0 = time.perf_counter()
+            scalar = _run_scalar(*states)
+            scalar_sec = time.perf_counter() - t0
+            _check(scalar, batch)
+            print(
+                f"{n:>10,}  {scalar_sec * 1000:>10.1f}ms  {vector_sec * 1000:>10.1f}ms  "
+                f"{scalar_sec / n * 1e9:>9.0f}  {vector_sec / n * 1e9:>9.1f}  {scalar_sec / vector_sec:>6.0f}x"
+            )
+        else:
+            print(
+                f"{n:>10,}  {'-':>12}  {vector_sec * 1000:>10.1f}ms  "
+                f"{'-':>9}  {vector_sec / n * 1e9:>9.1f}  {'-':>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="update_srs / update_srs_batch のベンチマーク")
+    parser.add_argument("--max-exp", type=int, default=7, help="最大件数の指数（10^N、デフォルト: 7）")
+    parser.add_argument(
+        "--scalar-limit", type=int, default=10 ** 7,
+        help="スカラー版を計測する最大件数（デフォルト: 10000000）"
+    )
+    args = parser.parse_args()
+    main(args.max_exp, args.scalar_limit)
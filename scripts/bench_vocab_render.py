@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+英単語10問セッション1回あたりの Discord API 呼び出し回数を比べるスクリプト
+
+- 旧実装: 「10問」も「覚えた」も defer → ボタンの無効化（または見出し）の編集 → カードの編集、の3回
+- render_pipeline: 1回のクリックの変更をまとめ、response.edit_message 1回で応答する
+  （RENDER_DEFER_AFTER_SEC までに間に合わなければ defer + edit_original_response の2回）
+
+Discord は呼ばずに、呼び出しを数えるだけのインタラクションで Vocab の「10問」と「覚えた」x10 を実行します。
+DB と SRS バッファも呼び出しを捨てる代わりのもので置き換えます（数えるのは Discord の呼び出しだけ）。
+--latency-ms を指定すると、API 1回あたりの往復時間から、クリックして次のカードが表示されるまでの目安も出します。
+
+Usage:
+    python scripts/bench_vocab_render.py [--latency-ms 120]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import discord
+
+import cogs.vocab as vocab
+from cogs.vocab import SESSION_SIZE, VocabAnswerButton, VocabSessionView
+from metrics import get_metrics
+from word_catalog import WordRecord, get_word_catalog
+
+
+class _Response:
+    def __init__(self, owner: "CountingInteraction") -> None:
+        self.owner = owner
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def defer(self, **kwargs) -> None:
+        await self.owner.call("defer")
+        self.done = True
+
+    async def edit_message(self, **kwargs) -> None:
+        await self.owner.call("edit_message")
+        self.done = True
+
+    async def send_message(self, *args, **kwargs) -> None:
+        await self.owner.call("send_message")
+        self.done = True
+
+
+class CountingInteraction:
+    """Discord の呼び出しを数えるだけのインタラクション（1回ごとに latency 秒待つ）"""
+
+    def __init__(self, user_id: int, custom_id: str, latency: float) -> None:
+        self.user = discord.Object(id=user_id)
+        self.data = {"custom_id": custom_id}
+        self.latency = latency
+        self.calls: list[str] = []
+        self.response = _Response(self)
+        self.message = None
+
+    async def call(self, name: str) -> None:
+        self.calls.append(name)
+        await asyncio.sleep(self.latency)
+
+    async def edit_original_response(self, **kwargs) -> None:
+        await self.call("edit_original_response")
+
+
+class _NullDB:
+    async def execute(self, *args, **kwargs) -> None:
+        return None
+
+
+class _NullSrsBuffer:
+    async def answer(self, *args, **kwargs) -> None:
+        return None
+
+
+async def _legacy_session(items: list[dict], latency: float) -> list[CountingInteraction]:
+    """旧実装の呼び出し順: クリックごとに defer → ボタンの無効化（「10問」では見出し）の編集 → カードの編集"""
+    clicks = []
+
+    async def edit(interaction: CountingInteraction) -> None:
+        # ErrorHandler.safe_edit_message: defer 済みなら edit_original_response
+        if interaction.response.is_done():
+            await interaction.edit_original_response()
+        else:
+            await interaction.response.edit_message()
+
+    start = CountingInteraction(1, "vocab:ten", latency)
+    await start.response.defer()
+    await edit(start)   # 「英単語 10問」の見出し
+    await edit(start)   # 1問目
+    clicks.append(start)
+    for w in items:
+        click = CountingInteraction(1, f"vocab:known:{w['word_id']}", latency)
+        await click.response.defer()
+        await edit(click)   # _disable_current_buttons
+        await edit(click)   # send_current（次のカード / 完了）
+        clicks.append(click)
+    return clicks
+
+
+async def _pipeline_session(latency: float) -> list[CountingInteraction]:
+    cog = vocab.Vocab(bot=None)
+    start = CountingInteraction(1, "vocab:ten", latency)
+    await cog.start_ten(start)
+    clicks = [start]
+    view = vocab.get_session_registry().get("1", VocabSessionView.MODULE)
+    while view is not None and not view.finished:
+        word_id = view.current_word_id()
+        click = CountingInteraction(1, f"vocab:known:{word_id}", latency)
+        await cog.handle_answer(click, VocabAnswerButton.__discord_ui_compiled_template__.fullmatch(click.data["custom_id"]))
+        clicks.append(click)
+    return clicks
+
+
+def _first_display_ms(click: CountingInteraction, latency: float) -> float:
+    """次のカードが表示される編集が終わるまでの呼び出し回数 x 往復時間"""
+    last_edit = max(i for i, name in enumerate(click.calls) if name != "defer")
+    return (last_edit + 1) * latency * 1000
+
+
+async def main(latency_ms: float) -> None:
+    latency = latency_ms / 1000
+    records = [
+        WordRecord(i, f"word{i}", f"意味{i}", "noun", 1, f"example {i}", f"例文{i}", ("syn",), ("der",))
+        for i in range(1, 101)
+    ]
+    get_word_catalog().replace(records)
+    vocab.get_db_manager = lambda: _NullDB()
+    vocab.get_srs_buffer = lambda: _NullSrsBuffer()
+    items = [r.to_dict() for r in records[:SESSION_SIZE]]
+
+    legacy = await _legacy_session(items, latency)
+    current = await _pipeline_session(latency)
+
+    print(f"📊 英単語 10問セッション1回あたりの Discord API 呼び出し（「10問」+「覚えた」x{SESSION_SIZE}）")
+    for label, clicks in (("旧実装", legacy), ("render_pipeline", current)):
+        total = sum(len(c.calls) for c in clicks)
+        per_click = total / len(clicks)
+        line = f"  {label:<16}: {total:3d} 回（1クリック {per_click:.1f} 回）"
+        if latency:
+            shown = sum(_first_display_ms(c, latency) for c in clicks[1:]) / (len(clicks) - 1)
+            line += f" / 「覚えた」から次のカードまで {shown:.0f} ms"
+        print(line)
+    hist = get_metrics().histogram("vocab.api_calls_per_session")
+    print(f"  メトリクス vocab.api_calls_per_session: {hist.max:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=120.0, help="API 1回あたりの往復時間（ミリ秒）")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms))
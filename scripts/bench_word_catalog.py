@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+語彙カタログのメモリ使用量と、単語カード描画レイテンシを計測するスクリプト
+
+- カタログあり: メモリ上のIDから抽出 → WordRecord → Embed 作成
+- カタログなし: IDサンプラー → `word_id = ANY($1)` で取得 → Embed 作成
+
+どちらも 10 問分のカードを作る時間を1回として、p50 / p99 を表示します。
+
+Usage:
+    python scripts/bench_word_catalog.py [回数]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# .envファイルを読み込む
+from dotenv import load_dotenv
+load_dotenv(project_root / ".env")
+
+from cogs.vocab import SESSION_SIZE, card_embed
+from db import QUERIES, get_db_manager
+from sampler import get_word_sampler, sample_distinct
+from word_catalog import get_word_catalog
+
+FETCH_SQL = QUERIES["vocab.random_words"]
+
+
+def _percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _report(label: str, samples: list[float]) -> None:
+    ms = [s * 1000 for s in samples]
+    print(
+        f"  {label:<12} p50={_percentile(ms, 0.50):7.3f} ms  "
+        f"p99={_percentile(ms, 0.99):7.3f} ms  mean={statistics.mean(ms):7.3f} ms"
+    )
+
+
+async def main(iterations: int) -> None:
+    db_manager = get_db_manager()
+    await db_manager.initialize()
+    catalog = get_word_catalog()
+    sampler = get_word_sampler()
+
+    try:
+        async with db_manager.acquire() as conn:
+            await catalog.load(conn)
+            await sampler.refresh(conn, force=True)
+
+        print(f"📊 語彙カタログ: {len(catalog)}語 / {catalog.memory_bytes() / 1024:.1f} KiB")
+        print(f"⏱  {SESSION_SIZE}問分のカード作成 × {iterations}回")
+
+        with_catalog: list[float] = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            for n, i in enumerate(sample_distinct(catalog.ids, SESSION_SIZE), start=1):
+                card_embed(catalog.get(i).to_dict(), n)
+            with_catalog.append(time.perf_counter() - t0)
+
+        without_catalog: list[float] = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            async with db_manager.acquire() as conn:
+                rows = await sampler.sample_rows(conn, SESSION_SIZE, FETCH_SQL)
+            for n, r in enumerate(rows, start=1):
+                card_embed(dict(r), n)
+            without_catalog.append(time.perf_counter() - t0)
+
+        _report("カタログあり", with_catalog)
+        _report("カタログなし", without_catalog)
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
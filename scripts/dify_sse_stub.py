@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Dify /workflows/run のローカルスタブ（blocking / streaming 両対応）で、本文が見えるまでの時間を比べる
+
+長文読解の出題結果（JSON テキスト）を、streaming モードでは text_chunk イベントとして
+少しずつ server-sent events で返し、blocking モードでは生成し終わるまで待ってからまとめて返します。
+実際の Dify と同じく、最後に workflow_finished の outputs.text で全文を返します。
+サーバーは scripts/dify_standin.py（エラー・崩れた出力・記録と再生はそちらのオプションで）です。
+
+- --serve: スタブを起動したままにする（DIFY_ENDPOINT_RUN をこのURLにしてボットを動かせる）
+- 引数なし: blocking と streaming で「本文が最初に見えるまで」と「全体」の時間を DifyClient で測る
+
+Usage:
+    python scripts/dify_sse_stub.py [--calls 5] [--chunk-chars 12] [--chunk-delay-ms 40]
+    python scripts/dify_sse_stub.py --serve [--port 8801]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from dify import DifyClient
+from scripts.dify_standin import READING_ITEMS, StandinConfig, fenced, start_standin
+
+READING_ITEM = READING_ITEMS[0]
+OUTPUT_TEXT = fenced(READING_ITEM)
+
+
+def start_stub(port: int, chunk_chars: int, chunk_delay_ms: float) -> tuple:
+    """スタブサーバー（dify_standin）を別スレッドで起動し、(サーバー, エンドポイントURL) を返す"""
+    chunks = -(-len(OUTPUT_TEXT) // chunk_chars)
+    config = StandinConfig(
+        latency=f"fixed:{chunk_delay_ms * chunks}", chunk_chars=chunk_chars, items=[READING_ITEM],
+    )
+    return start_standin(config, port)
+
+
+async def measure(endpoint: str, calls: int) -> None:
+    async with DifyClient(question_key="app-stub", endpoint=endpoint) as client:
+        blocking, first, streaming, updates = [], [], [], []
+        for _ in range(calls):
+            started = time.perf_counter()
+            await client.reading_question(user_id="stub")
+            blocking.append((time.perf_counter() - started) * 1000)
+
+            seen = []
+            started = time.perf_counter()
+
+            def on_passage(text: str) -> None:
+                seen.append((time.perf_counter() - started) * 1000)
+
+            q = await client.reading_question(user_id="stub", on_passage=on_passage)
+            streaming.append((time.perf_counter() - started) * 1000)
+            assert q.model_dump() == READING_ITEM
+            first.append(seen[0])
+            updates.append(len(seen))
+
+    print(f"  blocking:  本文が見えるまで {statistics.median(blocking):7.1f} ms（= 全体）")
+    print(f"  streaming: 本文が見えるまで {statistics.median(first):7.1f} ms / 全体 {statistics.median(streaming):7.1f} ms"
+          f"（本文の更新 {statistics.median(updates):.0f} 回）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dify /workflows/run のローカルスタブ（SSE）")
+    parser.add_argument("--serve", action="store_true", help="スタブを起動したままにする")
+    parser.add_argument("--port", type=int, default=0, help="待ち受けポート（0 で空いているポート）")
+    parser.add_argument("--calls", type=int, default=5, help="計測の回数")
+    parser.add_argument("--chunk-chars", type=int, default=12, help="text_chunk 1つあたりの文字数")
+    parser.add_argument("--chunk-delay-ms", type=float, default=40.0, help="text_chunk の間隔（ミリ秒）")
+    args = parser.parse_args()
+
+    server, endpoint = start_stub(args.port, args.chunk_chars, args.chunk_delay_ms)
+    if args.serve:
+        print(f"スタブ: {endpoint}（Ctrl+C で終了）")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(f"スタブ: {endpoint}（text_chunk {args.chunk_chars}文字 / {args.chunk_delay_ms:g} ms 間隔）")
+        asyncio.run(measure(endpoint, args.calls))
+    server.shutdown()
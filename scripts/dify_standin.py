@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+ローカルの Dify 代替サーバー（開発・負荷試験用）
+
+/v1/workflows/run を blocking / streaming の両方で実装し、出題（Winglish_reading_Question）と
+採点（Winglish_reading_Answer）のワークフローを真似ます。ボットの DIFY_ENDPOINT_RUN をこのサーバーに
+向ければ、本物の Dify なしで dify.py と ReadingCog を動かせます（API キーは何でも受け付けます）。
+
+- 出題: 用意した問題（または --replay の記録）を順番に返す
+- 採点: 入力の正解・ユーザーの解答から解説を組み立てて返す
+- --latency: 1回の生成にかかる時間の分布（streaming では text_chunk に均等に割り振る）
+- --error-rate: HTTP 500（streaming では途中の error イベント）を返す割合
+- --malformed-rate: 出力を崩す割合（前後の説明文・末尾カンマ・スマートクォート・途中で切れた JSON）
+- --record FILE --upstream URL: 本物の Dify に中継し、応答を1行1件の JSON で記録する
+- --replay FILE: 記録した応答（と所要時間）を返す
+- GET /stats: ワークフローごとの回数・エラー・崩した出力の数
+
+どちらのワークフローかは inputs で見分けます（採点は "Question" を持つ）。
+
+Usage:
+    python scripts/dify_standin.py [--port 8801] [--latency lognormal:3000,0.4] [--error-rate 0.05]
+    python scripts/dify_standin.py --record recorded.jsonl --upstream https://api.dify.ai/v1/workflows/run
+    python scripts/dify_standin.py --replay recorded.jsonl
+    # 別のターミナルで DIFY_ENDPOINT_RUN=http://127.0.0.1:8801/v1/workflows/run としてボットを起動
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+QUESTION = "question"
+ANSWER = "answer"
+
+READING_ITEMS = [
+    {
+        "passage": (
+            "Harbor City Library will extend its opening hours starting next month. "
+            "From Monday to Friday, the main branch will stay open until 9 P.M., two hours later than now. "
+            "The change follows a survey in which many residents said they could not visit after work. "
+            "To cover the longer hours, the library is hiring three part-time staff members. "
+            "Applicants should have customer service experience and be available on weekday evenings. "
+            "Application forms can be picked up at the front desk or downloaded from the library website."
+        ),
+        "question_1_text": "Why is the library changing its hours?",
+        "question_1_choice_A": "To save on energy costs",
+        "question_1_choice_B": "Because residents asked for later hours",
+        "question_1_choice_C": "Because a new branch is opening",
+        "question_1_choice_D": "To hold evening events",
+        "question_1_answer": "B",
+        "question_2_text": "What is required of applicants?",
+        "question_2_choice_A": "A library science degree",
+        "question_2_choice_B": "Availability on weekends",
+        "question_2_choice_C": "Customer service experience",
+        "question_2_choice_D": "A recommendation letter",
+        "question_2_answer": "C",
+    },
+    {
+        "passage": (
+            "To all employees: the third-floor break room will be closed from June 3 to June 7 for renovation. "
+            "During this period, please use the lounge on the second floor. "
+            "The new break room will have a larger refrigerator, two additional microwaves and more seating. "
+            "Please remove any personal items from the refrigerator by the end of the day on June 2. "
+            "Items left after that will be discarded. Thank you for your cooperation."
+        ),
+        "question_1_text": "What is the purpose of the notice?",
+        "question_1_choice_A": "To announce a temporary closure",
+        "question_1_choice_B": "To introduce a new employee",
+        "question_1_choice_C": "To request volunteers",
+        "question_1_choice_D": "To change office hours",
+        "question_1_answer": "A",
+        "question_2_text": "What are employees asked to do by June 2?",
+        "question_2_choice_A": "Move to the second floor",
+        "question_2_choice_B": "Buy a new refrigerator",
+        "question_2_choice_C": "Take their belongings out of the refrigerator",
+        "question_2_choice_D": "Sign up for a renovation survey",
+        "question_2_answer": "C",
+    },
+]
+
+
+def fenced(payload: dict) -> str:
+    """Dify の LLM ノードが返すのと同じ ```json フェンス付きのテキストにする"""
+    return "```json\n" + json.dumps(payload, ensure_ascii=False, indent=2) + "\n```"
+
+
+def answer_text(inputs: dict) -> str:
+    """採点の inputs（正解・ユーザーの解答）から解説のテキストを組み立てる"""
+    questions = []
+    correct = 0
+    for n in (1, 2):
+        answer = inputs.get(f"question_{n}_Answer", "")
+        user = inputs.get(f"question_{n}_User_Answer", "")
+        correct += answer == user
+        questions.append({
+            f"q{n}_reason": f"The correct answer is {answer}. The passage states it directly.",
+            "feedback": "Correct!" if answer == user else f"You chose {user}. Re-read the sentence that supports {answer}.",
+        })
+    return fenced({"questions": questions, "overall_feedback": f"You got {correct} out of 2 correct."})
+
+
+# ===== 所要時間の分布 =====
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    所要時間の分布（ミリ秒）を読む
+
+    - "fixed:MS"
+    - "uniform:MIN_MS,MAX_MS"
+    - "lognormal:MEDIAN_MS,SIGMA"（LLM の生成時間に近い右に裾の長い分布）
+
+    Returns:
+        乱数生成器を受け取って秒を返す関数
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"latency の指定が不正です: {spec!r}（fixed:MS / uniform:MIN,MAX / lognormal:MEDIAN,SIGMA）")
+
+
+# ===== 出力の崩し方 =====
+def _prose(text: str) -> str:
+    return "Sure! Here is the result you asked for:\n\n" + text.strip("`").removeprefix("json\n") + "\n\nLet me know if you need anything else."
+
+
+def _trailing_comma(text: str) -> str:
+    return re.sub(r'"\s*\n(\s*)}', '",\n\\1}', text, count=1)
+
+
+def _smart_quotes(text: str) -> str:
+    return re.sub(r'"([^"\n]*)"(\s*[:,\n])', "“\\1”\\2", text)
+
+
+def _truncated(text: str) -> str:
+    return text[: len(text) // 2]
+
+
+MALFORMATIONS: Dict[str, Callable[[str], str]] = {
+    "prose": _prose,
+    "trailing_comma": _trailing_comma,
+    "smart_quotes": _smart_quotes,
+    "truncated": _truncated,
+}
+
+
+# ===== 記録と再生 =====
+class Recorder:
+    """本物の Dify への中継と、応答の記録（1行1件の JSON）"""
+
+    def __init__(self, upstream: str, path: Path, timeout_sec: float = 120.0) -> None:
+        self.upstream = upstream
+        self.path = path
+        self._http = httpx.Client(timeout=timeout_sec)
+        self._lock = threading.Lock()
+
+    def forward(self, workflow: str, body: dict, authorization: str) -> Tuple[int, str, float]:
+        """
+        blocking で中継し、(HTTP ステータス, 成功なら outputs.text・失敗なら応答本文, 所要秒) を返す
+
+        streaming の呼び出しも上流には blocking で送る（記録は outputs.text で持ち、再生時に分割する）。
+        """
+        started = time.perf_counter()
+        resp = self._http.post(
+            self.upstream,
+            json=dict(body, response_mode="blocking"),
+            headers={"Authorization": authorization},
+        )
+        elapsed = time.perf_counter() - started
+        if resp.status_code == 200:
+            data = resp.json()
+            text = (data.get("data") or data).get("outputs", {}).get("text", "")
+        else:
+            text = resp.text
+        entry = {
+            "workflow": workflow,
+            "inputs": body.get("inputs", {}),
+            "status_code": resp.status_code,
+            "text": text,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return resp.status_code, text, elapsed
+
+
+class Replayer:
+    """記録した応答をワークフローごとに順番に（最後まで行ったら先頭から）返す"""
+
+    def __init__(self, path: Path) -> None:
+        entries: Dict[str, List[dict]] = {QUESTION: [], ANSWER: []}
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry["workflow"]].append(entry)
+        self._cycles = {workflow: itertools.cycle(items) for workflow, items in entries.items() if items}
+        self.counts = {workflow: len(items) for workflow, items in entries.items()}
+        self._lock = threading.Lock()
+
+    def next(self, workflow: str) -> Optional[dict]:
+        with self._lock:
+            cycle = self._cycles.get(workflow)
+            return next(cycle) if cycle is not None else None
+
+
+# ===== サーバー =====
+class StandinConfig:
+    """代替サーバーの振る舞い（StandinHandler.config に渡す）"""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        chunk_chars: int = 12,
+        items: Optional[List[dict]] = None,
+        recorder: Optional[Recorder] = None,
+        replayer: Optional[Replayer] = None,
+        use_recorded_latency: bool = True,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            latency: 所要時間の分布（parse_latency を参照）
+            error_rate: エラーを返す割合（0〜1）
+            malformed_rate: 出力を崩す割合（0〜1）
+            chunk_chars: streaming の text_chunk 1つあたりの文字数
+            items: 出題で返す問題（デフォルトは READING_ITEMS）
+            recorder: 本物の Dify に中継して記録する場合
+            replayer: 記録を再生する場合
+            use_recorded_latency: 再生時に記録した所要時間を使う（False なら latency の分布）
+            seed: 乱数のシード（負荷試験を再現する場合）
+        """
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.chunk_chars = chunk_chars
+        self.recorder = recorder
+        self.replayer = replayer
+        self.use_recorded_latency = use_recorded_latency
+        self._items = itertools.cycle(items or READING_ITEMS)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    def draw(self) -> Tuple[float, bool, Optional[str]]:
+        """1回分の (所要秒, エラーにするか, 崩し方) を決める"""
+        with self._lock:
+            delay = self.latency(self._rng)
+            error = self._rng.random() < self.error_rate
+            malformation = self._rng.choice(sorted(MALFORMATIONS)) if self._rng.random() < self.malformed_rate else None
+            return delay, error, malformation
+
+    def next_item(self) -> dict:
+        with self._lock:
+            return next(self._items)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """/v1/workflows/run を真似るハンドラー（HTTP/1.1 keep-alive、streaming は chunked の SSE）"""
+
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書くため、Nagle と遅延ACKで 40 ms 待たされないようにする
+    disable_nagle_algorithm = True
+    config = StandinConfig()
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/stats"):
+            self._json(200, dict(self.config.stats))
+        else:
+            self._json(404, {"code": "not_found", "message": self.path})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/workflows/run"):
+            self._json(404, {"code": "not_found", "message": self.path})
+            return
+        inputs = body.get("inputs") or {}
+        workflow = ANSWER if "Question" in inputs else QUESTION
+        streaming = body.get("response_mode") == "streaming"
+        config = self.config
+        config.count(f"{workflow}.calls")
+        delay, error, malformation = config.draw()
+
+        status = 200
+        if config.recorder is not None:
+            # 記録中は本物の応答をそのまま返す（エラー・崩しは足さない）
+            status, text, _ = config.recorder.forward(workflow, body, self.headers.get("Authorization", ""))
+            delay, error, malformation = 0.0, False, None
+        elif config.replayer is not None and (entry := config.replayer.next(workflow)) is not None:
+            status, text = entry["status_code"], entry["text"]
+            if config.use_recorded_latency:
+                delay = entry["elapsed_ms"] / 1000
+        else:
+            text = answer_text(inputs) if workflow == ANSWER else fenced(config.next_item())
+
+        if status != 200:
+            # 記録した本物のエラー応答
+            config.count(f"{workflow}.errors")
+            time.sleep(delay)
+            self._raw(status, text)
+            return
+        if error:
+            config.count(f"{workflow}.errors")
+            if not streaming:
+                time.sleep(delay)
+                self._json(500, {"code": "internal_server_error", "message": "stand-in error", "status": 500})
+                return
+        elif malformation is not None:
+            config.count(f"{workflow}.malformed.{malformation}")
+            text = MALFORMATIONS[malformation](text)
+
+        if streaming:
+            self._stream(text, delay, error)
+        else:
+            time.sleep(delay)
+            self._json(200, {"data": {"status": "succeeded", "outputs": {"text": text}, "elapsed_time": delay}})
+
+    def _stream(self, text: str, delay: float, error: bool) -> None:
+        chunks = [text[i:i + self.config.chunk_chars] for i in range(0, len(text), self.config.chunk_chars)] or [""]
+        per_chunk = delay / len(chunks)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._event({"event": "workflow_started", "data": {}})
+        self._write(b"event: ping\n\n")
+        # エラーにする回は途中まで送ってから error イベントで終える（本物の Dify のストリーム中の失敗を真似る）
+        for text_chunk in chunks[: len(chunks) // 2] if error else chunks:
+            time.sleep(per_chunk)
+            self._event({"event": "text_chunk", "data": {"text": text_chunk}})
+        if error:
+            self._event({"event": "error", "status": 500, "code": "internal_server_error", "message": "stand-in error"})
+        else:
+            self._event({"event": "workflow_finished", "data": {"status": "succeeded", "outputs": {"text": text}}})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _json(self, status: int, payload: dict) -> None:
+        self._raw(status, json.dumps(payload, ensure_ascii=False))
+
+    def _raw(self, status: int, text: str) -> None:
+        data = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _event(self, event: dict) -> None:
+        self._write(b"data: " + json.dumps(event, ensure_ascii=False).encode() + b"\n\n")
+
+    def _write(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_standin(config: StandinConfig, port: int = 0, host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, str]:
+    """
+    代替サーバーを別スレッドで起動する
+
+    Returns:
+        (サーバー, エンドポイントURL)。止めるときは server.shutdown()
+    """
+    handler = type("ConfiguredStandinHandler", (StandinHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/workflows/run"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8801, help="待ち受けポート（0 で空いているポート）")
+    parser.add_argument("--latency", default="lognormal:3000,0.4", help="所要時間の分布（fixed:MS / uniform:MIN,MAX / lognormal:MEDIAN,SIGMA）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラーを返す割合（0〜1）")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="出力を崩す割合（0〜1）")
+    parser.add_argument("--chunk-chars", type=int, default=12, help="text_chunk 1つあたりの文字数")
+    parser.add_argument("--items", type=Path, default=None, help="出題で返す問題（1行1件の JSON）")
+    parser.add_argument("--record", type=Path, default=None, help="本物の Dify の応答を記録するファイル（--upstream と一緒に使う）")
+    parser.add_argument("--upstream", default=None, help="記録時に中継する本物の /v1/workflows/run")
+    parser.add_argument("--replay", type=Path, default=None, help="記録した応答を返す")
+    parser.add_argument("--replay-latency", choices=("recorded", "distribution"), default="recorded",
+                        help="再生時の所要時間（記録した値 / --latency の分布）")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード")
+    args = parser.parse_args()
+
+    if (args.record is None) != (args.upstream is None):
+        parser.error("--record と --upstream は一緒に指定してください")
+    if args.record is not None and args.replay is not None:
+        parser.error("--record と --replay は同時に使えません")
+
+    items = None
+    if args.items is not None:
+        items = [json.loads(line) for line in args.items.read_text(encoding="utf-8").splitlines() if line.strip()]
+    config = StandinConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        chunk_chars=args.chunk_chars,
+        items=items,
+        recorder=Recorder(args.upstream, args.record) if args.record is not None else None,
+        replayer=Replayer(args.replay) if args.replay is not None else None,
+        use_recorded_latency=args.replay_latency == "recorded",
+        seed=args.seed,
+    )
+    server, endpoint = start_standin(config, args.port, args.host)
+    if config.recorder is not None:
+        mode = f"記録: {args.upstream} → {args.record}"
+    elif config.replayer is not None:
+        mode = f"再生: {args.replay}（出題 {config.replayer.counts[QUESTION]}件 / 採点 {config.replayer.counts[ANSWER]}件）"
+    else:
+        mode = f"latency={args.latency} error_rate={args.error_rate:g} malformed_rate={args.malformed_rate:g}"
+    print(f"Dify 代替サーバー: {endpoint}（{mode}、Ctrl+C で終了）")
+    print(f"  DIFY_ENDPOINT_RUN={endpoint}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    print(json.dumps(dict(config.stats), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
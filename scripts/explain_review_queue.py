@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+「今日の復習」キューと苦手テストのクエリプランを確認するスクリプト
+
+srs_state に検証用ユーザー（user_id が "__explain__" で始まる）の行を投入し、
+VACUUM ANALYZE 後に EXPLAIN (ANALYZE, BUFFERS) を表示します。終了時に投入した行は削除します。
+
+Usage:
+    python scripts/explain_review_queue.py [--users 400] [--words 3000] [--keep]
+"""
+
+import argparse
+import asyncio
+import datetime
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# .envファイルを読み込む
+from dotenv import load_dotenv
+load_dotenv(project_root / ".env")
+
+from db import QUERIES, get_db_manager
+
+USER_PREFIX = "__explain__"
+
+SEED_SQL = """
+    INSERT INTO srs_state(user_id, word_id, next_review, easiness, interval_days, consecutive_correct)
+    SELECT $1 || u, w.word_id,
+           $2::date + (abs(hashint4(u * 7919 + w.word_id)) % 120 - 60),
+           2.5,
+           abs(hashint4(u + w.word_id)) % 60,
+           abs(hashint4(u * 31 + w.word_id)) % 8
+    FROM generate_series(1, $3) AS u
+    CROSS JOIN (SELECT word_id FROM words ORDER BY word_id LIMIT $4) AS w
+    ON CONFLICT DO NOTHING
+"""
+
+
+async def _explain(conn, title: str, sql: str, *args) -> None:
+    print(f"\n=== {title} ===")
+    for row in await conn.fetch(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}", *args):
+        print(row[0])
+
+
+async def main(users: int, words: int, keep: bool) -> None:
+    db_manager = get_db_manager()
+    await db_manager.initialize()
+    today = datetime.date.today()
+    try:
+        async with db_manager.acquire() as conn:
+            print(f"📥 検証用データを投入中（{users}ユーザー × 最大{words}語）...")
+            await conn.execute(SEED_SQL, USER_PREFIX, today, users, words)
+            await conn.execute("VACUUM ANALYZE srs_state")
+            total = await conn.fetchval("SELECT count(*) FROM srs_state")
+            print(f"📊 srs_state: {total:,}行")
+
+            user_id = f"{USER_PREFIX}1"
+            cursor = None
+            rows = await conn.fetch(QUERIES["review.due_first_page"], user_id, today, 10)
+            if rows:
+                cursor = (rows[-1]["next_review"], rows[-1]["word_id"])
+
+            await _explain(conn, "due件数", QUERIES["review.due_count"], user_id, today)
+            await _explain(conn, "dueキュー 1ページ目", QUERIES["review.due_first_page"], user_id, today, 10)
+            if cursor:
+                await _explain(conn, "dueキュー 2ページ目（キーセット）", QUERIES["review.due_next_page"], user_id, today, 10, *cursor)
+            await _explain(conn, "苦手テスト", QUERIES["vocab.weak_candidates"], user_id)
+    finally:
+        if not keep:
+            async with db_manager.acquire() as conn:
+                await conn.execute("DELETE FROM srs_state WHERE user_id LIKE $1 || '%'", USER_PREFIX)
+            print("\n🧹 検証用データを削除しました")
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="review_queue のクエリプランを確認する")
+    parser.add_argument("--users", type=int, default=400, help="検証用ユーザー数（デフォルト: 400）")
+    parser.add_argument("--words", type=int, default=3000, help="1ユーザーあたりの単語数（デフォルト: 3000）")
+    parser.add_argument("--keep", action="store_true", help="投入したデータを削除しない")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.words, args.keep))
@@ -12,6 +12,7 @@ load_dotenv()
 DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
 CSV_PATH = os.getenv("WORDS_CSV_PATH") or "data/All-words-modified_2025-10-29_08-31-22.csv"
 LIMIT = int(os.getenv("WORDS_LIMIT") or 0)   # テスト投入数（0で全件）
+NOTIFY_CHANNEL = "winglish_words_changed"    # word_catalog.WORDS_CHANGED_CHANNEL と同じ値
 
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS words (
@@ -130,6 +131,9 @@ async def main():
                 if idx % 1000 == 0:
                     print(f"...progress: read={idx}, OK={ok}, NG={ng}")
 
+        # 起動中のBotに語彙カタログの再読み込みを通知（word_catalog.WORDS_CHANGED_CHANNEL）
+        async with pool.acquire() as con:
+            await con.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, f"ok={ok}")
     finally:
         await pool.close()
 
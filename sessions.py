@@ -0,0 +1,201 @@
+"""
+学習セッションのレジストリ
+
+(user_id, module) をキーに進行中のセッション（VocabSessionView など）を保持します。
+- O(1) の取得・登録
+- ユーザーごとのロック（多重クリック防止）
+- 最終アクセスからの TTL で失効
+- 上限件数を超えたら最も古く使われたものから削除（LRU）
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.sessions')
+
+SessionKey = Tuple[str, str]
+
+# VocabSessionView のタイムアウトと揃える
+DEFAULT_SESSION_TTL_SEC = 180
+DEFAULT_MAX_SESSIONS = 1000
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value: Any, expires_at: float) -> None:
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SessionRegistry:
+    """
+    ユーザー×モジュール単位のセッションを管理するクラス
+
+    Usage:
+        registry = get_session_registry()
+        registry.put(user_id, "vocab", view)
+        view = registry.get(user_id, "vocab")
+        async with registry.lock(user_id, "vocab"):
+            ...
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float = DEFAULT_SESSION_TTL_SEC,
+        max_entries: int = DEFAULT_MAX_SESSIONS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        SessionRegistryを初期化
+
+        Args:
+            ttl_sec: 最終アクセスからセッションが失効するまでの秒数
+            max_entries: 保持するセッションの上限件数
+            clock: 現在時刻（秒）を返す関数（テスト用に差し替え可能）
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.ttl_sec: float = ttl_sec
+        self.max_entries: int = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[SessionKey, _Entry]" = OrderedDict()
+        self._locks: Dict[SessionKey, asyncio.Lock] = {}
+        self.evictions_lru: int = 0
+        self.evictions_expired: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, module: str) -> Optional[Any]:
+        """
+        セッションを取得する（取得時にTTLを延長する）
+
+        Returns:
+            セッション。存在しないか失効済みの場合はNone
+        """
+        key = (str(user_id), module)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = self._clock()
+        if entry.expires_at <= now:
+            self._drop(key)
+            self.evictions_expired += 1
+            return None
+        entry.expires_at = now + self.ttl_sec
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, user_id: str, module: str, value: Any) -> None:
+        """
+        セッションを登録する（同じキーの既存セッションは置き換える）
+        """
+        key = (str(user_id), module)
+        self.purge_expired()
+        self._entries[key] = _Entry(value, self._clock() + self.ttl_sec)
+        self._entries.move_to_end(key)
+        self._evict_if_needed()
+
+    def pop(self, user_id: str, module: str) -> Optional[Any]:
+        """
+        セッションを削除して返す
+
+        Returns:
+            削除したセッション（存在しなければNone）
+        """
+        key = (str(user_id), module)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._drop(key)
+        return entry.value
+
+    def values(self) -> List[Any]:
+        """失効していないセッションの一覧を返す（TTLは延長しない）"""
+        now = self._clock()
+        return [entry.value for entry in self._entries.values() if entry.expires_at > now]
+
+    def lock(self, user_id: str, module: str) -> asyncio.Lock:
+        """
+        ユーザー×モジュール単位のロックを取得する
+
+        `lock.locked()` で処理中かどうかを判定し、多重クリックを捨てる用途を想定。
+        """
+        key = (str(user_id), module)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def purge_expired(self) -> int:
+        """
+        失効済みのセッションと、使われていないロックを削除する
+
+        Returns:
+            削除したセッション数
+        """
+        # TTLは一律でアクセス時に末尾へ移動するため、先頭から順に失効している
+        now = self._clock()
+        purged = 0
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            self._drop(key)
+            purged += 1
+        self.evictions_expired += purged
+        for key in [k for k, l in self._locks.items() if k not in self._entries and not l.locked()]:
+            del self._locks[key]
+        return purged
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {
+            "size": len(self._entries),
+            "locks": len(self._locks),
+            "max_entries": self.max_entries,
+            "evictions_lru": self.evictions_lru,
+            "evictions_expired": self.evictions_expired,
+        }
+
+    def _drop(self, key: SessionKey) -> None:
+        self._entries.pop(key, None)
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+
+    def _evict_if_needed(self) -> None:
+        # 先頭（最も古く使われたもの）から削除
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions_lru += 1
+            logger.debug(f"セッションをLRUで削除: {key}")
+
+
+# グローバルインスタンス
+_session_registry: Optional[SessionRegistry] = None
+
+
+def get_session_registry() -> SessionRegistry:
+    """
+    グローバルなSessionRegistryインスタンスを取得する
+
+    初回作成時にメトリクス（"sessions.*"）へ統計を登録する。
+    """
+    global _session_registry
+    if _session_registry is None:
+        _session_registry = SessionRegistry()
+        get_metrics().register_source("sessions", _session_registry.stats)
+    return _session_registry
+
+
+__all__ = ['SessionRegistry', 'get_session_registry', 'DEFAULT_SESSION_TTL_SEC']
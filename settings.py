@@ -35,12 +35,39 @@ class DiscordConfig:
 class DatabaseConfig:
     """データベース関連の設定"""
     url: str
+    # 接続プールの上下限（pool_controller がこの範囲で目標サイズを調整する）
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+    # 接続待ち p99 の目標（ミリ秒）。超えたら目標サイズを増やす
+    pool_target_wait_ms: float = 5.0
+    # この秒数使われなかった接続は閉じる
+    pool_max_idle_sec: float = 300.0
+    # この秒数を超えた接続は返却時に作り直す
+    pool_max_age_sec: float = 1800.0
+    # 読み取り専用レプリカ（未設定ならすべて primary）
+    replica_url: Optional[str] = None
+    # 書き込んだユーザーの読み取りを primary に向ける秒数（レプリカの遅延より長くする）
+    replica_sticky_sec: float = 10.0
+    # レプリカが落ちたときに再確認するまでの秒数
+    replica_retry_sec: float = 30.0
     
     @classmethod
     def from_env(cls) -> "DatabaseConfig":
         """環境変数からデータベース設定を読み込む"""
         url = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL") or ""
-        return cls(url=url)
+        min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+        max_size = max(min_size, int(os.getenv("DB_POOL_MAX_SIZE", "10")))
+        return cls(
+            url=url,
+            pool_min_size=min_size,
+            pool_max_size=max_size,
+            pool_target_wait_ms=float(os.getenv("DB_POOL_TARGET_WAIT_MS", "5")),
+            pool_max_idle_sec=float(os.getenv("DB_POOL_MAX_IDLE_SEC", "300")),
+            pool_max_age_sec=float(os.getenv("DB_POOL_MAX_AGE_SEC", "1800")),
+            replica_url=os.getenv("DATABASE_REPLICA_URL") or None,
+            replica_sticky_sec=float(os.getenv("DB_REPLICA_STICKY_SEC", "10")),
+            replica_retry_sec=float(os.getenv("DB_REPLICA_RETRY_SEC", "30")),
+        )
 
 
 @dataclass
@@ -76,6 +76,35 @@ CREATE TABLE IF NOT EXISTS reading_items (
   created_at TIMESTAMPTZ DEFAULT now()
 );
 
+-- 作り置きの出題（reading_pool.py）: kind ごとに在庫を持ち、出題したら served_at を付ける
+ALTER TABLE reading_items ADD COLUMN IF NOT EXISTS kind TEXT;
+ALTER TABLE reading_items ADD COLUMN IF NOT EXISTS served_at TIMESTAMPTZ;
+ALTER TABLE reading_items ADD COLUMN IF NOT EXISTS served_to TEXT;
+CREATE INDEX IF NOT EXISTS idx_reading_items_stock
+    ON reading_items(kind, level, item_id)
+    WHERE served_at IS NULL;
+
+-- 長文読解の採点結果キャッシュ（grading_cache.py）: 採点の入力の SHA-256 をキーにする
+CREATE TABLE IF NOT EXISTS grading_cache (
+  cache_key TEXT PRIMARY KEY,
+  result JSONB NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_grading_cache_expires ON grading_cache(expires_at);
+
+-- 長文読解の解説の詳しさ（reading_feedback.py）: brief なら全問正解のとき Dify の解説を省く
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reading_feedback TEXT NOT NULL DEFAULT 'full';
+
+-- 長文読解の進行中セッション（reading_sessions.py）: ユーザーごとに1行。解答ボタンの custom_id のセッション ID で引く
+CREATE TABLE IF NOT EXISTS reading_sessions (
+  session_id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL UNIQUE,
+  state JSONB NOT NULL,          -- {question: {...}, item_id, user_answers: [null, null], kind}
+  updated_at TIMESTAMPTZ DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
 -- 学習ログ（全モジュール共通）
 CREATE TABLE IF NOT EXISTS study_logs (
   log_id BIGSERIAL PRIMARY KEY,
@@ -138,4 +167,52 @@ CREATE INDEX IF NOT EXISTS idx_notebook_words_notebook ON notebook_words(noteboo
 CREATE INDEX IF NOT EXISTS idx_notebook_words_word ON notebook_words(word_id);
 CREATE INDEX IF NOT EXISTS idx_vocabulary_notebooks_user ON vocabulary_notebooks(user_id);
 CREATE INDEX IF NOT EXISTS idx_system_notebook_words_notebook ON system_notebook_words(notebook_id);
-CREATE INDEX IF NOT EXISTS idx_system_notebook_words_word ON system_notebook_words(word_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_system_notebook_words_word ON system_notebook_words(word_id);
+
+-- SM-2 の1ステップ（srs.update_srs と同じ計算）
+-- 浮動小数点の演算順序・丸め（round は偶数丸め）を Python 側と揃えるため double precision で計算する
+CREATE OR REPLACE FUNCTION srs_sm2_step(
+    p_easiness DOUBLE PRECISION,
+    p_interval_days DOUBLE PRECISION,
+    p_consecutive_correct INT,
+    p_q INT,
+    p_today DATE DEFAULT CURRENT_DATE,
+    OUT easiness DOUBLE PRECISION,
+    OUT interval_days INT,
+    OUT consecutive_correct INT,
+    OUT next_review DATE
+)
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    d DOUBLE PRECISION := (5 - p_q)::DOUBLE PRECISION;
+BEGIN
+    easiness := p_easiness + (0.1::DOUBLE PRECISION - d * (0.08::DOUBLE PRECISION + d * 0.02::DOUBLE PRECISION));
+    IF easiness < 1.3::DOUBLE PRECISION THEN
+        easiness := 1.3::DOUBLE PRECISION;
+    END IF;
+
+    IF p_q < 3 THEN
+        consecutive_correct := 0;
+        interval_days := 1;
+    ELSE
+        consecutive_correct := COALESCE(p_consecutive_correct, 0) + 1;
+        IF consecutive_correct = 1 THEN
+            interval_days := 1;
+        ELSE
+            interval_days := round(p_interval_days * easiness)::INT;
+        END IF;
+    END IF;
+
+    next_review := p_today + interval_days;
+END;
+$$;
+
+-- 「今日の復習」キュー（review_queue.py）: due カードを next_review 順に取り出す・数える
+-- (next_review, word_id) のキーセットページングと、件数の index-only scan に使う
+CREATE INDEX IF NOT EXISTS idx_srs_state_due
+    ON srs_state(user_id, next_review, word_id)
+    WHERE next_review IS NOT NULL;
+
+-- 苦手テスト: consecutive_correct 昇順 → next_review 昇順の並びをそのまま読む
+CREATE INDEX IF NOT EXISTS idx_srs_state_weak
+    ON srs_state(user_id, consecutive_correct ASC NULLS FIRST, next_review ASC NULLS LAST);
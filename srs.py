@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import datetime
-from typing import Tuple, Union
+from typing import TYPE_CHECKING, Any, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 def update_srs(
@@ -44,4 +47,91 @@ def update_srs(
         i = 1 if c == 1 else round(i * e)
 
     next_review = datetime.date.today() + datetime.timedelta(days=int(i))
-    return float(e), float(i), int(c), next_review
\ No newline at end of file
+    return float(e), float(i), int(c), next_review
+
+
+def update_srs_batch(
+    easiness: "np.ndarray",
+    interval_days: "np.ndarray",
+    consecutive_correct: "np.ndarray",
+    q: "np.ndarray",
+    today: Optional[datetime.date] = None
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    update_srs を配列に対してまとめて適用する（NumPy、Pythonレベルのループなし）
+    
+    バックフィルやスケジュール再計算、シミュレーションなど大量の行を再計算する用途向け。
+    各要素の結果は update_srs と完全に一致する（1.3 の下限、偶数丸めを含む）。
+    
+    Args:
+        easiness: 現在の容易度係数の配列
+        interval_days: 現在の復習間隔（日数）の配列
+        consecutive_correct: 連続正解回数の配列（NULL は事前に0へ置き換えておく）
+        q: 品質スコア（0-5）の配列。スカラーも可（ブロードキャストされる）
+        today: 基準日（デフォルト: date.today()）
+    
+    Returns:
+        (easiness[float64], interval_days[float64], consecutive_correct[int64], next_review[datetime64[D]])のタプル
+    
+    Note:
+        NumPy は実行時に読み込む（Bot本体は NumPy なしで動作する）
+    """
+    import numpy as np
+
+    e = np.asarray(easiness, dtype=np.float64)
+    i = np.asarray(interval_days, dtype=np.float64)
+    c = np.asarray(consecutive_correct, dtype=np.int64)
+    q = np.asarray(q, dtype=np.int64)
+
+    # update_srs と同じ演算順序で計算する（浮動小数点の結果をビット単位で一致させるため）
+    d = 5 - q
+    e = np.maximum(e + (0.1 - d * (0.08 + d * 0.02)), 1.3)
+
+    passed = q >= 3
+    c = np.where(passed, c + 1, 0)
+    # np.rint は Python の round と同じく偶数丸め
+    i = np.where(passed & (c != 1), np.rint(i * e), 1.0)
+
+    base = np.datetime64(today or datetime.date.today(), "D")
+    next_review = base + i.astype("timedelta64[D]")
+    return e, i, c, next_review
+
+# update_srs と同じ計算を DB 内（sql/schema.sql の srs_sm2_step）で行い、
+# 読み取り→計算→書き込みを1往復の UPSERT にまとめる
+# easiness は text 経由で NUMERIC にする（float8 → numeric の直接変換は15桁に丸められ、
+# 読み戻したときに Python 版と1ulpずれることがあるため）
+SM2_UPSERT_SQL = """
+    INSERT INTO srs_state AS s (user_id, word_id, easiness, interval_days, consecutive_correct, next_review)
+    SELECT $1, $2, n.easiness::TEXT::NUMERIC, n.interval_days, n.consecutive_correct, n.next_review
+    FROM srs_sm2_step(2.5, 0, 0, $3, $4) AS n
+    ON CONFLICT (user_id, word_id) DO UPDATE
+    SET (easiness, interval_days, consecutive_correct, next_review) = (
+        SELECT n.easiness::TEXT::NUMERIC, n.interval_days, n.consecutive_correct, n.next_review
+        FROM srs_sm2_step(s.easiness::DOUBLE PRECISION, s.interval_days, s.consecutive_correct, $3, $4) AS n
+    )
+    RETURNING easiness, interval_days, consecutive_correct, next_review
+"""
+
+
+async def update_srs_in_db(
+    conn: Any,
+    user_id: str,
+    word_id: int,
+    q: Union[int, float],
+    today: Optional[datetime.date] = None
+) -> Tuple[float, float, int, datetime.date]:
+    """
+    SM-2の更新をDB内で実行し、結果を返す（1往復）
+    
+    Args:
+        conn: asyncpg の接続
+        user_id: ユーザーID
+        word_id: 単語ID
+        q: 品質スコア（0-5）
+        today: 基準日（デフォルト: date.today()。update_srs と同じ基準にするため Python 側で渡す）
+    
+    Returns:
+        update_srs と同じ形式のタプル
+    """
+    row = await conn.fetchrow(SM2_UPSERT_SQL, str(user_id), int(word_id), int(q), today or datetime.date.today())
+    return float(row["easiness"]), float(row["interval_days"]), int(row["consecutive_correct"]), row["next_review"]
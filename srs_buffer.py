@@ -0,0 +1,333 @@
+"""
+SRS更新の書き込みバッファ（write-behind）
+
+「覚えた/忘れそう」のたびに srs_state を UPSERT するのではなく、結果をメモリに溜めて
+一定間隔（flush_interval_ms）または一定件数（max_pending）ごとに1本の UPSERT（db.QUERIES の "srs.flush"）で書き込みます。
+
+- 同じ (user_id, word_id) への更新はまとめられ、最新の状態だけが書き込まれる
+- 未書き込み・書き込み中（UPSERT がコミットされる前）の状態は読み取り時に優先される（自分の書き込みが見える）
+- 書き込みに失敗したら1行ずつ書き直し、書けなかった行だけを再試行する。max_attempts 回失敗した行はログに残して捨てる
+- close() で残りをすべて書き込む（close_db から呼ばれる）
+- srs_state を SQL で直接読む処理（苦手テスト・今日の復習）は、読む前に sync_srs_user() でその利用者の分を書き込む
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from db import get_db_manager, run_query
+from metrics import get_metrics
+from srs import update_srs
+
+logger = logging.getLogger('winglish.srs_buffer')
+
+DEFAULT_FLUSH_INTERVAL_MS = 500
+DEFAULT_MAX_PENDING = 200
+DEFAULT_MAX_ATTEMPTS = 5
+
+# SRSの初期状態（easiness, interval_days, consecutive_correct）
+INITIAL_STATE: Tuple[float, float, int] = (2.5, 0, 0)
+
+SrsKey = Tuple[str, int]
+
+
+class SrsState:
+    """1単語分のSRS状態"""
+
+    __slots__ = ("easiness", "interval_days", "consecutive_correct", "next_review")
+
+    def __init__(
+        self,
+        easiness: float,
+        interval_days: float,
+        consecutive_correct: int,
+        next_review: Optional[datetime.date],
+    ) -> None:
+        self.easiness = easiness
+        self.interval_days = interval_days
+        self.consecutive_correct = consecutive_correct
+        self.next_review = next_review
+
+
+class SrsWriteBuffer:
+    """
+    SRS更新をまとめて書き込むバッファ
+
+    Usage:
+        buffer = get_srs_buffer()
+        state = await buffer.answer(user_id, word_id, quality)
+        ...
+        await buffer.close()  # 終了時に残りを書き込む
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> None:
+        """
+        SrsWriteBufferを初期化
+
+        Args:
+            flush_interval_ms: 定期書き込みの間隔（ミリ秒）
+            max_pending: この件数に達したら間隔を待たずに書き込む
+            max_attempts: 1行あたりの書き込みの試行回数の上限（超えたら捨てる）
+        """
+        self.flush_interval_ms: int = flush_interval_ms
+        self.max_pending: int = max_pending
+        self.max_attempts: int = max_attempts
+        self._pending: Dict[SrsKey, SrsState] = {}
+        # 書き込み中のバッチ（UPSERT がコミットされるまで get_state から見えるように残す）
+        self._inflight: Dict[SrsKey, SrsState] = {}
+        # 書き込みに失敗した回数（キーごと）
+        self._attempts: Dict[SrsKey, int] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed: bool = False
+        self.coalesced: int = 0
+        self.dropped: int = 0
+
+    @property
+    def depth(self) -> int:
+        """未書き込みの件数"""
+        return len(self._pending)
+
+    async def get_state(self, user_id: str, word_id: int) -> SrsState:
+        """
+        現在のSRS状態を取得する（未書き込み・書き込み中の状態を優先）
+
+        Returns:
+            SRS状態（記録がなければ初期状態）
+        """
+        key = (user_id, word_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._inflight.get(key)
+        if pending is not None:
+            return pending
+        # 読み取りだけなので書き込みとして記録しない（user_id を渡さない）。更新の元になる状態なのでプライマリから読む
+        async with get_db_manager().acquire(site="srs_buffer.get_state") as conn:
+            row = await run_query(conn, "fetchrow", "srs.get_state", user_id, word_id)
+        if row:
+            return SrsState(row["easiness"], row["interval_days"], row["consecutive_correct"], row["next_review"])
+        return SrsState(*INITIAL_STATE, None)
+
+    async def answer(self, user_id: str, word_id: int, quality: int) -> SrsState:
+        """
+        解答結果からSRS状態を更新し、書き込み待ちに積む
+
+        Args:
+            user_id: ユーザーID
+            word_id: 単語ID
+            quality: 品質スコア（0-5）
+
+        Returns:
+            更新後のSRS状態
+        """
+        current = await self.get_state(user_id, word_id)
+        e, i, c, next_review = update_srs(current.easiness, current.interval_days, current.consecutive_correct, quality)
+        self.put(user_id, word_id, SrsState(e, i, c, next_review))
+        return self._pending[(user_id, word_id)]
+
+    def put(self, user_id: str, word_id: int, state: SrsState) -> None:
+        """
+        計算済みのSRS状態を書き込み待ちに積む（同じキーは上書き）
+        """
+        if self._closed:
+            raise RuntimeError("SrsWriteBuffer is closed")
+        key = (user_id, word_id)
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = state
+        self._ensure_task()
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        書き込み待ちをすべて1本のUPSERTで書き込む
+
+        失敗した場合は1行ずつ書き直し、書けなかった行を（その後に積まれた新しい状態を優先しつつ）書き込み待ちへ戻す。
+        max_attempts 回失敗した行は捨てる。
+
+        Returns:
+            書き込んだ件数
+
+        Raises:
+            Exception: 1行も書き込めなかったとき（最初の書き込みの例外）
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            metrics = get_metrics()
+            started = time.perf_counter()
+            try:
+                try:
+                    await self._write(batch)
+                    failed: Dict[SrsKey, SrsState] = {}
+                except Exception as e:
+                    metrics.inc("srs_buffer.flush_errors")
+                    logger.error(f"SRSバッファの書き込みに失敗しました（{len(batch)}件）: {e}")
+                    failed = await self._write_rows(batch) if len(batch) > 1 else batch
+                    self._requeue(failed)
+                    if len(failed) == len(batch):
+                        raise
+            finally:
+                self._inflight = {}
+            for key in batch:
+                if key not in failed:
+                    self._attempts.pop(key, None)
+            written = len(batch) - len(failed)
+            metrics.observe("srs_buffer.flush_ms", (time.perf_counter() - started) * 1000)
+            metrics.observe("srs_buffer.flush_size", written)
+            return written
+
+    async def _write(self, batch: Dict[SrsKey, SrsState]) -> None:
+        db_manager = get_db_manager()
+        async with db_manager.acquire(site="srs_buffer.flush") as conn:
+            await run_query(conn, "execute", "srs.flush", *_columns(batch))
+            # 複数ユーザーの行をまとめて書くため、acquire(user_id=...) の代わりに全員分を記録する
+            db_manager.record_writes({user_id for user_id, _ in batch})
+
+    async def _write_rows(self, batch: Dict[SrsKey, SrsState]) -> Dict[SrsKey, SrsState]:
+        """1行ずつ書き込み、書けなかった行を返す（壊れた1行でバッチ全体を止めない）"""
+        failed: Dict[SrsKey, SrsState] = {}
+        rows = iter(batch.items())
+        db_manager = get_db_manager()
+        try:
+            async with db_manager.acquire(site="srs_buffer.flush") as conn:
+                for key, st in rows:
+                    try:
+                        await run_query(conn, "execute", "srs.flush", *_columns({key: st}))
+                        db_manager.record_writes((key[0],))
+                    except Exception as e:
+                        failed[key] = st
+                        logger.warning(f"SRS状態の書き込みに失敗しました: user_id={key[0]} word_id={key[1]}: {e}")
+        except Exception as e:
+            # 接続できない: 残りの行はすべて失敗として扱う
+            failed.update(rows)
+            logger.warning(f"SRSバッファの1行ずつの書き込みで接続に失敗しました: {e}")
+        return failed
+
+    def _requeue(self, failed: Dict[SrsKey, SrsState]) -> None:
+        """失敗した行を書き込み待ちへ戻す（試行回数の上限に達した行は捨てる）"""
+        for key, st in failed.items():
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts >= self.max_attempts:
+                self._attempts.pop(key, None)
+                self.dropped += 1
+                logger.error(
+                    f"SRS状態の書き込みに {attempts} 回失敗したため破棄しました: "
+                    f"user_id={key[0]} word_id={key[1]} next_review={st.next_review}"
+                )
+                continue
+            self._attempts[key] = attempts
+            self._pending.setdefault(key, st)
+
+    async def sync_user(self, user_id: str) -> None:
+        """
+        user_id の未書き込み・書き込み中の状態が srs_state に書き込まれるまで待つ
+
+        書き込みに失敗したときはそのまま戻る（その行は再試行待ちに残り、直後の読み取りには反映されない）。
+        """
+        if any(key[0] == user_id for key in self._pending):
+            try:
+                await self.flush()
+            except Exception:
+                # flush 内でログ済み
+                pass
+        elif any(key[0] == user_id for key in self._inflight):
+            async with self._flush_lock:
+                pass
+
+    async def close(self) -> None:
+        """定期書き込みを止め、残りをすべて書き込む"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending:
+            count = await self.flush()
+            logger.info(f"✅ SRSバッファの残り {count} 件を書き込みました")
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {
+            "depth": self.depth,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        interval = self.flush_interval_ms / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # flush 内でログ済み。次の周期で再試行する
+                pass
+
+
+def _columns(batch: Dict[SrsKey, SrsState]) -> Tuple[list, ...]:
+    """srs.flush の引数（列ごとの配列）"""
+    columns: Tuple[list, ...] = ([], [], [], [], [], [])
+    for (user_id, word_id), st in batch.items():
+        columns[0].append(user_id)
+        columns[1].append(word_id)
+        columns[2].append(st.easiness)
+        columns[3].append(int(st.interval_days))
+        columns[4].append(st.consecutive_correct)
+        columns[5].append(st.next_review)
+    return columns
+
+
+# グローバルインスタンス
+_srs_buffer: Optional[SrsWriteBuffer] = None
+
+
+def get_srs_buffer() -> SrsWriteBuffer:
+    """グローバルなSrsWriteBufferインスタンスを取得する"""
+    global _srs_buffer
+    if _srs_buffer is None:
+        _srs_buffer = SrsWriteBuffer()
+        get_metrics().register_source("srs_buffer", _srs_buffer.stats)
+    return _srs_buffer
+
+
+async def sync_srs_user(user_id: str) -> None:
+    """srs_state を SQL で直接読む前に、user_id の書き込み待ちを書き込む（バッファを使っていなければ何もしない）"""
+    if _srs_buffer is not None:
+        await _srs_buffer.sync_user(user_id)
+
+
+async def close_srs_buffer() -> None:
+    """グローバルなSrsWriteBufferの残りを書き込んで破棄する"""
+    global _srs_buffer
+    if _srs_buffer is not None:
+        await _srs_buffer.close()
+        _srs_buffer = None
+
+
+__all__ = ['SrsState', 'SrsWriteBuffer', 'get_srs_buffer', 'sync_srs_user', 'close_srs_buffer']
@@ -0,0 +1,166 @@
+"""
+サーキットブレーカーとタイムアウト決定（circuit_breaker.py）のテスト
+"""
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyTracker
+from metrics import get_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, failure_ratio=0.5, window=10, min_calls=6,
+                          cooldown_sec=30, clock=clock)
+
+
+class TestCircuitBreaker:
+    """CircuitBreakerのテスト"""
+
+    def test_opens_after_consecutive_failures(self, breaker):
+        """連続失敗で open になり、呼び出しを止めることをテスト"""
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.allow() is None
+
+    def test_opens_on_failure_ratio(self, breaker):
+        """連続していなくても直近の失敗率が高ければ open になることをテスト"""
+        for ok in (True, False, True, False, True, False):
+            breaker.record_success() if ok else breaker.record_failure()
+
+        assert breaker.state == OPEN
+
+    def test_success_resets_consecutive_failures(self, breaker):
+        """成功を挟めば連続失敗は数え直すことをテスト"""
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CLOSED
+
+    def test_half_open_allows_single_probe(self, breaker, clock):
+        """cooldown 後は1件だけ試し、成功で closed に戻ることをテスト"""
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 31
+
+        probe = breaker.allow()
+        assert probe.probe is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is None, "試し呼び出しは1件だけ"
+        breaker.record_success(probe)
+        assert breaker.state == CLOSED
+        assert breaker.allow().probe is False
+
+    def test_failed_probe_reopens(self, breaker, clock):
+        """試し呼び出しが失敗したら再び open になることをテスト"""
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 31
+        breaker.record_failure(breaker.allow())
+
+        assert breaker.state == OPEN
+        assert breaker.allow() is None
+
+    def test_released_probe_can_be_retried(self, breaker, clock):
+        """成否を記録せずに終わった試し呼び出しは解放されることをテスト"""
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 31
+        breaker.release_probe(breaker.allow())
+
+        assert breaker.allow().probe is True
+
+    def test_only_the_probe_changes_half_open(self, breaker, clock):
+        """open の前に始まった呼び出しの結果・解放では half_open の状態も試し呼び出しも変わらないことをテスト"""
+        early = breaker.allow()
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 31
+        probe = breaker.allow()
+
+        breaker.record_success(early)
+        breaker.release_probe(early)
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is None, "試し呼び出しは実行中のまま"
+
+        breaker.record_failure(early)
+        assert breaker.state == HALF_OPEN
+        breaker.record_success(probe)
+        assert breaker.state == CLOSED
+
+    def test_stale_probe_release_keeps_new_probe(self, breaker, clock):
+        """前の試し呼び出しの解放が、次の試し呼び出しを解放しないことをテスト"""
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 31
+        first = breaker.allow()
+        breaker.record_failure(first)
+        clock.now += 31
+        second = breaker.allow()
+
+        breaker.release_probe(first)
+
+        assert second.probe is True
+        assert breaker.allow() is None
+
+    def test_transitions_are_counted(self, breaker, clock):
+        """状態遷移と拒否がメトリクスに記録されることをテスト"""
+        metrics = get_metrics()
+        metrics.reset()
+        for _ in range(3):
+            breaker.record_failure()
+        breaker.allow()
+
+        assert metrics.counter("test.breaker.open") == 1
+        assert metrics.counter("test.breaker.rejected") == 1
+        assert breaker.stats()["state"] == OPEN
+
+
+class TestLatencyTracker:
+    """LatencyTrackerのテスト"""
+
+    def test_default_until_enough_samples(self):
+        """サンプルが足りない間は既定のタイムアウトで、ヘッジしないことをテスト"""
+        tracker = LatencyTracker(default_sec=60, min_sec=5, max_sec=60, min_samples=5)
+        for _ in range(4):
+            tracker.observe(2.0)
+
+        assert tracker.timeout() == 60
+        assert tracker.hedge_after() is None
+
+    def test_timeout_from_p99(self):
+        """p99 × factor をタイムアウトにすることをテスト"""
+        tracker = LatencyTracker(default_sec=60, min_sec=5, max_sec=60, factor=2.0, min_samples=5)
+        for value in (4.0, 5.0, 6.0, 7.0, 8.0):
+            tracker.observe(value)
+
+        assert tracker.timeout() == 16.0
+        assert tracker.hedge_after() == 8.0
+
+    def test_timeout_is_clamped(self):
+        """タイムアウトは下限〜上限に収まることをテスト"""
+        fast = LatencyTracker(default_sec=60, min_sec=5, max_sec=60, min_samples=3)
+        slow = LatencyTracker(default_sec=60, min_sec=5, max_sec=60, min_samples=3)
+        for _ in range(3):
+            fast.observe(0.1)
+            slow.observe(50)
+
+        assert fast.timeout() == 5
+        assert slow.timeout() == 60
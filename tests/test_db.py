@@ -0,0 +1,261 @@
+"""
+クエリカタログ（db.QUERIES / run_query）のテスト
+"""
+import inspect
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import asyncpg
+import pytest
+
+import db
+from db import QUERIES, CatalogConnection, DatabaseManager, run_query
+from metrics import get_metrics
+
+
+@pytest.fixture
+def metrics():
+    registry = get_metrics()
+    registry.reset()
+    return registry
+
+
+@pytest.fixture
+def manager():
+    """プールをモックした DatabaseManager"""
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=MagicMock())
+    pool.release = AsyncMock()
+    pool.get_size.return_value = 3
+    pool.get_idle_size.return_value = 1
+    pool.get_min_size.return_value = 1
+    pool.get_max_size.return_value = 10
+    mgr = DatabaseManager("postgresql://test")
+    mgr._pool = pool
+    return mgr
+
+
+class TestCatalogConnection:
+    """CatalogConnectionのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_prepare_catalog_skips_failures(self):
+        """prepare できないクエリを飛ばして残りを prepare することをテスト"""
+        failing = QUERIES["srs.flush"]
+
+        async def get_statement(sql, timeout, use_cache=False):
+            if sql == failing:
+                raise asyncpg.UndefinedTableError("missing")
+
+        conn = MagicMock()
+        conn._get_statement = AsyncMock(side_effect=get_statement)
+
+        count = await CatalogConnection.prepare_catalog(conn)
+
+        assert count == len(QUERIES) - 1
+        prepared = {c.args[0] for c in conn._get_statement.await_args_list}
+        assert prepared == set(QUERIES.values())
+        assert all(c.kwargs["use_cache"] for c in conn._get_statement.await_args_list)
+
+    def test_asyncpg_statement_cache_api(self):
+        """prepare_catalog が使う asyncpg の内部 API（_get_statement）がこの版にあることをテスト（asyncpg を上げたとき用）"""
+        params = inspect.signature(asyncpg.Connection._get_statement).parameters
+
+        assert list(params)[:3] == ["self", "query", "timeout"]
+        assert params["use_cache"].default is True
+
+    @pytest.mark.asyncio
+    async def test_prepare_catalog_without_internal_api(self):
+        """_get_statement がない asyncpg でも接続の作成は止めないことをテスト"""
+        conn = MagicMock(spec=[])
+
+        assert await CatalogConnection.prepare_catalog(conn) == 0
+
+
+class TestRunQuery:
+    """run_query関数のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_runs_catalog_sql(self):
+        """名前に対応するSQLで実行することをテスト"""
+        conn = AsyncMock()
+        conn.fetchrow = AsyncMock(return_value=None)
+
+        await run_query(conn, "fetchrow", "srs.get_state", "u1", 1)
+
+        conn.fetchrow.assert_awaited_once_with(QUERIES["srs.get_state"], "u1", 1)
+
+    @pytest.mark.asyncio
+    async def test_records_timing_and_errors(self):
+        """実行時間とエラー件数がメトリクスに記録されることをテスト"""
+        metrics = get_metrics()
+        metrics.reset()
+        conn = AsyncMock()
+        conn.fetch = AsyncMock(side_effect=[[], ConnectionError("down")])
+
+        await run_query(conn, "fetch", "vocab.weak_candidates", "u1")
+        with pytest.raises(ConnectionError):
+            await run_query(conn, "fetch", "vocab.weak_candidates", "u1")
+
+        assert metrics.histogram("db.vocab.weak_candidates.ms").count == 2
+        assert metrics.counter("db.vocab.weak_candidates.errors") == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_name(self):
+        """未登録のクエリ名は KeyError になることをテスト"""
+        with pytest.raises(KeyError):
+            await run_query(AsyncMock(), "fetch", "no.such.query")
+
+
+class TestInstrumentation:
+    """接続待ち・呼び出し元別クエリ時間の計測のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_records_wait_and_releases(self, manager, metrics):
+        """接続待ち時間を記録し、ブロックを抜けたら返却することをテスト"""
+        async with manager.acquire(site="vocab.start_ten") as conn:
+            assert conn is manager._pool.acquire.return_value
+
+        assert metrics.histogram("db.acquire_wait_ms").count == 1
+        manager._pool.release.assert_awaited_once_with(conn)
+
+    @pytest.mark.asyncio
+    async def test_queries_are_tagged_by_site(self, manager, metrics):
+        """ブロック内のクエリだけが呼び出し元タグ付きで記録されることをテスト"""
+        record = SimpleNamespace(elapsed=0.002, query="SELECT 1")
+
+        async with manager.acquire(site="vocab.weak_test"):
+            db._log_query(record)
+            async with manager.acquire():
+                db._log_query(record)  # 内側はタグを引き継ぐ
+        db._log_query(record)  # ブロック外（返却時のリセットなど）は記録しない
+
+        assert metrics.histogram("db.site.vocab.weak_test.ms").count == 2
+        assert list(metrics.histograms("db.site.")) == ["db.site.vocab.weak_test.ms"]
+
+    @pytest.mark.asyncio
+    async def test_untagged_site(self, manager, metrics):
+        """タグなしの acquire は "other" として記録されることをテスト"""
+        async with manager.acquire():
+            db._log_query(SimpleNamespace(elapsed=0.001, query="SELECT 1"))
+
+        assert metrics.histogram(f"db.site.{db.UNTAGGED_SITE}.ms").count == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_query_threshold(self, manager, metrics, monkeypatch):
+        """閾値以上のクエリが遅いクエリとして数えられることをテスト"""
+        monkeypatch.setattr(db, "DB_SLOW_QUERY_MS", 50)
+
+        async with manager.acquire(site="notebook.notebook_list"):
+            db._log_query(SimpleNamespace(elapsed=0.01, query="SELECT 1"))
+            db._log_query(SimpleNamespace(elapsed=0.08, query="SELECT pg_sleep(0.08)"))
+
+        assert metrics.counter("db.slow_queries") == 1
+
+    def test_pool_stats(self, manager):
+        """プールのゲージをテスト"""
+        assert manager.pool_stats() == {
+            "size": 3, "idle": 1, "in_use": 2, "waiting": 0, "min_size": 1, "max_size": 10,
+        }
+
+
+class TestReplicaRouting:
+    """読み取り専用レプリカへの振り分けのテスト"""
+
+    @pytest.fixture
+    def routed(self, manager):
+        replica = MagicMock()
+        replica.acquire = AsyncMock(return_value=MagicMock())
+        replica.release = AsyncMock()
+        replica.get_size.return_value = 1
+        replica.get_idle_size.return_value = 0
+        manager._replica = replica
+        manager._replica_healthy = True
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_readonly_goes_to_replica(self, routed, metrics):
+        """readonly の取得だけがレプリカに振り分けられることをテスト"""
+        async with routed.acquire(site="notebook.sys_notebooks", readonly=True) as conn:
+            assert conn is routed._replica.acquire.return_value
+        async with routed.acquire(site="notebook.notebook_add") as conn:
+            assert conn is routed._pool.acquire.return_value
+
+        routed._replica.release.assert_awaited_once()
+        assert metrics.counter("db.route.replica") == 1
+        assert metrics.counter("db.route.primary") == 1
+
+    @pytest.mark.asyncio
+    async def test_reads_own_writes_on_primary(self, routed, metrics):
+        """書き込んだユーザーの直後の読み取りは primary に向くことをテスト"""
+        async with routed.acquire(site="notebook.notebook_add", user_id="u1"):
+            pass
+        async with routed.acquire(site="notebook.notebook_list", readonly=True, user_id="u1") as conn:
+            assert conn is routed._pool.acquire.return_value
+        async with routed.acquire(site="notebook.notebook_list", readonly=True, user_id="u2") as conn:
+            assert conn is routed._replica.acquire.return_value
+
+        assert metrics.counter("db.route.sticky") == 1
+
+    @pytest.mark.asyncio
+    async def test_sticky_window_expires(self, routed):
+        """sticky 期間を過ぎればレプリカに戻ることをテスト"""
+        routed._sticky_sec = 0
+        async with routed.acquire(site="notebook.notebook_add", user_id="u1"):
+            pass
+        async with routed.acquire(readonly=True, user_id="u1") as conn:
+            assert conn is routed._replica.acquire.return_value
+        assert "u1" not in routed._recent_writes
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_replica_is_down(self, routed, metrics):
+        """レプリカに接続できなければ primary で読み、しばらくレプリカを使わないことをテスト"""
+        routed._replica.acquire = AsyncMock(side_effect=ConnectionRefusedError("down"))
+
+        async with routed.acquire(readonly=True) as conn:
+            assert conn is routed._pool.acquire.return_value
+        async with routed.acquire(readonly=True) as conn:
+            assert conn is routed._pool.acquire.return_value
+
+        routed._replica.acquire.assert_awaited_once()
+        assert routed._replica_healthy is False
+        assert metrics.counter("db.replica_failures") == 1
+        assert metrics.counter("db.route.fallback") == 2
+
+    @pytest.mark.asyncio
+    async def test_connection_lost_inside_block(self, routed, metrics):
+        """ブロック内で接続が切れたらレプリカを使えないものとして扱うことをテスト"""
+        with pytest.raises(ConnectionResetError):
+            async with routed.acquire(readonly=True):
+                raise ConnectionResetError("reset")
+
+        assert routed._replica_healthy is False
+        routed._replica.release.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_interface_error_keeps_replica(self, routed):
+        """呼び出し側の誤り（InterfaceError）ではレプリカを使えないものとしないことをテスト"""
+        with pytest.raises(asyncpg.InterfaceError):
+            async with routed.acquire(readonly=True):
+                raise asyncpg.InterfaceError("another operation is in progress")
+
+        assert routed._replica_healthy is True
+
+    @pytest.mark.asyncio
+    async def test_batch_writes_are_sticky(self, routed):
+        """まとめて書き込んだユーザー全員の読み取りが primary に向くことをテスト"""
+        routed.record_writes({"u1", "u2"})
+
+        for user_id in ("u1", "u2"):
+            async with routed.acquire(readonly=True, user_id=user_id) as conn:
+                assert conn is routed._pool.acquire.return_value
+
+    @pytest.mark.asyncio
+    async def test_without_replica(self, manager):
+        """レプリカ未設定なら readonly でも primary を使い、書き込みも記録しないことをテスト"""
+        async with manager.acquire(readonly=True) as conn:
+            assert conn is manager._pool.acquire.return_value
+        async with manager.acquire(user_id="u1"):
+            pass
+
+        assert manager._recent_writes == {}
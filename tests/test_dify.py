@@ -0,0 +1,547 @@
+"""
+Dify クライアント（dify.py）のテスト
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import dify
+from circuit_breaker import OPEN, CircuitBreaker
+from dify import (
+    LANE_ANSWER, LANE_QUESTION, DifyBusyError, DifyClient, DifyError, DifyLimiter, DifyPayloadError,
+    DifyUnavailableError, DifyUpstreamError, SyncDifyClient, partial_json_string,
+)
+
+# 出題（ReadingQuestion）としても採点（ReadingAnswer）としても読める outputs.text の中身
+PAYLOAD = {
+    "passage": "p",
+    "question_1_text": "q1", "question_1_choice_A": "a", "question_1_choice_B": "b", "question_1_answer": "A",
+    "question_2_text": "q2", "question_2_choice_A": "a", "question_2_choice_B": "b", "question_2_answer": "B",
+    "questions": [{"q1_reason": "r1", "feedback": "f1"}, {"q2_reason": "r2", "feedback": "f2"}],
+    "overall_feedback": "ok",
+}
+
+
+def _workflow_response(payload: dict) -> httpx.Response:
+    text = "```json\n" + json.dumps(payload) + "\n```"
+    return httpx.Response(200, json={"data": {"outputs": {"text": text}}})
+
+
+@pytest.fixture
+def recorded():
+    """受け取ったリクエストを記録し、PAYLOAD を返すトランスポート"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return _workflow_response(PAYLOAD)
+
+    return httpx.MockTransport(handler), requests
+
+
+def _client(transport) -> DifyClient:
+    return DifyClient(question_key="app-question", answer_key="app-answer", transport=transport)
+
+
+ANSWER_ARGS = dict(
+    user_id=1, passage="p",
+    q1_text="q1", q1_choices_str="A. a", q1_answer="A", q1_user="A",
+    q2_text="q2", q2_choices_str="B. b", q2_answer="B", q2_user="C",
+)
+
+
+class TestDifyClient:
+    """DifyClientのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_question_and_answer_share_client(self, recorded):
+        """出題と採点が同じクライアントを使い、キーはリクエストごとに切り替わることをテスト"""
+        transport, requests = recorded
+        client = await _client(transport).open()
+        http = client._http
+
+        question = await client.reading_question(user_id=1)
+        answer = await client.reading_answer(**ANSWER_ARGS)
+
+        assert question.passage == "p" and question.answer(2) == "B"
+        assert answer.question(1).reason == "r1" and answer.overall_feedback == "ok"
+        assert [r.headers["Authorization"] for r in requests] == ["Bearer app-question", "Bearer app-answer"]
+        assert json.loads(requests[0].content)["user"] == "1"
+        assert json.loads(requests[1].content)["inputs"]["question_2_User_Answer"] == "C"
+        assert client._http is http
+        await client.aclose()
+        assert http.is_closed
+
+    @pytest.mark.asyncio
+    async def test_without_open(self, recorded):
+        """open() 前でも1回限りのクライアントで送信できることをテスト"""
+        transport, requests = recorded
+
+        assert (await _client(transport).reading_question(user_id=1)).passage == "p"
+        assert len(requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_unparsable_text(self):
+        """outputs.text が JSON でなければ DifyPayloadError になり、ブレーカーは失敗と数えないことをテスト"""
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"outputs": {"text": "not json"}})
+        )
+        client = _client(transport)
+
+        with pytest.raises(DifyPayloadError):
+            await client.reading_question(user_id=1)
+        assert client.breaker.stats()["consecutive_failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_sloppy_text_is_repaired(self):
+        """前後の説明文・末尾カンマ・小文字の正解を直して読むことをテスト"""
+        text = "Here is your question:\n" + json.dumps(dict(PAYLOAD, question_1_answer="(a)"))[:-1] + ",}\nEnjoy!"
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"outputs": {"text": text}}))
+
+        q = await _client(transport).reading_question(user_id=1)
+
+        assert q.answer(1) == "A"
+
+    @pytest.mark.asyncio
+    async def test_http_error_status(self):
+        """2xx 以外は DifyError になることをテスト"""
+        transport = httpx.MockTransport(lambda request: httpx.Response(503, json={"message": "busy"}))
+
+        with pytest.raises(DifyError, match="HTTP 503"):
+            await _client(transport).reading_question(user_id=1)
+
+    @pytest.mark.asyncio
+    async def test_transport_error(self):
+        """接続エラーも DifyError に包まれることをテスト"""
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        with pytest.raises(DifyError, match="Failed to call Dify"):
+            await _client(httpx.MockTransport(handler)).reading_question(user_id=1)
+
+    @pytest.mark.asyncio
+    async def test_missing_key(self, recorded):
+        """APIキーがなければ送信せずに DifyError になることをテスト"""
+        transport, requests = recorded
+
+        with pytest.raises(DifyError, match="Missing Dify API key"):
+            await DifyClient(question_key="", transport=transport).reading_question(user_id=1)
+        assert requests == []
+
+
+def _sse(*events) -> bytes:
+    out = b""
+    for event in events:
+        out += b"event: ping\n\n" if event == "ping" else b"data: " + json.dumps(event).encode() + b"\n\n"
+    return out
+
+
+def _streaming_transport(body: bytes, requests: list) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=body)
+
+    return httpx.MockTransport(handler)
+
+
+QUESTION_TEXT = "```json\n" + json.dumps(dict(PAYLOAD, passage="The library opens at 9.")) + "\n```"
+
+
+class TestStreaming:
+    """streaming モードのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_passage_is_reported_progressively(self):
+        """text_chunk ごとに本文が伸びて渡され、最終結果は outputs.text から作られることをテスト"""
+        requests = []
+        chunks = [QUESTION_TEXT[i:i + 10] for i in range(0, len(QUESTION_TEXT), 10)]
+        body = _sse(
+            {"event": "workflow_started", "data": {}},
+            "ping",
+            *({"event": "text_chunk", "data": {"text": c}} for c in chunks),
+            {"event": "workflow_finished", "data": {"status": "succeeded", "outputs": {"text": QUESTION_TEXT}}},
+        )
+        seen = []
+
+        q = await _client(_streaming_transport(body, requests)).reading_question(user_id=1, on_passage=seen.append)
+
+        assert json.loads(requests[0].content)["response_mode"] == "streaming"
+        assert q.passage == "The library opens at 9."
+        assert seen[-1] == "The library opens at 9."
+        assert len(seen) > 1 and all(b.startswith(a) for a, b in zip(seen, seen[1:]))
+
+    @pytest.mark.asyncio
+    async def test_workflow_without_text_chunks(self):
+        """text_chunk を出さないワークフローでも最後に1回本文を渡すことをテスト"""
+        body = _sse({"event": "workflow_finished", "data": {"status": "succeeded", "outputs": {"text": QUESTION_TEXT}}})
+        seen = []
+
+        q = await _client(_streaming_transport(body, [])).reading_question(user_id=1, on_passage=seen.append)
+
+        assert seen == [q.passage]
+
+    @pytest.mark.asyncio
+    async def test_failed_workflow(self):
+        """workflow_finished が失敗なら DifyError になることをテスト"""
+        body = _sse({"event": "workflow_finished", "data": {"status": "failed", "error": "LLM timeout"}})
+
+        with pytest.raises(DifyError, match="LLM timeout"):
+            await _client(_streaming_transport(body, [])).reading_question(user_id=1, on_passage=lambda t: None)
+
+    @pytest.mark.asyncio
+    async def test_stream_cut_before_finish(self):
+        """workflow_finished の前にストリームが切れたら DifyError になることをテスト"""
+        body = _sse({"event": "text_chunk", "data": {"text": QUESTION_TEXT[:20]}})
+
+        with pytest.raises(DifyError, match="before workflow_finished"):
+            await _client(_streaming_transport(body, [])).reading_question(user_id=1, on_passage=lambda t: None)
+
+    @pytest.mark.asyncio
+    async def test_http_error_status(self):
+        """streaming でも 2xx 以外はボディ付きの DifyError になることをテスト"""
+        transport = httpx.MockTransport(lambda request: httpx.Response(429, json={"message": "slow down"}))
+
+        with pytest.raises(DifyError, match="HTTP 429.*slow down"):
+            await _client(transport).reading_question(user_id=1, on_passage=lambda t: None)
+
+
+class TestPartialJsonString:
+    """partial_json_string のテスト"""
+
+    def test_reads_unterminated_value(self):
+        """閉じていない文字列もエスケープを解いて読めた所まで返すことをテスト"""
+        assert partial_json_string('```json\n{"passage": "He said \\"hi', "passage") == 'He said "hi'
+
+    def test_drops_incomplete_escape(self):
+        """途中で切れたエスケープは含めないことをテスト"""
+        assert partial_json_string('{"passage": "caf\\u00e', "passage") == "caf"
+        assert partial_json_string('{"passage": "a\\', "passage") == "a"
+
+    def test_stops_at_closing_quote(self):
+        """閉じた値は後続のキーを含めずに返すことをテスト"""
+        assert partial_json_string('{"passage": "done", "question_1_text": "x', "passage") == "done"
+
+    def test_key_not_yet_present(self):
+        """キーがまだ届いていなければ None を返すことをテスト"""
+        assert partial_json_string('{"pass', "passage") is None
+
+
+class TestDifyLimiter:
+    """DifyLimiterのテスト"""
+
+    async def _hold(self, limiter, user, release, started, lane=None, on_queued=None, background=False):
+        async with limiter.slot(user, lane=lane, on_queued=on_queued, background=background):
+            started.append(user)
+            await release.wait()
+
+    @pytest.mark.asyncio
+    async def test_global_cap_and_fifo(self):
+        """全体の上限を超えた分は到着順に通すことをテスト"""
+        limiter = DifyLimiter(max_concurrency=2, lane_limits={})
+        release, started = asyncio.Event(), []
+        tasks = [asyncio.create_task(self._hold(limiter, f"u{i}", release, started)) for i in range(5)]
+        await asyncio.sleep(0)
+
+        assert started == ["u0", "u1"]
+        assert limiter.stats()["queued"] == 3
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["u0", "u1", "u2", "u3", "u4"]
+        assert limiter.active == 0
+
+    @pytest.mark.asyncio
+    async def test_full_lane_does_not_block_other_lane(self):
+        """出題レーンが埋まっていても、後から来た採点は先に通ることをテスト"""
+        limiter = DifyLimiter(max_concurrency=4, lane_limits={LANE_QUESTION: 1, LANE_ANSWER: 1})
+        release, started = asyncio.Event(), []
+        tasks = [
+            asyncio.create_task(self._hold(limiter, "q1", release, started, lane=LANE_QUESTION)),
+            asyncio.create_task(self._hold(limiter, "q2", release, started, lane=LANE_QUESTION)),
+            asyncio.create_task(self._hold(limiter, "a1", release, started, lane=LANE_ANSWER)),
+        ]
+        await asyncio.sleep(0)
+
+        assert started == ["q1", "a1"]
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started[-1] == "q2"
+
+    @pytest.mark.asyncio
+    async def test_one_call_per_user(self):
+        """同じユーザーの2件目は待たせずに DifyBusyError になることをテスト"""
+        limiter = DifyLimiter(max_concurrency=4, lane_limits={})
+        release, started = asyncio.Event(), []
+        task = asyncio.create_task(self._hold(limiter, "u1", release, started))
+        await asyncio.sleep(0)
+
+        with pytest.raises(DifyBusyError):
+            async with limiter.slot("u1"):
+                pass
+        release.set()
+        await task
+        async with limiter.slot("u1"):
+            pass
+        assert limiter.rejected == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_positions_are_reported(self):
+        """順番待ちの間、前が空くたびに新しい順番が知らされることをテスト"""
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={})
+        releases = [asyncio.Event() for _ in range(3)]
+        started, positions = [], []
+        tasks = [asyncio.create_task(self._hold(limiter, "u0", releases[0], started))]
+        tasks.append(asyncio.create_task(self._hold(limiter, "u1", releases[1], started)))
+        tasks.append(asyncio.create_task(
+            self._hold(limiter, "u2", releases[2], started, on_queued=positions.append)
+        ))
+        await asyncio.sleep(0)
+        assert positions == [2]
+
+        releases[0].set()
+        await asyncio.sleep(0.01)
+        assert positions == [2, 1]
+        for r in releases:
+            r.set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """順番待ちの上限時間を過ぎたら DifyError になり、列から外れることをテスト"""
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={}, queue_timeout_sec=0.01)
+        release, started = asyncio.Event(), []
+        task = asyncio.create_task(self._hold(limiter, "u0", release, started))
+        await asyncio.sleep(0)
+
+        with pytest.raises(DifyError, match="queue wait"):
+            async with limiter.slot("u1"):
+                pass
+        assert limiter.stats()["queued"] == 0
+        release.set()
+        await task
+        assert limiter.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """待っている呼び出しがキャンセルされたら列から外れることをテスト"""
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={})
+        release, started = asyncio.Event(), []
+        first = asyncio.create_task(self._hold(limiter, "u0", release, started))
+        waiting = asyncio.create_task(self._hold(limiter, "u1", release, started))
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.stats()["queued"] == 0
+        release.set()
+        await first
+        assert started == ["u0"]
+
+    @pytest.mark.asyncio
+    async def test_background_counts_against_user(self):
+        """低優先の呼び出しも同じユーザーの1件に数え、空き枠がなければ待たずに DifyBusyError になることをテスト"""
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={})
+        release, started = asyncio.Event(), []
+        task = asyncio.create_task(self._hold(limiter, "u1", release, started))
+        await asyncio.sleep(0)
+
+        with pytest.raises(DifyBusyError):
+            async with limiter.slot("u1", background=True):
+                pass
+        with pytest.raises(DifyBusyError):
+            async with limiter.slot("u2", background=True):
+                pass
+        assert limiter.stats()["queued"] == 0
+        release.set()
+        await task
+        assert limiter.active == 0
+
+    @pytest.mark.asyncio
+    async def test_same_user_call_preempts_background(self):
+        """本人の本番の呼び出しが来たら、本人の低優先の呼び出しをキャンセルして枠を引き継ぐことをテスト"""
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={})
+        release, started = asyncio.Event(), []
+        prefetch = asyncio.create_task(self._hold(limiter, "u1", release, started, background=True))
+        await asyncio.sleep(0)
+        assert limiter.stats()["background"] == 1
+
+        real = asyncio.create_task(self._hold(limiter, "u1", release, started))
+        await asyncio.sleep(0)
+        with pytest.raises(DifyBusyError):
+            async with limiter.slot("u1"):
+                pass  # 引き継いだあとも1ユーザー1件
+        with pytest.raises(asyncio.CancelledError):
+            await prefetch
+        release.set()
+        await real
+
+        assert started == ["u1", "u1"]
+        assert limiter.stats()["preempted"] == 1 and limiter.stats()["background"] == 0
+        assert limiter.active == 0
+        async with limiter.slot("u1"):
+            pass
+
+    @pytest.mark.asyncio
+    async def test_queued_call_preempts_background(self):
+        """ほかのユーザーの本番の呼び出しが順番待ちになったら、低優先の呼び出しが枠を譲ることをテスト"""
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={})
+        release, started = asyncio.Event(), []
+        prefetch = asyncio.create_task(self._hold(limiter, "u1", release, started, background=True))
+        await asyncio.sleep(0)
+
+        real = asyncio.create_task(self._hold(limiter, "u2", release, started))
+        with pytest.raises(asyncio.CancelledError):
+            await prefetch
+        await asyncio.sleep(0.01)
+
+        assert started == ["u1", "u2"]
+        release.set()
+        await real
+        assert limiter.active == 0
+        async with limiter.slot("u1"):
+            pass
+
+    @pytest.mark.asyncio
+    async def test_client_calls_go_through_limiter(self, recorded):
+        """DifyClient の呼び出しが出題/採点のレーンで枠を確保することをテスト"""
+        transport, _ = recorded
+        limiter = DifyLimiter(max_concurrency=1, lane_limits={})
+        lanes = []
+        original = limiter.slot
+
+        def slot(user_id, lane=None, on_queued=None, background=False):
+            lanes.append(lane)
+            return original(user_id, lane=lane, on_queued=on_queued, background=background)
+
+        limiter.slot = slot
+        client = DifyClient(question_key="k", answer_key="k", transport=transport, limiter=limiter)
+
+        await client.reading_question(user_id=1)
+        await client.reading_answer(**ANSWER_ARGS)
+
+        assert lanes == [LANE_QUESTION, LANE_ANSWER]
+
+
+class TestResilience:
+    """タイムアウト・サーキットブレーカー・ヘッジのテスト"""
+
+    def _failing_client(self, requests, status=503, **kwargs):
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(status, json={"message": "down"})
+
+        breaker = CircuitBreaker("dify_test", failure_threshold=3, cooldown_sec=60)
+        return DifyClient(question_key="k", transport=httpx.MockTransport(handler), breaker=breaker, **kwargs)
+
+    @pytest.mark.asyncio
+    async def test_breaker_opens_and_fails_fast(self):
+        """5xx が続いたら Dify を呼ばずに DifyUnavailableError にすることをテスト"""
+        requests = []
+        client = self._failing_client(requests)
+        for _ in range(3):
+            with pytest.raises(DifyUpstreamError):
+                await client.reading_question(user_id=1)
+
+        with pytest.raises(DifyUnavailableError):
+            await client.reading_question(user_id=1)
+        assert client.breaker.state == OPEN
+        assert len(requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_open_breaker(self):
+        """4xx は Dify が応答しているので失敗として数えないことをテスト"""
+        requests = []
+        client = self._failing_client(requests, status=400)
+        for _ in range(5):
+            with pytest.raises(DifyError) as excinfo:
+                await client.reading_question(user_id=1)
+            assert not isinstance(excinfo.value, DifyUpstreamError)
+
+        assert client.breaker.state != OPEN
+
+    @pytest.mark.asyncio
+    async def test_timeout_follows_observed_latency(self, recorded):
+        """観測した所要時間からタイムアウトが決まり、超えたら DifyUpstreamError になることをテスト"""
+        transport, _ = recorded
+        client = DifyClient(question_key="k", transport=transport)
+        tracker = client._latency_tracker(LANE_QUESTION)
+        for _ in range(tracker.min_samples):
+            tracker.observe(0.001)
+        tracker.min_sec = 0.05
+        assert tracker.timeout() == 0.05
+
+        async def slow(request):
+            await asyncio.sleep(1)
+            return _workflow_response(PAYLOAD)
+
+        client._transport = httpx.MockTransport(slow)
+        with pytest.raises(DifyUpstreamError, match="timed out"):
+            await client.reading_question(user_id=1)
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_wins(self):
+        """p95 を過ぎたら2本目を送り、先に返った方を使うことをテスト"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+            return _workflow_response(dict(PAYLOAD, passage=f"n{len(calls)}"))
+
+        client = DifyClient(question_key="k", transport=httpx.MockTransport(handler), hedge=True)
+        tracker = client._latency_tracker(LANE_QUESTION)
+        for _ in range(tracker.min_samples):
+            tracker.observe(0.02)
+
+        assert (await client.reading_question(user_id=1)).passage == "n2"
+        assert len(calls) == 2
+        assert client.limiter.active == 0, "2本目の実行枠も返す"
+
+    @pytest.mark.asyncio
+    async def test_hedge_skipped_when_lane_is_full(self):
+        """レーンに空きがなければ2本目を送らずに1本目を待つことをテスト"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.1)
+            return _workflow_response(PAYLOAD)
+
+        limiter = DifyLimiter(max_concurrency=4, lane_limits={LANE_QUESTION: 1})
+        client = DifyClient(question_key="k", transport=httpx.MockTransport(handler), limiter=limiter, hedge=True)
+        tracker = client._latency_tracker(LANE_QUESTION)
+        for _ in range(tracker.min_samples):
+            tracker.observe(0.02)
+
+        await client.reading_question(user_id=1)
+        assert len(calls) == 1
+        assert limiter.active == 0
+
+
+class TestSyncDifyClient:
+    """SyncDifyClientのテスト"""
+
+    def test_runs_outside_event_loop(self, recorded):
+        """イベントループの外からは同期的に結果を返すことをテスト"""
+        transport, requests = recorded
+        client = SyncDifyClient(question_key="app-question", answer_key="app-answer", transport=transport)
+
+        assert client.reading_answer(**ANSWER_ARGS).overall_feedback == "ok"
+        assert requests[0].headers["Authorization"] == "Bearer app-answer"
+
+    @pytest.mark.asyncio
+    async def test_refuses_inside_event_loop(self, recorded):
+        """イベントループの中から呼ぶと RuntimeError になることをテスト"""
+        transport, requests = recorded
+
+        with pytest.raises(RuntimeError, match="イベントループ"):
+            SyncDifyClient(transport=transport).reading_question(user_id=1)
+        assert requests == []
+
+
+def test_get_dify_client_is_shared():
+    """get_dify_client は同じインスタンスを返すことをテスト"""
+    assert dify.get_dify_client() is dify.get_dify_client()
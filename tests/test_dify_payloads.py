@@ -0,0 +1,149 @@
+"""
+Dify 出力のデコードと検証（dify_payloads.py）のテスト
+"""
+import json
+
+import pytest
+
+import dify_payloads
+from dify_payloads import (
+    PayloadError, ReadingAnswer, decode_json, extract_json_object, parse_reading_answer, parse_reading_question,
+    repair_json,
+)
+
+QUESTION = {
+    "passage": "The library opens at 9.",
+    "question_1_text": "When does it open?",
+    "question_1_choice_A": "At 8", "question_1_choice_B": "At 9", "question_1_choice_C": "At 10", "question_1_choice_D": "",
+    "question_1_answer": "B",
+    "question_2_text": "What opens?",
+    "question_2_choice_A": "A shop", "question_2_choice_B": "A library",
+    "question_2_answer": "B",
+}
+
+
+class TestDecodeJson:
+    """decode_jsonのテスト"""
+
+    @pytest.mark.parametrize("text", [
+        '{"a": 1}',
+        '```json\n{"a": 1}\n```',
+        '```\n{"a": 1}',
+        'Here is the result:\n{"a": 1}\nHope this helps!',
+        'Sure!\n```json\n{"a": 1}\n```\nAnything else?',
+        '{"a": 1,}',
+        '{“a”: 1}',
+    ])
+    def test_tolerated_wrappers(self, text):
+        """フェンス・前後の説明文・末尾カンマ・スマートクォートを許すことをテスト"""
+        assert decode_json(text) == {"a": 1}
+
+    def test_stdlib_fallback(self, monkeypatch):
+        """orjson がなくても同じ結果になることをテスト"""
+        monkeypatch.setattr(dify_payloads, "orjson", None)
+
+        assert decode_json('Result: {"a": [1, 2,],}') == {"a": [1, 2]}
+
+    @pytest.mark.parametrize("text", ["not json", "", "[1, 2]", '{"a": '])
+    def test_rejects(self, text):
+        """オブジェクトとして読めなければ PayloadError になることをテスト"""
+        with pytest.raises(PayloadError):
+            decode_json(text)
+
+
+class TestExtractJsonObject:
+    """extract_json_objectのテスト"""
+
+    def test_braces_inside_strings(self):
+        """文字列の中の括弧やフェンスでは切らないことをテスト"""
+        text = 'x {"a": "} ``` {", "b": {"c": "\\"}"}} y'
+
+        assert json.loads(extract_json_object(text)) == {"a": "} ``` {", "b": {"c": '"}'}}
+
+
+class TestRepairJson:
+    """repair_jsonのテスト"""
+
+    def test_smart_quotes_in_text_are_kept(self):
+        """区切りのスマートクォートだけを直し、本文中の “引用” は残すことをテスト"""
+        repaired = repair_json('{“passage”: “He said, “Stop,” and left.”, “n”: 1}')
+
+        assert json.loads(repaired) == {"passage": "He said, “Stop,” and left.", "n": 1}
+
+    def test_unescaped_quotes_and_newlines(self):
+        """文字列の中の " と生の改行をエスケープすることをテスト"""
+        repaired = repair_json('{"passage": "He said "hi"\nto me", "n": 1}')
+
+        assert json.loads(repaired) == {"passage": 'He said "hi"\nto me', "n": 1}
+
+    def test_valid_json_is_unchanged(self):
+        """正しい JSON は変えないことをテスト"""
+        text = json.dumps(QUESTION, indent=2)
+
+        assert repair_json(text) == text
+
+
+class TestReadingQuestion:
+    """parse_reading_questionのテスト"""
+
+    def test_typed_accessors(self):
+        """問題文・空でない選択肢・正解を取り出せることをテスト"""
+        q = parse_reading_question("```json\n" + json.dumps(QUESTION) + "\n```")
+
+        assert q.passage == "The library opens at 9."
+        assert q.choices(1) == {"A": "At 8", "B": "At 9", "C": "At 10"}
+        assert q.answer(2) == "B"
+        assert q.item_id is None
+
+    @pytest.mark.parametrize("raw, expected", [("b", "B"), ("(B)", "B"), ("B. At 9", "B"), ("Answer: B", "B")])
+    def test_answer_is_normalized(self, raw, expected):
+        """正解の表記ゆれを "A"〜"D" にそろえることをテスト"""
+        q = parse_reading_question(json.dumps(dict(QUESTION, question_1_answer=raw)))
+
+        assert q.answer(1) == expected
+
+    @pytest.mark.parametrize("change", [
+        {"passage": ""},
+        {"question_2_text": None},
+        {"question_1_answer": "D"},
+        {"question_2_choice_B": None},
+    ])
+    def test_rejects_incomplete(self, change):
+        """本文・問題文の欠け、選択肢にない正解、選択肢不足は PayloadError になることをテスト"""
+        with pytest.raises(PayloadError):
+            parse_reading_question(json.dumps(dict(QUESTION, **change)))
+
+    def test_round_trip(self):
+        """保存（model_dump_json）した出題を読み直せることをテスト（item_id は保存しない）"""
+        q = parse_reading_question(json.dumps(QUESTION))
+        q.item_id = 7
+
+        again = type(q).model_validate_json(q.model_dump_json())
+
+        assert again == parse_reading_question(json.dumps(QUESTION))
+        assert "item_id" not in q.model_dump()
+
+
+class TestReadingAnswer:
+    """parse_reading_answerのテスト"""
+
+    def test_numbered_reasons(self):
+        """q1_reason / q2_reason を reason にそろえることをテスト"""
+        result = parse_reading_answer(json.dumps({
+            "questions": [{"q1_reason": "r1", "feedback": "f1"}, {"q2_reason": "r2"}],
+            "overall_feedback": "ok",
+        }))
+
+        assert result.question(1).reason == "r1"
+        assert result.question(2).feedback == "-"
+        assert result.question(3) is None
+        assert result.overall_feedback == "ok"
+
+    def test_defaults(self):
+        """項目がなくても "-" で表示できることをテスト"""
+        assert parse_reading_answer("{}") == ReadingAnswer()
+
+    def test_rejects_wrong_shape(self):
+        """questions が配列でなければ PayloadError になることをテスト"""
+        with pytest.raises(PayloadError):
+            parse_reading_answer('{"questions": "none"}')
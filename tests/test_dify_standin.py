@@ -0,0 +1,150 @@
+"""
+ローカルの Dify 代替サーバー（scripts/dify_standin.py）のテスト
+
+DifyClient から実際の HTTP で呼び、ボットから使える形で応答することを確かめる。
+"""
+import json
+import random
+
+import httpx
+import pytest
+
+from dify import DifyClient, DifyPayloadError, DifyUpstreamError
+from scripts.dify_standin import (
+    MALFORMATIONS, READING_ITEMS, Recorder, Replayer, StandinConfig, fenced, parse_latency, start_standin,
+)
+
+ANSWER_ARGS = dict(
+    user_id=1, passage="p",
+    q1_text="q1", q1_choices_str="A. a B. b", q1_answer="A", q1_user="A",
+    q2_text="q2", q2_choices_str="A. a B. b", q2_answer="B", q2_user="A",
+)
+
+
+@pytest.fixture
+def standin():
+    servers = []
+
+    def start(**kwargs):
+        config = StandinConfig(**kwargs)
+        server, endpoint = start_standin(config)
+        servers.append(server)
+        return config, endpoint
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(endpoint) -> DifyClient:
+    return DifyClient(question_key="app-q", answer_key="app-a", endpoint=endpoint)
+
+
+class TestStandin:
+    """代替サーバーのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_question_and_answer(self, standin):
+        """出題は用意した問題を順に返し、採点は入力の解答から解説を組み立てることをテスト"""
+        _, endpoint = standin()
+        async with _client(endpoint) as client:
+            first = await client.reading_question(user_id=1)
+            second = await client.reading_question(user_id=1, on_passage=lambda text: None)
+            result = await client.reading_answer(**ANSWER_ARGS)
+
+        assert first.passage == READING_ITEMS[0]["passage"]
+        assert second.passage == READING_ITEMS[1]["passage"]
+        assert result.question(1).feedback == "Correct!"
+        assert result.overall_feedback == "You got 1 out of 2 correct."
+
+    @pytest.mark.asyncio
+    async def test_streaming_sends_chunks(self, standin):
+        """streaming では本文が少しずつ届くことをテスト"""
+        _, endpoint = standin(chunk_chars=8)
+        seen = []
+        async with _client(endpoint) as client:
+            q = await client.reading_question(user_id=1, on_passage=seen.append)
+
+        assert len(seen) > 10 and seen[-1] == q.passage
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("streaming", [False, True])
+    async def test_error_rate(self, standin, streaming):
+        """エラーにする回は blocking では 500、streaming では途中の error イベントになることをテスト"""
+        config, endpoint = standin(error_rate=1.0)
+        on_passage = (lambda text: None) if streaming else None
+        async with _client(endpoint) as client:
+            with pytest.raises(DifyUpstreamError):
+                await client.reading_question(user_id=1, on_passage=on_passage)
+
+        assert config.stats["question.errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_malformed_outputs(self, standin):
+        """崩した出力のうち途中で切れた JSON だけが DifyPayloadError になることをテスト"""
+        for name, malform in MALFORMATIONS.items():
+            assert malform(fenced(READING_ITEMS[0])) != fenced(READING_ITEMS[0]), name
+
+        config, endpoint = standin(malformed_rate=1.0, seed=1)
+        outcomes = []
+        async with _client(endpoint) as client:
+            for _ in range(12):
+                try:
+                    await client.reading_question(user_id=1)
+                    outcomes.append("ok")
+                except DifyPayloadError:
+                    outcomes.append("payload_error")
+
+        assert outcomes.count("payload_error") == config.stats["question.malformed.truncated"]
+        assert outcomes.count("ok") == 12 - outcomes.count("payload_error") > 0
+
+    @pytest.mark.asyncio
+    async def test_record_and_replay(self, standin, tmp_path):
+        """中継した応答を記録し、別のサーバーで同じ応答を再生できることをテスト"""
+        _, upstream = standin(items=[READING_ITEMS[1]])
+        path = tmp_path / "recorded.jsonl"
+        _, recording = standin(recorder=Recorder(upstream, path))
+        async with _client(recording) as client:
+            recorded = await client.reading_question(user_id=1)
+            await client.reading_answer(**ANSWER_ARGS)
+
+        entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [e["workflow"] for e in entries] == ["question", "answer"]
+        assert entries[1]["inputs"]["question_2_User_Answer"] == "A"
+
+        _, replaying = standin(replayer=Replayer(path))
+        async with _client(replaying) as client:
+            replayed = await client.reading_question(user_id=2, on_passage=lambda text: None)
+
+        assert replayed == recorded
+
+    @pytest.mark.asyncio
+    async def test_stats_endpoint(self, standin):
+        """GET /stats でワークフローごとの回数を返すことをテスト"""
+        _, endpoint = standin()
+        async with _client(endpoint) as client:
+            await client.reading_question(user_id=1)
+        async with httpx.AsyncClient() as http:
+            stats = (await http.get(endpoint.replace("/workflows/run", "/stats"))).json()
+
+        assert stats == {"question.calls": 1}
+
+
+@pytest.mark.parametrize("spec, low, high", [
+    ("fixed:250", 0.25, 0.25),
+    ("uniform:100,200", 0.1, 0.2),
+    ("lognormal:1000,0.5", 0.0, 60.0),
+])
+def test_parse_latency(spec, low, high):
+    """所要時間の分布を秒で返すことをテスト"""
+    draw = parse_latency(spec)
+    rng = random.Random(0)
+
+    assert all(low <= draw(rng) <= high for _ in range(100))
+
+
+def test_parse_latency_rejects_unknown():
+    """不正な指定は ValueError になることをテスト"""
+    with pytest.raises(ValueError):
+        parse_latency("normal:1")
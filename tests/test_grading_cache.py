@@ -0,0 +1,178 @@
+"""
+採点結果キャッシュ（grading_cache.py）のテスト
+"""
+import json
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import dify
+import grading_cache
+from dify_payloads import ReadingAnswer
+from grading_cache import GradingCache, grading_key
+
+GOOD = ReadingAnswer(overall_feedback="good")
+ANSWER_ARGS = dict(
+    user_id=1, passage="p",
+    q1_text="q1", q1_choices_str="A. a", q1_answer="A", q1_user="A",
+    q2_text="q2", q2_choices_str="B. b", q2_answer="B", q2_user="C",
+)
+
+
+class FakeTable:
+    """grading.* のクエリを真似るインメモリの grading_cache"""
+
+    def __init__(self):
+        self.rows = {}
+        self.reads = 0
+
+    async def run_query(self, conn, method, name, *args):
+        now = time.time()
+        if name == "grading.get":
+            self.reads += 1
+            row = self.rows.get(args[0])
+            if row is None or row[1] <= now:
+                return None
+            return {"result": row[0], "ttl_sec": row[1] - now}
+        if name == "grading.put":
+            key, result, ttl_sec = args
+            self.rows[key] = (result, now + ttl_sec)
+            return "INSERT 0 1"
+        if name == "grading.purge_expired":
+            expired = [k for k, (_, exp) in self.rows.items() if exp <= now]
+            for k in expired:
+                del self.rows[k]
+            return f"DELETE {len(expired)}"
+        if name == "grading.purge_all":
+            count = len(self.rows)
+            self.rows.clear()
+            return f"DELETE {count}"
+        raise KeyError(name)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    fake = FakeTable()
+
+    @asynccontextmanager
+    async def acquire(site=None, readonly=False):
+        yield MagicMock()
+
+    manager = MagicMock()
+    manager.acquire = acquire
+    monkeypatch.setattr(grading_cache, "get_db_manager", lambda: manager)
+    monkeypatch.setattr(grading_cache, "run_query", fake.run_query)
+    return fake
+
+
+@pytest.fixture
+def dify_answer(monkeypatch):
+    client = MagicMock()
+    client.reading_answer = AsyncMock(return_value=GOOD)
+    monkeypatch.setattr(dify, "get_dify_client", lambda: client)
+    return client.reading_answer
+
+
+class TestGradingKey:
+    """grading_keyのテスト"""
+
+    def test_ignores_user_id(self):
+        """同じ入力なら解いたユーザーが違っても同じキーになることをテスト"""
+        assert grading_key(**ANSWER_ARGS) == grading_key(**dict(ANSWER_ARGS, user_id=2))
+
+    def test_user_answers_change_key(self):
+        """解答が違えば別のキーになることをテスト"""
+        assert grading_key(**ANSWER_ARGS) != grading_key(**dict(ANSWER_ARGS, q2_user="B"))
+
+
+class TestGradingCache:
+    """GradingCacheのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_second_grading_skips_dify(self, table, dify_answer):
+        """同じ採点の2回目は Dify を呼ばずに返すことをテスト"""
+        cache = GradingCache()
+
+        first = await cache.reading_answer(**ANSWER_ARGS)
+        second = await cache.reading_answer(**dict(ANSWER_ARGS, user_id=2))
+
+        assert first == second == GOOD
+        assert dify_answer.await_count == 1
+        assert table.reads == 1, "2回目はメモリから返る"
+
+    @pytest.mark.asyncio
+    async def test_db_tier_is_shared(self, table, dify_answer):
+        """別プロセス（メモリが空）でも DB から返し、メモリに載せることをテスト"""
+        await GradingCache().reading_answer(**ANSWER_ARGS)
+        other = GradingCache()
+
+        assert await other.reading_answer(**ANSWER_ARGS) == GOOD
+        assert dify_answer.await_count == 1
+        assert len(other) == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_are_misses(self, table):
+        """期限切れはメモリ・DB どちらからも返さないことをテスト"""
+        cache = GradingCache(ttl_sec=0.01)
+        await cache.put("k", GOOD)
+        time.sleep(0.02)
+
+        assert await cache.get("k") is None
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self, table):
+        """メモリは max_entries 件を超えたら古いものから捨てることをテスト"""
+        cache = GradingCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            await cache.put(key, ReadingAnswer(overall_feedback=key))
+
+        assert list(cache._entries) == ["b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_payload_error_is_not_cached(self, table, dify_answer):
+        """解析できなかった採点結果はキャッシュしないことをテスト"""
+        dify_answer.side_effect = dify.DifyPayloadError("Answer: not json")
+        cache = GradingCache()
+
+        for _ in range(2):
+            with pytest.raises(dify.DifyPayloadError):
+                await cache.reading_answer(**ANSWER_ARGS)
+
+        assert dify_answer.await_count == 2
+        assert table.rows == {}
+
+    @pytest.mark.asyncio
+    async def test_unreadable_db_entry_is_a_miss(self, table, dify_answer):
+        """DB の内容が採点結果の形でなければ採点し直すことをテスト"""
+        table.rows[grading_key(**ANSWER_ARGS)] = ('"broken"', time.time() + 60)
+
+        assert await GradingCache().reading_answer(**ANSWER_ARGS) == GOOD
+        assert dify_answer.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_db_error_falls_back_to_dify(self, monkeypatch, dify_answer):
+        """DB が使えなくても採点は Dify で続くことをテスト"""
+        @asynccontextmanager
+        async def acquire(site=None, readonly=False):
+            raise OSError("connection refused")
+            yield
+
+        manager = MagicMock()
+        manager.acquire = acquire
+        monkeypatch.setattr(grading_cache, "get_db_manager", lambda: manager)
+
+        assert await GradingCache().reading_answer(**ANSWER_ARGS) == GOOD
+
+    @pytest.mark.asyncio
+    async def test_purge(self, table):
+        """期限切れだけ / 全件の削除をテスト"""
+        cache = GradingCache(ttl_sec=60)
+        await cache.put("live", GOOD)
+        table.rows["old"] = (json.dumps({"overall_feedback": "old"}), time.time() - 1)
+
+        assert await cache.purge() == 1
+        assert len(cache) == 1
+        assert await cache.purge(expired_only=False) == 1
+        assert len(cache) == 0
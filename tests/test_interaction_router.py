@@ -0,0 +1,148 @@
+"""
+インタラクションの振り分け（interaction_router.py）のテスト
+"""
+from unittest.mock import AsyncMock, MagicMock
+
+import discord
+import pytest
+
+import interaction_router
+from interaction_router import InteractionRouter, routed_view
+from metrics import get_metrics
+
+
+class AnswerButton(discord.ui.DynamicItem[discord.ui.Button], template=r"quiz:ans:(?P<sid>\w+):(?P<key>[A-D])"):
+    def __init__(self, sid: str, key: str):
+        super().__init__(discord.ui.Button(label=key, custom_id=f"quiz:ans:{sid}:{key}"))
+
+
+class Handlers:
+    """呼ばれたハンドラーと引数を記録する"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def exact(self, interaction):
+        self.calls.append(("exact",))
+
+    async def prefix(self, interaction, rest):
+        self.calls.append(("prefix", rest))
+
+    async def long_prefix(self, interaction, rest):
+        self.calls.append(("long_prefix", rest))
+
+    async def answer(self, interaction, match):
+        self.calls.append(("answer", match["sid"], match["key"]))
+
+    async def broken(self, interaction):
+        raise RuntimeError("boom")
+
+
+def _interaction(custom_id, kind=discord.InteractionType.component):
+    interaction = MagicMock()
+    interaction.type = kind
+    interaction.data = {"custom_id": custom_id}
+    return interaction
+
+
+@pytest.fixture
+def router():
+    get_metrics().reset()
+    handlers = Handlers()
+    router = InteractionRouter()
+    router.add("quiz:start", handlers.exact)
+    router.add("quiz:", handlers.prefix)
+    router.add("quiz:feedback:", handlers.long_prefix)
+    router.add("quiz:ans:", handlers.answer, template=AnswerButton)
+    return router, handlers
+
+
+class TestDispatch:
+    """InteractionRouter.dispatch のテスト"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("custom_id, expected", [
+        ("quiz:start", ("exact",)),
+        ("quiz:other", ("prefix", "other")),
+        ("quiz:feedback:brief", ("long_prefix", "brief")),
+        ("quiz:ans:s1:B", ("answer", "s1", "B")),
+    ])
+    async def test_wakes_exactly_one_handler(self, router, custom_id, expected):
+        """完全一致 → 長い接頭辞の順で、1つのハンドラーだけを呼ぶことをテスト"""
+        router, handlers = router
+
+        assert await router.dispatch(_interaction(custom_id)) is True
+        assert handlers.calls == [expected]
+
+    @pytest.mark.asyncio
+    async def test_unrouted_and_malformed(self, router):
+        """どのルートにも当たらない・テンプレートに合わないものは呼ばずに数えることをテスト"""
+        router, handlers = router
+
+        assert await router.dispatch(_interaction("menu:vocab")) is False
+        assert await router.dispatch(_interaction("quiz:ans:s1:Z")) is False
+        assert await router.dispatch(_interaction("quiz:start", kind=discord.InteractionType.application_command)) is False
+
+        assert handlers.calls == []
+        assert get_metrics().counter("interactions.unrouted") == 1
+        assert get_metrics().counter("interactions.malformed") == 1
+
+    @pytest.mark.asyncio
+    async def test_per_route_metrics(self, router):
+        """ルートごとに件数と処理時間を記録することをテスト"""
+        router, _ = router
+
+        await router.dispatch(_interaction("quiz:ans:s1:A"))
+        await router.dispatch(_interaction("quiz:ans:s2:C"))
+
+        assert get_metrics().counter("interactions.quiz.ans") == 2
+        assert get_metrics().histogram("interactions.quiz.ans_ms").count == 2
+
+    @pytest.mark.asyncio
+    async def test_handler_error_is_reported(self, router, monkeypatch):
+        """ハンドラーの例外はエラー処理に渡して数えることをテスト"""
+        router, handlers = router
+        router.add("quiz:broken", handlers.broken)
+        handle = AsyncMock()
+        monkeypatch.setattr(interaction_router.ErrorHandler, "handle_interaction_error", handle)
+
+        assert await router.dispatch(_interaction("quiz:broken")) is True
+
+        handle.assert_awaited_once()
+        assert get_metrics().counter("interactions.quiz.broken.errors") == 1
+        assert get_metrics().histogram("interactions.quiz.broken_ms").count == 1
+
+
+class TestRegistration:
+    """ルートの登録と削除のテスト"""
+
+    def test_rejects_conflicting_route(self, router):
+        """同じキーに別のハンドラーを登録できないことをテスト（同じハンドラーなら再登録できる）"""
+        router, handlers = router
+
+        router.add("quiz:start", handlers.exact)
+        with pytest.raises(ValueError):
+            router.add("quiz:start", handlers.broken)
+        with pytest.raises(ValueError):
+            router.add("quiz:finish", handlers.answer, template=AnswerButton)
+
+    def test_remove_owner(self, router):
+        """cog_unload 用に、あるオブジェクトのルートだけをまとめて削除できることをテスト"""
+        router, handlers = router
+        other = Handlers()
+        router.add("other:start", other.exact)
+
+        assert router.remove_owner(handlers) == 4
+        assert len(router) == 1
+        assert router.resolve("quiz:start") is None
+        assert router.resolve("other:start").name == "other.start"
+
+
+@pytest.mark.asyncio
+async def test_routed_view_is_not_stored():
+    """routed_view は送る前に止めた View を返す（ViewStore に残らない）ことをテスト"""
+    view = routed_view(AnswerButton("s1", "A"))
+
+    assert view.is_finished()
+    assert [item.custom_id for item in view.children] == ["quiz:ans:s1:A"]
+    assert view.children[0].template.fullmatch("quiz:ans:s1:A")
@@ -0,0 +1,55 @@
+"""
+メインメニュー（cogs/menu.py）のテスト
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import cogs.menu as menu
+
+
+def _labels(view) -> list:
+    return [item.label for item in view.children]
+
+
+class TestVocabButton:
+    """「英単語」ボタンのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_responds_before_due_count(self, monkeypatch):
+        """復習の枚数を数える前に応答し、数えたらボタンに書き足すことをテスト"""
+        gate = asyncio.Event()
+        edits = []
+
+        async def due_count(user_id):
+            await gate.wait()
+            return 3
+
+        async def safe_edit_message(interaction, embed=None, view=None, content=None):
+            edits.append(view)
+            return True
+
+        monkeypatch.setattr(menu, "_due_count", due_count)
+        monkeypatch.setattr(menu.ErrorHandler, "safe_edit_message", safe_edit_message)
+        interaction = MagicMock()
+        interaction.user.id = 1
+
+        task = asyncio.create_task(menu.Menu(None).vocab_btn(interaction))
+        await asyncio.sleep(0)
+        assert len(edits) == 1 and "今日の復習" in _labels(edits[0]), "枚数を待たずにメニューを出す"
+
+        gate.set()
+        await task
+        assert len(edits) == 2 and "今日の復習（3）" in _labels(edits[1])
+
+    @pytest.mark.asyncio
+    async def test_failed_due_count_keeps_menu(self, monkeypatch):
+        """枚数が取れなければ、出したメニューをそのまま残すことをテスト"""
+        safe_edit_message = AsyncMock(return_value=True)
+        monkeypatch.setattr(menu, "_due_count", AsyncMock(return_value=None))
+        monkeypatch.setattr(menu.ErrorHandler, "safe_edit_message", safe_edit_message)
+
+        await menu.Menu(None).vocab_btn(MagicMock())
+
+        assert safe_edit_message.await_count == 1
@@ -0,0 +1,64 @@
+"""
+単語帳（cogs/notebook.py）のテスト
+"""
+from unittest.mock import AsyncMock, MagicMock
+
+import asyncpg
+import pytest
+
+import cogs.notebook as notebook
+from db import QUERIES, DatabaseManager
+from word_catalog import WordCatalog, WordRecord
+
+
+def _pool(conn):
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=conn)
+    pool.release = AsyncMock()
+    pool.get_size.return_value = 1
+    pool.get_idle_size.return_value = 0
+    return pool
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """readonly の取得を、書き込みを拒むレプリカに振り分ける DatabaseManager"""
+    replica_conn = MagicMock()
+    replica_conn.fetchrow = AsyncMock(return_value={"notebook_id": 1, "name": "mine", "is_system": True})
+    replica_conn.fetch = AsyncMock(return_value=[{"word_id": 7}])
+    replica_conn.execute = AsyncMock(
+        side_effect=asyncpg.ReadOnlySQLTransactionError("cannot execute INSERT in a read-only transaction")
+    )
+    primary_conn = MagicMock()
+    primary_conn.execute = AsyncMock(return_value="INSERT 0 1")
+
+    manager = DatabaseManager("postgresql://test", replica_url="postgresql://replica")
+    manager._pool = _pool(primary_conn)
+    manager._replica = _pool(replica_conn)
+    manager._replica_healthy = True
+
+    catalog = WordCatalog()
+    catalog.replace([WordRecord(7, "apple", "りんご", "noun", 1, None, None, (), ())])
+    registry = MagicMock()
+    monkeypatch.setattr(notebook, "get_db_manager", lambda: manager)
+    monkeypatch.setattr(notebook, "get_word_catalog", lambda: catalog)
+    monkeypatch.setattr(notebook, "get_session_registry", lambda: registry)
+    return manager, primary_conn, replica_conn, registry
+
+
+class TestNotebookStudy:
+    """notebook_study のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_batch_is_written_on_primary(self, routed, mock_interaction):
+        """単語はレプリカで読み、セッションバッチは primary に書いてから View を登録することをテスト"""
+        manager, primary_conn, replica_conn, registry = routed
+        cog = notebook.Notebook(bot=None)
+
+        await notebook.Notebook.notebook_study.callback(cog, mock_interaction, "mine")
+
+        replica_conn.execute.assert_not_awaited()
+        primary_conn.execute.assert_awaited_once()
+        assert primary_conn.execute.await_args.args[0] == QUERIES["vocab.record_batch"]
+        registry.put.assert_called_once()
+        mock_interaction.followup.send.assert_not_awaited()
@@ -0,0 +1,174 @@
+"""
+接続プールのサイズ調整（pool_controller.py）のテスト
+"""
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from db import DatabaseManager
+from pool_controller import PoolController
+from settings import DatabaseConfig
+
+
+@pytest.fixture
+def controller():
+    return PoolController(min_size=1, max_size=10, target_wait_ms=5, max_age_sec=1800)
+
+
+class TestPoolController:
+    """PoolControllerのテスト"""
+
+    def test_grows_when_waits_exceed_target(self, controller):
+        """待ち p99 が目標を超えたら、ピーク時の使用数まで増やすことをテスト"""
+        for _ in range(50):
+            controller.observe_wait(0.5, 1)
+        controller.observe_wait(40, 4)
+
+        assert controller.tick() == 4
+        assert controller.grows == 1
+
+    def test_grows_by_waiting_callers(self, controller):
+        """待っている呼び出しがあれば、その分だけ増やすことをテスト"""
+        controller.target = 3
+        controller.observe_wait(1, 3)
+
+        assert controller.tick(waiting=2) == 5
+
+    def test_never_exceeds_max(self, controller):
+        """上限を超えないことをテスト"""
+        controller.target = 9
+        controller.observe_wait(100, 9)
+
+        assert controller.tick(waiting=5) == 10
+
+    def test_shrinks_one_step_when_idle(self, controller):
+        """待ちがなく余っていれば1つずつ下限まで減らすことをテスト"""
+        controller.target = 4
+        assert [controller.tick() for _ in range(4)] == [3, 2, 1, 1]
+        assert controller.shrinks == 3
+
+    def test_keeps_target_when_fully_used(self, controller):
+        """待ちはないが目標どおり使われている間は変えないことをテスト"""
+        controller.target = 4
+        controller.observe_wait(0.3, 3)
+
+        assert controller.tick() == 4
+
+    def test_window_resets_after_tick(self, controller):
+        """tick で観測がリセットされることをテスト"""
+        controller.observe_wait(50, 3)
+        controller.tick()
+        grown = controller.target
+
+        assert controller.tick() == grown - 1
+
+    def test_surplus_counts_only_idle(self, controller):
+        """目標を超えた分のうち、アイドルの接続だけを閉じる対象にすることをテスト"""
+        controller.target = 3
+
+        assert controller.surplus(size=6, idle=5) == 3
+        assert controller.surplus(size=6, idle=1) == 1
+        assert controller.surplus(size=3, idle=3) == 0
+
+    def test_should_retire_by_age(self, controller):
+        """寿命切れの接続だけを閉じる判定をテスト"""
+        assert controller.should_retire(10) is False
+        assert controller.should_retire(1800) is True
+        assert controller.should_retire(None) is False
+
+    def test_invalid_bounds(self):
+        """上下限が逆転していれば ValueError になることをテスト"""
+        with pytest.raises(ValueError):
+            PoolController(min_size=5, max_size=2, target_wait_ms=5)
+
+
+class TestDatabaseManagerRetirement:
+    """DatabaseManagerの返却時の接続の作り直しのテスト"""
+
+    @pytest.fixture
+    def manager(self, controller):
+        pool = MagicMock()
+        pool.release = AsyncMock()
+        pool.get_size.return_value = 2
+        pool.get_idle_size.return_value = 0
+        mgr = DatabaseManager("postgresql://test")
+        mgr._pool = pool
+        mgr._controller = controller
+        controller.target = 2
+        return mgr
+
+    def _conn(self, age_sec):
+        conn = MagicMock()
+        conn.is_closed.return_value = False
+        conn.close = AsyncMock()
+        conn.created_at = time.monotonic() - age_sec
+        return conn
+
+    @pytest.mark.asyncio
+    async def test_old_connection_is_closed_before_release(self, manager):
+        """寿命を過ぎた接続は閉じてから返却することをテスト"""
+        conn = self._conn(age_sec=3600)
+        manager._pool.acquire = AsyncMock(return_value=conn)
+
+        async with manager.acquire(site="test"):
+            pass
+
+        conn.close.assert_awaited_once()
+        manager._pool.release.assert_awaited_once_with(conn)
+
+    @pytest.mark.asyncio
+    async def test_young_connection_is_reused(self, manager):
+        """寿命内で目標サイズ以内なら閉じずに返却することをテスト"""
+        conn = self._conn(age_sec=1)
+        manager._pool.acquire = AsyncMock(return_value=conn)
+
+        async with manager.acquire(site="test"):
+            pass
+
+        conn.close.assert_not_awaited()
+        manager._pool.release.assert_awaited_once_with(conn)
+
+    @pytest.mark.asyncio
+    async def test_surplus_connection_is_closed_on_release(self, manager):
+        """目標サイズを超えている分は、返却時に閉じてから返すことをテスト"""
+        conn = self._conn(age_sec=1)
+        manager._pool.acquire = AsyncMock(return_value=conn)
+        manager._pool.get_size.return_value = 4
+        manager._pool.get_idle_size.return_value = 1
+
+        async with manager.acquire(site="test"):
+            pass
+
+        conn.close.assert_awaited_once()
+        manager._pool.release.assert_awaited_once_with(conn)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("idle, prewarmed", [(0, True), (1, False)])
+    async def test_adjust_pool_grows_one_at_a_time(self, manager, idle, prewarmed):
+        """目標に足りなければ、アイドル接続がないときだけ1本ずつ先に接続することをテスト"""
+        conn = self._conn(age_sec=1)
+        manager._pool.acquire = AsyncMock(return_value=conn)
+        manager._pool.get_size.return_value = 1
+        manager._pool.get_idle_size.return_value = idle
+        manager._controller.tick = lambda waiting: 4
+
+        assert await manager.adjust_pool() == 4
+
+        assert manager._pool.acquire.await_count == (1 if prewarmed else 0)
+        assert manager._pool.release.await_count == manager._pool.acquire.await_count
+
+
+class TestDatabaseConfig:
+    """DatabaseConfigのプール設定のテスト"""
+
+    def test_pool_bounds_from_env(self, monkeypatch):
+        """環境変数から上下限を読み、上限は下限未満にならないことをテスト"""
+        monkeypatch.setenv("DB_POOL_MIN_SIZE", "4")
+        monkeypatch.setenv("DB_POOL_MAX_SIZE", "2")
+        monkeypatch.setenv("DB_POOL_TARGET_WAIT_MS", "3")
+
+        config = DatabaseConfig.from_env()
+
+        assert (config.pool_min_size, config.pool_max_size) == (4, 4)
+        assert config.pool_target_wait_ms == 3.0
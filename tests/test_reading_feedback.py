@@ -0,0 +1,237 @@
+"""
+長文読解の採点結果の表示（reading_feedback.py）のテスト
+"""
+import json
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import cogs.reading as reading_cog
+import reading_feedback
+from dify import DifyUpstreamError
+from dify_payloads import parse_reading_question
+from reading_feedback import FEEDBACK_BRIEF, FEEDBACK_FULL, get_feedback_mode, needs_explanation, set_feedback_mode
+from reading_sessions import ReadingSession
+from tests.test_dify_payloads import QUESTION
+
+
+class FakeUsers:
+    """reading_feedback.* のクエリを真似るインメモリの users"""
+
+    def __init__(self):
+        self.modes = {}
+        self.fail = False
+
+    async def run_query(self, conn, method, name, *args):
+        if self.fail:
+            raise ConnectionError("db down")
+        if name == "reading_feedback.get":
+            return self.modes.get(args[0])
+        if name == "reading_feedback.set":
+            self.modes[args[0]] = args[1]
+            return "INSERT 0 1"
+        raise KeyError(name)
+
+
+@pytest.fixture
+def users(monkeypatch):
+    fake = FakeUsers()
+
+    @asynccontextmanager
+    async def acquire(site=None, readonly=False, user_id=None):
+        yield MagicMock()
+
+    manager = MagicMock()
+    manager.acquire = acquire
+    monkeypatch.setattr(reading_feedback, "get_db_manager", lambda: manager)
+    monkeypatch.setattr(reading_feedback, "run_query", fake.run_query)
+    return fake
+
+
+def _answered(q1: str, q2: str) -> ReadingSession:
+    session = ReadingSession.new("1", parse_reading_question(json.dumps(QUESTION)))
+    session.record(1, q1)
+    session.record(2, q2)
+    return session
+
+
+class TestLocalScoring:
+    """セッションの正解からの採点のテスト"""
+
+    def test_correct_count(self):
+        """正解（B / B）と比べて正誤を数えることをテスト"""
+        session = _answered("B", "A")
+
+        assert session.is_correct(1) and not session.is_correct(2)
+        assert session.correct_count() == 1
+
+    @pytest.mark.parametrize("q1, q2, mode, expected", [
+        ("B", "B", FEEDBACK_BRIEF, False),
+        ("B", "A", FEEDBACK_BRIEF, True),
+        ("B", "B", FEEDBACK_FULL, True),
+    ])
+    def test_needs_explanation(self, q1, q2, mode, expected):
+        """簡潔モードで全問正解のときだけ Dify の解説を省くことをテスト"""
+        assert needs_explanation(_answered(q1, q2), mode) is expected
+
+
+class TestFeedbackMode:
+    """解説の詳しさの保存と読み取りのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_default_and_round_trip(self, users):
+        """未登録なら full、保存した値はそのまま読めることをテスト"""
+        assert await get_feedback_mode(1) == FEEDBACK_FULL
+
+        await set_feedback_mode(1, FEEDBACK_BRIEF)
+
+        assert await get_feedback_mode(1) == FEEDBACK_BRIEF
+        assert users.modes == {"1": FEEDBACK_BRIEF}
+
+    @pytest.mark.asyncio
+    async def test_db_error_means_full(self, users):
+        """DB エラーのときは解説を省かない（full）ことをテスト"""
+        users.modes["1"] = FEEDBACK_BRIEF
+        users.fail = True
+
+        assert await get_feedback_mode(1) == FEEDBACK_FULL
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_mode(self, users):
+        """不明な値は保存しないことをテスト"""
+        with pytest.raises(ValueError):
+            await set_feedback_mode(1, "verbose")
+        assert users.modes == {}
+
+
+class FakeChannel:
+    """送ったメッセージと、そのメッセージへの編集を記録するチャンネル"""
+
+    def __init__(self):
+        self.message = MagicMock()
+        self.edits = []
+
+        async def edit(**fields):
+            self.edits.append(fields)
+
+        self.message.edit = edit
+
+    async def send(self, **fields):
+        return self.message
+
+    @asynccontextmanager
+    async def typing(self):
+        yield
+
+
+class TestGrade:
+    """採点（cogs/reading.py の _grade）の失敗時の表示のテスト"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error, raises", [
+        (DifyUpstreamError("workflow failed"), False),
+        (RuntimeError("boom"), True),
+    ])
+    async def test_failure_still_shows_end_view(self, monkeypatch, error, raises):
+        """想定外のエラーでも「解説を作成中」のまま残さず、結果と続きのボタンを出すことをテスト"""
+        cache = MagicMock()
+
+        async def reading_answer(**kwargs):
+            raise error
+
+        async def feedback_mode(user_id):
+            return FEEDBACK_FULL
+
+        cache.reading_answer = reading_answer
+        monkeypatch.setattr(reading_cog, "get_grading_cache", lambda: cache)
+        monkeypatch.setattr(reading_cog, "get_feedback_mode", feedback_mode)
+        channel = FakeChannel()
+
+        if raises:
+            with pytest.raises(RuntimeError):
+                await reading_cog.ReadingCog._grade(None, channel, _answered("B", "A"))
+        else:
+            await reading_cog.ReadingCog._grade(None, channel, _answered("B", "A"))
+
+        assert len(channel.edits) == 1
+        assert channel.edits[0]["embed"].fields[-1].value == reading_cog.GRADE_FAILED_MESSAGE
+        assert isinstance(channel.edits[0]["view"], reading_cog.ReadingEndView)
+
+
+def _custom_ids(view) -> list:
+    return [item.custom_id for item in view.children]
+
+
+class TestEndViewKind:
+    """「もう一問」が終わった問題と同じ種類で再出題することのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_custom_ids_carry_kind(self):
+        """「もう一問」と解説の切り替えボタンの custom_id に種類が入ることをテスト"""
+        view = reading_cog.ReadingEndView(FEEDBACK_FULL, "eiken")
+
+        assert _custom_ids(view) == ["reading:again:eiken", "reading:back_main", "reading:feedback:brief:eiken"]
+
+    @pytest.mark.asyncio
+    async def test_too_long_kind_falls_back(self):
+        """custom_id の上限を超える種類は種類なしの ID にすることをテスト"""
+        view = reading_cog.ReadingEndView(FEEDBACK_BRIEF, "x" * 100)
+
+        assert _custom_ids(view) == ["reading:again", "reading:back_main", "reading:feedback:full"]
+
+    @pytest.mark.asyncio
+    async def test_grade_uses_session_kind(self, monkeypatch):
+        """採点結果の「もう一問」にセッションの種類が付くことをテスト"""
+        cache = MagicMock()
+
+        async def reading_answer(**kwargs):
+            raise DifyUpstreamError("workflow failed")
+
+        async def feedback_mode(user_id):
+            return FEEDBACK_FULL
+
+        cache.reading_answer = reading_answer
+        monkeypatch.setattr(reading_cog, "get_grading_cache", lambda: cache)
+        monkeypatch.setattr(reading_cog, "get_feedback_mode", feedback_mode)
+        channel = FakeChannel()
+        session = ReadingSession.new("1", parse_reading_question(json.dumps(QUESTION)), kind="eiken")
+        session.record(1, "B")
+        session.record(2, "A")
+
+        await reading_cog.ReadingCog._grade(None, channel, session)
+
+        assert _custom_ids(channel.edits[0]["view"])[0] == "reading:again:eiken"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("args, kind", [
+        (("eiken",), "eiken"),
+        ((), "toeic"),  # 種類のない古いボタン
+    ])
+    async def test_again_passes_kind(self, monkeypatch, args, kind):
+        """「もう一問」が custom_id の種類で start_session を呼ぶことをテスト"""
+        cog = reading_cog.ReadingCog(None)
+        cog.start_session = AsyncMock()
+        monkeypatch.setattr(reading_cog, "_disable_buttons_only", AsyncMock())
+        interaction = MagicMock()
+        interaction.user.id = 1
+        interaction.response.send_message = AsyncMock()
+
+        await cog.again(interaction, *args)
+
+        cog.start_session.assert_awaited_once_with(interaction.channel, 1, kind, use_prefetch=True)
+
+    @pytest.mark.asyncio
+    async def test_feedback_toggle_keeps_kind(self, users):
+        """解説の切り替えでボタンを作り直しても種類が残ることをテスト"""
+        cog = reading_cog.ReadingCog(None)
+        interaction = MagicMock()
+        interaction.user.id = 1
+        interaction.response.edit_message = AsyncMock()
+        interaction.followup.send = AsyncMock()
+
+        await cog.set_feedback(interaction, "brief:eiken")
+
+        assert users.modes == {"1": FEEDBACK_BRIEF}
+        view = interaction.response.edit_message.await_args.kwargs["view"]
+        assert _custom_ids(view)[0] == "reading:again:eiken"
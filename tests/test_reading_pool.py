@@ -0,0 +1,182 @@
+"""
+長文読解の作り置きプール（reading_pool.py）のテスト
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock
+
+import pytest
+
+import reading_pool
+from dify import DifyPayloadError
+from dify_payloads import ReadingQuestion
+from reading_pool import DEFAULT_LEVEL, ReadingPool
+
+ITEM = {
+    "passage": "p",
+    "question_1_text": "q1", "question_1_choice_A": "a", "question_1_choice_B": "b", "question_1_answer": "A",
+    "question_2_text": "q2", "question_2_choice_A": "a", "question_2_choice_B": "b", "question_2_answer": "B",
+}
+
+
+class FakeStore:
+    """reading.* のクエリを真似るインメモリの reading_items"""
+
+    def __init__(self):
+        self.rows = []
+
+    async def run_query(self, conn, method, name, *args):
+        if name == "reading.stock":
+            kind, level = args
+            return sum(1 for r in self.rows if r["key"] == (kind, level) and r["served_to"] is None)
+        if name == "reading.insert":
+            kind, level, _passage, questions, _answer_key = args
+            self.rows.append({
+                "item_id": len(self.rows) + 1, "key": (kind, level),
+                "questions": questions, "served_to": None,
+            })
+            return None
+        if name == "reading.claim":
+            kind, level, user_id = args
+            for r in self.rows:
+                if r["key"] == (kind, level) and r["served_to"] is None:
+                    r["served_to"] = user_id or ""
+                    return {"item_id": r["item_id"], "questions": r["questions"]}
+            return None
+        raise KeyError(name)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeStore()
+
+    @asynccontextmanager
+    async def acquire(site=None):
+        yield MagicMock()
+
+    manager = MagicMock()
+    manager.acquire = acquire
+    monkeypatch.setattr(reading_pool, "get_db_manager", lambda: manager)
+    monkeypatch.setattr(reading_pool, "run_query", fake.run_query)
+    return fake
+
+
+def _generator(items=None):
+    calls = []
+
+    async def generate(kind, level):
+        calls.append((kind, level))
+        if items:
+            item = items.pop(0)
+            if isinstance(item, Exception):
+                raise item
+            return item
+        return ReadingQuestion(**dict(ITEM, passage=f"p{len(calls)}"))
+
+    return generate, calls
+
+
+class TestReadingPool:
+    """ReadingPoolのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_refill_up_to_target(self, store):
+        """在庫を目標数まで補充し、足りている分は生成しないことをテスト"""
+        generate, calls = _generator()
+        pool = ReadingPool(kinds=["toeic"], target=3, generate=generate)
+
+        assert await pool.refill() == 3
+        assert await pool.refill() == 0
+        assert len(calls) == 3
+        assert pool.stats() == {f"stock.toeic.{DEFAULT_LEVEL}": 3}
+
+    @pytest.mark.asyncio
+    async def test_claim_returns_item_once(self, store):
+        """取り出した問題は item_id 付きで返り、二度は出ないことをテスト"""
+        generate, _ = _generator()
+        pool = ReadingPool(kinds=["toeic"], target=2, generate=generate)
+        await pool.refill()
+
+        first = await pool.claim("toeic", user_id=1)
+        second = await pool.claim("toeic", user_id=2)
+
+        assert first.passage != second.passage
+        assert {first.item_id, second.item_id} == {1, 2}
+        assert await pool.claim("toeic", user_id=3) is None
+
+    @pytest.mark.asyncio
+    async def test_claim_requests_refill_at_low_water(self, store):
+        """在庫が閾値以下になったら補充を前倒しすることをテスト"""
+        generate, _ = _generator()
+        pool = ReadingPool(kinds=["toeic"], target=4, low_water=2, generate=generate)
+        await pool.refill()
+
+        await pool.claim("toeic")
+        assert not pool._wakeup.is_set()
+        await pool.claim("toeic")
+        assert pool._wakeup.is_set()
+
+    @pytest.mark.asyncio
+    async def test_unknown_kind_skips_db(self, store):
+        """作り置きしていない種類はDBを見ずに None を返すことをテスト"""
+        pool = ReadingPool(kinds=["toeic"], target=2, generate=_generator()[0])
+
+        assert await pool.claim("eiken1") is None
+        assert not pool._wakeup.is_set()
+
+    @pytest.mark.asyncio
+    async def test_invalid_item_stops_refill(self, store):
+        """読めなかった出題結果は保存せず、その回の補充を打ち切ることをテスト"""
+        generate, calls = _generator([DifyPayloadError("Question: not json")])
+        pool = ReadingPool(kinds=["toeic"], target=3, generate=generate)
+
+        assert await pool.refill() == 0
+        assert len(calls) == 1
+        assert store.rows == []
+
+    @pytest.mark.asyncio
+    async def test_claim_error_falls_back(self, monkeypatch):
+        """DBエラーのときは None を返してその場の生成に任せることをテスト"""
+        @asynccontextmanager
+        async def acquire(site=None):
+            raise OSError("connection refused")
+            yield
+
+        manager = MagicMock()
+        manager.acquire = acquire
+        monkeypatch.setattr(reading_pool, "get_db_manager", lambda: manager)
+        pool = ReadingPool(kinds=["toeic"], target=2, generate=_generator()[0])
+
+        assert await pool.claim("toeic") is None
+
+    @pytest.mark.asyncio
+    async def test_background_loop_fills_and_stops(self, store):
+        """start() で補充が走り、close() で止まることをテスト"""
+        generate, _ = _generator()
+        pool = ReadingPool(kinds=["toeic"], target=2, refill_interval_sec=60, generate=generate)
+
+        pool.start()
+        for _ in range(50):
+            if len(store.rows) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await pool.close()
+
+        assert len(store.rows) == 2
+        assert json.loads(store.rows[0]["questions"])["passage"] == "p1"
+        assert pool._task is None
+
+    @pytest.mark.asyncio
+    async def test_broken_stored_item_is_a_miss(self, store):
+        """保存内容が出題の形になっていない行は None を返すことをテスト"""
+        store.rows.append({"item_id": 1, "key": ("toeic", DEFAULT_LEVEL), "questions": '{"raw_text": "x"}', "served_to": None})
+        pool = ReadingPool(kinds=["toeic"], target=2, generate=_generator()[0])
+
+        assert await pool.claim("toeic") is None
+
+    def test_zero_target_disables(self):
+        """目標数 0 なら補充ループを開始しないことをテスト"""
+        pool = ReadingPool(kinds=["toeic"], target=0)
+
+        assert pool.enabled is False
@@ -0,0 +1,227 @@
+"""
+長文読解の先読み（reading_prefetch.py）のテスト
+"""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import reading_prefetch
+from dify import DifyBusyError, DifyPayloadError
+from dify_payloads import parse_reading_question
+from reading_pool import ReadingPool
+from reading_prefetch import ReadingPrefetcher
+from tests.test_dify_payloads import QUESTION
+
+
+class FakeClock:
+    """テスト用の手動クロック"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeGenerator:
+    """呼ばれた (user_id, kind) を記録し、gate がセットされるまで生成中のままにする"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self, user_id, kind):
+        self.calls.append((user_id, kind))
+        await self.gate.wait()
+        if self.fail:
+            raise DifyPayloadError("broken")
+        return parse_reading_question(json.dumps(dict(QUESTION, passage=f"next for {user_id}")))
+
+
+@pytest.fixture(autouse=True)
+def empty_pool(monkeypatch):
+    """作り置きは在庫なし（先読みする）"""
+    pool = ReadingPool(target=0)
+    monkeypatch.setattr(reading_prefetch, "get_reading_pool", lambda: pool)
+    return pool
+
+
+class TestReadingPrefetcher:
+    """ReadingPrefetcherクラスのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_take_returns_prefetched(self):
+        """先読みした問題を本人に渡し、2回目は None になることをテスト"""
+        generate = FakeGenerator()
+        prefetcher = ReadingPrefetcher(generate=generate)
+
+        assert prefetcher.start(1, "toeic") is True
+        assert prefetcher.start(1, "toeic") is False, "Q2 の解答で呼んでも二重に生成しない"
+        await asyncio.sleep(0)
+
+        assert await prefetcher.take(2, "toeic") is None, "ほかのユーザーには渡さない"
+        q = await prefetcher.take(1, "toeic")
+        assert q.passage == "next for 1"
+        assert await prefetcher.take(1, "toeic") is None
+        assert generate.calls == [("1", "toeic")]
+        assert prefetcher.stats()["hit_rate"] == pytest.approx(1 / 3)
+
+    @pytest.mark.asyncio
+    async def test_take_waits_for_pending(self):
+        """生成中に取り出すと、最初から生成し直さずに完了を待つことをテスト"""
+        generate = FakeGenerator()
+        generate.gate.clear()
+        prefetcher = ReadingPrefetcher(generate=generate)
+        prefetcher.start(1, "toeic")
+
+        taking = asyncio.create_task(prefetcher.take(1, "toeic"))
+        await asyncio.sleep(0)
+        assert not taking.done() and prefetcher.stats()["pending"] == 0, "取り出した時点で先読みから外れる"
+        generate.gate.set()
+
+        assert (await taking).passage == "next for 1"
+        assert len(generate.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_unused_prefetch_expires(self):
+        """使われない先読みは TTL で捨てられ、生成中ならキャンセルされることをテスト"""
+        clock = FakeClock()
+        generate = FakeGenerator()
+        generate.gate.clear()
+        prefetcher = ReadingPrefetcher(ttl_sec=60, generate=generate, clock=clock)
+        prefetcher.start(1, "toeic")
+        task = prefetcher._entries[("1", "toeic")].task
+
+        clock.now = 61
+        assert await prefetcher.take(1, "toeic") is None
+        await asyncio.sleep(0)
+        assert task.cancelled() and len(prefetcher) == 0
+
+    @pytest.mark.asyncio
+    async def test_limits(self):
+        """ユーザーごと・全体の上限を超えて先読みしないことをテスト"""
+        prefetcher = ReadingPrefetcher(per_user=1, max_total=2, generate=FakeGenerator())
+
+        assert prefetcher.start(1, "toeic") is True
+        assert prefetcher.start(1, "eiken") is False, "ユーザーごとの上限"
+        assert prefetcher.start(2, "toeic") is True
+        assert prefetcher.start(3, "toeic") is False, "全体の上限"
+        assert ReadingPrefetcher(per_user=0, generate=FakeGenerator()).start(1, "toeic") is False
+        await prefetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_skips_when_pool_has_stock(self, monkeypatch):
+        """作り置きに在庫があれば先読みしないことをテスト"""
+        pool = ReadingPool(kinds=["toeic"], target=5)
+        pool._stock[("toeic", "standard")] = 3
+        generate = FakeGenerator()
+        prefetcher = ReadingPrefetcher(generate=generate)
+        monkeypatch.setattr(reading_prefetch, "get_reading_pool", lambda: pool)
+
+        assert prefetcher.start(1, "toeic") is False
+        assert generate.calls == []
+
+    @pytest.mark.asyncio
+    async def test_failed_prefetch_is_dropped(self):
+        """生成に失敗した先読みは捨て、取り出しは None になることをテスト"""
+        prefetcher = ReadingPrefetcher(generate=FakeGenerator(fail=True))
+        prefetcher.start(1, "toeic")
+        await asyncio.sleep(0)
+
+        assert len(prefetcher) == 0
+        assert await prefetcher.take(1, "toeic") is None
+        assert prefetcher.start(1, "toeic") is True, "次の解答でまた先読みできる"
+        await prefetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_pending(self):
+        """close で生成中の先読みをキャンセルすることをテスト"""
+        generate = FakeGenerator()
+        generate.gate.clear()
+        prefetcher = ReadingPrefetcher(generate=generate)
+        prefetcher.start(1, "toeic")
+        task = prefetcher._entries[("1", "toeic")].task
+
+        await prefetcher.close()
+
+        assert task.cancelled() and len(prefetcher) == 0
+
+    @pytest.mark.asyncio
+    async def test_preempted_prefetch_can_restart(self):
+        """本番の呼び出しに譲って（キャンセルされて）終わった先読みは捨て、次の解答で始め直せることをテスト"""
+        generate = FakeGenerator()
+        generate.gate.clear()
+        prefetcher = ReadingPrefetcher(generate=generate)
+        prefetcher.start(1, "toeic")
+        task = prefetcher._entries[("1", "toeic")].task
+        await asyncio.sleep(0)
+
+        task.cancel()  # DifyLimiter が同じユーザーの採点のためにキャンセルしたとき
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert len(prefetcher) == 0
+        assert prefetcher.start(1, "toeic") is True
+        await prefetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_busy_prefetch_is_skipped(self):
+        """Dify の空き枠がない・本人の呼び出しがあるときは先読みしないことをテスト"""
+        async def generate(user_id, kind):
+            raise DifyBusyError("busy")
+
+        prefetcher = ReadingPrefetcher(generate=generate)
+        prefetcher.start(1, "toeic")
+        await asyncio.sleep(0)
+
+        assert len(prefetcher) == 0
+        assert await prefetcher.take(1, "toeic") is None
+
+    @pytest.mark.asyncio
+    async def test_dify_call_is_background_for_same_user(self, monkeypatch):
+        """先読みは本人の user のまま低優先で Dify に頼むことをテスト"""
+        import dify
+
+        client = MagicMock()
+        client.reading_question = AsyncMock(return_value=parse_reading_question(json.dumps(QUESTION)))
+        monkeypatch.setattr(dify, "get_dify_client", lambda: client)
+
+        await reading_prefetch._generate_with_dify("1", "toeic")
+
+        kwargs = client.reading_question.await_args.kwargs
+        assert kwargs["user_id"] == "1" and kwargs["background"] is True
+
+
+class TestStartSession:
+    """出題の入口（cogs/reading.py の start_session）での先読みの使い方のテスト"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("use_prefetch, expected", [(True, 1), (False, 0)])
+    async def test_take_only_for_again(self, monkeypatch, use_prefetch, expected):
+        """先読みを取り出す（hits / misses を数える）のは「もう一問」のときだけであることをテスト"""
+        import cogs.reading as reading_cog
+        from tests.test_reading_feedback import FakeChannel
+
+        prefetcher = ReadingPrefetcher(generate=FakeGenerator())
+        pool = ReadingPool(target=0)
+        question = parse_reading_question(json.dumps(QUESTION))
+
+        async def claim(kind, user_id=None):
+            return question
+
+        sessions = MagicMock()
+        sessions.create = AsyncMock()
+        monkeypatch.setattr(pool, "claim", claim)
+        monkeypatch.setattr(reading_cog, "get_reading_prefetcher", lambda: prefetcher)
+        monkeypatch.setattr(reading_cog, "get_reading_pool", lambda: pool)
+        monkeypatch.setattr(reading_cog, "get_reading_sessions", lambda: sessions)
+        cog = reading_cog.ReadingCog(None)
+        cog._send_question = AsyncMock()
+
+        await cog.start_session(FakeChannel(), 1, "toeic", use_prefetch=use_prefetch)
+
+        assert prefetcher.hits + prefetcher.misses == expected
+        sessions.create.assert_awaited_once_with("1", question, kind="toeic")
@@ -0,0 +1,212 @@
+"""
+長文読解セッション（reading_sessions.py）のテスト
+"""
+import json
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock
+
+import pytest
+
+import reading_sessions
+from dify_payloads import parse_reading_question
+from reading_sessions import (
+    ReadingSession, ReadingSessionStore, answer_custom_id, parse_answer_custom_id,
+)
+from tests.test_dify_payloads import QUESTION
+
+
+class FakeClock:
+    """テスト用の手動クロック"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeTable:
+    """reading_session.* のクエリを真似るインメモリの reading_sessions（ユーザーごとに1行）"""
+
+    def __init__(self):
+        self.rows = {}   # user_id -> (session_id, state, expires_at)
+        self.fail = False
+
+    async def run_query(self, conn, method, name, *args):
+        if self.fail:
+            raise ConnectionError("db down")
+        now = time.time()
+        if name == "reading_session.get":
+            session_id, user_id = args
+            row = self.rows.get(user_id)
+            if row is None or row[0] != session_id or row[2] <= now:
+                return None
+            return {"state": row[1]}
+        if name == "reading_session.put":
+            session_id, user_id, state, ttl_sec = args
+            self.rows[user_id] = (session_id, state, now + ttl_sec)
+            return "INSERT 0 1"
+        if name == "reading_session.delete":
+            for user_id in [u for u, row in self.rows.items() if row[0] == args[0]]:
+                del self.rows[user_id]
+            return "DELETE 1"
+        raise KeyError(name)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    fake = FakeTable()
+
+    @asynccontextmanager
+    async def acquire(site=None, readonly=False):
+        yield MagicMock()
+
+    manager = MagicMock()
+    manager.acquire = acquire
+    monkeypatch.setattr(reading_sessions, "get_db_manager", lambda: manager)
+    monkeypatch.setattr(reading_sessions, "run_query", fake.run_query)
+    return fake
+
+
+def _question(item_id=None):
+    q = parse_reading_question(json.dumps(QUESTION))
+    q.item_id = item_id
+    return q
+
+
+class TestCustomId:
+    """解答ボタンの custom_id のテスト"""
+
+    def test_round_trip(self):
+        """セッションIDを含む custom_id を分解できることをテスト"""
+        cid = answer_custom_id("abc_-1", 2, "C")
+
+        assert len(cid) <= 100
+        assert parse_answer_custom_id(cid) == ("abc_-1", 2, "C")
+
+    @pytest.mark.parametrize("cid", ["1:A", "reading:again", "reading:ans:x:1"])
+    def test_rejects_other_ids(self, cid):
+        """解答ボタン以外の custom_id は ValueError になることをテスト"""
+        with pytest.raises(ValueError):
+            parse_answer_custom_id(cid)
+
+    def test_ids_differ_per_session(self):
+        """同じ問題でもセッションごとに custom_id が変わることをテスト"""
+        a, b = ReadingSession.new("1", _question()), ReadingSession.new("2", _question())
+
+        assert answer_custom_id(a.session_id, 1, "A") != answer_custom_id(b.session_id, 1, "A")
+
+
+class TestReadingSession:
+    """ReadingSessionクラスのテスト"""
+
+    def test_answers_in_order(self):
+        """Q1 → Q2 の順にだけ記録し、解答済み・選択肢にないキーは捨てることをテスト"""
+        session = ReadingSession.new("1", _question())
+
+        assert session.record(2, "A") is False, "Q1より先にQ2は解答できない"
+        assert session.record(1, "D") is False, "Q1にDの選択肢はない"
+        assert session.record(1, "B") is True
+        assert session.record(1, "A") is False, "多重クリック"
+        assert session.next_number() == 2
+        assert session.record(2, "B") is True
+        assert session.next_number() is None
+        assert session.user_answer(1) == "B"
+
+    def test_json_round_trip(self):
+        """保存した状態から item_id・解答・種類を含めて戻せることをテスト"""
+        session = ReadingSession.new("1", _question(item_id=7), kind="eiken")
+        session.record(1, "A")
+
+        again = ReadingSession.from_json(session.session_id, "1", session.to_json())
+
+        assert again.question == session.question
+        assert again.question.item_id == 7
+        assert again.user_answers == ["A", None]
+        assert again.kind == "eiken"
+
+    def test_memory_bytes(self):
+        """メモリ使用量が本文の長さに応じて増えることをテスト"""
+        short = ReadingSession.new("1", _question())
+        long = ReadingSession.new("1", parse_reading_question(json.dumps(dict(QUESTION, passage="x" * 10000))))
+
+        assert 1000 < short.memory_bytes() < long.memory_bytes()
+        assert long.memory_bytes() - short.memory_bytes() >= 10000 - len(QUESTION["passage"])
+
+
+class TestReadingSessionStore:
+    """ReadingSessionStoreクラスのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_get_checks_session_id(self, table):
+        """セッションIDが一致するときだけ返すことをテスト（前のセッションのボタンは効かない）"""
+        store = ReadingSessionStore()
+        old = await store.create("1", _question())
+        new = await store.create("1", _question())
+
+        assert await store.get("1", new.session_id) is new
+        assert await store.get("1", old.session_id) is None
+        assert await store.get("2", new.session_id) is None, "ほかのユーザーのセッションは引けない"
+        assert len(store) == 1
+
+    @pytest.mark.asyncio
+    async def test_restores_from_db(self, table):
+        """メモリにない（再起動後・別プロセス）セッションを DB から戻せることをテスト"""
+        session = await ReadingSessionStore().create("1", _question(item_id=3))
+        session.record(1, "C")
+        await ReadingSessionStore().save(session)
+
+        restored = await ReadingSessionStore().get("1", session.session_id)
+
+        assert restored is not None and restored is not session
+        assert restored.user_answers == ["C", None]
+        assert restored.question.item_id == 3
+
+    @pytest.mark.asyncio
+    async def test_finish_removes_both(self, table):
+        """終えたセッションはメモリからも DB からも消えることをテスト"""
+        store = ReadingSessionStore()
+        session = await store.create("1", _question())
+
+        await store.finish(session)
+
+        assert len(store) == 0 and table.rows == {}
+        assert await store.get("1", session.session_id) is None
+
+    @pytest.mark.asyncio
+    async def test_memory_is_bounded(self, table):
+        """メモリは上限件数と TTL で削除され、DB から戻せることをテスト"""
+        clock = FakeClock()
+        store = ReadingSessionStore(ttl_sec=60, max_entries=2, clock=clock)
+        sessions = [await store.create(str(uid), _question()) for uid in range(3)]
+
+        assert len(store) == 2 and store.stats()["evictions_lru"] == 1
+        clock.now = 61
+        assert store._registry.purge_expired() == 2
+        assert await store.get("0", sessions[0].session_id) is not None, "DB の期限内なら戻せる"
+
+    @pytest.mark.asyncio
+    async def test_db_errors_keep_memory(self, table):
+        """DB が使えなくてもメモリだけで続けられることをテスト"""
+        table.fail = True
+        store = ReadingSessionStore()
+        session = await store.create("1", _question())
+
+        assert await store.get("1", session.session_id) is session
+        assert await store.get("1", "other") is None
+        await store.finish(session)
+        assert len(store) == 0
+
+    @pytest.mark.asyncio
+    async def test_stats_report_memory(self, table):
+        """統計にセッションあたりのメモリ使用量が含まれることをテスト"""
+        store = ReadingSessionStore()
+        session = await store.create("1", _question())
+        await store.create("2", _question())
+
+        stats = store.stats()
+
+        assert stats["size"] == 2
+        assert stats["bytes_per_session"] == session.memory_bytes()
+        assert stats["memory_bytes"] == 2 * session.memory_bytes()
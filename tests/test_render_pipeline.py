@@ -0,0 +1,147 @@
+"""
+インタラクションごとの描画パイプライン（render_pipeline.py）のテスト
+"""
+import asyncio
+
+import pytest
+
+from cogs.vocab import VocabSessionView
+from render_pipeline import RenderPipeline
+
+
+class FakeResponse:
+    def __init__(self, calls):
+        self.calls = calls
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def edit_message(self, **fields):
+        self.calls.append(("edit_message", fields))
+        self.done = True
+
+    async def defer(self):
+        self.calls.append(("defer", {}))
+        self.done = True
+
+    async def send_message(self, content, ephemeral=False):
+        self.calls.append(("send_message", {"content": content, "ephemeral": ephemeral}))
+        self.done = True
+
+
+class FakeFollowup:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send(self, content, ephemeral=False):
+        self.calls.append(("followup", {"content": content}))
+
+
+class FakeMessage:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def edit(self, **fields):
+        self.calls.append(("message.edit", fields))
+
+
+class FakeInteraction:
+    """Discord への呼び出しを calls に記録するインタラクション"""
+
+    def __init__(self):
+        self.calls = []
+        self.response = FakeResponse(self.calls)
+        self.followup = FakeFollowup(self.calls)
+        self.message = FakeMessage(self.calls)
+
+    async def edit_original_response(self, **fields):
+        self.calls.append(("edit_original_response", fields))
+
+
+class TestRenderPipeline:
+    """RenderPipelineクラスのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_merges_updates_into_one_edit(self):
+        """途中の変更はまとめて、間に合えば edit_message 1回で応答することをテスト"""
+        interaction = FakeInteraction()
+
+        async with RenderPipeline(interaction) as render:
+            render.update(view="disabled")
+            render.update(embed="card 2", view="card view")
+
+        assert interaction.calls == [("edit_message", {"view": "card view", "embed": "card 2"})]
+        assert render.calls == 1 and not render.deferred
+
+    @pytest.mark.asyncio
+    async def test_defers_when_slow(self):
+        """間に合わなければ先に defer し、最後に1回だけ編集することをテスト"""
+        interaction = FakeInteraction()
+
+        async with RenderPipeline(interaction, defer_after_sec=0.01) as render:
+            await asyncio.sleep(0.05)
+            render.update(embed="card 2")
+
+        assert [name for name, _ in interaction.calls] == ["defer", "edit_original_response"]
+        assert render.calls == 2 and render.deferred
+
+    @pytest.mark.asyncio
+    async def test_acknowledges_without_changes(self):
+        """変更がなくても defer で応答することをテスト（捨てた多重クリックなど）"""
+        interaction = FakeInteraction()
+
+        async with RenderPipeline(interaction):
+            pass
+
+        assert interaction.calls == [("defer", {})]
+
+    @pytest.mark.asyncio
+    async def test_notify_uses_the_response(self):
+        """まだ応答していなければ、通知を応答そのものにして1回で済ませることをテスト"""
+        interaction = FakeInteraction()
+
+        async with RenderPipeline(interaction) as render:
+            await render.notify("db down")
+            render.update(view="menu")
+
+        assert interaction.calls == [
+            ("send_message", {"content": "db down", "ephemeral": True}),
+            ("message.edit", {"view": "menu"}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_discards_on_error(self):
+        """例外のときは積んだ変更を送らないことをテスト（エラーの応答はルーターが返す）"""
+        interaction = FakeInteraction()
+
+        with pytest.raises(RuntimeError):
+            async with RenderPipeline(interaction) as render:
+                render.update(embed="card 2")
+                raise RuntimeError("boom")
+
+        assert interaction.calls == []
+
+
+class TestVocabSessionView:
+    """カードの View を使い回すことのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_reuses_buttons_across_cards(self):
+        """カードが変わってもボタンは作り直さず、custom_id の単語IDだけ変えることをテスト"""
+        view = VocabSessionView("batch", [{"word_id": 7, "word": "apple"}, {"word_id": 9, "word": "pear"}])
+        buttons = list(view.children)
+
+        first = view.current_fields()
+        assert first["view"] is view and view.current_word_id() == 7
+        assert [b.custom_id for b in view.children] == ["vocab:known:7", "vocab:unsure:7", "vocab:next"]
+
+        view.index += 1
+        view.current_fields()
+        assert view.children == buttons
+        assert [b.custom_id for b in view.children][:2] == ["vocab:known:9", "vocab:unsure:9"]
+        assert view.is_finished(), "ViewStore に残さない"
+
+        view.index += 1
+        assert view.finished and view.current_word_id() is None
+        assert view.current_fields()["embed"].title == "完了"
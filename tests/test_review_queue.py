@@ -0,0 +1,57 @@
+"""
+今日の復習キューのテスト
+"""
+from datetime import date
+from unittest.mock import AsyncMock
+
+import pytest
+
+from db import QUERIES
+from review_queue import count_due, fetch_due_page
+
+TODAY = date(2025, 1, 31)
+
+
+def _rows(*pairs):
+    return [{"word_id": w, "next_review": d} for d, w in pairs]
+
+
+class TestFetchDuePage:
+    """fetch_due_page関数のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_full_page_returns_cursor_of_last_row(self):
+        """1ページ分取れたら最後の行がカーソルになることをテスト"""
+        conn = AsyncMock()
+        conn.fetch = AsyncMock(return_value=_rows((date(2025, 1, 1), 5), (date(2025, 1, 2), 3)))
+
+        word_ids, cursor = await fetch_due_page(conn, "u1", limit=2, today=TODAY)
+
+        assert word_ids == [5, 3]
+        assert cursor == (date(2025, 1, 2), 3)
+        assert conn.fetch.await_args.args == (QUERIES["review.due_first_page"], "u1", TODAY, 2)
+
+    @pytest.mark.asyncio
+    async def test_short_page_is_last(self):
+        """件数が足りなければ最後のページ（カーソルなし）になることをテスト"""
+        conn = AsyncMock()
+        conn.fetch = AsyncMock(return_value=_rows((date(2025, 1, 5), 9)))
+
+        word_ids, cursor = await fetch_due_page(conn, "u1", limit=2, after=(date(2025, 1, 2), 3), today=TODAY)
+
+        assert word_ids == [9]
+        assert cursor is None
+        assert conn.fetch.await_args.args == (QUERIES["review.due_next_page"], "u1", TODAY, 2, date(2025, 1, 2), 3)
+
+
+class TestCountDue:
+    """count_due関数のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_count_due(self):
+        """件数が int で返ることをテスト"""
+        conn = AsyncMock()
+        conn.fetchval = AsyncMock(return_value=12)
+
+        assert await count_due(conn, "u1", today=TODAY) == 12
+        assert conn.fetchval.await_args.args[1:] == ("u1", TODAY)
@@ -0,0 +1,133 @@
+"""
+IDサンプラーのテスト
+"""
+import random
+from array import array
+from unittest.mock import AsyncMock
+
+import pytest
+
+from sampler import IdSampler, sample_distinct
+
+
+class TestSampleDistinct:
+    """sample_distinct関数のテスト"""
+
+    @pytest.mark.parametrize("k", [1, 5, 10, 30, 99])
+    def test_returns_k_distinct_ids(self, k):
+        """重複なしでk件返すことをテスト"""
+        ids = array('i', range(100, 200))
+        result = sample_distinct(ids, k, rng=random.Random(0))
+
+        assert len(result) == k
+        assert len(set(result)) == k, "重複があってはいけない"
+        assert set(result) <= set(ids), "元のID以外が含まれてはいけない"
+
+    def test_k_larger_than_population(self):
+        """全体より多く要求した場合は全件を返すことをテスト"""
+        result = sample_distinct([1, 2, 3], 10, rng=random.Random(0))
+
+        assert sorted(result) == [1, 2, 3]
+
+    def test_empty(self):
+        """空の場合は空リストを返すことをテスト"""
+        assert sample_distinct([], 10) == []
+        assert sample_distinct([1, 2], 0) == []
+
+    def test_covers_population(self):
+        """繰り返し抽出で全IDが選ばれうることをテスト"""
+        ids = list(range(50))
+        rng = random.Random(1)
+        seen = set()
+        for _ in range(200):
+            seen.update(sample_distinct(ids, 3, rng=rng))
+
+        assert seen == set(ids)
+
+
+class TestIdSampler:
+    """IdSamplerクラスのテスト"""
+
+    @staticmethod
+    def _conn(signature, rows):
+        conn = AsyncMock()
+        conn.fetchrow = AsyncMock(return_value=signature)
+        conn.fetch = AsyncMock(return_value=rows)
+        return conn
+
+    @pytest.mark.asyncio
+    async def test_loads_once_within_interval(self):
+        """確認間隔内は再読み込みしないことをテスト"""
+        sampler = IdSampler("t", "t", "id")
+        conn = self._conn((3, 3), [(1,), (2,), (3,)])
+
+        await sampler.sample(conn, 2)
+        await sampler.sample(conn, 2)
+
+        assert conn.fetchrow.await_count == 1
+        assert conn.fetch.await_count == 1
+        assert len(sampler) == 3
+
+    @pytest.mark.asyncio
+    async def test_reloads_when_signature_changes(self):
+        """シグネチャが変わったときだけ再読み込みすることをテスト"""
+        sampler = IdSampler("t", "t", "id", refresh_interval_sec=0)
+        conn = self._conn((2, 2), [(1,), (2,)])
+        await sampler.sample(conn, 1)
+        await sampler.sample(conn, 1)
+        assert sampler.reloads == 1, "シグネチャが同じなら読み込まない"
+
+        conn.fetchrow.return_value = (3, 3)
+        conn.fetch.return_value = [(1,), (2,), (3,)]
+        await sampler.sample(conn, 1)
+        assert sampler.reloads == 2
+        assert len(sampler) == 3
+
+    @pytest.mark.asyncio
+    async def test_group_sampling(self):
+        """グループ指定で該当IDのみ抽出することをテスト"""
+        sampler = IdSampler("t", "t", "id", group_column="pattern")
+        conn = self._conn((4, 4), [(1, 1), (2, 1), (3, 2), (4, 2)])
+
+        for _ in range(20):
+            assert set(await sampler.sample(conn, 1, group=2)) <= {3, 4}
+        assert await sampler.sample(conn, 1, group=5) == []
+
+    @pytest.mark.asyncio
+    async def test_sample_rows_keeps_sample_order(self):
+        """取得した行が抽出順に並ぶことをテスト"""
+        sampler = IdSampler("t", "t", "id")
+        sampler.sample = AsyncMock(return_value=[3, 1, 2])
+        conn = self._conn((3, 3), [(1, "a"), (2, "b"), (3, "c")])
+
+        rows = await sampler.sample_rows(conn, 3, "SELECT id, v FROM t WHERE id = ANY($1)")
+
+        assert [r[0] for r in rows] == [3, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_sample_rows_with_fetch_function(self):
+        """SQLの代わりに取得関数を渡せることをテスト"""
+        sampler = IdSampler("t", "t", "id")
+        sampler.sample = AsyncMock(return_value=[2, 1])
+        conn = self._conn((2, 2), [])
+        fetch = AsyncMock(return_value=[(1, "a"), (2, "b")])
+
+        rows = await sampler.sample_rows(conn, 2, fetch)
+
+        assert [r[0] for r in rows] == [2, 1]
+        fetch.assert_awaited_once_with([2, 1])
+        conn.fetch.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_sample_rows_retries_after_stale_ids(self):
+        """削除済みIDで行が不足した場合に再読み込みしてやり直すことをテスト"""
+        sampler = IdSampler("t", "t", "id")
+        sampler.sample = AsyncMock(side_effect=[[1, 9], [1, 2]])
+        sampler.refresh = AsyncMock()
+        conn = self._conn((2, 2), [])
+        conn.fetch = AsyncMock(side_effect=[[(1, "a")], [(1, "a"), (2, "b")]])
+
+        rows = await sampler.sample_rows(conn, 2, "SELECT id, v FROM t WHERE id = ANY($1)")
+
+        assert [r[0] for r in rows] == [1, 2]
+        sampler.refresh.assert_awaited_once_with(conn, force=True)
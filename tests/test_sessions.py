@@ -0,0 +1,108 @@
+"""
+セッションレジストリのテスト
+"""
+import pytest
+
+from metrics import MetricsRegistry
+from sessions import SessionRegistry
+
+
+class FakeClock:
+    """テスト用の手動クロック"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSessionRegistry:
+    """SessionRegistryクラスのテスト"""
+
+    def test_sessions_are_isolated_per_user(self):
+        """ユーザーごとにセッションが分離されることをテスト"""
+        registry = SessionRegistry()
+        registry.put("1", "vocab", "session-a")
+        registry.put("2", "vocab", "session-b")
+
+        assert registry.get("1", "vocab") == "session-a"
+        assert registry.get("2", "vocab") == "session-b"
+        assert registry.get("1", "svocm") is None, "モジュールが違えば別セッション"
+
+    def test_ttl_expiry(self):
+        """TTLを過ぎたセッションが失効することをテスト"""
+        clock = FakeClock()
+        registry = SessionRegistry(ttl_sec=10, clock=clock)
+        registry.put("1", "vocab", "s")
+
+        clock.now = 9
+        assert registry.get("1", "vocab") == "s", "アクセスでTTLが延長される"
+        clock.now = 18
+        assert registry.get("1", "vocab") == "s"
+        clock.now = 28.5
+        assert registry.get("1", "vocab") is None
+        assert registry.evictions_expired == 1
+
+    def test_purge_expired(self):
+        """期限切れのセッションがまとめて削除されることをテスト"""
+        clock = FakeClock()
+        registry = SessionRegistry(ttl_sec=10, clock=clock)
+        registry.put("1", "vocab", "a")
+        clock.now = 5
+        registry.put("2", "vocab", "b")
+
+        clock.now = 12
+        assert registry.purge_expired() == 1
+        assert len(registry) == 1
+        assert registry.get("2", "vocab") == "b"
+
+    def test_lru_eviction(self):
+        """上限を超えると最も古く使われたセッションが削除されることをテスト"""
+        registry = SessionRegistry(max_entries=2)
+        registry.put("1", "vocab", "a")
+        registry.put("2", "vocab", "b")
+        registry.get("1", "vocab")  # 1 を最近使ったことにする
+        registry.put("3", "vocab", "c")
+
+        assert len(registry) == 2
+        assert registry.get("2", "vocab") is None, "最も古く使われた2が削除される"
+        assert registry.get("1", "vocab") == "a"
+        assert registry.evictions_lru == 1
+
+    def test_pop(self):
+        """popでセッションが削除されることをテスト"""
+        registry = SessionRegistry()
+        registry.put("1", "vocab", "a")
+
+        assert registry.pop("1", "vocab") == "a"
+        assert registry.pop("1", "vocab") is None
+        assert len(registry) == 0
+
+    def test_invalid_max_entries(self):
+        """上限が1未満の場合はエラーになることをテスト"""
+        with pytest.raises(ValueError):
+            SessionRegistry(max_entries=0)
+
+    @pytest.mark.asyncio
+    async def test_lock_is_per_user(self):
+        """ロックがユーザーごとに独立していることをテスト"""
+        registry = SessionRegistry()
+        lock_a = registry.lock("1", "vocab")
+
+        async with lock_a:
+            assert registry.lock("1", "vocab").locked(), "同じユーザーは同じロック"
+            assert not registry.lock("2", "vocab").locked(), "別ユーザーはブロックされない"
+
+    def test_stats_as_metrics_source(self):
+        """統計値がメトリクスとして取得できることをテスト"""
+        registry = SessionRegistry(max_entries=1)
+        registry.put("1", "vocab", "a")
+        registry.put("2", "vocab", "b")
+
+        metrics = MetricsRegistry()
+        metrics.register_source("sessions", registry.stats)
+        snapshot = metrics.snapshot()
+
+        assert snapshot["sessions.size"] == 1
+        assert snapshot["sessions.evictions_lru"] == 1
@@ -1,9 +1,12 @@
 """
 SRS（Spaced Repetition System）のテスト
 """
-from datetime import date
+import itertools
+from datetime import date, timedelta
 
-from srs import update_srs
+import pytest
+
+from srs import update_srs, update_srs_batch
 
 
 class TestUpdateSRS:
@@ -63,3 +66,49 @@ class TestUpdateSRS:
         assert isinstance(c, int), "consecutive_correctはint型"
         assert isinstance(next_review, date), "next_reviewはdate型"
 
+
+
+class TestUpdateSRSBatch:
+    """update_srs_batch関数のテスト"""
+
+    @pytest.fixture
+    def np(self):
+        return pytest.importorskip("numpy")
+
+    def test_matches_scalar_on_grid(self, np):
+        """全グリッドで update_srs と完全に一致することをテスト"""
+        grid = list(itertools.product(
+            [1.3, 1.31, 1.36, 1.5, 2.0, 2.18, 2.36, 2.5, 2.6, 3.0],
+            [0, 1, 2, 3, 4, 6, 10, 15, 37, 365],
+            [0, 1, 2, 5],
+            [0, 1, 2, 3, 4, 5],
+        ))
+        e, i, c, q = (np.array(col) for col in zip(*grid))
+
+        be, bi, bc, bnext = update_srs_batch(e, i, c, q)
+
+        for k, args in enumerate(grid):
+            pe, pi, pc, pnext = update_srs(*args)
+            assert (be[k], bi[k], bc[k]) == (pe, pi, pc), args
+            assert bnext[k].astype(date) == pnext, args
+
+    def test_round_half_to_even(self, np):
+        """間隔の丸めが update_srs と同じく偶数丸めであることをテスト"""
+        # 1 * 2.5 = 2.5 → 2、3 * 2.5 = 7.5 → 8
+        _, bi, _, _ = update_srs_batch(np.array([2.4, 2.4]), np.array([1.0, 3.0]), np.array([2, 2]), 5)
+
+        assert list(bi) == [update_srs(2.4, 1, 2, 5)[1], update_srs(2.4, 3, 2, 5)[1]] == [2.0, 8.0]
+
+    def test_easiness_floor(self, np):
+        """easinessの下限（1.3）をテスト"""
+        be, _, _, _ = update_srs_batch(np.full(6, 1.3), np.zeros(6), np.zeros(6, dtype=int), np.arange(6))
+
+        assert be.min() == 1.3
+
+    def test_today_and_dtypes(self, np):
+        """基準日と戻り値の型をテスト"""
+        today = date(2025, 1, 31)
+        be, bi, bc, bnext = update_srs_batch([2.5], [6], [2], [4], today=today)
+
+        assert (be.dtype, bi.dtype, bc.dtype) == (np.float64, np.float64, np.int64)
+        assert bnext[0].astype(date) == today + timedelta(days=int(bi[0]))
@@ -0,0 +1,170 @@
+"""
+SRS書き込みバッファのテスト
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import srs_buffer
+from srs_buffer import SrsState, SrsWriteBuffer
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    """srs_buffer が使うDB接続のモック"""
+    connection = AsyncMock()
+    connection.fetchrow = AsyncMock(return_value=None)
+    connection.execute = AsyncMock()
+    connection.acquires = []
+
+    @asynccontextmanager
+    async def acquire(site=None, readonly=False, user_id=None):
+        connection.acquires.append((site, readonly, user_id))
+        yield connection
+
+    manager = MagicMock()
+    manager.acquire = acquire
+    monkeypatch.setattr(srs_buffer, "get_db_manager", lambda: manager)
+    return connection
+
+
+class TestSrsWriteBuffer:
+    """SrsWriteBufferクラスのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_answer_reads_own_pending_write(self, conn):
+        """未書き込みの状態が次の解答で使われることをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+
+        first = await buffer.answer("u1", 1, 5)
+        second = await buffer.answer("u1", 1, 5)
+
+        assert first.consecutive_correct == 1
+        assert second.consecutive_correct == 2, "バッファ内の状態から計算される"
+        assert conn.fetchrow.await_count == 1, "2回目はDBを読まない"
+        await buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_updates_are_coalesced(self, conn):
+        """同じキーへの更新が1件にまとまることをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+        await buffer.answer("u1", 1, 5)
+        await buffer.answer("u1", 1, 2)
+        await buffer.answer("u2", 1, 5)
+
+        assert buffer.depth == 2
+        assert buffer.coalesced == 1
+
+        assert await buffer.flush() == 2
+        args = conn.execute.await_args.args
+        assert args[1] == ["u1", "u2"]
+        assert args[5] == [0, 1], "u1は最後の解答（忘れそう）の状態が書き込まれる"
+        assert buffer.depth == 0
+        await buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_flush_when_max_pending_reached(self, conn):
+        """上限件数に達したら間隔を待たずに書き込むことをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000, max_pending=3)
+        for word_id in range(3):
+            buffer.put("u1", word_id, SrsState(2.5, 1, 1, date.today()))
+
+        for _ in range(10):
+            await asyncio.sleep(0)
+            if conn.execute.await_count:
+                break
+        assert conn.execute.await_count == 1
+        assert buffer.depth == 0
+        await buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_close_drains_pending(self, conn):
+        """close() で残りがすべて書き込まれることをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+        buffer.put("u1", 1, SrsState(2.5, 1, 1, date.today()))
+
+        await buffer.close()
+
+        assert conn.execute.await_count == 1
+        assert buffer.depth == 0
+        with pytest.raises(RuntimeError):
+            buffer.put("u1", 2, SrsState(2.5, 1, 1, date.today()))
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_requeues(self, conn):
+        """書き込み失敗時に書き込み待ちへ戻すことをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+        buffer.put("u1", 1, SrsState(2.5, 1, 1, date.today()))
+        conn.execute.side_effect = ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert buffer.depth == 1
+
+        conn.execute.side_effect = None
+        await buffer.close()
+        assert buffer.depth == 0
+
+    @pytest.mark.asyncio
+    async def test_get_state_does_not_record_write(self, conn):
+        """DB からの状態の読み取りを書き込みとして記録しない（user_id を渡さない）ことをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+
+        await buffer.get_state("u1", 1)
+
+        assert conn.acquires == [("srs_buffer.get_state", False, None)]
+
+    @pytest.mark.asyncio
+    async def test_inflight_state_is_visible(self, conn):
+        """UPSERT がコミットされるまでは、書き込み中の状態が読み取りで使われることをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+        await buffer.answer("u1", 1, 5)
+        seen = []
+
+        async def slow_execute(*args):
+            seen.append(await buffer.get_state("u1", 1))
+
+        conn.execute.side_effect = slow_execute
+        await buffer.flush()
+
+        assert seen[0].consecutive_correct == 1, "DB（まだ古い状態）を読まない"
+        assert conn.fetchrow.await_count == 1
+        await buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_bad_row_is_isolated_and_dropped(self, conn):
+        """失敗したバッチは1行ずつ書き直し、書けない行だけを再試行して上限で捨てることをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000, max_attempts=2)
+        buffer.put("u1", 1, SrsState(2.5, 1, 1, date.today()))
+        buffer.put("u1", 2, SrsState(2.5, 1, 1, date.today()))
+
+        async def execute(query, user_ids, word_ids, *rest):
+            if 2 in word_ids:
+                raise ValueError("bad row")
+
+        conn.execute.side_effect = execute
+
+        assert await buffer.flush() == 1
+        assert buffer.depth == 1, "書けなかった行だけが残る"
+        with pytest.raises(ValueError):
+            await buffer.flush()
+        assert buffer.depth == 0
+        assert buffer.dropped == 1
+        await buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_sync_user_flushes_only_when_needed(self, conn):
+        """srs_state を直接読む前に、その利用者の書き込み待ちがあるときだけ書き込むことをテスト"""
+        buffer = SrsWriteBuffer(flush_interval_ms=60_000)
+        buffer.put("u1", 1, SrsState(2.5, 1, 1, date.today()))
+
+        await buffer.sync_user("u2")
+        assert conn.execute.await_count == 0
+
+        await buffer.sync_user("u1")
+        assert conn.execute.await_count == 1
+        assert buffer.depth == 0
+        await buffer.close()
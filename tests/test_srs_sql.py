@@ -0,0 +1,107 @@
+"""
+SM-2 の SQL 実装（srs_sm2_step / SM2_UPSERT_SQL）と Python 実装（update_srs）の一致テスト
+
+PostgreSQL が必要なため、TEST_DATABASE_URL が設定されている場合のみ実行します。
+テストでは sql/schema.sql を適用します（冪等）。
+
+    TEST_DATABASE_URL=postgresql://... pytest -m integration
+"""
+import datetime
+import itertools
+import os
+from pathlib import Path
+
+import pytest
+
+from srs import SM2_UPSERT_SQL, update_srs, update_srs_in_db
+
+asyncpg = pytest.importorskip("asyncpg")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA_PATH = Path(__file__).parent.parent / "sql" / "schema.sql"
+
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL が未設定"),
+]
+
+QUALITIES = [0, 1, 2, 3, 4, 5]
+EASINESS = [1.3, 1.31, 1.36, 1.5, 1.7, 2.0, 2.18, 2.36, 2.5, 2.6, 2.7, 3.0, 3.5]
+INTERVALS = [0, 1, 2, 3, 4, 6, 7, 10, 15, 16, 25, 37, 100, 365]
+CONSECUTIVE = [None, 0, 1, 2, 3, 5, 10]
+TODAY = datetime.date(2025, 1, 31)
+
+
+@pytest.fixture
+async def conn():
+    connection = await asyncpg.connect(TEST_DATABASE_URL)
+    await connection.execute(SCHEMA_PATH.read_text(encoding="utf-8"))
+    try:
+        yield connection
+    finally:
+        await connection.close()
+
+
+class TestSm2SqlParity:
+    """SQL版とPython版のSM-2が同じ結果になることのテスト"""
+
+    async def test_step_function_matches_python_on_grid(self, conn):
+        """srs_sm2_step が全グリッドで update_srs と一致することをテスト"""
+        grid = list(itertools.product(EASINESS, INTERVALS, CONSECUTIVE, QUALITIES))
+        rows = await conn.fetch(
+            """
+            SELECT n.*
+            FROM unnest($1::float8[], $2::float8[], $3::int[], $4::int[]) WITH ORDINALITY AS g(e, i, c, q, ord)
+            CROSS JOIN LATERAL srs_sm2_step(g.e, g.i, g.c, g.q, $5) AS n
+            ORDER BY g.ord
+            """,
+            [g[0] for g in grid], [float(g[1]) for g in grid], [g[2] for g in grid], [g[3] for g in grid], TODAY,
+        )
+
+        mismatches = []
+        for (e, i, c, q), row in zip(grid, rows):
+            pe, pi, pc, pnext = update_srs(e, i, c, q)
+            pnext = TODAY + (pnext - datetime.date.today())
+            sql = (row["easiness"], float(row["interval_days"]), row["consecutive_correct"], row["next_review"])
+            if sql != (pe, pi, pc, pnext):
+                mismatches.append(((e, i, c, q), sql, (pe, pi, pc, pnext)))
+
+        assert len(rows) == len(grid)
+        assert not mismatches, f"{len(mismatches)}件不一致: {mismatches[:5]}"
+
+    async def test_upsert_matches_python_over_answer_sequences(self, conn):
+        """UPSERT を繰り返した結果が update_srs の連鎖と一致することをテスト"""
+        user_id = "__srs_parity_test__"
+        word_id = await conn.fetchval("SELECT word_id FROM words ORDER BY word_id LIMIT 1")
+        if word_id is None:
+            word_id = await conn.fetchval(
+                "INSERT INTO words(word, jp) VALUES('__srs_parity__', 'テスト') "
+                "ON CONFLICT (word) DO UPDATE SET jp=EXCLUDED.jp RETURNING word_id"
+            )
+
+        sequences = list(itertools.product([2, 3, 4, 5], repeat=4)) + [(5,) * 12, (0, 5, 5, 1, 5, 5, 5)]
+        tr = conn.transaction()
+        await tr.start()
+        try:
+            for seq in sequences:
+                await conn.execute("DELETE FROM srs_state WHERE user_id=$1", user_id)
+                e, i, c = 2.5, 0, 0
+                for q in seq:
+                    e, i, c, next_review = update_srs(e, i, c, q)
+                    result = await update_srs_in_db(conn, user_id, word_id, q)
+                    assert result == (e, i, c, next_review), (seq, q)
+
+                    stored = await conn.fetchrow(
+                        "SELECT easiness, interval_days, consecutive_correct, next_review "
+                        "FROM srs_state WHERE user_id=$1 AND word_id=$2",
+                        user_id, word_id
+                    )
+                    assert (float(stored["easiness"]), float(stored["interval_days"]),
+                            stored["consecutive_correct"], stored["next_review"]) == (e, i, c, next_review), (seq, q)
+        finally:
+            await tr.rollback()
+
+    async def test_upsert_is_single_statement(self):
+        """UPSERT が RETURNING 付きの1文であることをテスト"""
+        assert SM2_UPSERT_SQL.count(";") == 0
+        assert "RETURNING" in SM2_UPSERT_SQL
@@ -1,10 +1,13 @@
 """
 ユーティリティ関数のテスト
 """
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
 import discord
 import pytest
 
-from utils import info_embed, main_menu_view
+from utils import ThrottledEditor, info_embed, main_menu_view
 
 
 class TestInfoEmbed:
@@ -67,3 +70,52 @@ class TestMainMenuView:
         assert "menu:vocab" in custom_ids, "vocabボタンのIDがあるべき"
         assert "menu:svocm" in custom_ids, "svocmボタンのIDがあるべき"
         assert "menu:reading" in custom_ids, "readingボタンのIDがあるべき"
+
+
+class TestThrottledEditor:
+    """ThrottledEditorのテスト"""
+
+    @pytest.fixture
+    def message(self):
+        msg = MagicMock()
+        msg.edit = AsyncMock()
+        return msg
+
+    @pytest.mark.asyncio
+    async def test_updates_are_coalesced(self, message):
+        """間隔内の更新はまとめられ、最新の内容だけが反映されることをテスト"""
+        editor = ThrottledEditor(message, min_interval_sec=0.05)
+
+        for i in range(10):
+            editor.update(content=str(i))
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.12)
+
+        contents = [c.kwargs["content"] for c in message.edit.await_args_list]
+        assert contents[0] == "0"
+        assert contents[-1] == "9"
+        assert len(contents) <= 3
+
+    @pytest.mark.asyncio
+    async def test_finish_drops_pending_and_edits_now(self, message):
+        """finish は途中の内容を捨てて最終内容で編集することをテスト"""
+        editor = ThrottledEditor(message, min_interval_sec=10)
+        editor.update(content="partial-1")
+        await asyncio.sleep(0)
+        editor.update(content="partial-2")
+
+        await editor.finish(content="final")
+
+        contents = [c.kwargs["content"] for c in message.edit.await_args_list]
+        assert contents == ["partial-1", "final"]
+        assert editor.edits == 2
+
+    @pytest.mark.asyncio
+    async def test_edit_failure_is_not_raised(self, message):
+        """途中の編集の失敗は例外にしないことをテスト"""
+        message.edit.side_effect = discord.HTTPException(MagicMock(status=429), "rate limited")
+        editor = ThrottledEditor(message, min_interval_sec=0)
+
+        await editor.finish(content="final")
+
+        assert editor.edits == 0
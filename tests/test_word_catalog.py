@@ -0,0 +1,194 @@
+"""
+語彙カタログのテスト
+"""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+import word_catalog
+from word_catalog import WordCatalog, WordRecord
+
+
+def _row(word_id, word, level=1, synonyms=None):
+    return {
+        "word_id": word_id, "word": word, "jp": f"{word}の意味", "pos": "名詞", "level": level,
+        "example_en": f"This is {word}.", "example_ja": "例文", "synonyms": synonyms, "derived": None,
+    }
+
+
+@pytest.fixture
+def catalog():
+    c = WordCatalog()
+    c.replace(WordRecord.from_row(r) for r in [
+        _row(1, "apple", synonyms=["fruit"]),
+        _row(2, "Apply", level=2),
+        _row(3, "banana"),
+    ])
+    return c
+
+
+class TestWordCatalog:
+    """WordCatalogクラスのテスト"""
+
+    def test_lookup_by_id(self, catalog):
+        """IDで検索できることをテスト"""
+        assert catalog.get(1).word == "apple"
+        assert catalog.get(99) is None
+        assert catalog.ids == (1, 2, 3)
+
+    def test_find_is_case_insensitive(self, catalog):
+        """完全一致検索が大文字小文字を無視することをテスト"""
+        assert catalog.find("APPLE").word_id == 1
+        assert catalog.find(" apply ").word_id == 2
+        assert catalog.find("app") is None
+
+    def test_find_prefix(self, catalog):
+        """前方一致で辞書順の最初の単語を返すことをテスト"""
+        assert catalog.find_prefix("app").word == "apple"
+        assert catalog.find_prefix("APPL").word == "apple"
+        assert catalog.find_prefix("ban").word == "banana"
+        assert catalog.find_prefix("zzz") is None
+
+    def test_by_level(self, catalog):
+        """レベルで絞り込めることをテスト"""
+        assert [r.word_id for r in catalog.by_level(1)] == [1, 3]
+        assert catalog.by_level(9) == ()
+
+    def test_record_to_dict(self, catalog):
+        """カード表示用のdictに変換できることをテスト"""
+        d = catalog.get(1).to_dict()
+
+        assert d["word"] == "apple"
+        assert d["synonyms"] == ("fruit",)
+        assert d["derived"] == ()
+
+    def test_record_has_no_instance_dict(self, catalog):
+        """__slots__でインスタンスdictを持たないことをテスト"""
+        assert not hasattr(catalog.get(1), "__dict__")
+
+    def test_memory_bytes(self, catalog):
+        """メモリ使用量が計算できることをテスト"""
+        assert catalog.memory_bytes() > 0
+        assert WordCatalog().memory_bytes() == 0
+
+    def test_replace_is_atomic(self, catalog):
+        """差し替え後は新しい内容だけが見えることをテスト"""
+        catalog.replace([WordRecord.from_row(_row(10, "cherry"))])
+
+        assert len(catalog) == 1
+        assert catalog.get(1) is None
+        assert catalog.find("cherry").word_id == 10
+        assert catalog.reloads == 2
+
+    @pytest.mark.asyncio
+    async def test_get_many_from_catalog(self, catalog):
+        """読み込み済みならDBを使わずに取得することをテスト"""
+        conn = AsyncMock()
+        records = await catalog.get_many(conn, [3, 99, 1])
+
+        assert [r.word_id for r in records] == [3, 1]
+        conn.fetch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fallback_to_database(self):
+        """未読み込みならDBから取得することをテスト"""
+        catalog = WordCatalog()
+        conn = AsyncMock()
+        conn.fetch = AsyncMock(return_value=[_row(2, "b"), _row(1, "a")])
+        conn.fetchrow = AsyncMock(side_effect=[None, _row(5, "apple")])
+
+        records = await catalog.get_many(conn, [1, 2])
+        found = await catalog.lookup(conn, "app")
+
+        assert [r.word_id for r in records] == [1, 2]
+        assert found.word_id == 5
+        assert conn.fetchrow.await_count == 2, "完全一致 → 前方一致の順に検索する"
+
+    def test_memory_bytes_is_computed_once_per_load(self, catalog, monkeypatch):
+        """メモリ使用量はスナップショットごとに1回だけ計算することをテスト"""
+        calls = []
+        measure = word_catalog._measure
+        monkeypatch.setattr(word_catalog, "_measure", lambda snap: calls.append(snap) or measure(snap))
+
+        first = catalog.stats()["memory_bytes"]
+        assert catalog.stats()["memory_bytes"] == first
+        assert len(calls) == 1
+
+        catalog.replace([WordRecord.from_row(_row(10, "cherry"))])
+        catalog.stats()
+        assert len(calls) == 2
+
+
+class FakeListenConnection:
+    """LISTEN 用の接続の代わり（リスナーを記録し、切断を起こせる）"""
+
+    def __init__(self):
+        self.listeners = {}
+        self.termination = []
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback):
+        self.termination.append(callback)
+
+    async def close(self):
+        self.closed = True
+        for callback in self.termination:
+            callback(self)
+
+    def drop(self):
+        for callback in self.termination:
+            callback(self)
+
+
+class TestListening:
+    """words 更新通知の待ち受けのテスト"""
+
+    @pytest.fixture
+    def connections(self, monkeypatch):
+        created = []
+
+        async def connect(url):
+            conn = FakeListenConnection()
+            created.append(conn)
+            return conn
+
+        monkeypatch.setattr(word_catalog.asyncpg, "connect", connect)
+        return created
+
+    @pytest.mark.asyncio
+    async def test_failed_reload_is_logged(self, connections, caplog):
+        """通知から起動した再読み込みの失敗はログに残り、タスクの参照も片付くことをテスト"""
+        catalog = WordCatalog()
+        reload = AsyncMock(side_effect=RuntimeError("db down"))
+        await catalog.start_listening("postgresql://test", reload)
+
+        connections[0].listeners[word_catalog.WORDS_CHANGED_CHANNEL](connections[0], 1, "ch", "")
+        assert len(catalog._tasks) == 1
+        await asyncio.gather(*catalog._tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert catalog._tasks == set()
+        assert "db down" in caplog.text
+        await catalog.stop_listening()
+
+    @pytest.mark.asyncio
+    async def test_reconnects_and_reloads(self, connections):
+        """LISTEN の接続が切れたら再接続し、全件を読み直すことをテスト"""
+        catalog = WordCatalog()
+        reload = AsyncMock()
+        await catalog.start_listening("postgresql://test", reload)
+
+        connections[0].drop()
+        await asyncio.gather(*catalog._tasks)
+
+        assert len(connections) == 2
+        assert catalog._listener_conn is connections[1]
+        reload.assert_awaited_once()
+
+        await catalog.stop_listening()
+        assert connections[1].closed
+        assert len(connections) == 2, "自分で閉じたときは再接続しない"
@@ -1,7 +1,12 @@
-from typing import Optional
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
 
 import discord
 
+logger = logging.getLogger('winglish.utils')
+
 
 def main_menu_view() -> discord.ui.View:
     """
@@ -32,3 +37,67 @@ def info_embed(title: str, desc: str, color: Optional[int] = None) -> discord.Em
     embed_color = color if color is not None else 0x2b90d9
     e = discord.Embed(title=title, description=desc, color=embed_color)
     return e
+
+
+class ThrottledEditor:
+    """
+    1つのメッセージへの編集を間引くヘルパー
+
+    update() は最新の内容だけを覚えておき、前回の編集から min_interval_sec 以上空けて反映する
+    （間に来た途中の内容は捨てる）。ストリーミング表示のように短い間隔で内容が変わっても、
+    Discord のメッセージ編集のレート制限（おおむね 5秒に5回）に当たらない。
+
+    Usage:
+        editor = ThrottledEditor(message, min_interval_sec=1.2)
+        editor.update(embed=partial_embed)   # 何度呼んでもよい
+        await editor.finish(embed=final_embed)
+    """
+
+    def __init__(self, message: discord.Message, min_interval_sec: float = 1.2) -> None:
+        """
+        Args:
+            message: 編集するメッセージ
+            min_interval_sec: 編集の最小間隔（秒）
+        """
+        self.message = message
+        self.min_interval_sec = min_interval_sec
+        self.edits = 0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._last_edit = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, **fields: Any) -> None:
+        """次の編集で反映する内容を差し替える（message.edit の引数）"""
+        self._pending = fields
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def finish(self, **fields: Any) -> None:
+        """途中の内容を捨て、最終的な内容ですぐに編集する"""
+        self._pending = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._edit(fields)
+
+    async def _drain(self) -> None:
+        while self._pending is not None:
+            wait = self._last_edit + self.min_interval_sec - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            fields, self._pending = self._pending, None
+            await self._edit(fields)
+
+    async def _edit(self, fields: Dict[str, Any]) -> None:
+        self._last_edit = time.monotonic()
+        try:
+            await self.message.edit(**fields)
+            self.edits += 1
+        except discord.HTTPException as e:
+            # 途中経過の表示に失敗しても、最後の編集で追いつく
+            logger.warning(f"メッセージの編集に失敗しました: {e}")
@@ -0,0 +1,348 @@
+"""
+語彙カタログ（wordsテーブルのプロセス内キャッシュ）
+
+words はほぼ更新されないため、起動時（setup_hook）に一度だけ読み込み、
+単語カード表示・単語帳の単語検索・苦手テストなどで DB を引かずに参照します。
+
+- レコードは __slots__ 付きの WordRecord（配列カラムはタプル）
+- ID / 単語（大文字小文字無視、前方一致）/ レベルで検索可能
+- 再読み込みは新しいスナップショットを作ってから参照を差し替える（アトミック）
+- scripts/load_words.py 実行後の NOTIFY で自動的に再読み込みする
+  （LISTEN の接続が切れたら再接続し、切れていた間の通知を取りこぼさないよう全件を読み直す）
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import sys
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import asyncpg
+
+from metrics import get_metrics
+
+logger = logging.getLogger('winglish.word_catalog')
+
+# scripts/load_words.py が取り込み後に通知するチャンネル
+WORDS_CHANGED_CHANNEL = "winglish_words_changed"
+
+# LISTEN の再接続の間隔の上限（秒）。1秒から倍々に伸ばす
+LISTEN_RECONNECT_MAX_DELAY_SEC = 60.0
+
+WORD_COLUMNS = "word_id, word, jp, pos, level, example_en, example_ja, synonyms, derived"
+
+
+class WordRecord:
+    """wordsテーブルの1行（カード表示に必要なカラムのみ）"""
+
+    __slots__ = ("word_id", "word", "jp", "pos", "level", "example_en", "example_ja", "synonyms", "derived")
+
+    def __init__(
+        self,
+        word_id: int,
+        word: str,
+        jp: str,
+        pos: Optional[str],
+        level: Optional[int],
+        example_en: Optional[str],
+        example_ja: Optional[str],
+        synonyms: Tuple[str, ...],
+        derived: Tuple[str, ...],
+    ) -> None:
+        self.word_id = word_id
+        self.word = word
+        self.jp = jp
+        self.pos = pos
+        self.level = level
+        self.example_en = example_en
+        self.example_ja = example_ja
+        self.synonyms = synonyms
+        self.derived = derived
+
+    @classmethod
+    def from_row(cls, row: Any) -> "WordRecord":
+        """asyncpg.Record（または同じキーを持つdict）から作成する"""
+        return cls(
+            row["word_id"], row["word"], row["jp"], row["pos"], row["level"],
+            row["example_en"], row["example_ja"],
+            tuple(row["synonyms"] or ()), tuple(row["derived"] or ()),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """VocabSessionView の items 形式（dict）に変換する"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"WordRecord({self.word_id}, {self.word!r})"
+
+
+class _Snapshot:
+    """ある時点のカタログ内容（読み込み後は変更しない）"""
+
+    __slots__ = ("by_id", "by_word", "sorted_words", "by_level", "ids", "memory_bytes")
+
+    def __init__(self, records: Iterable[WordRecord]) -> None:
+        self.by_id: Dict[int, WordRecord] = {}
+        self.by_word: Dict[str, WordRecord] = {}
+        levels: Dict[Optional[int], List[WordRecord]] = {}
+        for rec in records:
+            self.by_id[rec.word_id] = rec
+            self.by_word.setdefault(rec.word.lower(), rec)
+            levels.setdefault(rec.level, []).append(rec)
+        self.sorted_words: List[str] = sorted(self.by_word)
+        self.by_level: Dict[Optional[int], Tuple[WordRecord, ...]] = {k: tuple(v) for k, v in levels.items()}
+        self.ids: Tuple[int, ...] = tuple(sorted(self.by_id))
+        # WordCatalog.memory_bytes() が初回に計算して入れる（スナップショットごとに1回）
+        self.memory_bytes: Optional[int] = None
+
+
+class WordCatalog:
+    """
+    wordsテーブルの読み取り専用キャッシュ
+
+    Usage:
+        catalog = get_word_catalog()
+        await catalog.load(conn)
+        rec = catalog.get(word_id)
+        rec = catalog.find("apple") or catalog.find_prefix("app")
+    """
+
+    def __init__(self) -> None:
+        self._snapshot: Optional[_Snapshot] = None
+        self._reload_lock = asyncio.Lock()
+        self._listener_conn: Optional[asyncpg.Connection] = None
+        self._listen_url: Optional[str] = None
+        self._reload: Optional[Callable[[], Awaitable[Any]]] = None
+        # 通知・再接続から起動した処理（参照を持っておかないと途中で回収されうる）
+        self._tasks: Set[asyncio.Task] = set()
+        self.reloads: int = 0
+
+    @property
+    def loaded(self) -> bool:
+        """読み込み済みかどうか"""
+        return self._snapshot is not None
+
+    def __len__(self) -> int:
+        return len(self._snapshot.by_id) if self._snapshot else 0
+
+    @property
+    def ids(self) -> Tuple[int, ...]:
+        """全 word_id（昇順）"""
+        return self._snapshot.ids if self._snapshot else ()
+
+    def replace(self, records: Iterable[WordRecord]) -> None:
+        """
+        カタログの内容を差し替える
+
+        新しいスナップショットを作り終えてから参照を入れ替えるため、
+        読み取り側が途中状態を見ることはない。
+        """
+        self._snapshot = _Snapshot(records)
+        self.reloads += 1
+
+    async def load(self, conn: asyncpg.Connection) -> None:
+        """
+        wordsテーブルを読み込む
+
+        Args:
+            conn: データベース接続
+        """
+        async with self._reload_lock:
+            rows = await conn.fetch(f"SELECT {WORD_COLUMNS} FROM words")
+            self.replace(WordRecord.from_row(r) for r in rows)
+        logger.info(f"語彙カタログを読み込みました: {len(self)}語 / 約{self.memory_bytes() // 1024}KiB")
+
+    def invalidate(self) -> None:
+        """カタログを破棄する（次回の load まで DB 参照にフォールバック）"""
+        self._snapshot = None
+
+    def get(self, word_id: int) -> Optional[WordRecord]:
+        """IDで検索する"""
+        return self._snapshot.by_id.get(word_id) if self._snapshot else None
+
+    def find(self, word: str) -> Optional[WordRecord]:
+        """単語の完全一致（大文字小文字無視）で検索する"""
+        if not self._snapshot:
+            return None
+        return self._snapshot.by_word.get(word.strip().lower())
+
+    def find_prefix(self, prefix: str) -> Optional[WordRecord]:
+        """前方一致（大文字小文字無視）で辞書順の最初の単語を返す"""
+        if not self._snapshot:
+            return None
+        p = prefix.strip().lower()
+        words = self._snapshot.sorted_words
+        i = bisect.bisect_left(words, p)
+        if i < len(words) and words[i].startswith(p):
+            return self._snapshot.by_word[words[i]]
+        return None
+
+    def by_level(self, level: Optional[int]) -> Tuple[WordRecord, ...]:
+        """レベルで絞り込む"""
+        return self._snapshot.by_level.get(level, ()) if self._snapshot else ()
+
+    async def get_many(self, conn: asyncpg.Connection, word_ids: Sequence[int]) -> List[WordRecord]:
+        """
+        複数IDをまとめて取得する（指定順を維持、存在しないIDは除外）
+
+        未読み込みの場合は DB から取得する。
+        """
+        if self._snapshot:
+            by_id = self._snapshot.by_id
+            return [by_id[i] for i in word_ids if i in by_id]
+        rows = await conn.fetch(f"SELECT {WORD_COLUMNS} FROM words WHERE word_id = ANY($1::int[])", list(word_ids))
+        fetched = {r["word_id"]: WordRecord.from_row(r) for r in rows}
+        return [fetched[i] for i in word_ids if i in fetched]
+
+    async def lookup(self, conn: asyncpg.Connection, word: str, prefix_fallback: bool = True) -> Optional[WordRecord]:
+        """
+        単語を検索する（完全一致 → 前方一致）
+
+        未読み込みの場合は DB から ILIKE で検索する。
+        """
+        if self._snapshot:
+            rec = self.find(word)
+            if rec is None and prefix_fallback:
+                rec = self.find_prefix(word)
+            return rec
+        row = await conn.fetchrow(f"SELECT {WORD_COLUMNS} FROM words WHERE word ILIKE $1 LIMIT 1", word)
+        if row is None and prefix_fallback:
+            row = await conn.fetchrow(f"SELECT {WORD_COLUMNS} FROM words WHERE word ILIKE $1 || '%' LIMIT 1", word)
+        return WordRecord.from_row(row) if row else None
+
+    def memory_bytes(self) -> int:
+        """
+        カタログのおおよそのメモリ使用量（バイト）を返す
+
+        レコード・文字列・タプル・索引用の dict/list を sys.getsizeof で合算する。
+        文字列はインターンされていても重複して数えるため、上限寄りの値になる。
+        全レコードをたどるため、計算はスナップショットごとに1回だけ行う（メトリクスの取得ごとには数えない）。
+        """
+        snap = self._snapshot
+        if snap is None:
+            return 0
+        if snap.memory_bytes is None:
+            snap.memory_bytes = _measure(snap)
+        return snap.memory_bytes
+
+    def stats(self) -> Dict[str, int]:
+        """メトリクス用の統計値を返す"""
+        return {
+            "words": len(self),
+            "reloads": self.reloads,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+    async def start_listening(self, database_url: str, reload: Callable[[], Awaitable[Any]]) -> None:
+        """
+        words 更新通知（LISTEN）の受信を開始する
+
+        接続が切れたら（終了リスナーで検知）再接続し、再接続できたら reload で全件を読み直す。
+
+        Args:
+            database_url: PostgreSQL接続URL（LISTEN専用の接続を張る）
+            reload: 通知受信時・再接続後に呼ぶコルーチン関数
+        """
+        if self._listener_conn is not None:
+            return
+        self._listen_url = database_url
+        self._reload = reload
+        await self._listen()
+        logger.info(f"✅ words 更新通知の待ち受けを開始しました ({WORDS_CHANGED_CHANNEL})")
+
+    async def stop_listening(self) -> None:
+        """更新通知の受信を停止する（再接続・再読み込みの途中なら止める）"""
+        self._listen_url = None
+        conn, self._listener_conn = self._listener_conn, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.warning(f"LISTEN 接続のクローズに失敗: {e}")
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _listen(self) -> None:
+        conn = await asyncpg.connect(self._listen_url)
+        try:
+            await conn.add_listener(WORDS_CHANGED_CHANNEL, self._on_notify)
+        except BaseException:
+            await conn.close()
+            raise
+        conn.add_termination_listener(self._on_terminated)
+        self._listener_conn = conn
+
+    def _on_notify(self, conn: Any, pid: int, channel: str, payload: str) -> None:
+        logger.info(f"words 更新通知を受信しました: {payload or '-'}")
+        self._spawn(self._reload())
+
+    def _on_terminated(self, conn: Any) -> None:
+        if conn is not self._listener_conn:
+            # stop_listening で閉じた
+            return
+        self._listener_conn = None
+        get_metrics().inc("word_catalog.listener_lost")
+        logger.warning("words 更新通知の LISTEN 接続が切れました。再接続します")
+        self._spawn(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        while self._listen_url is not None and self._listener_conn is None:
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning(f"LISTEN の再接続に失敗しました（{delay:g}秒後に再試行）: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LISTEN_RECONNECT_MAX_DELAY_SEC)
+                continue
+            logger.info("✅ words 更新通知の待ち受けを再開しました（切れていた間の更新を取り込むため再読み込みします）")
+            await self._reload()
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            get_metrics().inc("word_catalog.reload_errors")
+            logger.error(f"語彙カタログの再読み込みに失敗しました: {error}", exc_info=error)
+
+
+def _measure(snap: _Snapshot) -> int:
+    """スナップショットのおおよそのメモリ使用量（バイト）"""
+    total = sys.getsizeof(snap.by_id) + sys.getsizeof(snap.by_word)
+    total += sys.getsizeof(snap.sorted_words) + sys.getsizeof(snap.by_level) + sys.getsizeof(snap.ids)
+    total += sum(sys.getsizeof(v) for v in snap.by_level.values())
+    for rec in snap.by_id.values():
+        total += sys.getsizeof(rec)
+        for name in WordRecord.__slots__:
+            value = getattr(rec, name)
+            total += sys.getsizeof(value)
+            if isinstance(value, tuple):
+                total += sum(sys.getsizeof(s) for s in value)
+    total += sum(sys.getsizeof(k) for k in snap.by_word)
+    return total
+
+
+# グローバルインスタンス
+_word_catalog: Optional[WordCatalog] = None
+
+
+def get_word_catalog() -> WordCatalog:
+    """グローバルなWordCatalogインスタンスを取得する"""
+    global _word_catalog
+    if _word_catalog is None:
+        _word_catalog = WordCatalog()
+        get_metrics().register_source("word_catalog", _word_catalog.stats)
+    return _word_catalog
+
+
+__all__ = ['WordRecord', 'WordCatalog', 'get_word_catalog', 'WORDS_CHANGED_CHANNEL']